@@ -0,0 +1,355 @@
+from typing import List, Tuple, Dict, Union, Any, Callable, Optional
+from sample_scripts.corpus_io import Corpus
+from sample_scripts.token_corpus import TokenCorpus
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+from sample_scripts.binary_model import BinaryScoreModel, write_binary_model
+from sample_scripts.batch_tokenizer import build_mecab_wrapper
+from sample_scripts.sample_keyword import iter_tokenized_documents, construct_multi_ngram_cached_dicts, run_feature_selection
+from sample_scripts import sample_category_classification
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""パイプラインの各段階の成果物を、入力と設定のハッシュで管理し、変更があった段階だけを作り直します。
+各段階は 入力(ファイルまたは前の段階の成果物)・パラメータ・出力ディレクトリ を宣言します。
+成果物は <保存先>/<段階の名前>/<入力の内容のハッシュとパラメータのハッシュ>/ に保存し、同じハッシュの成果物があれば計算を省略します。
+前の段階を作り直しても出力の内容が同じであれば、後ろの段階は作り直しません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+FILE_NAME_MANIFEST = 'manifest.json'
+FILE_NAME_FILE_HASH_CACHE = 'file_hashes.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_json(json_obj:Any)->str:
+    return hashlib.sha1(json.dumps(json_obj, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _iter_files(path_target:str)->List[str]:
+    if os.path.isfile(path_target):
+        return [path_target]
+    seq_path_file = []
+    for path_dir, _, seq_file_name in os.walk(path_target):
+        seq_path_file.extend(os.path.join(path_dir, file_name) for file_name in seq_file_name)
+    return sorted(seq_path_file)
+
+
+def hash_content(path_target:str, seq_excluded_file_name:Tuple[str, ...]=())->str:
+    """* What you can do
+    - ファイル、またはディレクトリ以下の全ファイルの内容のハッシュを計算します。ディレクトリの場合は相対パスもハッシュに含めます。
+    """
+    hash_obj = hashlib.sha1()
+    for path_file in _iter_files(path_target):
+        if os.path.basename(path_file) in seq_excluded_file_name:
+            continue
+        if os.path.isdir(path_target):
+            hash_obj.update(os.path.relpath(path_file, path_target).encode('utf-8') + b'\0')
+        with open(path_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hash_obj.update(chunk)
+        hash_obj.update(b'\0')
+    return hash_obj.hexdigest()
+
+
+class Stage(object):
+    """* What you can do
+    - パイプラインの1つの段階を宣言します。
+
+    * Params
+    - name: 段階の名前。他の段階のinputsから、この名前で成果物を参照します。
+    - function: function(path_output_dir, inputs, **params) の形の関数。inputsは {入力の名前: 入力のパス} です。出力はpath_output_dirに書きます。
+    - inputs: {入力の名前: 前の段階の名前 または ファイル・ディレクトリのパス}
+    - params: functionに渡すパラメータ。jsonにできる値だけを使ってください。
+    - version: functionの処理を変えたときに変更すると、入力とパラメータが同じでも作り直します。
+
+    >>> Stage('tokenize', tokenize_stage, inputs={'training_corpus': './wikipedia_data/wikipedia-full.jsonl'},
+    ...       params={'pos_condition': [['名詞', '固有名詞']]})
+    """
+    def __init__(self,
+                 name:str,
+                 function:Callable[..., None],
+                 inputs:Dict[str, str]=None,
+                 params:Dict[str, Any]=None,
+                 version:str='1'):
+        self.name = name
+        self.function = function
+        self.inputs = inputs if inputs is not None else {}
+        self.params = params if params is not None else {}
+        self.version = version
+
+
+class ArtifactStore(object):
+    """* What you can do
+    - 成果物を <path_store_dir>/<段階の名前>/<キー>/ に保存します。
+    - 成果物ディレクトリには、キーの元になった入力のハッシュ・パラメータと、出力の内容のハッシュを manifest.json として保存します。
+    - 成果物は一時ディレクトリに作ってから名前を変えるので、途中で落ちても作りかけの成果物が使われることはありません。
+    - 外部ファイルのハッシュは (サイズ, 更新時刻) と一緒にキャッシュし、ファイルが変わっていなければ読み直しません。
+    """
+    def __init__(self, path_store_dir:str='./artifacts'):
+        self.path_store_dir = path_store_dir
+        if not os.path.exists(path_store_dir):
+            os.makedirs(path_store_dir)
+        self.path_file_hash_cache = os.path.join(path_store_dir, FILE_NAME_FILE_HASH_CACHE)
+        if os.path.exists(self.path_file_hash_cache):
+            with open(self.path_file_hash_cache, 'r') as f:
+                self._file_hash_cache = json.load(f)
+        else:
+            self._file_hash_cache = {}
+
+    def get_artifact_path(self, stage_name:str, artifact_key:str)->str:
+        return os.path.join(self.path_store_dir, stage_name, artifact_key)
+
+    def load_manifest(self, stage_name:str, artifact_key:str)->Optional[Dict[str, Any]]:
+        path_manifest = os.path.join(self.get_artifact_path(stage_name, artifact_key), FILE_NAME_MANIFEST)
+        if not os.path.exists(path_manifest):
+            return None
+        with open(path_manifest, 'r') as f:
+            return json.load(f)
+
+    def hash_external_input(self, path_input:str)->str:
+        """* What you can do
+        - 外部のファイル・ディレクトリの内容のハッシュを返します。中のファイルのサイズと更新時刻が前回と同じなら、キャッシュを返します。
+        """
+        path_input = os.path.abspath(path_input)
+        if not os.path.exists(path_input):
+            raise FileNotFoundError('Input {} does not exist.'.format(path_input))
+        file_signature = [[os.path.relpath(path_file, path_input), os.stat(path_file).st_size, os.stat(path_file).st_mtime_ns]
+                          for path_file in _iter_files(path_input)]
+        cached_obj = self._file_hash_cache.get(path_input)
+        if cached_obj is not None and cached_obj['signature'] == file_signature:
+            return cached_obj['content_hash']
+        content_hash = hash_content(path_input)
+        self._file_hash_cache[path_input] = {'signature': file_signature, 'content_hash': content_hash}
+        file_descriptor, path_tmp = tempfile.mkstemp(dir=self.path_store_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as f:
+            f.write(json.dumps(self._file_hash_cache, ensure_ascii=False))
+        os.replace(path_tmp, self.path_file_hash_cache)
+        return content_hash
+
+    def build(self,
+              stage:Stage,
+              artifact_key:str,
+              dict_input_path:Dict[str, str],
+              manifest_obj:Dict[str, Any])->Dict[str, Any]:
+        """* What you can do
+        - 段階の関数を一時ディレクトリで実行し、出力の内容のハッシュをmanifestに書いてから成果物ディレクトリに移します。
+        """
+        path_stage_dir = os.path.join(self.path_store_dir, stage.name)
+        if not os.path.exists(path_stage_dir):
+            os.makedirs(path_stage_dir)
+        path_tmp_dir = tempfile.mkdtemp(dir=path_stage_dir, suffix='.tmp')
+        try:
+            start_time = time.perf_counter()
+            stage.function(path_tmp_dir, dict_input_path, **stage.params)
+            manifest_obj = dict(manifest_obj)
+            manifest_obj['elapsed_seconds'] = time.perf_counter() - start_time
+            manifest_obj['content_hash'] = hash_content(path_tmp_dir, seq_excluded_file_name=(FILE_NAME_MANIFEST,))
+            with open(os.path.join(path_tmp_dir, FILE_NAME_MANIFEST), 'w') as f:
+                f.write(json.dumps(manifest_obj, ensure_ascii=False, indent=4))
+            os.rename(path_tmp_dir, self.get_artifact_path(stage.name, artifact_key))
+        except Exception:
+            shutil.rmtree(path_tmp_dir, ignore_errors=True)
+            raise
+        return manifest_obj
+
+
+class ArtifactPipeline(object):
+    """* What you can do
+    - 段階を宣言した順に実行します。前の段階の成果物を参照する段階は、その段階より後に追加してください。
+    - 段階のキーは (段階の名前, version, パラメータ, 各入力の内容のハッシュ) のハッシュです。同じキーの成果物があれば実行しません。
+    - 前の段階の入力のハッシュには、前の段階の出力の内容のハッシュを使います。作り直しても出力が同じなら、後ろの段階のキーは変わりません。
+
+    >>> pipeline = ArtifactPipeline(ArtifactStore('./artifacts'))
+    >>> pipeline.add_stage(Stage('tokenize', tokenize_stage, inputs={'training_corpus': './wikipedia_data/wikipedia-full.jsonl'}))
+    >>> pipeline.add_stage(Stage('feature_selection', feature_selection_stage, inputs={'token_corpus': 'tokenize'}))
+    >>> dict_artifact_path = pipeline.run()
+    """
+    def __init__(self, artifact_store:ArtifactStore):
+        self.artifact_store = artifact_store
+        self.stages = []  # type: List[Stage]
+
+    def add_stage(self, stage:Stage)->'ArtifactPipeline':
+        seq_stage_name = [added_stage.name for added_stage in self.stages]
+        if stage.name in seq_stage_name:
+            raise ValueError('Stage {} is already added.'.format(stage.name))
+        self.stages.append(stage)
+        return self
+
+    def _get_required_stages(self, seq_target:List[str])->List[Stage]:
+        stage_name2stage = {stage.name: stage for stage in self.stages}
+        set_required = set()
+        stack = list(seq_target)
+        while len(stack) > 0:
+            stage_name = stack.pop()
+            if stage_name not in stage_name2stage:
+                raise ValueError('Stage {} is not defined.'.format(stage_name))
+            if stage_name in set_required:
+                continue
+            set_required.add(stage_name)
+            stack.extend(input_source for input_source in stage_name2stage[stage_name].inputs.values() if input_source in stage_name2stage)
+        return [stage for stage in self.stages if stage.name in set_required]
+
+    def run(self, seq_target:List[str]=None, is_force:bool=False)->Dict[str, str]:
+        """* What you can do
+        - 段階を実行し、{段階の名前: 成果物ディレクトリのパス} を返します。
+        - seq_targetを与えると、その段階と、その段階が依存する段階だけを実行します。
+        - is_force=Trueの場合は、成果物があっても作り直します(古い成果物は削除します)。
+        """
+        seq_stage = self._get_required_stages(seq_target) if seq_target is not None else self.stages
+        dict_artifact_path = {}  # type: Dict[str, str]
+        dict_content_hash = {}  # type: Dict[str, str]
+        for stage in seq_stage:
+            dict_input_path = {}  # type: Dict[str, str]
+            dict_input_hash = {}  # type: Dict[str, str]
+            for input_name, input_source in sorted(stage.inputs.items()):
+                if input_source in dict_artifact_path:
+                    dict_input_path[input_name] = dict_artifact_path[input_source]
+                    dict_input_hash[input_name] = 'artifact:{}:{}'.format(input_source, dict_content_hash[input_source])
+                elif any(added_stage.name == input_source for added_stage in self.stages):
+                    raise ValueError('Stage {} must be added before stage {}.'.format(input_source, stage.name))
+                else:
+                    dict_input_path[input_name] = input_source
+                    dict_input_hash[input_name] = 'file:{}'.format(self.artifact_store.hash_external_input(input_source))
+
+            key_obj = {'stage': stage.name, 'version': stage.version, 'params': stage.params, 'inputs': dict_input_hash}
+            artifact_key = _hash_json(key_obj)
+            path_artifact = self.artifact_store.get_artifact_path(stage.name, artifact_key)
+            manifest_obj = self.artifact_store.load_manifest(stage.name, artifact_key)
+            if manifest_obj is not None and is_force:
+                shutil.rmtree(path_artifact)
+                manifest_obj = None
+            if manifest_obj is None:
+                logger.info('Building stage={} key={}'.format(stage.name, artifact_key))
+                manifest_obj = self.artifact_store.build(stage, artifact_key, dict_input_path, key_obj)
+                logger.info('Built stage={} in {:.2f} sec'.format(stage.name, manifest_obj['elapsed_seconds']))
+            else:
+                logger.info('Skipped stage={}; artifact {} is up to date.'.format(stage.name, path_artifact))
+            dict_artifact_path[stage.name] = path_artifact
+            dict_content_hash[stage.name] = manifest_obj['content_hash']
+        return dict_artifact_path
+
+
+# ------------------------------------------------------------------------
+# wikipediaテキスト -> 形態素分割 -> 特徴量抽出 -> 分類の評価 の段階
+
+
+def tokenize_stage(path_output_dir:str,
+                   inputs:Dict[str, str],
+                   pos_condition:List[List[str]],
+                   tokenizer_kwargs:Dict[str, Any])->None:
+    """* What you can do
+    - inputs['training_corpus']の文書を形態素分割し、TokenCorpusとして保存します。
+    """
+    seq_tokenized_document = iter_tokenized_documents(build_mecab_wrapper(**tokenizer_kwargs),
+                                                      Corpus(inputs['training_corpus']),
+                                                      [tuple(pos_tuple) for pos_tuple in pos_condition])
+    token_corpus = TokenCorpus.from_tokenized_documents(
+        (wiki_document_obj['gold_label'], seq_tokens) for wiki_document_obj, seq_tokens in seq_tokenized_document)
+    token_corpus.save(os.path.join(path_output_dir, 'token_corpus'))
+
+
+def feature_selection_stage(path_output_dir:str,
+                            inputs:Dict[str, str],
+                            selection_method:str='soa',
+                            n_value:int=1,
+                            min_df:int=1,
+                            max_df:Union[int, float]=1.0)->None:
+    """* What you can do
+    - inputs['token_corpus']のTokenCorpusから語彙を絞り込み、特徴量抽出をしてスコアモデルを保存します。
+    - 出力はsample_keyword.pyと同じ word_score.json, word_score.bin(単語の場合のみ), vocabulary.json です。
+    """
+    token_corpus = TokenCorpus.load(os.path.join(inputs['token_corpus'], 'token_corpus'))
+    vocabulary_pruner = VocabularyPruner(min_df=min_df, max_df=max_df).fit(token_corpus.iter_documents())
+    vocabulary_pruner.save(os.path.join(path_output_dir, 'vocabulary.json'))
+    ngram_cached_dicts = construct_multi_ngram_cached_dicts(tokenizer_obj=None,
+                                                            seq_text_data=token_corpus,
+                                                            pos_condition=[],
+                                                            seq_n_value=(n_value,),
+                                                            vocabulary_pruner=vocabulary_pruner)
+    seq_score_object = run_feature_selection(tokenized_documents=ngram_cached_dicts[n_value], selection_method=selection_method)
+    with open(os.path.join(path_output_dir, 'word_score.json'), 'w') as f:
+        f.write(json.dumps(seq_score_object, ensure_ascii=False))
+    if n_value == 1:
+        write_binary_model(seq_score_object, os.path.join(path_output_dir, 'word_score.bin'))
+
+
+def evaluation_stage(path_output_dir:str,
+                     inputs:Dict[str, str],
+                     pos_condition:List[List[str]],
+                     tokenizer_kwargs:Dict[str, Any],
+                     ranking_evaluation:List[int])->None:
+    """* What you can do
+    - inputs['model']のスコアモデルで、inputs['evaluation_corpus']の文書を分類し、evaluation_report.jsonを保存します。
+    """
+    path_word_model_bin = os.path.join(inputs['model'], 'word_score.bin')
+    if os.path.exists(path_word_model_bin):
+        word_score_model = BinaryScoreModel(path_word_model_bin)
+    else:
+        with open(os.path.join(inputs['model'], 'word_score.json'), 'r') as f:
+            word_score_model = json.load(f)
+    sample_category_classification.main(word_score_model=word_score_model,
+                                      seq_evaluation_data=Corpus(inputs['evaluation_corpus']),
+                                      tokenizer_obj=build_mecab_wrapper(**tokenizer_kwargs),
+                                      pos_condition=[tuple(pos_tuple) for pos_tuple in pos_condition],
+                                      ranking_evaluation=ranking_evaluation,
+                                      vocabulary_pruner=VocabularyPruner.load(os.path.join(inputs['model'], 'vocabulary.json')),
+                                      path_evaluation_report=os.path.join(path_output_dir, 'evaluation_report.json'))
+
+
+def build_wikipedia_pipeline(artifact_store:ArtifactStore,
+                             path_training_corpus:str='./wikipedia_data/wikipedia-full.jsonl',
+                             path_evaluation_corpus:str='./wikipedia_data/wikipedia-evaluation-full.jsonl',
+                             pos_condition:List[List[str]]=(('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')),
+                             tokenizer_kwargs:Dict[str, Any]=None,
+                             selection_method:str='soa',
+                             n_value:int=1,
+                             min_df:int=2,
+                             max_df:Union[int, float]=0.95,
+                             ranking_evaluation:List[int]=(1, 3))->ArtifactPipeline:
+    """* What you can do
+    - get_wikipedia_text.py -> sample_keyword.py -> sample_category_classification.py と同じ流れを、段階として宣言します。
+    - 評価の設定(ranking_evaluation)だけを変えた場合は、形態素分割と特徴量抽出を実行しません。
+    """
+    tokenizer_kwargs = tokenizer_kwargs if tokenizer_kwargs is not None else {'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}
+    pos_condition = [list(pos_tuple) for pos_tuple in pos_condition]
+    pipeline = ArtifactPipeline(artifact_store)
+    pipeline.add_stage(Stage('tokenize', tokenize_stage,
+                             inputs={'training_corpus': path_training_corpus},
+                             params={'pos_condition': pos_condition, 'tokenizer_kwargs': tokenizer_kwargs}))
+    pipeline.add_stage(Stage('feature_selection', feature_selection_stage,
+                             inputs={'token_corpus': 'tokenize'},
+                             params={'selection_method': selection_method, 'n_value': n_value, 'min_df': min_df, 'max_df': max_df}))
+    pipeline.add_stage(Stage('evaluation', evaluation_stage,
+                             inputs={'model': 'feature_selection', 'evaluation_corpus': path_evaluation_corpus},
+                             params={'pos_condition': pos_condition, 'tokenizer_kwargs': tokenizer_kwargs,
+                                     'ranking_evaluation': list(ranking_evaluation)}))
+    return pipeline
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='変更があった段階だけを作り直して、モデルの構築と評価を実行します。')
+    arg_parser.add_argument('--store', dest='path_store_dir', default='./artifacts')
+    arg_parser.add_argument('--method', dest='selection_method', default='soa')
+    arg_parser.add_argument('--rank', dest='ranking_evaluation', type=int, nargs='+', default=[1, 3])
+    arg_parser.add_argument('--target', dest='seq_target', nargs='+', default=None,
+                            help='実行する段階の名前。依存する段階も実行します')
+    arg_parser.add_argument('--force', dest='is_force', action='store_true')
+    args = arg_parser.parse_args()
+
+    wikipedia_pipeline = build_wikipedia_pipeline(ArtifactStore(args.path_store_dir),
+                                                  selection_method=args.selection_method,
+                                                  ranking_evaluation=args.ranking_evaluation)
+    for stage_name, path_artifact in wikipedia_pipeline.run(seq_target=args.seq_target, is_force=args.is_force).items():
+        logger.info('{} -> {}'.format(stage_name, path_artifact))
@@ -0,0 +1,195 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Callable
+from sample_scripts.tokenizer_cache import TokenizationCache
+from sample_scripts import instrumentation
+import collections
+import itertools
+import json
+import logging
+import multiprocessing
+import threading
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""複数の文書をプロセスプールで並列に形態素分割します。
+MecabWrapperはプロセス間で受け渡しできないので、各ワーカープロセスが起動時に1度だけ自分のMecabWrapperを作ります。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### ワーカープロセスごとの形態素解析機。_initialize_worker()で1度だけ作られる ###
+_worker_tokenizer = None
+### get_shared_tokenizer()で作った形態素解析機。(tokenizer_factory, 引数)ごとにプロセス内で使い回す ###
+_shared_tokenizers = {}  # type: Dict[Tuple[Callable[..., Any], str], Any]
+_shared_tokenizers_lock = threading.Lock()
+
+
+def build_mecab_wrapper(**tokenizer_kwargs)->Any:
+    """* What you can do
+    - MecabWrapperを作ります。デフォルトのtokenizer_factoryです。
+    """
+    from JapaneseTokenizer import MecabWrapper
+    return MecabWrapper(**tokenizer_kwargs)
+
+
+def get_shared_tokenizer(tokenizer_factory:Callable[..., Any]=build_mecab_wrapper, **tokenizer_kwargs)->Any:
+    """* What you can do
+    - 同じtokenizer_factory・同じ引数の形態素解析機を、プロセス内で1度だけ作って使い回します。
+    - MecabWrapperの作成(辞書の読み込み)は重いので、1つのプロセスで何度も作らないようにします。
+
+    >>> get_shared_tokenizer(dictType='ipadic') is get_shared_tokenizer(dictType='ipadic')
+    True
+    """
+    cache_key = (tokenizer_factory, json.dumps(tokenizer_kwargs, sort_keys=True))
+    with _shared_tokenizers_lock:
+        if cache_key not in _shared_tokenizers:
+            _shared_tokenizers[cache_key] = tokenizer_factory(**tokenizer_kwargs)
+        return _shared_tokenizers[cache_key]
+
+
+def _initialize_worker(tokenizer_factory:Callable[..., Any], tokenizer_kwargs:Dict[str, Any])->None:
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer_factory(**tokenizer_kwargs)
+
+
+def _tokenize_chunk(seq_text:List[str],
+                    pos_condition:List[Tuple[str,...]],
+                    is_surface:bool)->List[List[str]]:
+    return [
+        _worker_tokenizer.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
+        for input_text in seq_text
+    ]
+
+
+class BatchTokenizer(object):
+    """* What you can do
+    - 文書のイテラブルを受け取り、プロセスプールで並列に形態素分割します。
+    - 結果は入力と同じ順番で、generatorとして返します。
+    - 結果を受け取っていないチャンクはmax_pending_chunks個までに制限するので、メモリ使用量はchunk_sizeで決まります。
+    - プロセスプールは最初の呼び出しで作られ、close()するまで使い回します。
+
+    * Params
+    - tokenizer_kwargs: 各ワーカーでtokenizer_factoryに渡す引数
+        >>> {'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}
+    - tokenizer_factory: 形態素解析機を作る関数。プロセス間で受け渡すので、モジュールのトップレベルに定義された関数を渡してください。
+    - n_process: プロセス数。Noneの場合はCPUコア数です。1の場合はプロセスプールを使いません。
+    - chunk_size: 1回のタスクでワーカーに渡す文書数
+    """
+    def __init__(self,
+                 tokenizer_kwargs:Dict[str, Any]=None,
+                 tokenizer_factory:Callable[..., Any]=build_mecab_wrapper,
+                 n_process:int=None,
+                 chunk_size:int=100,
+                 max_pending_chunks:int=None):
+        self.tokenizer_kwargs = tokenizer_kwargs if tokenizer_kwargs is not None else {}
+        self.tokenizer_factory = tokenizer_factory
+        self.n_process = n_process if n_process is not None else multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.max_pending_chunks = max_pending_chunks if max_pending_chunks is not None else self.n_process * 2
+        self._pool = None
+        self._local_tokenizer = None
+
+    def get_local_tokenizer(self)->Any:
+        """* What you can do
+        - 呼び出し元プロセスで使う形態素解析機を返します。キャッシュキーの計算とn_process=1の場合に使います。
+        """
+        if self._local_tokenizer is None:
+            self._local_tokenizer = get_shared_tokenizer(self.tokenizer_factory, **self.tokenizer_kwargs)
+        return self._local_tokenizer
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(processes=self.n_process,
+                                              initializer=_initialize_worker,
+                                              initargs=(self.tokenizer_factory, self.tokenizer_kwargs))
+        return self._pool
+
+    def _submit(self, seq_text:List[str], pos_condition:List[Tuple[str,...]], is_surface:bool):
+        if self.n_process == 1:
+            tokenizer_obj = self.get_local_tokenizer()
+            return [
+                tokenizer_obj.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
+                for input_text in seq_text
+            ]
+        return self._get_pool().apply_async(_tokenize_chunk, (seq_text, pos_condition, is_surface))
+
+    def tokenize_documents(self,
+                           seq_text:Iterable[str],
+                           pos_condition:List[Tuple[str,...]],
+                           is_surface:bool=False,
+                           tokenization_cache:TokenizationCache=None)->Iterator[List[str]]:
+        """* What you can do
+        - テキストのイテラブルを形態素分割し、入力と同じ順番でトークン列をyieldします。
+        - tokenization_cacheを与えると、キャッシュにあるテキストはワーカーに渡さずキャッシュから返します。
+        """
+        config_hash = None
+        if tokenization_cache is not None:
+            config_hash = tokenization_cache.get_tokenizer_config_hash(self.get_local_tokenizer(), pos_condition, is_surface)
+
+        pending_chunks = collections.deque()
+        iter_text = iter(seq_text)
+        while True:
+            seq_chunk_text = list(itertools.islice(iter_text, self.chunk_size))
+            if len(seq_chunk_text) > 0:
+                if tokenization_cache is None:
+                    seq_cache_key = None
+                    seq_cached_tokens = [None] * len(seq_chunk_text)
+                else:
+                    seq_cache_key = [tokenization_cache.get_cache_key(input_text, config_hash) for input_text in seq_chunk_text]
+                    seq_cached_tokens = [tokenization_cache.get(cache_key) for cache_key in seq_cache_key]
+                seq_text_to_tokenize = [input_text for input_text, cached_tokens in zip(seq_chunk_text, seq_cached_tokens)
+                                        if cached_tokens is None]
+                with instrumentation.span('batch_tokenizer.submit'):
+                    submitted_obj = self._submit(seq_text_to_tokenize, pos_condition, is_surface) if len(seq_text_to_tokenize) > 0 else []
+                instrumentation.increment('batch_tokenizer.documents', len(seq_chunk_text))
+                pending_chunks.append((seq_cache_key, seq_cached_tokens, submitted_obj))
+
+            if len(pending_chunks) == 0:
+                break
+            if len(seq_chunk_text) > 0 and len(pending_chunks) < self.max_pending_chunks:
+                continue
+
+            ### 先頭のチャンクから順に結果を受け取り、キャッシュの結果と合わせて入力順に返す ###
+            seq_cache_key, seq_cached_tokens, submitted_obj = pending_chunks.popleft()
+            ### ワーカーの結果待ちの時間. 長い場合はワーカープロセスが足りていない ###
+            with instrumentation.span('batch_tokenizer.wait'):
+                iter_tokenized = iter(submitted_obj if isinstance(submitted_obj, list) else submitted_obj.get())
+            for i, cached_tokens in enumerate(seq_cached_tokens):
+                if cached_tokens is not None:
+                    yield cached_tokens
+                    continue
+                seq_tokens = next(iter_tokenized)
+                if tokenization_cache is not None:
+                    tokenization_cache.put(seq_cache_key[i], seq_tokens)
+                yield seq_tokens
+
+    def iter_tokenized_documents(self,
+                                 seq_document:Iterable[Dict[str, Any]],
+                                 pos_condition:List[Tuple[str,...]],
+                                 is_surface:bool=False,
+                                 tokenization_cache:TokenizationCache=None,
+                                 text_key:str='text')->Iterator[Tuple[Dict[str, Any], List[str]]]:
+        """* What you can do
+        - 文書(辞書)のイテラブルを受け取り、(文書, トークン列)をyieldします。
+        - ラベルなど、テキスト以外の情報と形態素分割の結果を一緒に扱いたいときに使います。
+        """
+        seq_document_a, seq_document_b = itertools.tee(seq_document)
+        seq_tokenized = self.tokenize_documents((document_obj[text_key] for document_obj in seq_document_b),
+                                                pos_condition=pos_condition,
+                                                is_surface=is_surface,
+                                                tokenization_cache=tokenization_cache)
+        return zip(seq_document_a, seq_tokenized)
+
+    def close(self)->None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
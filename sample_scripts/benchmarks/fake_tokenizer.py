@@ -0,0 +1,112 @@
+from typing import List, Tuple, Dict, Union, Any, Iterator
+import logging
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""Mecabなしでベンチマークを実行するための、形態素解析機の代わりです。
+MecabWrapperと同じく tokenize().filter().convert_list_object() の形で使えます。
+文字種(カタカナ・漢字・ひらがな・記号)が変わる位置で文字列を区切り、文字種と語尾から品詞を決めます。
+同じテキストからは必ず同じ結果を返します。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+CHAR_TYPE_KATAKANA = 'katakana'
+CHAR_TYPE_KANJI = 'kanji'
+CHAR_TYPE_HIRAGANA = 'hiragana'
+CHAR_TYPE_SYMBOL = 'symbol'
+CHAR_TYPE_OTHER = 'other'
+
+
+def get_char_type(character:str)->str:
+    code_point = ord(character)
+    if 0x30A0 <= code_point <= 0x30FF:
+        return CHAR_TYPE_KATAKANA
+    if 0x4E00 <= code_point <= 0x9FFF:
+        return CHAR_TYPE_KANJI
+    if 0x3040 <= code_point <= 0x309F:
+        return CHAR_TYPE_HIRAGANA
+    if character.isspace() or 0x3000 <= code_point <= 0x303F:
+        return CHAR_TYPE_SYMBOL
+    return CHAR_TYPE_OTHER
+
+
+def get_pos_tuple(word:str, char_type:str)->Tuple[str, ...]:
+    """* What you can do
+    - 文字種と語尾から、Mecab(ipadic)と同じ形の品詞のタプルを決めます。
+    """
+    if char_type == CHAR_TYPE_KATAKANA:
+        return ('名詞', '固有名詞')
+    if char_type == CHAR_TYPE_KANJI:
+        return ('名詞', '一般')
+    if char_type == CHAR_TYPE_HIRAGANA:
+        if word.endswith('る') or word.endswith('う'):
+            return ('動詞', '自立')
+        if word.endswith('い'):
+            return ('形容詞', '自立')
+        return ('助詞', '格助詞')
+    if char_type == CHAR_TYPE_SYMBOL:
+        return ('記号', '一般')
+    return ('名詞', '一般')
+
+
+class FakeTokenizedSentence(object):
+    """* What you can do
+    - MecabWrapper.tokenize()の戻り値と同じく、filter()とconvert_list_object()を持ちます。
+    """
+    def __init__(self, seq_word_pos:List[Tuple[str, Tuple[str, ...]]]):
+        self.seq_word_pos = seq_word_pos
+
+    def filter(self, pos_condition:List[Tuple[str, ...]]=None)->'FakeTokenizedSentence':
+        """* What you can do
+        - 品詞がpos_conditionのいずれかで始まる単語だけを残します。('名詞', )は全ての名詞に一致します。
+        """
+        if pos_condition is None:
+            return self
+        seq_pos_condition = [tuple(pos_tuple) for pos_tuple in pos_condition]
+        return FakeTokenizedSentence([(word, pos_tuple) for word, pos_tuple in self.seq_word_pos
+                                      if any(pos_tuple[:len(condition)] == condition for condition in seq_pos_condition)])
+
+    def convert_list_object(self)->List[str]:
+        return [word for word, _ in self.seq_word_pos]
+
+
+class FakeTokenizer(object):
+    """* What you can do
+    - MecabWrapperの代わりに使える、決定的な形態素解析機です。
+    - 記号以外の文字種の区切りを単語の境界にします。synthetic_corpusで作った文書は、作ったときの単語に分割されます。
+
+    >>> FakeTokenizer().tokenize('スターウォーズは面白い').filter(pos_condition=[('名詞', )]).convert_list_object()
+    ['スターウォーズ']
+    """
+    def __init__(self, dictType:str='fake', **tokenizer_kwargs):
+        ### tokenizer_cacheのキャッシュキーに使われる ###
+        self._dictType = dictType
+
+    def tokenize(self, sentence:str, is_surface:bool=False, **kwargs)->FakeTokenizedSentence:
+        seq_word_pos = []
+        current_chars = []  # type: List[str]
+        current_char_type = None
+        for character in sentence:
+            char_type = get_char_type(character)
+            if char_type != current_char_type and len(current_chars) > 0:
+                if current_char_type != CHAR_TYPE_SYMBOL:
+                    word = ''.join(current_chars)
+                    seq_word_pos.append((word, get_pos_tuple(word, current_char_type)))
+                current_chars = []
+            current_chars.append(character)
+            current_char_type = char_type
+        if len(current_chars) > 0 and current_char_type != CHAR_TYPE_SYMBOL:
+            word = ''.join(current_chars)
+            seq_word_pos.append((word, get_pos_tuple(word, current_char_type)))
+        return FakeTokenizedSentence(seq_word_pos)
+
+
+def build_fake_tokenizer(**tokenizer_kwargs)->FakeTokenizer:
+    """* What you can do
+    - BatchTokenizerのtokenizer_factoryに渡せる、FakeTokenizerを作る関数です。
+    """
+    return FakeTokenizer(**tokenizer_kwargs)
@@ -0,0 +1,259 @@
+from typing import List, Tuple, Dict, Union, Any, Callable, Iterable, Optional
+from sample_scripts.benchmarks.synthetic_corpus import SyntheticCorpusGenerator
+from sample_scripts.benchmarks.fake_tokenizer import FakeTokenizer
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""主要な処理の計算時間とメモリ使用量を、文書数を変えながら計測します。
+文書はsynthetic_corpusで作り、形態素分割はfake_tokenizerで代用するので、ネットワークもMecabも不要です。
+結果はjsonで保存し、--baselineに以前の結果を与えると、遅くなった・メモリが増えた処理を報告します。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+POS_CONDITION = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+class Benchmark(object):
+    """* What you can do
+    - 1つの計測対象です。setup(size)で入力を作り、function(入力)の実行時間だけを計測します。
+    """
+    def __init__(self,
+                 name:str,
+                 setup:Callable[[int], Any],
+                 function:Callable[[Any], Any]):
+        self.name = name
+        self.setup = setup
+        self.function = function
+
+
+def _setup_documents(size:int)->Dict[str, Any]:
+    generator = SyntheticCorpusGenerator(seed=0)
+    return {'seq_document': list(generator.generate(n_documents=size, mean_document_length=100)),
+            'tokenizer_obj': FakeTokenizer()}
+
+
+def _setup_tokenized_documents(size:int)->List[List[str]]:
+    setup_obj = _setup_documents(size)
+    tokenizer_obj = setup_obj['tokenizer_obj']
+    return [tokenizer_obj.tokenize(document_obj['text']).filter(pos_condition=POS_CONDITION).convert_list_object()
+            for document_obj in setup_obj['seq_document']]
+
+
+def _setup_score_records(size:int)->List[Dict[str, Any]]:
+    ### 語彙数をsizeにしたモデル. レコード数は size x 3 程度 ###
+    return SyntheticCorpusGenerator(vocabulary_size=size, n_topic_words=max(1, size // 20), seed=0).generate_score_records()
+
+
+def _setup_classification(size:int)->Dict[str, Any]:
+    from sample_scripts.sample_category_classification import reformat_dictionary
+    setup_obj = _setup_documents(size)
+    generator = SyntheticCorpusGenerator(seed=0)
+    setup_obj['word_score_dictionary'] = reformat_dictionary(generator.generate_score_records())
+    return setup_obj
+
+
+def _setup_classification_matrix(size:int)->Dict[str, Any]:
+    from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+    setup_obj = _setup_classification(size)
+    setup_obj['word_score_dictionary'] = ScoreMatrixScorer.from_word_score_dictionary(setup_obj['word_score_dictionary'])
+    return setup_obj
+
+
+def _setup_scoring(size:int)->Dict[str, Any]:
+    from sample_scripts.sample_category_classification import reformat_dictionary
+    generator = SyntheticCorpusGenerator(seed=0)
+    return {'seq_document_tokens': _setup_tokenized_documents(size),
+            'word_score_dictionary': reformat_dictionary(generator.generate_score_records())}
+
+
+def _setup_scoring_matrix(size:int)->Dict[str, Any]:
+    from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+    setup_obj = _setup_scoring(size)
+    setup_obj['word_score_dictionary'] = ScoreMatrixScorer.from_word_score_dictionary(setup_obj['word_score_dictionary'])
+    return setup_obj
+
+
+def _run_construct_cached_dict(setup_obj:Dict[str, Any])->Any:
+    from sample_scripts.sample_keyword import construct_cached_dict
+    return construct_cached_dict(setup_obj['tokenizer_obj'], setup_obj['seq_document'], POS_CONDITION)
+
+
+def _run_construct_ngram_cached_dict(setup_obj:Dict[str, Any])->Any:
+    from sample_scripts.sample_keyword import construct_ngram_cached_dict
+    return construct_ngram_cached_dict(setup_obj['tokenizer_obj'], setup_obj['seq_document'], POS_CONDITION, n_value=2)
+
+
+def _run_aggregate_words(seq_tokenized:List[List[str]])->Any:
+    from sample_scripts.sample_tokenization import aggregate_words
+    return aggregate_words(seq_tokenized)
+
+
+def _run_reformat_dictionary(seq_score_record:List[Dict[str, Any]])->Any:
+    from sample_scripts.sample_category_classification import reformat_dictionary
+    return reformat_dictionary(seq_score_record)
+
+
+def _run_get_text_score(setup_obj:Dict[str, Any])->Any:
+    from sample_scripts.sample_category_classification import get_text_score
+    return [get_text_score(document_obj['text'], setup_obj['word_score_dictionary'], setup_obj['tokenizer_obj'], POS_CONDITION)
+            for document_obj in setup_obj['seq_document']]
+
+
+def _run_score_tokens(setup_obj:Dict[str, Any])->Any:
+    ### 形態素分割を除いた、1文書ずつのスコアリングだけの時間 ###
+    from sample_scripts.sample_category_classification import score_tokens
+    return [score_tokens(list_tokens, setup_obj['word_score_dictionary']) for list_tokens in setup_obj['seq_document_tokens']]
+
+
+BENCHMARKS = [
+    Benchmark('construct_cached_dict', _setup_documents, _run_construct_cached_dict),
+    Benchmark('construct_ngram_cached_dict', _setup_documents, _run_construct_ngram_cached_dict),
+    Benchmark('aggregate_words', _setup_tokenized_documents, _run_aggregate_words),
+    Benchmark('reformat_dictionary', _setup_score_records, _run_reformat_dictionary),
+    Benchmark('get_text_score', _setup_classification, _run_get_text_score),
+    Benchmark('get_text_score[ScoreMatrixScorer]', _setup_classification_matrix, _run_get_text_score),
+    Benchmark('score_tokens', _setup_scoring, _run_score_tokens),
+    Benchmark('score_tokens[ScoreMatrixScorer]', _setup_scoring_matrix, _run_score_tokens),
+]
+
+
+def measure(benchmark:Benchmark, size:int, n_repeat:int=3)->Dict[str, Any]:
+    """* What you can do
+    - 計算時間はn_repeat回の最小値です。メモリ使用量はtracemallocで計測したピークで、計算時間とは別に1回実行して測ります。
+    """
+    setup_obj = benchmark.setup(size)
+    seq_seconds = []
+    for _ in range(n_repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        benchmark.function(setup_obj)
+        seq_seconds.append(time.perf_counter() - start_time)
+
+    gc.collect()
+    tracemalloc.start()
+    benchmark.function(setup_obj)
+    _, peak_traced_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'benchmark': benchmark.name,
+            'size': size,
+            'seconds': min(seq_seconds),
+            'peak_memory_bytes': peak_traced_bytes,
+            'n_repeat': n_repeat}
+
+
+def _get_git_revision()->Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(seq_size:Iterable[int]=DEFAULT_SIZES,
+                   seq_benchmark_name:Iterable[str]=None,
+                   n_repeat:int=3)->Dict[str, Any]:
+    """* What you can do
+    - 計測対象 x 文書数 の全ての組み合わせを計測します。
+    - 依存ライブラリがなくて読み込めない計測対象は、スキップしてログに出します。
+    - 1つも計測できなかった場合はRuntimeErrorを送出します。空の結果を保存して、比較で回帰を見逃さないようにするためです。
+    """
+    seq_benchmark_name = list(seq_benchmark_name) if seq_benchmark_name is not None else None
+    if seq_benchmark_name is not None:
+        seq_unknown_name = [name for name in seq_benchmark_name if name not in [benchmark.name for benchmark in BENCHMARKS]]
+        if len(seq_unknown_name) > 0:
+            raise ValueError('Unknown benchmark names: {}'.format(', '.join(seq_unknown_name)))
+    seq_result = []
+    seq_skipped = []
+    for benchmark in BENCHMARKS:
+        if seq_benchmark_name is not None and benchmark.name not in seq_benchmark_name:
+            continue
+        for size in seq_size:
+            try:
+                result_obj = measure(benchmark, size, n_repeat=n_repeat)
+            except ImportError as exception_obj:
+                logger.warning('Skip benchmark={}. {}'.format(benchmark.name, exception_obj))
+                seq_skipped.append('{} ({})'.format(benchmark.name, exception_obj))
+                break
+            logger.info('benchmark={benchmark} size={size}; {seconds:.4f} sec, peak={peak_memory_bytes} bytes'.format(**result_obj))
+            seq_result.append(result_obj)
+    if len(seq_result) == 0:
+        raise RuntimeError('No benchmark was measured. Skipped: {}'.format('; '.join(seq_skipped)))
+    return {'created_at': datetime.datetime.now().isoformat(),
+            'git_revision': _get_git_revision(),
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'results': seq_result}
+
+
+def compare_results(baseline_obj:Dict[str, Any],
+                    current_obj:Dict[str, Any],
+                    threshold:float=1.2)->List[Dict[str, Any]]:
+    """* What you can do
+    - 同じ (計測対象, 文書数) の結果を比べ、計算時間またはメモリ使用量が threshold 倍を超えて増えたものを返します。
+    """
+    key2baseline = {(result_obj['benchmark'], result_obj['size']): result_obj for result_obj in baseline_obj['results']}
+    seq_regression = []
+    for result_obj in current_obj['results']:
+        baseline_result = key2baseline.get((result_obj['benchmark'], result_obj['size']))
+        if baseline_result is None:
+            continue
+        for metric_name in ('seconds', 'peak_memory_bytes'):
+            if baseline_result[metric_name] <= 0:
+                continue
+            ratio = result_obj[metric_name] / baseline_result[metric_name]
+            if ratio > threshold:
+                seq_regression.append({'benchmark': result_obj['benchmark'],
+                                       'size': result_obj['size'],
+                                       'metric': metric_name,
+                                       'baseline': baseline_result[metric_name],
+                                       'current': result_obj[metric_name],
+                                       'ratio': ratio})
+    return seq_regression
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='主要な処理の計算時間とメモリ使用量を計測します。')
+    arg_parser.add_argument('--sizes', dest='seq_size', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help='文書数(reformat_dictionaryは語彙数)')
+    arg_parser.add_argument('--benchmarks', dest='seq_benchmark_name', nargs='+', default=None,
+                            help='計測対象の名前。省略時は全て: {}'.format(', '.join(benchmark.name for benchmark in BENCHMARKS)))
+    arg_parser.add_argument('--repeat', dest='n_repeat', type=int, default=3)
+    arg_parser.add_argument('--output-dir', dest='path_output_dir', default='./benchmark_results')
+    arg_parser.add_argument('--baseline', dest='path_baseline', default=None,
+                            help='比較する以前の結果のjson')
+    arg_parser.add_argument('--threshold', dest='threshold', type=float, default=1.2)
+    args = arg_parser.parse_args()
+
+    benchmark_result = run_benchmarks(seq_size=args.seq_size, seq_benchmark_name=args.seq_benchmark_name, n_repeat=args.n_repeat)
+    if not os.path.exists(args.path_output_dir):
+        os.makedirs(args.path_output_dir)
+    path_result = os.path.join(args.path_output_dir, 'benchmark_{}_{}.json'.format(
+        datetime.datetime.now().strftime('%Y%m%d%H%M%S'), benchmark_result['git_revision'] or 'unknown'))
+    with open(path_result, 'w') as f:
+        f.write(json.dumps(benchmark_result, ensure_ascii=False, indent=4))
+    logger.info('Saved benchmark results into {}'.format(path_result))
+
+    if args.path_baseline is not None:
+        with open(args.path_baseline, 'r') as f:
+            baseline_result = json.load(f)
+        seq_regression = compare_results(baseline_result, benchmark_result, threshold=args.threshold)
+        for regression_obj in seq_regression:
+            logger.warning('Regression benchmark={benchmark} size={size} {metric}; {baseline} -> {current} (x{ratio:.2f})'.format(**regression_obj))
+        if len(seq_regression) == 0:
+            logger.info('No regression against {}'.format(args.path_baseline))
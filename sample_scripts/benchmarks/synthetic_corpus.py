@@ -0,0 +1,138 @@
+from typing import List, Tuple, Dict, Union, Any, Iterator
+from sample_scripts.corpus_io import CorpusWriter
+import logging
+import numpy
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""ベンチマーク用に、ラベルつきの日本語風の文書を乱数で作ります。
+wikipediaからの取得なしで、好きな文書数・文書長のコーパスを作れます。seedが同じなら同じ文書を作ります。
+文書は「内容語(カタカナ・漢字) + 機能語(ひらがな)」の繰り返しです。benchmarks.fake_tokenizerで分割すると、作ったときの単語に戻ります。
+内容語の頻度はZipf分布に従い、ラベルごとの話題語が一定の割合で混ざります。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+KATAKANA_SYLLABLES = [chr(code_point) for code_point in range(ord('ア'), ord('ン') + 1)
+                      if chr(code_point) not in 'ァィゥェォッャュョヮヰヱ']
+### 常用漢字の多い範囲から使う ###
+KANJI_CHARACTERS = [chr(code_point) for code_point in range(0x4E00, 0x4E00 + 3000)]
+FUNCTION_WORDS = ['は', 'が', 'を', 'に', 'で', 'と', 'の', 'から', 'まで', 'より',
+                  'つくる', 'みる', 'はしる', 'うたう', 'あう', 'ならう',
+                  'おもしろい', 'たかい', 'はやい', 'あたらしい']
+SENTENCE_END = '。'
+
+
+class SyntheticCorpusGenerator(object):
+    """* What you can do
+    - ラベルつきの文書を、get_wikipedia_text.pyの出力と同じ {'page_title', 'text', 'gold_label'} の形で作ります。
+    - 語彙は初期化時にseedから作るので、文書数を変えても同じ語彙・同じ先頭の文書になります。
+
+    * Params
+    - n_labels: ラベル数
+    - vocabulary_size: 全ラベル共通の内容語の数
+    - n_topic_words: ラベルごとの話題語の数
+    - topic_ratio: 内容語のうち、ラベルの話題語を使う割合
+    - zipf_exponent: 共通の内容語の頻度分布の指数
+
+    >>> generator = SyntheticCorpusGenerator(n_labels=10, seed=0)
+    >>> seq_document = list(generator.generate(n_documents=1000, mean_document_length=200))
+    """
+    def __init__(self,
+                 n_labels:int=10,
+                 vocabulary_size:int=20000,
+                 n_topic_words:int=500,
+                 topic_ratio:float=0.3,
+                 zipf_exponent:float=1.1,
+                 seed:int=0):
+        self.n_labels = n_labels
+        self.vocabulary_size = vocabulary_size
+        self.n_topic_words = n_topic_words
+        self.topic_ratio = topic_ratio
+        self.zipf_exponent = zipf_exponent
+        self.seed = seed
+
+        random_state = numpy.random.RandomState(seed)
+        self.labels = ['ラベル{:02d}'.format(label_index) for label_index in range(n_labels)]
+        set_word = set()
+        self.shared_words = self._generate_words(random_state, vocabulary_size, set_word)
+        self.topic_words = [self._generate_words(random_state, n_topic_words, set_word) for _ in range(n_labels)]
+        rank_weight = 1.0 / numpy.arange(1, vocabulary_size + 1) ** zipf_exponent
+        self.shared_word_probability = rank_weight / rank_weight.sum()
+
+    @staticmethod
+    def _generate_words(random_state:numpy.random.RandomState, n_words:int, set_word:set)->List[str]:
+        ### 半分をカタカナ(固有名詞)、半分を漢字(一般名詞)にする. 重複した単語は作り直す ###
+        seq_word = []
+        while len(seq_word) < n_words:
+            if len(seq_word) % 2 == 0:
+                word = ''.join(KATAKANA_SYLLABLES[i] for i in random_state.randint(0, len(KATAKANA_SYLLABLES), random_state.randint(2, 7)))
+            else:
+                word = ''.join(KANJI_CHARACTERS[i] for i in random_state.randint(0, len(KANJI_CHARACTERS), random_state.randint(1, 4)))
+            if word in set_word:
+                continue
+            set_word.add(word)
+            seq_word.append(word)
+        return seq_word
+
+    @property
+    def words(self)->List[str]:
+        return self.shared_words + [word for seq_topic_word in self.topic_words for word in seq_topic_word]
+
+    def generate(self, n_documents:int, mean_document_length:int=200)->Iterator[Dict[str, Any]]:
+        """* What you can do
+        - n_documents件の文書をyieldします。文書の内容語の数は平均mean_document_lengthのポアソン分布です。
+        """
+        random_state = numpy.random.RandomState(self.seed + 1)
+        for document_index in range(n_documents):
+            label_index = random_state.randint(0, self.n_labels)
+            n_content_words = max(1, random_state.poisson(mean_document_length))
+            is_topic_word = random_state.random_sample(n_content_words) < self.topic_ratio
+            seq_shared_index = random_state.choice(self.vocabulary_size, size=n_content_words, p=self.shared_word_probability)
+            seq_topic_index = random_state.randint(0, self.n_topic_words, size=n_content_words)
+            seq_function_index = random_state.randint(0, len(FUNCTION_WORDS), size=n_content_words)
+            seq_sentence_length = random_state.randint(5, 15, size=n_content_words)
+
+            seq_text = []
+            topic_words = self.topic_words[label_index]
+            n_in_sentence = 0
+            for word_index in range(n_content_words):
+                if is_topic_word[word_index]:
+                    seq_text.append(topic_words[seq_topic_index[word_index]])
+                else:
+                    seq_text.append(self.shared_words[seq_shared_index[word_index]])
+                seq_text.append(FUNCTION_WORDS[seq_function_index[word_index]])
+                n_in_sentence += 1
+                if n_in_sentence >= seq_sentence_length[word_index]:
+                    seq_text.append(SENTENCE_END)
+                    n_in_sentence = 0
+            seq_text.append(SENTENCE_END)
+            yield {'page_title': 'synthetic-{}'.format(document_index),
+                   'text': ''.join(seq_text),
+                   'gold_label': self.labels[label_index]}
+
+    def write(self, path_corpus:str, n_documents:int, mean_document_length:int=200)->int:
+        """* What you can do
+        - 文書をJSON Linesファイルに書き出します。corpus_io.Corpusで読み込めます。
+        """
+        with CorpusWriter(path_corpus, mode='w') as corpus_writer:
+            return corpus_writer.write_all(self.generate(n_documents, mean_document_length))
+
+    def generate_score_records(self, n_labels_per_word:int=3)->List[Dict[str, Any]]:
+        """* What you can do
+        - run_feature_selection()の戻り値と同じ形のスコアのレコードを作ります。全ての内容語に、n_labels_per_word個のラベルのスコアをつけます。
+        >>> [{"label": "ラベル00", "score": 0.02942301705479622, "word": "スターウォーズ", "frequency": 3}]
+        """
+        random_state = numpy.random.RandomState(self.seed + 2)
+        seq_score_record = []
+        for word in self.words:
+            for label_index in random_state.choice(self.n_labels, size=min(n_labels_per_word, self.n_labels), replace=False):
+                seq_score_record.append({'label': self.labels[label_index],
+                                         'word': word,
+                                         'score': float(random_state.normal()),
+                                         'frequency': int(random_state.randint(1, 100))})
+        seq_score_record.sort(key=lambda score_record: score_record['score'], reverse=True)
+        return seq_score_record
@@ -0,0 +1,276 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Optional
+import array
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from sample_scripts import instrumentation
+from sample_scripts.external_groupby import iter_grouped_score_records
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""単語スコアモデル(word_score_soa.json)を、mmapでそのまま読めるバイナリ形式で保存します。
+jsonのモデルは、読み込むたびに全レコードをパースし、単語 -> [(ラベル, スコア)] の形に組み替える必要があります。
+バイナリ形式では、単語はソート済みの表、スコアはCSR形式の配列で保存するので、読み込み時のパースも組み替えも不要です。
+単語の検索は二分探索で、ファイル全体をメモリに読み込むことはありません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### ファイル形式
+### [ヘッダー]
+###   magic(8byte), version(uint32), n_labels(uint32), n_words(uint64), n_entries(uint64),
+###   各セクションの開始位置(uint64 x 7)
+### [セクション] いずれも8byte境界から始まる
+###   label_offsets(uint64 x n_labels+1), label_strings(utf-8),
+###   word_offsets(uint64 x n_words+1), word_strings(utf-8, バイト列の昇順),
+###   entry_offsets(uint64 x n_words+1), entry_label_ids(uint32 x n_entries), entry_scores(float32 x n_entries)
+### 単語iのスコアは entry_label_ids/entry_scores[entry_offsets[i]:entry_offsets[i+1]] です。
+MAGIC = b'SOAMODEL'
+FORMAT_VERSION = 1
+HEADER_FORMAT = '<8sIIQQ7Q'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SECTION_NAMES = ('label_offsets', 'label_strings', 'word_offsets', 'word_strings',
+                 'entry_offsets', 'entry_label_ids', 'entry_scores')
+OFFSET_TYPECODE = 'Q'
+LABEL_ID_TYPECODE = 'I'
+SCORE_TYPECODE = 'f'
+ALIGNMENT = 8
+
+
+def _check_platform()->None:
+    ### array/memoryviewはネイティブのバイト順で読み書きするので、リトルエンディアンの環境だけに対応します ###
+    if sys.byteorder != 'little':
+        raise RuntimeError('Binary score model supports only little-endian platforms.')
+    for typecode, itemsize in ((OFFSET_TYPECODE, 8), (LABEL_ID_TYPECODE, 4), (SCORE_TYPECODE, 4)):
+        if array.array(typecode).itemsize != itemsize:
+            raise RuntimeError('array typecode {} is not {} bytes on this platform.'.format(typecode, itemsize))
+
+
+class BinaryModelWriter(object):
+    """* What you can do
+    - 単語ごとの [(ラベル, スコア)] を1単語ずつ受け取り、バイナリモデルを書き出します。
+    - 単語はUTF-8のバイト列で昇順に渡してください。二分探索で引けるように、順番が崩れた場合はエラーにします。
+    - 各セクションは一時ファイルに書き溜め、close()で1つのファイルにまとめるので、モデル全体をメモリに載せません。
+
+    >>> with BinaryModelWriter('./models/word_score_soa.bin') as writer:
+    >>>     writer.write('お金', [('レストラン', 0.029)])
+    """
+    def __init__(self, path_model_file:str):
+        _check_platform()
+        self.path_model_file = path_model_file
+        self.label2id = {}  # type: Dict[str, int]
+        self.n_words = 0
+        self.n_entries = 0
+        self._last_word_bytes = None  # type: Optional[bytes]
+        self._n_word_bytes = 0
+        self._section_files = {section_name: tempfile.TemporaryFile()
+                               for section_name in ('word_offsets', 'word_strings', 'entry_offsets', 'entry_label_ids', 'entry_scores')}
+        self._section_files['word_offsets'].write(array.array(OFFSET_TYPECODE, [0]).tobytes())
+        self._section_files['entry_offsets'].write(array.array(OFFSET_TYPECODE, [0]).tobytes())
+        self._is_closed = False
+
+    def write(self, word:str, seq_label_score:Iterable[Tuple[str, float]])->None:
+        word_bytes = word.encode('utf-8')
+        if self._last_word_bytes is not None and word_bytes <= self._last_word_bytes:
+            raise ValueError('Words must be written in strictly ascending order of UTF-8 bytes. Got {} after {}'.format(
+                word, self._last_word_bytes.decode('utf-8')))
+        self._last_word_bytes = word_bytes
+
+        label_ids = array.array(LABEL_ID_TYPECODE)
+        scores = array.array(SCORE_TYPECODE)
+        for label_name, score in seq_label_score:
+            label_ids.append(self.label2id.setdefault(label_name, len(self.label2id)))
+            scores.append(score)
+        self._section_files['word_strings'].write(word_bytes)
+        self._n_word_bytes += len(word_bytes)
+        self._section_files['word_offsets'].write(array.array(OFFSET_TYPECODE, [self._n_word_bytes]).tobytes())
+        self._section_files['entry_label_ids'].write(label_ids.tobytes())
+        self._section_files['entry_scores'].write(scores.tobytes())
+        self.n_entries += len(label_ids)
+        self._section_files['entry_offsets'].write(array.array(OFFSET_TYPECODE, [self.n_entries]).tobytes())
+        self.n_words += 1
+
+    def close(self)->None:
+        if self._is_closed:
+            return
+        self._is_closed = True
+        seq_label = sorted(self.label2id.keys(), key=lambda label_name: self.label2id[label_name])
+        label_strings = b''.join(label_name.encode('utf-8') for label_name in seq_label)
+        label_offsets = array.array(OFFSET_TYPECODE, [0])
+        for label_name in seq_label:
+            label_offsets.append(label_offsets[-1] + len(label_name.encode('utf-8')))
+        for section_name, section_bytes in (('label_offsets', label_offsets.tobytes()), ('label_strings', label_strings)):
+            self._section_files[section_name] = tempfile.TemporaryFile()
+            self._section_files[section_name].write(section_bytes)
+
+        path_model_dir = os.path.dirname(os.path.abspath(self.path_model_file))
+        if not os.path.exists(path_model_dir):
+            os.makedirs(path_model_dir)
+        file_descriptor, path_tmp = tempfile.mkstemp(dir=path_model_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as f:
+            f.write(b'\x00' * HEADER_SIZE)
+            seq_section_offset = []
+            for section_name in SECTION_NAMES:
+                ### 配列をmemoryviewで読めるように、各セクションを8byte境界に揃える ###
+                f.write(b'\x00' * (-f.tell() % ALIGNMENT))
+                seq_section_offset.append(f.tell())
+                section_file = self._section_files[section_name]
+                section_file.seek(0)
+                shutil.copyfileobj(section_file, f)
+                section_file.close()
+            f.seek(0)
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, len(seq_label), self.n_words, self.n_entries,
+                                *seq_section_offset))
+        os.replace(path_tmp, self.path_model_file)
+        instrumentation.increment('binary_model.bytes_written', os.path.getsize(self.path_model_file))
+        logger.info('Saved binary score model N(word)={}, N(label)={}, N(entry)={} into {}'.format(
+            self.n_words, len(seq_label), self.n_entries, self.path_model_file))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            ### 失敗した場合は書きかけのモデルを残さない ###
+            self._is_closed = True
+            for section_file in self._section_files.values():
+                section_file.close()
+
+
+def write_binary_model(score_dictionary:Iterable[Dict[str, Any]],
+                       path_model_file:str,
+                       max_records_in_memory:int=1000000)->None:
+    """* What you can do
+    - run_feature_selection()の戻り値(スコアのレコードのリスト)をバイナリモデルとして保存します。
+    - 単語ごとの (ラベル, スコア) はレコードの順番のまま保存します。reformat_dictionary()と同じ順番です。
+    - レコードはexternal_groupbyで単語ごとにまとめるので、メモリに載るのはmax_records_in_memory件までです。score_dictionaryはgeneratorでも構いません。
+
+    * Input
+    >>> [{"label": "レストラン", "score": 0.02942301705479622, "word": "お金"}]
+    """
+    with BinaryModelWriter(path_model_file) as writer:
+        for word, seq_label_score in iter_grouped_score_records(score_dictionary, max_records_in_memory=max_records_in_memory):
+            writer.write(word, seq_label_score)
+
+
+class BinaryScoreModel(object):
+    """* What you can do
+    - バイナリモデルをmmapで開き、dictと同じように 単語 -> [(ラベル, スコア)] を引けます。
+    - 開くときに読むのはヘッダーとラベル表だけなので、モデルの大きさに関わらずすぐに使えます。
+    - reformat_dictionary()の戻り値の代わりに、get_text_score()にそのまま渡せます。
+
+    >>> word_score_model = BinaryScoreModel('./models/word_score_soa.bin')
+    >>> word_score_model['お金']
+    [('レストラン', 0.02942301705479622)]
+    """
+    def __init__(self, path_model_file:str):
+        _check_platform()
+        self.path_model_file = path_model_file
+        with open(path_model_file, 'rb') as f:
+            ### mmapはファイルを閉じても有効です ###
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = struct.unpack_from(HEADER_FORMAT, self._mmap, 0)
+        magic, version, n_labels, n_words, n_entries = header[:5]
+        if magic != MAGIC:
+            raise ValueError('{} is not a binary score model.'.format(path_model_file))
+        if version != FORMAT_VERSION:
+            raise ValueError('Unsupported binary score model version {}. Expected {}'.format(version, FORMAT_VERSION))
+        self.n_labels = n_labels
+        self.n_words = n_words
+        self.n_entries = n_entries
+        section_offsets = dict(zip(SECTION_NAMES, header[5:]))
+
+        buffer_obj = memoryview(self._mmap)
+        self._word_offsets = self._cast(buffer_obj, section_offsets['word_offsets'], n_words + 1, OFFSET_TYPECODE)
+        self._word_strings_offset = section_offsets['word_strings']
+        self._entry_offsets = self._cast(buffer_obj, section_offsets['entry_offsets'], n_words + 1, OFFSET_TYPECODE)
+        self._entry_label_ids = self._cast(buffer_obj, section_offsets['entry_label_ids'], n_entries, LABEL_ID_TYPECODE)
+        self._entry_scores = self._cast(buffer_obj, section_offsets['entry_scores'], n_entries, SCORE_TYPECODE)
+        ### ラベル表は小さいので、文字列にしておく ###
+        label_offsets = self._cast(buffer_obj, section_offsets['label_offsets'], n_labels + 1, OFFSET_TYPECODE)
+        label_strings_offset = section_offsets['label_strings']
+        self.labels = [bytes(self._mmap[label_strings_offset + label_offsets[i]:label_strings_offset + label_offsets[i + 1]]).decode('utf-8')
+                       for i in range(n_labels)]
+
+    @staticmethod
+    def _cast(buffer_obj:memoryview, start:int, n_items:int, typecode:str)->memoryview:
+        itemsize = array.array(typecode).itemsize
+        return buffer_obj[start:start + n_items * itemsize].cast(typecode)
+
+    def _get_word_bytes(self, word_index:int)->bytes:
+        start = self._word_strings_offset + self._word_offsets[word_index]
+        end = self._word_strings_offset + self._word_offsets[word_index + 1]
+        return self._mmap[start:end]
+
+    def find_word_index(self, word:str)->int:
+        """* What you can do
+        - 単語の番号を二分探索で探します。ない場合は-1を返します。
+        """
+        word_bytes = word.encode('utf-8')
+        low = 0
+        high = self.n_words
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_word_bytes(middle) < word_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_words and self._get_word_bytes(low) == word_bytes:
+            return low
+        return -1
+
+    def get_entries(self, word_index:int)->List[Tuple[str, float]]:
+        start = self._entry_offsets[word_index]
+        end = self._entry_offsets[word_index + 1]
+        labels = self.labels
+        return [(labels[self._entry_label_ids[i]], self._entry_scores[i]) for i in range(start, end)]
+
+    def get(self, word:str, default:Any=None)->Any:
+        word_index = self.find_word_index(word)
+        if word_index == -1:
+            return default
+        return self.get_entries(word_index)
+
+    def __getitem__(self, word:str)->List[Tuple[str, float]]:
+        word_index = self.find_word_index(word)
+        if word_index == -1:
+            raise KeyError(word)
+        return self.get_entries(word_index)
+
+    def __contains__(self, word:str)->bool:
+        return self.find_word_index(word) != -1
+
+    def __len__(self)->int:
+        return self.n_words
+
+    def __iter__(self)->Iterator[str]:
+        return self.keys()
+
+    def keys(self)->Iterator[str]:
+        for word_index in range(self.n_words):
+            yield self._get_word_bytes(word_index).decode('utf-8')
+
+    def items(self)->Iterator[Tuple[str, List[Tuple[str, float]]]]:
+        for word_index in range(self.n_words):
+            yield self._get_word_bytes(word_index).decode('utf-8'), self.get_entries(word_index)
+
+    def close(self)->None:
+        ### memoryviewを解放してからでないと、mmapを閉じられない ###
+        for attribute_name in ('_word_offsets', '_entry_offsets', '_entry_label_ids', '_entry_scores'):
+            getattr(self, attribute_name).release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,173 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable
+import logging
+import numpy
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""カテゴリ分類の評価を、1回のスコアリング結果からまとめて計算します。
+文書ごとにラベルの順位を全て保持しておき、正解ラベルの順位から accuracy@k を計算するので、kをいくつ増やしても文書をスコアリングし直す必要はありません。
+ラベルごとのPrecision / Recall / F1と混同行列は、順位1位の予測ラベルから計算します。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### 予測がない(どのラベルにもスコアがない)文書の予測ラベル番号 ###
+NO_PREDICTION = -1
+### 予測に正解ラベルがない文書の正解ラベルの順位。どのkに対しても gold_rank < k が偽になるよう、int64の最大値にする ###
+NOT_RANKED = numpy.iinfo(numpy.int64).max
+
+
+class EvaluationResult(object):
+    """* What you can do
+    - 評価文書ごとの正解ラベルと、スコアの降順に並べたラベルの順位をnumpyの配列で保持します。
+    - accuracy@k、ラベルごとのaccuracy@k、Precision / Recall / F1、混同行列を配列演算で計算します。
+
+    * Params
+    - labels: ラベル名のリスト。配列にはラベル名の代わりにこのリストの番号を入れます。
+    - gold_label_ids: 文書ごとの正解ラベルの番号 (N(文書),)
+    - ranked_label_ids: 文書ごとの予測ラベルの番号を順位順に並べた行列 (N(文書), N(順位))。予測がない順位はNO_PREDICTIONです。
+
+    >>> evaluation_result = EvaluationResult.from_ranked_results(seq_gold_label, seq_ranked_result)
+    >>> evaluation_result.get_accuracy_at_k([1, 3, 5])
+    {1: 0.71, 3: 0.90, 5: 0.95}
+    """
+    def __init__(self,
+                 labels:List[str],
+                 gold_label_ids:numpy.ndarray,
+                 ranked_label_ids:numpy.ndarray):
+        self.labels = labels
+        self.gold_label_ids = gold_label_ids
+        self.ranked_label_ids = ranked_label_ids
+        ### 正解ラベルの順位(0始まり)。予測に正解ラベルがない場合はNOT_RANKED ###
+        is_gold_label = ranked_label_ids == gold_label_ids[:, numpy.newaxis]
+        self.gold_rank = numpy.where(is_gold_label.any(axis=1), is_gold_label.argmax(axis=1), NOT_RANKED).astype(numpy.int64)
+
+    @classmethod
+    def from_ranked_results(cls,
+                            seq_gold_label:Iterable[str],
+                            seq_ranked_result:Iterable[List[Tuple[str, float]]],
+                            labels:List[str]=None)->'EvaluationResult':
+        """* What you can do
+        - 正解ラベルと、get_text_score()やclassify_batch()の [(ラベル, スコア)] を文書ごとに受け取って作ります。
+        - 上位k件に絞っていない結果を渡してください。渡した順位までしかaccuracy@kを計算できません。
+        """
+        label2id = {label_name: label_id for label_id, label_name in enumerate(labels)} if labels is not None else {}
+        seq_gold_label_id = []  # type: List[int]
+        seq_ranked_label_id = []  # type: List[List[int]]
+        for gold_label, seq_score_tuple in zip(seq_gold_label, seq_ranked_result):
+            seq_gold_label_id.append(label2id.setdefault(gold_label, len(label2id)))
+            seq_ranked_label_id.append([label2id.setdefault(label_name, len(label2id)) for label_name, _ in seq_score_tuple])
+
+        n_rank = max([len(seq_label_id) for seq_label_id in seq_ranked_label_id] + [1])
+        ranked_label_ids = numpy.full((len(seq_ranked_label_id), n_rank), NO_PREDICTION, dtype=numpy.int64)
+        for document_index, seq_label_id in enumerate(seq_ranked_label_id):
+            ranked_label_ids[document_index, :len(seq_label_id)] = seq_label_id
+        return cls(labels=sorted(label2id.keys(), key=lambda label_name: label2id[label_name]),
+                   gold_label_ids=numpy.array(seq_gold_label_id, dtype=numpy.int64),
+                   ranked_label_ids=ranked_label_ids)
+
+    @property
+    def n_documents(self)->int:
+        return len(self.gold_label_ids)
+
+    @property
+    def predicted_label_ids(self)->numpy.ndarray:
+        return self.ranked_label_ids[:, 0]
+
+    def get_accuracy_at_k(self, seq_k:Iterable[int])->Dict[int, float]:
+        """* What you can do
+        - 正解ラベルが上位k件に入っている文書の割合を、kごとに返します。
+        """
+        if self.n_documents == 0:
+            return {k: 0.0 for k in seq_k}
+        return {k: float(numpy.count_nonzero(self.gold_rank < k)) / self.n_documents for k in seq_k}
+
+    def get_label_accuracy_at_k(self, k:int)->Dict[str, Tuple[float, int, int]]:
+        """* What you can do
+        - 正解ラベルごとに、(accuracy@k, 正解した文書数, 文書数) を返します。評価文書のないラベルは含みません。
+        """
+        n_labels = len(self.labels)
+        seq_n_document = numpy.bincount(self.gold_label_ids, minlength=n_labels)
+        seq_n_hit = numpy.bincount(self.gold_label_ids, weights=self.gold_rank < k, minlength=n_labels).astype(numpy.int64)
+        return {self.labels[label_id]: (float(seq_n_hit[label_id]) / seq_n_document[label_id], int(seq_n_hit[label_id]), int(seq_n_document[label_id]))
+                for label_id in numpy.flatnonzero(seq_n_document)}
+
+    def get_confusion_matrix(self)->numpy.ndarray:
+        """* What you can do
+        - 行が正解ラベル、列が順位1位の予測ラベルの混同行列を返します。形は (N(ラベル), N(ラベル) + 1) です。
+        - 最後の列は、予測がなかった文書の数です。
+        """
+        n_labels = len(self.labels)
+        predicted_column = numpy.where(self.predicted_label_ids == NO_PREDICTION, n_labels, self.predicted_label_ids)
+        seq_cell_count = numpy.bincount(self.gold_label_ids * (n_labels + 1) + predicted_column, minlength=n_labels * (n_labels + 1))
+        return seq_cell_count.reshape((n_labels, n_labels + 1))
+
+    def get_precision_recall_f1(self)->Dict[str, Dict[str, float]]:
+        """* What you can do
+        - ラベルごとに、順位1位の予測ラベルに対するPrecision / Recall / F1と、評価文書数(support)を返します。
+        - 'macro_average'に、評価文書のあるラベルのマクロ平均を入れます。
+        """
+        confusion_matrix = self.get_confusion_matrix()
+        n_labels = len(self.labels)
+        true_positive = numpy.diag(confusion_matrix[:, :n_labels]).astype(numpy.float64)
+        n_predicted = confusion_matrix[:, :n_labels].sum(axis=0)
+        support = confusion_matrix.sum(axis=1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            precision = numpy.where(n_predicted > 0, true_positive / n_predicted, 0.0)
+            recall = numpy.where(support > 0, true_positive / support, 0.0)
+            f1 = numpy.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        label_scores = {self.labels[label_id]: {'precision': float(precision[label_id]),
+                                                'recall': float(recall[label_id]),
+                                                'f1': float(f1[label_id]),
+                                                'support': int(support[label_id])}
+                        for label_id in range(n_labels)}
+        has_support = support > 0
+        label_scores['macro_average'] = {'precision': float(precision[has_support].mean()) if has_support.any() else 0.0,
+                                         'recall': float(recall[has_support].mean()) if has_support.any() else 0.0,
+                                         'f1': float(f1[has_support].mean()) if has_support.any() else 0.0,
+                                         'support': int(support.sum())}
+        return label_scores
+
+    def to_dict(self, seq_k:Iterable[int])->Dict[str, Any]:
+        """* What you can do
+        - 評価結果をjsonで保存できる形にまとめます。
+        """
+        seq_k = list(seq_k)
+        return {
+            'n_documents': self.n_documents,
+            'accuracy_at_k': {str(k): accuracy for k, accuracy in self.get_accuracy_at_k(seq_k).items()},
+            'label_accuracy_at_k': {str(k): {label_name: accuracy_tuple[0] for label_name, accuracy_tuple in self.get_label_accuracy_at_k(k).items()}
+                                    for k in seq_k},
+            'precision_recall_f1': self.get_precision_recall_f1(),
+            'confusion_matrix': {'labels': self.labels,
+                                 'columns': self.labels + ['(no prediction)'],
+                                 'matrix': self.get_confusion_matrix().tolist()}
+        }
+
+
+def log_evaluation_result(evaluation_result:EvaluationResult, seq_k:Iterable[int])->None:
+    """* What you can do
+    - kごとの全体・カテゴリごとの正解率と、Precision / Recall / F1をログに出します。
+    """
+    for k, accuracy in sorted(evaluation_result.get_accuracy_at_k(seq_k).items()):
+        n_hit = int(numpy.count_nonzero(evaluation_result.gold_rank < k))
+        logger.info(msg='='*40)
+        logger.info(msg='Accuracy of wikipedia summary text when rank={}'.format(k))
+        logger.info(msg='Accuracy; {} = {} / {}'.format(accuracy, n_hit, evaluation_result.n_documents))
+        ### カテゴリ名の降順に出す ###
+        for category_name, accuracy_tuple in sorted(evaluation_result.get_label_accuracy_at_k(k).items(), reverse=True):
+            logger.info(msg='Accuracy of category={}; {} = {} / {}'.format(category_name, *accuracy_tuple))
+        logger.info('+'*40)
+
+    for label_name, score_obj in evaluation_result.get_precision_recall_f1().items():
+        if score_obj['support'] == 0 and label_name != 'macro_average':
+            continue
+        logger.info(msg='label={}; precision={:.3f} recall={:.3f} f1={:.3f} support={}'.format(label_name,
+                                                                                          score_obj['precision'],
+                                                                                          score_obj['recall'],
+                                                                                          score_obj['f1'],
+                                                                                          score_obj['support']))
@@ -0,0 +1,454 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Callable, Optional
+from concurrent.futures import Future
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from sample_scripts.batch_tokenizer import BatchTokenizer
+from sample_scripts.binary_model import BinaryScoreModel
+from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+from sample_scripts.sample_category_classification import tokenize_text, reformat_dictionary
+import argparse
+import collections
+import hashlib
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""スコアモデルを常駐させて、HTTPでカテゴリ分類を受け付けるサービスです。
+sample_category_classification.pyは実行のたびにモデルの読み込み・reformat_dictionary()・MecabWrapperの作成をやり直します。
+このサービスはそれらを起動時に1度だけ実施し、同時に届いたリクエストをまとめて(マイクロバッチ)スコアリングします。
+分類結果はテキストのハッシュをキーにLRUキャッシュし、モデルはリクエストを止めずに読み込み直せます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+
+class ClassificationModel(object):
+    """* What you can do
+    - スコア行列と語彙をまとめて持ちます。サービスはこのオブジェクトを丸ごと差し替えてモデルを読み込み直します。
+    """
+    def __init__(self,
+                 score_matrix_scorer:ScoreMatrixScorer,
+                 vocabulary_pruner:VocabularyPruner=None,
+                 model_version:str=''):
+        self.score_matrix_scorer = score_matrix_scorer
+        self.vocabulary_pruner = vocabulary_pruner
+        self.model_version = model_version
+
+
+def load_classification_model(path_word_model_bin:str='./models/word_score_soa.bin',
+                              path_word_model_json:str='./models/word_score_soa.json',
+                              path_vocabulary_file:str='./models/vocabulary.json')->ClassificationModel:
+    """* What you can do
+    - sample_category_classification.pyと同じ順番でモデルを読み込みます。バイナリモデルがあればそちらを使います。
+    - モデルファイルと語彙ファイルの更新時刻をmodel_versionにします。
+        - 分類結果のキャッシュはmodel_versionをキーに含むので、語彙ファイルだけを作り直した場合も、読み込み直せば古い結果は使われません。
+    """
+    vocabulary_pruner = VocabularyPruner.load(path_vocabulary_file) if os.path.exists(path_vocabulary_file) else None
+    if os.path.exists(path_word_model_bin):
+        path_word_model = path_word_model_bin
+        word_score_dictionary = BinaryScoreModel(path_word_model_bin)
+    else:
+        path_word_model = path_word_model_json
+        with open(path_word_model_json, 'r') as f:
+            word_score_model = json.load(f)
+        if vocabulary_pruner is not None:
+            word_score_model = [score_object for score_object in word_score_model if vocabulary_pruner.is_kept(score_object['word'])]
+        word_score_dictionary = reformat_dictionary(score_dictionary=word_score_model)
+    score_matrix_scorer = ScoreMatrixScorer.from_word_score_dictionary(word_score_dictionary)
+    model_version = '{}@{}'.format(os.path.basename(path_word_model), os.stat(path_word_model).st_mtime_ns)
+    if vocabulary_pruner is not None:
+        model_version += '+{}@{}'.format(os.path.basename(path_vocabulary_file), os.stat(path_vocabulary_file).st_mtime_ns)
+    return ClassificationModel(score_matrix_scorer=score_matrix_scorer,
+                               vocabulary_pruner=vocabulary_pruner,
+                               model_version=model_version)
+
+
+class LRUCache(object):
+    """* What you can do
+    - 件数上限つきのLRUキャッシュです。複数スレッドから使えます。
+    """
+    def __init__(self, max_size:int=10000):
+        self.max_size = max_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key:str)->Optional[Any]:
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def put(self, key:str, value:Any)->None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self)->None:
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self)->int:
+        return len(self._cache)
+
+
+class LatencyRecorder(object):
+    """* What you can do
+    - 直近window_size件のレイテンシ(秒)を保持し、パーセンタイルを計算します。
+    """
+    def __init__(self, window_size:int=10000):
+        self._latencies = collections.deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency_seconds:float)->None:
+        with self._lock:
+            self._latencies.append(latency_seconds)
+
+    def get_percentiles(self, seq_percentile:Iterable[float]=(50, 90, 99))->Dict[str, float]:
+        with self._lock:
+            seq_latency = sorted(self._latencies)
+        if len(seq_latency) == 0:
+            return {}
+        ### nearest-rank法 ###
+        return {'p{}'.format(percentile): seq_latency[max(0, int(-(-percentile * len(seq_latency) // 100)) - 1)]
+                for percentile in seq_percentile}
+
+
+class ClassificationService(object):
+    """* What you can do
+    - 常駐してカテゴリ分類を実行します。classify()は複数スレッドから同時に呼び出せます。
+    - 同時に届いたリクエストは、1つのワーカースレッドがmax_batch_size件まで、最大max_wait_seconds秒待ってまとめ、1回の行列計算でスコアリングします。
+    - 分類結果は (モデルのバージョン, テキストのハッシュ) をキーにLRUキャッシュします。
+    - reload()は新しいモデルを読み込み終えてから差し替えます。読み込み中のリクエストは古いモデルで処理されます。
+
+    * Params
+    - model_loader: ClassificationModelを返す関数。reload()でも同じ関数を呼び出します。
+    - tokenizer_obj: 形態素解析機。ワーカースレッドだけが使います。
+    - batch_tokenizer: 与えると、バッチの形態素分割をプロセスプールで並列に実行します。
+
+    >>> service = ClassificationService(model_loader=load_classification_model, tokenizer_obj=mecab_obj, pos_condition=pos_condition)
+    >>> service.classify('スターウォーズはおもしろい', k=3)
+    [('映画', 3.2), ('アニメ', 1.1), ('小説', 0.3)]
+    >>> service.reload()
+    >>> service.close()
+    """
+    def __init__(self,
+                 model_loader:Callable[[], ClassificationModel],
+                 tokenizer_obj:Any,
+                 pos_condition:List[Tuple[str,...]],
+                 batch_tokenizer:BatchTokenizer=None,
+                 max_batch_size:int=64,
+                 max_wait_seconds:float=0.005,
+                 cache_size:int=10000,
+                 latency_window_size:int=10000):
+        self.model_loader = model_loader
+        self.tokenizer_obj = tokenizer_obj
+        self.pos_condition = pos_condition
+        self.batch_tokenizer = batch_tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.result_cache = LRUCache(cache_size)
+        self.latency_recorder = LatencyRecorder(latency_window_size)
+
+        self._model = model_loader()  # type: ClassificationModel
+        self._reload_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = collections.Counter()
+        self._request_queue = queue.Queue()
+        self._worker_thread = threading.Thread(target=self._run_worker, name='classification-batch-worker')
+        self._worker_thread.daemon = True
+        self._worker_thread.start()
+        logger.info('Started classification service with model {}'.format(self._model.model_version))
+
+    @property
+    def model_version(self)->str:
+        return self._model.model_version
+
+    def _count(self, **counts)->None:
+        with self._stats_lock:
+            self._stats.update(counts)
+
+    @staticmethod
+    def _get_text_hash(input_text:str)->str:
+        return hashlib.sha1(input_text.encode('utf-8')).hexdigest()
+
+    def _collect_batch(self)->Optional[List[Tuple[str, str, Future]]]:
+        ### 先頭のリクエストが届いてから最大max_wait_seconds秒待って、バッチにまとめる ###
+        first_request = self._request_queue.get()
+        if first_request is None:
+            return None
+        seq_request = [first_request]
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while len(seq_request) < self.max_batch_size:
+            remaining_seconds = deadline - time.perf_counter()
+            try:
+                request_obj = self._request_queue.get(timeout=remaining_seconds) if remaining_seconds > 0 \
+                    else self._request_queue.get_nowait()
+            except queue.Empty:
+                break
+            if request_obj is None:
+                ### 終了の合図は、手元のバッチを処理してから受け取り直す ###
+                self._request_queue.put(None)
+                break
+            seq_request.append(request_obj)
+        return seq_request
+
+    def _score_batch(self, model_obj:ClassificationModel, seq_text:List[str])->List[List[Tuple[str, float]]]:
+        if self.batch_tokenizer is not None:
+            seq_document_tokens = list(self.batch_tokenizer.tokenize_documents(seq_text, pos_condition=self.pos_condition))
+        else:
+            seq_document_tokens = [tokenize_text(input_text=input_text, tokenizer_obj=self.tokenizer_obj, pos_condition=self.pos_condition)
+                                   for input_text in seq_text]
+        if model_obj.vocabulary_pruner is not None:
+            seq_document_tokens = [model_obj.vocabulary_pruner.transform(list_tokens) for list_tokens in seq_document_tokens]
+        return model_obj.score_matrix_scorer.score_documents(seq_document_tokens)
+
+    def _run_worker(self)->None:
+        while True:
+            seq_request = self._collect_batch()
+            if seq_request is None:
+                break
+            ### バッチの途中でモデルが差し替わっても、1つのバッチは同じモデルで処理する ###
+            model_obj = self._model
+            ### 同じテキストはバッチ内で1回だけスコアリングする ###
+            text_hash2text = collections.OrderedDict((text_hash, input_text) for text_hash, input_text, _ in seq_request)
+            try:
+                seq_result = self._score_batch(model_obj, list(text_hash2text.values()))
+            except Exception as exception_obj:
+                logger.exception('Failed to classify a batch of {} requests.'.format(len(seq_request)))
+                for _, _, future_obj in seq_request:
+                    future_obj.set_exception(exception_obj)
+                continue
+            text_hash2result = dict(zip(text_hash2text.keys(), seq_result))
+            for text_hash, result in text_hash2result.items():
+                self.result_cache.put('{}:{}'.format(model_obj.model_version, text_hash), result)
+            for text_hash, _, future_obj in seq_request:
+                future_obj.set_result(text_hash2result[text_hash])
+            self._count(n_batches=1, n_batched_requests=len(seq_request))
+
+    def classify(self, input_text:str, k:int=3, timeout:float=None)->List[Tuple[str, float]]:
+        """* What you can do
+        - 1文書を分類し、get_text_score()と同じ [(ラベル, スコア)] の上位k件を返します。
+        """
+        return self.classify_many([input_text], k=k, timeout=timeout)[0]
+
+    def classify_many(self, seq_text:List[str], k:int=3, timeout:float=None)->List[List[Tuple[str, float]]]:
+        """* What you can do
+        - 複数の文書を分類します。キャッシュにない文書だけをワーカーに渡し、他のリクエストと一緒にバッチ処理します。
+        """
+        validate_classify_request(seq_text, k)
+        start_time = time.perf_counter()
+        model_version = self._model.model_version
+        seq_result = []  # type: List[Union[List[Tuple[str, float]], Future]]
+        n_cache_hits = 0
+        for input_text in seq_text:
+            text_hash = self._get_text_hash(input_text)
+            cached_result = self.result_cache.get('{}:{}'.format(model_version, text_hash))
+            if cached_result is not None:
+                n_cache_hits += 1
+                seq_result.append(cached_result)
+                continue
+            future_obj = Future()
+            self._request_queue.put((text_hash, input_text, future_obj))
+            seq_result.append(future_obj)
+        seq_result = [result.result(timeout=timeout) if isinstance(result, Future) else result for result in seq_result]
+        self.latency_recorder.record(time.perf_counter() - start_time)
+        self._count(n_requests=1, n_documents=len(seq_text), n_cache_hits=n_cache_hits)
+        return [result[:k] if k is not None else result for result in seq_result]
+
+    def reload(self)->str:
+        """* What you can do
+        - モデルを読み込み直し、読み込みが終わった時点で差し替えます。新しいモデルのバージョンを返します。
+        - 古いモデルのキャッシュはキーにバージョンが入っているので使われず、LRUで追い出されます。
+        """
+        with self._reload_lock:
+            start_time = time.perf_counter()
+            new_model = self.model_loader()
+            old_version = self._model.model_version
+            self._model = new_model
+            self._count(n_reloads=1)
+            logger.info('Reloaded model {} -> {} in {:.2f} sec'.format(old_version, new_model.model_version,
+                                                                      time.perf_counter() - start_time))
+            return new_model.model_version
+
+    def get_stats(self)->Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['model_version'] = self.model_version
+        stats['cache_size'] = len(self.result_cache)
+        stats['queue_size'] = self._request_queue.qsize()
+        stats['mean_batch_size'] = stats['n_batched_requests'] / stats['n_batches'] if stats.get('n_batches') else 0.0
+        stats['latency_seconds'] = self.latency_recorder.get_percentiles()
+        return stats
+
+    def close(self)->None:
+        self._request_queue.put(None)
+        self._worker_thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def validate_classify_request(seq_text:List[str], k:Optional[int])->None:
+    """* What you can do
+    - 分類のリクエストを検査します。文書が文字列のリストでない場合はTypeError, kが1以上の整数かNoneでない場合はValueErrorを送出します。
+    - ワーカーに渡してから失敗すると、同じバッチの他のリクエストまで失敗するので、キューに入れる前に検査します。
+    """
+    if not isinstance(seq_text, list) or not all(isinstance(input_text, str) for input_text in seq_text):
+        raise TypeError('texts must be a list of str.')
+    ### boolはintのサブクラスなので除く ###
+    if k is not None and (isinstance(k, bool) or not isinstance(k, int) or k < 1):
+        raise ValueError('k must be a positive integer or null. Got {}'.format(json.dumps(k)))
+
+
+class ClassificationRequestHandler(BaseHTTPRequestHandler):
+    """* What you can do
+    - POST /classify
+        >>> {"text": "スターウォーズはおもしろい", "k": 3}
+        >>> {"texts": ["スターウォーズはおもしろい", "ウイスキーを飲む"], "k": 3}
+    - POST /reload : モデルを読み込み直します。
+    - GET /stats : リクエスト数・キャッシュヒット数・バッチサイズ・レイテンシのパーセンタイルを返します。
+    - GET /health
+    """
+    def _send_json(self, status_code:int, response_obj:Any)->None:
+        response_body = json.dumps(response_obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def _read_json(self)->Dict[str, Any]:
+        content_length = int(self.headers.get('Content-Length', 0))
+        if content_length == 0:
+            return {}
+        return json.loads(self.rfile.read(content_length).decode('utf-8'))
+
+    def do_GET(self):
+        service = self.server.classification_service
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'model_version': service.model_version})
+        elif self.path == '/stats':
+            self._send_json(200, service.get_stats())
+        else:
+            self._send_json(404, {'error': 'Not found: {}'.format(self.path)})
+
+    def do_POST(self):
+        service = self.server.classification_service
+        try:
+            request_obj = self._read_json()
+        except ValueError as exception_obj:
+            self._send_json(400, {'error': 'Invalid json: {}'.format(exception_obj)})
+            return
+
+        if not isinstance(request_obj, dict):
+            self._send_json(400, {'error': 'Request body must be a json object.'})
+            return
+
+        if self.path == '/classify':
+            k = request_obj.get('k', 3)
+            if 'texts' in request_obj:
+                seq_text = request_obj['texts']
+            elif 'text' in request_obj:
+                if not isinstance(request_obj['text'], str):
+                    self._send_json(400, {'error': 'text must be str.'})
+                    return
+                seq_text = [request_obj['text']]
+            else:
+                self._send_json(400, {'error': 'text or texts is required.'})
+                return
+            try:
+                validate_classify_request(seq_text, k)
+            except (TypeError, ValueError) as exception_obj:
+                self._send_json(400, {'error': str(exception_obj)})
+                return
+            try:
+                seq_result = service.classify_many(seq_text, k=k)
+            except Exception as exception_obj:
+                logger.exception('Failed to classify the request.')
+                self._send_json(500, {'error': str(exception_obj), 'model_version': service.model_version})
+                return
+            if 'texts' in request_obj:
+                self._send_json(200, {'results': seq_result, 'model_version': service.model_version})
+            else:
+                self._send_json(200, {'result': seq_result[0], 'model_version': service.model_version})
+        elif self.path == '/reload':
+            try:
+                self._send_json(200, {'model_version': service.reload()})
+            except Exception as exception_obj:
+                logger.exception('Failed to reload the model.')
+                self._send_json(500, {'error': str(exception_obj), 'model_version': service.model_version})
+        else:
+            self._send_json(404, {'error': 'Not found: {}'.format(self.path)})
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class ClassificationHTTPServer(ThreadingMixIn, HTTPServer):
+    """* What you can do
+    - 1リクエスト1スレッドで処理するHTTPサーバーです。スコアリングはClassificationServiceのワーカーにまとめられます。
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address:Tuple[str, int], classification_service:ClassificationService):
+        super().__init__(server_address, ClassificationRequestHandler)
+        self.classification_service = classification_service
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='カテゴリ分類をHTTPで受け付けるサービスを起動します。')
+    arg_parser.add_argument('--host', dest='host', default='127.0.0.1')
+    arg_parser.add_argument('--port', dest='port', type=int, default=8080)
+    arg_parser.add_argument('--max-batch-size', dest='max_batch_size', type=int, default=64)
+    arg_parser.add_argument('--max-wait-ms', dest='max_wait_ms', type=float, default=5.0,
+                            help='バッチにまとめるために待つ最大時間(ミリ秒)')
+    arg_parser.add_argument('--cache-size', dest='cache_size', type=int, default=10000)
+    arg_parser.add_argument('--n-process', dest='n_process', type=int, default=1,
+                            help='形態素分割のプロセス数。1の場合はワーカースレッドで分割します')
+    args = arg_parser.parse_args()
+
+    from JapaneseTokenizer import MecabWrapper
+    tokenizer_kwargs = {'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}
+    mecab_obj = MecabWrapper(**tokenizer_kwargs)
+    pos_condition = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
+    batch_tokenizer = BatchTokenizer(tokenizer_kwargs=tokenizer_kwargs, n_process=args.n_process) if args.n_process > 1 else None
+
+    classification_service = ClassificationService(model_loader=load_classification_model,
+                                                   tokenizer_obj=mecab_obj,
+                                                   pos_condition=pos_condition,
+                                                   batch_tokenizer=batch_tokenizer,
+                                                   max_batch_size=args.max_batch_size,
+                                                   max_wait_seconds=args.max_wait_ms / 1000,
+                                                   cache_size=args.cache_size)
+    ### SIGHUPでもモデルを読み込み直す; 読み込みは別スレッドで実行し、リクエストの処理は止めない ###
+    signal.signal(signal.SIGHUP, lambda signal_number, frame: threading.Thread(target=classification_service.reload).start())
+
+    http_server = ClassificationHTTPServer((args.host, args.port), classification_service)
+    logger.info('Listening on http://{}:{}'.format(args.host, args.port))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        classification_service.close()
+        if batch_tokenizer is not None:
+            batch_tokenizer.close()
@@ -0,0 +1,304 @@
+from typing import List, Tuple, Dict, Union, Any, Iterator
+import argparse
+import json
+import logging
+import os
+import sys
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""サンプルコードをまとめて実行するコマンドラインツールです。
+サブコマンドは fetch, tokenize, count, train, classify, evaluate です。
+起動を速くするため、このモジュールでは標準ライブラリだけをimportします。
+DocumentFeatureSelection, nltk, sqlitedict, JapaneseTokenizer, wikipediaなどは、必要なサブコマンドの中でだけimportします。
+形態素解析機はbatch_tokenizer.get_shared_tokenizer()で作るので、1つのプロセスでは1度しか作りません。
+
+>>> sample-scripts classify --model ./models/word_score_soa.bin 'スター・ウォーズの新作映画'
+>>> cat texts.txt | sample-scripts classify -k 1
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+POS_CONDITION = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
+PATH_WIKIPEDIA_DATA_DIR = './wikipedia_data'
+PATH_WORD_MODEL_BIN = './models/word_score_soa.bin'
+PATH_WORD_MODEL_JSON = './models/word_score_soa.json'
+PATH_VOCABULARY_FILE = './models/vocabulary.json'
+
+
+def _parse_pos(pos_text:str)->Tuple[str, ...]:
+    return tuple(pos_text.split(','))
+
+
+def _parse_df(df_text:str)->Union[int, float]:
+    ### VocabularyPrunerと同じく、小数点があれば全文書数に対する割合、なければ文書数 ###
+    try:
+        return float(df_text) if '.' in df_text else int(df_text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('Expected a document count (e.g. 100) or a ratio (e.g. 0.95). Got {}'.format(df_text))
+
+
+def get_tokenizer(args:argparse.Namespace)->Any:
+    """* What you can do
+    - オプションから形態素解析機を作ります。同じオプションなら、プロセス内で作った形態素解析機を使い回します。
+    """
+    from sample_scripts.batch_tokenizer import get_shared_tokenizer
+    return get_shared_tokenizer(**_get_tokenizer_kwargs(args))
+
+
+def _get_tokenizer_kwargs(args:argparse.Namespace)->Dict[str, Any]:
+    tokenizer_kwargs = {'dictType': args.dict_type}
+    if args.path_mecab_config is not None:
+        tokenizer_kwargs['path_mecab_config'] = args.path_mecab_config
+    return tokenizer_kwargs
+
+
+def _open_batch_tokenizer(args:argparse.Namespace)->Any:
+    ### 並列化しない場合はプロセスプールを作らない; 起動が速く、小さな入力ではこの方が速い ###
+    if args.n_process == 1:
+        return None
+    from sample_scripts.batch_tokenizer import BatchTokenizer
+    return BatchTokenizer(tokenizer_kwargs=_get_tokenizer_kwargs(args), n_process=args.n_process)
+
+
+def _open_tokenization_cache(args:argparse.Namespace)->Any:
+    if args.path_tokenization_cache is None:
+        return None
+    from sample_scripts.tokenizer_cache import TokenizationCache
+    return TokenizationCache(args.path_tokenization_cache)
+
+
+def _close_all(*seq_closable:Any)->None:
+    for closable_obj in seq_closable:
+        if closable_obj is not None:
+            closable_obj.close()
+
+
+def _iter_input_text(seq_text:List[str])->Iterator[str]:
+    ### 引数で与えなかった場合は、標準入力の1行を1文書として読む ###
+    if len(seq_text) > 0:
+        return iter(seq_text)
+    return (line.rstrip('\n') for line in sys.stdin if line.strip() != '')
+
+
+def load_word_score_model(path_model:str=None)->Any:
+    """* What you can do
+    - スコアモデルを読み込みます。.binならmmapで開き、それ以外はjsonとして読み込みます。
+    - path_modelを与えない場合は、バイナリモデルがあればそれを、なければjsonのモデルを読み込みます。
+    """
+    if path_model is None:
+        path_model = PATH_WORD_MODEL_BIN if os.path.exists(PATH_WORD_MODEL_BIN) else PATH_WORD_MODEL_JSON
+    if path_model.endswith('.bin'):
+        from sample_scripts.binary_model import BinaryScoreModel
+        return BinaryScoreModel(path_model)
+    with open(path_model, 'r') as f:
+        return json.load(f)
+
+
+def _load_vocabulary_pruner(path_vocabulary_file:str)->Any:
+    if path_vocabulary_file is None or not os.path.exists(path_vocabulary_file):
+        return None
+    from sample_scripts.vocabulary_pruning import VocabularyPruner
+    return VocabularyPruner.load(path_vocabulary_file)
+
+
+def run_fetch(args:argparse.Namespace)->None:
+    from sample_scripts import get_wikipedia_text
+    if args.path_dump is None:
+        get_wikipedia_text.main(args.path_output_dir,
+                                get_wikipedia_text.TRAINING_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                                get_wikipedia_text.EVALUATION_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                                requests_per_second=args.requests_per_second)
+    else:
+        get_wikipedia_text.main_from_dump(args.path_dump,
+                                          args.path_output_dir,
+                                          get_wikipedia_text.TRAINING_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                                          get_wikipedia_text.EVALUATION_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                                          n_process=args.n_process,
+                                          path_index=args.path_index)
+
+
+def run_tokenize(args:argparse.Namespace)->None:
+    from sample_scripts.sample_tokenization import tokenize_text
+    tokenizer_obj = get_tokenizer(args)
+    tokenization_cache = _open_tokenization_cache(args)
+    try:
+        if args.path_corpus is not None:
+            from sample_scripts.corpus_io import Corpus
+            seq_text = (document_obj['text'] for document_obj in Corpus(args.path_corpus))
+        else:
+            seq_text = _iter_input_text(args.seq_text)
+        for input_text in seq_text:
+            seq_tokens = tokenize_text(input_text, tokenizer_obj, args.pos_condition, is_surface=args.is_surface,
+                                       tokenization_cache=tokenization_cache)
+            print(json.dumps(seq_tokens, ensure_ascii=False))
+    finally:
+        _close_all(tokenization_cache)
+
+
+def run_count(args:argparse.Namespace)->None:
+    from sample_scripts import sample_tokenization
+    from sample_scripts.corpus_io import Corpus
+    tokenization_cache = _open_tokenization_cache(args)
+    batch_tokenizer = _open_batch_tokenizer(args)
+    try:
+        sample_tokenization.main(tokenizer_obj=get_tokenizer(args),
+                                 seq_text_data=Corpus(args.path_corpus),
+                                 pos_condition=args.pos_condition,
+                                 tokenization_cache=tokenization_cache,
+                                 batch_tokenizer=batch_tokenizer,
+                                 is_approximate=args.is_approximate)
+    finally:
+        _close_all(batch_tokenizer, tokenization_cache)
+
+
+def run_train(args:argparse.Namespace)->None:
+    from sample_scripts import sample_keyword
+    from sample_scripts.corpus_io import Corpus
+    from sample_scripts.vocabulary_pruning import VocabularyPruner
+    vocabulary_pruner = VocabularyPruner(min_df=args.min_df, max_df=args.max_df) if args.is_pruning else None
+    tokenization_cache = _open_tokenization_cache(args)
+    batch_tokenizer = _open_batch_tokenizer(args)
+    try:
+        sample_keyword.main(tokenizer_obj=get_tokenizer(args),
+                            seq_text_data=Corpus(args.path_corpus),
+                            pos_condition=args.pos_condition,
+                            tokenization_cache=tokenization_cache,
+                            batch_tokenizer=batch_tokenizer,
+                            vocabulary_pruner=vocabulary_pruner,
+                            path_vocabulary_file=args.path_vocabulary_file)
+    finally:
+        _close_all(batch_tokenizer, tokenization_cache)
+
+
+def run_classify(args:argparse.Namespace)->None:
+    """* What you can do
+    - 1文書ならget_text_score()で、複数文書ならclassify_batch()でまとめて分類し、1文書1行のjsonで [[ラベル, スコア]] を出力します。
+    """
+    from sample_scripts.sample_category_classification import get_text_score, classify_batch
+    word_score_model = load_word_score_model(args.path_model)
+    if isinstance(word_score_model, list):
+        from sample_scripts.sample_category_classification import reformat_dictionary
+        word_score_model = reformat_dictionary(word_score_model)
+    vocabulary_pruner = _load_vocabulary_pruner(args.path_vocabulary_file)
+    tokenizer_obj = get_tokenizer(args)
+    tokenization_cache = _open_tokenization_cache(args)
+    batch_tokenizer = None
+    try:
+        seq_text = list(_iter_input_text(args.seq_text))
+        if len(seq_text) == 1:
+            seq_result = [get_text_score(seq_text[0], word_score_model, tokenizer_obj, args.pos_condition,
+                                         tokenization_cache=tokenization_cache,
+                                         vocabulary_pruner=vocabulary_pruner)[:args.k]]
+        else:
+            batch_tokenizer = _open_batch_tokenizer(args)
+            seq_result = classify_batch(seq_text, word_score_model, args.pos_condition,
+                                        batch_tokenizer=batch_tokenizer,
+                                        tokenizer_obj=tokenizer_obj,
+                                        k=args.k,
+                                        tokenization_cache=tokenization_cache,
+                                        vocabulary_pruner=vocabulary_pruner)
+        for seq_score_tuple in seq_result:
+            print(json.dumps([[label_name, float(score)] for label_name, score in seq_score_tuple], ensure_ascii=False))
+    finally:
+        _close_all(batch_tokenizer, tokenization_cache)
+
+
+def run_evaluate(args:argparse.Namespace)->None:
+    from sample_scripts import sample_category_classification
+    from sample_scripts.corpus_io import Corpus
+    tokenization_cache = _open_tokenization_cache(args)
+    batch_tokenizer = _open_batch_tokenizer(args)
+    try:
+        sample_category_classification.main(word_score_model=load_word_score_model(args.path_model),
+                                            seq_evaluation_data=Corpus(args.path_corpus),
+                                            tokenizer_obj=get_tokenizer(args),
+                                            pos_condition=args.pos_condition,
+                                            ranking_evaluation=args.seq_rank,
+                                            tokenization_cache=tokenization_cache,
+                                            vocabulary_pruner=_load_vocabulary_pruner(args.path_vocabulary_file),
+                                            batch_tokenizer=batch_tokenizer,
+                                            path_evaluation_report=args.path_evaluation_report)
+    finally:
+        _close_all(batch_tokenizer, tokenization_cache)
+
+
+def build_argument_parser()->argparse.ArgumentParser:
+    ### 形態素分割を使うサブコマンドに共通のオプション ###
+    tokenizer_parser = argparse.ArgumentParser(add_help=False)
+    tokenizer_parser.add_argument('--dict-type', dest='dict_type', default='ipadic')
+    tokenizer_parser.add_argument('--path-mecab-config', dest='path_mecab_config', default=None,
+                                  help='mecab-configのあるディレクトリ. 例: /usr/local/bin/')
+    tokenizer_parser.add_argument('--pos', dest='pos_condition', type=_parse_pos, nargs='+', default=POS_CONDITION,
+                                  help='取り出す品詞. 例: --pos 名詞,固有名詞 動詞,自立')
+    tokenizer_parser.add_argument('--n-process', dest='n_process', type=int, default=1,
+                                  help='形態素分割のプロセス数. 1の場合はプロセスプールを作りません')
+    tokenizer_parser.add_argument('--tokenization-cache', dest='path_tokenization_cache', default=None,
+                                  help='形態素分割のキャッシュファイル. 例: ./wikipedia_data/tokenization_cache.sqlite3')
+
+    arg_parser = argparse.ArgumentParser(prog='sample-scripts', description='サンプルコードのコマンドラインツールです。')
+    sub_parsers = arg_parser.add_subparsers(dest='command')
+
+    fetch_parser = sub_parsers.add_parser('fetch', help='wikipediaから学習・評価用の文書を取得します')
+    fetch_parser.add_argument('--dump', dest='path_dump', default=None, help='jawiki-*-pages-articles.xml.bz2へのパス')
+    fetch_parser.add_argument('--n-process', dest='n_process', type=int, default=None, help='--dump利用時のプロセス数')
+    fetch_parser.add_argument('--dump-index', dest='path_index', default=None,
+                              help='--dumpがmultistreamダンプの場合のインデックスへのパス')
+    fetch_parser.add_argument('--requests-per-second', dest='requests_per_second', type=float, default=1.0)
+    fetch_parser.add_argument('--output-dir', dest='path_output_dir', default=PATH_WIKIPEDIA_DATA_DIR)
+    fetch_parser.set_defaults(function=run_fetch)
+
+    tokenize_parser = sub_parsers.add_parser('tokenize', parents=[tokenizer_parser], help='形態素分割の結果を1文書1行のjsonで出力します')
+    tokenize_parser.add_argument('seq_text', nargs='*', help='省略時は標準入力の1行を1文書とします')
+    tokenize_parser.add_argument('--corpus', dest='path_corpus', default=None, help='JSON Linesのコーパス')
+    tokenize_parser.add_argument('--surface', dest='is_surface', action='store_true', help='原形でなく表層形を出力します')
+    tokenize_parser.set_defaults(function=run_tokenize)
+
+    count_parser = sub_parsers.add_parser('count', parents=[tokenizer_parser], help='ラベルごとに単語を集計します')
+    count_parser.add_argument('--corpus', dest='path_corpus', default=os.path.join(PATH_WIKIPEDIA_DATA_DIR, 'wikipedia-summary.jsonl'))
+    count_parser.add_argument('--approximate', dest='is_approximate', action='store_true', help='固定メモリのスケッチで近似的に集計します')
+    count_parser.set_defaults(function=run_count)
+
+    train_parser = sub_parsers.add_parser('train', parents=[tokenizer_parser], help='特徴量抽出を実行し、スコアモデルを保存します')
+    train_parser.add_argument('--corpus', dest='path_corpus', default=os.path.join(PATH_WIKIPEDIA_DATA_DIR, 'wikipedia-full.jsonl'))
+    train_parser.add_argument('--min-df', dest='min_df', type=int, default=2)
+    train_parser.add_argument('--max-df', dest='max_df', type=_parse_df, default=0.95,
+                              help='文書頻度の上限。整数は文書数、小数は全文書数に対する割合')
+    train_parser.add_argument('--prune', dest='is_pruning', action='store_true',
+                              help='--min-df, --max-dfで語彙を絞り込み、語彙を--vocabularyに保存します')
+    train_parser.add_argument('--vocabulary', dest='path_vocabulary_file', default=PATH_VOCABULARY_FILE)
+    train_parser.set_defaults(function=run_train)
+
+    classify_parser = sub_parsers.add_parser('classify', parents=[tokenizer_parser], help='文書を分類し、上位k件の[ラベル, スコア]を出力します')
+    classify_parser.add_argument('seq_text', nargs='*', help='省略時は標準入力の1行を1文書とします')
+    classify_parser.add_argument('--model', dest='path_model', default=None,
+                                 help='スコアモデル(.binまたは.json). 省略時は{}か{}'.format(PATH_WORD_MODEL_BIN, PATH_WORD_MODEL_JSON))
+    classify_parser.add_argument('--vocabulary', dest='path_vocabulary_file', default=PATH_VOCABULARY_FILE)
+    classify_parser.add_argument('-k', dest='k', type=int, default=3)
+    classify_parser.set_defaults(function=run_classify)
+
+    evaluate_parser = sub_parsers.add_parser('evaluate', parents=[tokenizer_parser], help='評価文書で分類の精度を計算します')
+    evaluate_parser.add_argument('--corpus', dest='path_corpus', default=os.path.join(PATH_WIKIPEDIA_DATA_DIR, 'wikipedia-evaluation-full.jsonl'))
+    evaluate_parser.add_argument('--model', dest='path_model', default=None)
+    evaluate_parser.add_argument('--vocabulary', dest='path_vocabulary_file', default=PATH_VOCABULARY_FILE)
+    evaluate_parser.add_argument('--rank', dest='seq_rank', type=int, nargs='+', default=[1, 3])
+    evaluate_parser.add_argument('--report', dest='path_evaluation_report', default='./models/evaluation_report.json')
+    evaluate_parser.set_defaults(function=run_evaluate)
+    return arg_parser
+
+
+def main(seq_argument:List[str]=None)->int:
+    arg_parser = build_argument_parser()
+    args = arg_parser.parse_args(seq_argument)
+    if getattr(args, 'function', None) is None:
+        arg_parser.print_help()
+        return 2
+    args.function(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
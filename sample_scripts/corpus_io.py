@@ -0,0 +1,106 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator
+import bz2
+import gzip
+import json
+import logging
+import os
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""文書データを1行1文書のjson(JSON Lines)で読み書きします。
+巨大なjson配列を一度に読み込むとメモリを大量に消費します。1行ずつ読み書きすれば、メモリ使用量は文書数に依存しません。
+拡張子が.gzか.bz2であれば、圧縮ファイルとして読み書きします。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+
+def open_text_file(path_file:str, mode:str='r'):
+    """* What you can do
+    - 拡張子に応じて、圧縮ファイル/通常ファイルをテキストモードで開きます。
+    """
+    if path_file.endswith('.gz'):
+        return gzip.open(path_file, mode + 't', encoding='utf-8')
+    elif path_file.endswith('.bz2'):
+        return bz2.open(path_file, mode + 't', encoding='utf-8')
+    else:
+        return open(path_file, mode, encoding='utf-8')
+
+
+class CorpusWriter(object):
+    """* What you can do
+    - 文書を1行ずつファイルに追記します。
+    - with構文で使うと、抜けるときにファイルを閉じます。
+
+    * Params
+    - mode: 'a'なら既存ファイルに追記、'w'なら上書きします。
+    """
+    def __init__(self, path_corpus:str, mode:str='a'):
+        if mode not in ('a', 'w'):
+            raise ValueError('mode must be either of a or w. Got {}'.format(mode))
+        self.path_corpus = path_corpus
+        self.n_written = 0
+        self._file_obj = open_text_file(path_corpus, mode)
+
+    def write(self, document_obj:Dict[str, Any])->None:
+        self._file_obj.write(json.dumps(document_obj, ensure_ascii=False))
+        self._file_obj.write('\n')
+        self.n_written += 1
+
+    def write_all(self, seq_document_obj:Iterable[Dict[str, Any]])->int:
+        for document_obj in seq_document_obj:
+            self.write(document_obj)
+        return self.n_written
+
+    def flush(self)->None:
+        self._file_obj.flush()
+
+    def close(self)->None:
+        if not self._file_obj.closed:
+            self._file_obj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_documents(path_corpus:str)->Iterator[Dict[str, Any]]:
+    """* What you can do
+    - 文書を1つずつyieldするgeneratorを返します。
+    - 拡張子が.jsonのファイルは、これまでのjson配列形式とみなして読み込みます。この場合だけは全体がメモリに載ります。
+    """
+    if path_corpus.endswith('.json'):
+        logger.warning('{} is a json array. It is loaded on memory at once. Use JSON Lines format for large data.'.format(path_corpus))
+        with open(path_corpus, 'r') as f:
+            for document_obj in json.load(f):
+                yield document_obj
+        return
+
+    with open_text_file(path_corpus, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line == '':
+                continue
+            yield json.loads(line)
+
+
+class Corpus(object):
+    """* What you can do
+    - 何度でもイテレーションできる、遅延読み込みのコーパスです。
+    - for文で回すたびにファイルを先頭から読み直すので、List[Dict]の代わりに渡しても、メモリに全体が載ることはありません。
+
+    >>> corpus = Corpus('./wikipedia_data/wikipedia-full.jsonl')
+    >>> for wiki_document_obj in corpus: print(wiki_document_obj['page_title'])
+    """
+    def __init__(self, path_corpus:str):
+        if not os.path.exists(path_corpus):
+            raise FileNotFoundError('No corpus file at {}'.format(path_corpus))
+        self.path_corpus = path_corpus
+
+    def __iter__(self)->Iterator[Dict[str, Any]]:
+        return iter_documents(self.path_corpus)
@@ -0,0 +1,271 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Hashable
+import array
+import hashlib
+import heapq
+import logging
+import math
+import pickle
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""メモリに載り切らない規模の単語集計を、近似的に実施するためのスケッチです。
+- Count-Min Sketch: 全単語の頻度を、固定サイズの表で近似します。頻度は過大に見積もられることはあっても、過小にはなりません。
+- Misra-Gries: 頻度の高い単語(heavy hitters)を、固定個数のカウンタで追跡します。
+どちらも同じ設定で作ったもの同士はmerge()で足し合わせられるので、プロセス・マシンごとに集計して最後に合算できます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+
+def _encode_item(item:Hashable)->bytes:
+    ### n-gram(タプル)は区切り文字で連結してから符号化する ###
+    if isinstance(item, tuple):
+        return '\x1f'.join(str(element) for element in item).encode('utf-8')
+    return str(item).encode('utf-8')
+
+
+class CountMinSketch(object):
+    """* What you can do
+    - Count-Min Sketchで頻度を近似します。
+    - 推定値の誤差は、確率 1 - delta で epsilon * (総頻度) 以下です。
+    - Pythonのhash()はプロセスごとに値が変わるので使いません。md5を使うので、別プロセス・別マシンで作ったスケッチも合算できます。
+
+    * Params
+    - width, depth: 表の大きさ。from_error_bounds()を使うと、誤差の上限から決められます。
+    - seed: ハッシュ関数のシード。合算するスケッチ同士は同じ値にしてください。
+    """
+    def __init__(self, width:int, depth:int, seed:int=0):
+        if width < 1 or depth < 1:
+            raise ValueError('width and depth must be >= 1. Got width={}, depth={}'.format(width, depth))
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.total_count = 0
+        self.table = array.array('q', [0]) * (width * depth)
+        self._hash_key = seed.to_bytes(8, 'little', signed=False)
+
+    @classmethod
+    def from_error_bounds(cls, epsilon:float=0.0001, delta:float=0.001, seed:int=0)->'CountMinSketch':
+        """* What you can do
+        - 誤差 epsilon * (総頻度) を 確率 1 - delta で保証する大きさのスケッチを作ります。
+        """
+        width = int(math.ceil(math.e / epsilon))
+        depth = int(math.ceil(math.log(1.0 / delta)))
+        return cls(width=width, depth=depth, seed=seed)
+
+    def _iter_index(self, item:Hashable):
+        digest = hashlib.md5(self._hash_key + _encode_item(item)).digest()
+        hash_1 = int.from_bytes(digest[:8], 'little')
+        hash_2 = int.from_bytes(digest[8:], 'little') | 1
+        for row_index in range(self.depth):
+            yield row_index * self.width + (hash_1 + row_index * hash_2) % self.width
+
+    def update(self, item:Hashable, count:int=1)->None:
+        table = self.table
+        for table_index in self._iter_index(item):
+            table[table_index] += count
+        self.total_count += count
+
+    def update_many(self, seq_item:Iterable[Hashable])->None:
+        for item in seq_item:
+            self.update(item)
+
+    def estimate(self, item:Hashable)->int:
+        table = self.table
+        return min(table[table_index] for table_index in self._iter_index(item))
+
+    def __getitem__(self, item:Hashable)->int:
+        return self.estimate(item)
+
+    def is_mergeable(self, other:'CountMinSketch')->bool:
+        return (self.width, self.depth, self.seed) == (other.width, other.depth, other.seed)
+
+    def merge(self, other:'CountMinSketch')->'CountMinSketch':
+        """* What you can do
+        - 他のスケッチの頻度を足し合わせます(自分自身を更新します)。
+        """
+        if not self.is_mergeable(other):
+            raise ValueError('Sketches with different width, depth or seed can not be merged.')
+        table = self.table
+        for table_index, count in enumerate(other.table):
+            if count != 0:
+                table[table_index] += count
+        self.total_count += other.total_count
+        return self
+
+    @property
+    def error_bound(self)->float:
+        ### 確率 1 - exp(-depth) で、推定値の誤差はこの値以下 ###
+        return math.e / self.width * self.total_count
+
+
+class MisraGries(object):
+    """* What you can do
+    - Misra-Griesアルゴリズムで、頻度の高い要素をcapacity個のカウンタで追跡します。
+    - 頻度が 総頻度 / (capacity + 1) より大きい要素は、必ずカウンタに残ります。
+    - カウンタの値は真の頻度より小さく、誤差は 総頻度 / (capacity + 1) 以下です。
+    """
+    def __init__(self, capacity:int=1000):
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1. Got {}'.format(capacity))
+        self.capacity = capacity
+        self.total_count = 0
+        self.counters = {}  # type: Dict[Hashable, int]
+
+    def update(self, item:Hashable, count:int=1)->None:
+        self.total_count += count
+        counters = self.counters
+        counters[item] = counters.get(item, 0) + count
+        ### 1件ごとに全カウンタを減らすと遅いので、2 * capacity個まで溜めてからまとめて減らす ###
+        if len(counters) > 2 * self.capacity:
+            self._reduce()
+
+    def _reduce(self)->None:
+        """* What you can do
+        - (capacity+1)番目に大きいカウンタの値を全カウンタから引き、正の値だけ残します。
+        - 残るカウンタはcapacity個以下になり、誤差の上限 総頻度 / (capacity + 1) は保たれます。
+        """
+        if len(self.counters) <= self.capacity:
+            return
+        decrement = heapq.nlargest(self.capacity + 1, self.counters.values())[-1]
+        self.counters = {item: count - decrement for item, count in self.counters.items() if count > decrement}
+
+    def update_many(self, seq_item:Iterable[Hashable])->None:
+        for item in seq_item:
+            self.update(item)
+
+    def estimate(self, item:Hashable)->int:
+        self._reduce()
+        return self.counters.get(item, 0)
+
+    def merge(self, other:'MisraGries')->'MisraGries':
+        """* What you can do
+        - 他のサマリーを足し合わせます。合算後も誤差の上限は 総頻度 / (capacity + 1) のままです。
+        """
+        if self.capacity != other.capacity:
+            raise ValueError('Summaries with different capacity can not be merged.')
+        counters = self.counters
+        for item, count in other.counters.items():
+            counters[item] = counters.get(item, 0) + count
+        self.total_count += other.total_count
+        self._reduce()
+        return self
+
+    def most_common(self, k:int=None)->List[Tuple[Hashable, int]]:
+        self._reduce()
+        if k is None:
+            return sorted(self.counters.items(), key=lambda x:x[1], reverse=True)
+        return heapq.nlargest(k, self.counters.items(), key=lambda x:x[1])
+
+    @property
+    def error_bound(self)->float:
+        return self.total_count / (self.capacity + 1)
+
+
+class FrequencySketch(object):
+    """* What you can do
+    - Count-Min SketchとMisra-Griesを組み合わせた、固定メモリの単語頻度集計です。
+    - 頻度の高い単語の候補はMisra-Gries、その頻度はCount-Min Sketchで推定します。
+    - collections.Counterと同じように most_common() と [] で頻度を取り出せます。
+    """
+    def __init__(self,
+                 epsilon:float=0.0001,
+                 delta:float=0.001,
+                 n_heavy_hitters:int=1000,
+                 seed:int=0):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.n_heavy_hitters = n_heavy_hitters
+        self.seed = seed
+        self.count_min_sketch = CountMinSketch.from_error_bounds(epsilon=epsilon, delta=delta, seed=seed)
+        self.heavy_hitters = MisraGries(capacity=n_heavy_hitters)
+
+    def update(self, seq_item:Iterable[Hashable])->None:
+        for item in seq_item:
+            self.count_min_sketch.update(item)
+            self.heavy_hitters.update(item)
+
+    def __getitem__(self, item:Hashable)->int:
+        return self.count_min_sketch.estimate(item)
+
+    @property
+    def total_count(self)->int:
+        return self.count_min_sketch.total_count
+
+    def most_common(self, k:int=100)->List[Tuple[Hashable, int]]:
+        seq_item_frequency = [(item, self.count_min_sketch.estimate(item)) for item, _ in self.heavy_hitters.most_common()]
+        return heapq.nlargest(k, seq_item_frequency, key=lambda x:x[1])
+
+    def merge(self, other:'FrequencySketch')->'FrequencySketch':
+        self.count_min_sketch.merge(other.count_min_sketch)
+        self.heavy_hitters.merge(other.heavy_hitters)
+        return self
+
+    def to_bytes(self)->bytes:
+        """* What you can do
+        - 別プロセス・別マシンに送るためにバイト列にします。
+        """
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, byte_obj:bytes)->'FrequencySketch':
+        sketch_obj = pickle.loads(byte_obj)
+        if not isinstance(sketch_obj, cls):
+            raise TypeError('Expected {}, but got {}'.format(cls.__name__, type(sketch_obj).__name__))
+        return sketch_obj
+
+
+class LabeledFrequencySketch(object):
+    """* What you can do
+    - 全体とラベルごとの頻度を、FrequencySketchで同時に集計します。
+    - ラベルごとのスケッチは、そのラベルが初めて現れたときに作られます。
+    """
+    def __init__(self,
+                 epsilon:float=0.0001,
+                 delta:float=0.001,
+                 n_heavy_hitters:int=1000,
+                 seed:int=0):
+        self.sketch_params = {'epsilon': epsilon, 'delta': delta, 'n_heavy_hitters': n_heavy_hitters, 'seed': seed}
+        self.global_sketch = FrequencySketch(**self.sketch_params)
+        self.label_sketches = {}  # type: Dict[str, FrequencySketch]
+
+    def update(self, label_name:str, seq_item:Iterable[Hashable])->None:
+        if label_name not in self.label_sketches:
+            self.label_sketches[label_name] = FrequencySketch(**self.sketch_params)
+        seq_item = list(seq_item)
+        self.global_sketch.update(seq_item)
+        self.label_sketches[label_name].update(seq_item)
+
+    def merge(self, other:'LabeledFrequencySketch')->'LabeledFrequencySketch':
+        if self.sketch_params != other.sketch_params:
+            raise ValueError('Sketches with different parameters can not be merged.')
+        self.global_sketch.merge(other.global_sketch)
+        for label_name, label_sketch in other.label_sketches.items():
+            ### otherのスケッチをそのまま持つと、後でどちらかを更新したときにもう一方も変わるので、空のスケッチに足し込む ###
+            if label_name not in self.label_sketches:
+                self.label_sketches[label_name] = FrequencySketch(**self.sketch_params)
+            self.label_sketches[label_name].merge(label_sketch)
+        return self
+
+    def to_bytes(self)->bytes:
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, byte_obj:bytes)->'LabeledFrequencySketch':
+        sketch_obj = pickle.loads(byte_obj)
+        if not isinstance(sketch_obj, cls):
+            raise TypeError('Expected {}, but got {}'.format(cls.__name__, type(sketch_obj).__name__))
+        return sketch_obj
+
+
+def merge_sketches(seq_sketch:Iterable[Union[FrequencySketch, LabeledFrequencySketch, CountMinSketch, MisraGries]]):
+    """* What you can do
+    - シャードごとに作ったスケッチを1つに合算します。
+    """
+    merged_sketch = None
+    for sketch_obj in seq_sketch:
+        merged_sketch = sketch_obj if merged_sketch is None else merged_sketch.merge(sketch_obj)
+    return merged_sketch
@@ -0,0 +1,177 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator
+from sample_scripts import instrumentation
+import heapq
+import itertools
+import logging
+import operator
+import os
+import pickle
+import shutil
+import tempfile
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""メモリに載り切らない数のスコアのレコードを、単語ごとにまとめます(外部ソートによるgroup by)。
+レコードはmax_records_in_memory件ずつメモリ上でソートしてディスクに書き出し(ソート済みラン)、最後にheapq.merge()で全ランをマージしながら単語ごとにまとめます。
+メモリに載るのは max_records_in_memory件 + マージ中の各ランの先頭チャンク だけなので、レコード数が数千万件でもメモリ使用量は一定です。
+単語は文字列の昇順で出力するので、binary_model.BinaryModelWriterにそのまま書き込めます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### ランファイルを読み書きする単位(レコード数). マージ中はラン数 x CHUNK_SIZE 件がメモリに載る ###
+CHUNK_SIZE = 10000
+
+_get_word = operator.itemgetter(0)
+
+
+class ExternalGroupBy(object):
+    """* What you can do
+    - (単語, ラベル, スコア) を1件ずつ受け取り、単語ごとの [(ラベル, スコア)] を単語の昇順でyieldします。
+    - 同じ単語の (ラベル, スコア) は、受け取った順番のままです。reformat_dictionary()と同じ順番になります。
+    - 文字列の昇順はUTF-8のバイト列の昇順と同じなので、BinaryModelWriterの順番の条件を満たします。
+
+    * Params
+    - max_records_in_memory: メモリ上に溜めるレコード数の上限。超えるとソートしてディスクに書き出します。
+    - max_merge_fan_in: 1回のマージで同時に開くランの数の上限。ランがこれより多い場合は、何段かに分けてマージします。
+    - path_temporary_dir: ランファイルを置くディレクトリ。Noneの場合はOSの一時ディレクトリです。
+
+    >>> with ExternalGroupBy(max_records_in_memory=1000000) as external_groupby:
+    ...     for score_object in seq_score_object:
+    ...         external_groupby.add(score_object['word'], score_object['label'], score_object['score'])
+    ...     for word, seq_label_score in external_groupby.iter_groups():
+    ...         print(word, seq_label_score)
+    お金 [('レストラン', 0.02942301705479622)]
+    """
+    def __init__(self,
+                 max_records_in_memory:int=1000000,
+                 max_merge_fan_in:int=64,
+                 path_temporary_dir:str=None):
+        if max_records_in_memory < 1:
+            raise ValueError('max_records_in_memory must be positive. Got {}'.format(max_records_in_memory))
+        if max_merge_fan_in < 2:
+            raise ValueError('max_merge_fan_in must be 2 or more. Got {}'.format(max_merge_fan_in))
+        self.max_records_in_memory = max_records_in_memory
+        self.max_merge_fan_in = max_merge_fan_in
+        self.n_records = 0
+        self.n_spilled_runs = 0
+        self._path_run_dir = tempfile.mkdtemp(dir=path_temporary_dir)
+        self._seq_path_run = []  # type: List[str]
+        self._buffer = []  # type: List[Tuple[str, str, float]]
+
+    def add(self, word:str, label:str, score:float)->None:
+        self._buffer.append((word, label, score))
+        self.n_records += 1
+        if len(self._buffer) >= self.max_records_in_memory:
+            self._spill()
+
+    def _get_new_run_path(self)->str:
+        file_descriptor, path_run = tempfile.mkstemp(dir=self._path_run_dir, suffix='.run')
+        os.close(file_descriptor)
+        return path_run
+
+    def _write_run(self, seq_record:Iterable[Tuple[str, str, float]])->str:
+        path_run = self._get_new_run_path()
+        iter_record = iter(seq_record)
+        with open(path_run, 'wb') as f:
+            while True:
+                seq_chunk = list(itertools.islice(iter_record, CHUNK_SIZE))
+                if len(seq_chunk) == 0:
+                    break
+                pickle.dump(seq_chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        instrumentation.increment('external_groupby.bytes_written', os.path.getsize(path_run))
+        return path_run
+
+    @staticmethod
+    def _iter_run(path_run:str)->Iterator[Tuple[str, str, float]]:
+        with open(path_run, 'rb') as f:
+            while True:
+                try:
+                    seq_chunk = pickle.load(f)
+                except EOFError:
+                    break
+                for record in seq_chunk:
+                    yield record
+
+    def _spill(self)->None:
+        ### list.sort()は安定ソートなので、同じ単語のレコードは受け取った順番のまま ###
+        with instrumentation.span('external_groupby.spill'):
+            self._buffer.sort(key=_get_word)
+            self._seq_path_run.append(self._write_run(self._buffer))
+        self._buffer = []
+        self.n_spilled_runs += 1
+        logger.debug('Spilled run #{} N(record)={} so far.'.format(self.n_spilled_runs, self.n_records))
+
+    def _merge(self, seq_path_run:List[str])->Iterator[Tuple[str, str, float]]:
+        ### heapq.merge()はキーが同じ場合、先に渡したランのレコードを先に返すので、ランの順番を保てば受け取った順番も保たれる ###
+        return heapq.merge(*[self._iter_run(path_run) for path_run in seq_path_run], key=_get_word)
+
+    def _reduce_runs(self)->None:
+        ### ランが多すぎる場合は、隣り合うランをまとめて減らす. 隣り合うランをまとめるので順番は崩れない ###
+        while len(self._seq_path_run) > self.max_merge_fan_in:
+            seq_path_merged_run = []
+            for start in range(0, len(self._seq_path_run), self.max_merge_fan_in):
+                seq_path_run = self._seq_path_run[start:start + self.max_merge_fan_in]
+                if len(seq_path_run) == 1:
+                    seq_path_merged_run.append(seq_path_run[0])
+                    continue
+                with instrumentation.span('external_groupby.merge'):
+                    seq_path_merged_run.append(self._write_run(self._merge(seq_path_run)))
+                for path_run in seq_path_run:
+                    os.remove(path_run)
+            logger.debug('Merged {} runs into {} runs.'.format(len(self._seq_path_run), len(seq_path_merged_run)))
+            self._seq_path_run = seq_path_merged_run
+
+    def iter_groups(self)->Iterator[Tuple[str, List[Tuple[str, float]]]]:
+        """* What you can do
+        - 単語の昇順で (単語, [(ラベル, スコア)]) をyieldします。
+        - 1度もディスクに書き出していない場合は、メモリ上でソートするだけです。
+        """
+        if len(self._seq_path_run) == 0:
+            self._buffer.sort(key=_get_word)
+            seq_record = iter(self._buffer)
+        else:
+            if len(self._buffer) > 0:
+                self._spill()
+            self._reduce_runs()
+            seq_record = self._merge(self._seq_path_run)
+        for word, grouped_records in itertools.groupby(seq_record, key=_get_word):
+            yield word, [(label_name, score) for _, label_name, score in grouped_records]
+
+    def close(self)->None:
+        self._buffer = []
+        self._seq_path_run = []
+        if os.path.exists(self._path_run_dir):
+            shutil.rmtree(self._path_run_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_grouped_score_records(score_dictionary:Iterable[Dict[str, Any]],
+                               max_records_in_memory:int=1000000,
+                               path_temporary_dir:str=None)->Iterator[Tuple[str, List[Tuple[str, float]]]]:
+    """* What you can do
+    - run_feature_selection()の戻り値の形のレコードを、単語の昇順で (単語, [(ラベル, スコア)]) にまとめてyieldします。
+    - score_dictionaryはリストでなくgeneratorでも構いません。レコード全体をメモリに載せることはありません。
+    - ランファイルは、yieldし終わるかgeneratorが閉じられた時点で削除します。
+
+    * Input
+    >>> [{"label": "レストラン", "score": 0.02942301705479622, "word": "お金"}]
+    """
+    with ExternalGroupBy(max_records_in_memory=max_records_in_memory, path_temporary_dir=path_temporary_dir) as external_groupby:
+        for score_object in score_dictionary:
+            ### DocumentFeatureSelectionのバージョンによって、単語のキーは'word'または'feature'です ###
+            word = score_object['word'] if 'word' in score_object else score_object['feature']
+            if not isinstance(word, str):
+                raise TypeError('External group by supports only str words. Got {}'.format(type(word).__name__))
+            external_groupby.add(word, score_object['label'], score_object['score'])
+        logger.info(msg='Grouping N(record)={} with {} spilled runs.'.format(external_groupby.n_records, external_groupby.n_spilled_runs))
+        for word, seq_label_score in external_groupby.iter_groups():
+            yield word, seq_label_score
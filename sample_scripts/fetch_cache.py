@@ -0,0 +1,87 @@
+from typing import List, Tuple, Dict, Union, Any, Optional
+import hashlib
+import json
+import logging
+import os
+import re
+from sample_scripts import instrumentation
+import tempfile
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""wikipediaから取得したテキストをディスクにキャッシュします。
+キャッシュは(言語, モード, ページタイトル)のハッシュ値をキーにした1ページ1ファイルの構成です。
+取得できた時点でファイルに書き出すので、途中でプロセスが落ちても、再実行時には取得済みのページを飛ばして再開できます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### 見出し行(== 概要 ==)で本文のセクションが始まる ###
+SECTION_HEADER_PATTERN = re.compile(r'\n\s*==[^=\n].*?==\s*\n')
+SENTENCE_PATTERN = re.compile(r'.*?(?:[。！？]|\.(?=\s)|$)', flags=re.DOTALL)
+
+
+def derive_summary(full_text:str, n_summary_sentence:int=3)->str:
+    """* What you can do
+    - ページ全文から、冒頭(最初の見出しより前)の文をn_summary_sentence個取り出して要約を作ります。
+    - wikipedia.summary()と同じく、リード文の先頭数文を要約とみなします。
+    - リード文が取り出せない場合は空文字を返します。
+    """
+    lead_text = SECTION_HEADER_PATTERN.split(full_text, maxsplit=1)[0].strip()
+    seq_sentence = [sentence for sentence in SENTENCE_PATTERN.findall(lead_text) if sentence.strip()]
+    return ''.join(seq_sentence[:n_summary_sentence]).strip()
+
+
+class FetchCache(object):
+    """* What you can do
+    - 取得済みテキストを1ページ1ファイルでディスクに保存します。
+    - ファイル名は(言語, モード, ページタイトル)のsha1です。ページタイトルに記号が含まれていても安全に保存できます。
+    - 書き込みは一時ファイル -> os.replace()で行うので、書き込み途中で落ちても壊れたファイルは残りません。
+
+    * Params
+    - path_cache_dir: キャッシュを保存するディレクトリ
+    - lang: wikipediaの言語。キャッシュキーに含まれます。
+    """
+    def __init__(self, path_cache_dir:str, lang:str='ja'):
+        self.path_cache_dir = path_cache_dir
+        self.lang = lang
+        if not os.path.exists(path_cache_dir):
+            os.makedirs(path_cache_dir)
+
+    def get_cache_key(self, page_title:str, mode:str)->str:
+        return hashlib.sha1('{}\t{}\t{}'.format(self.lang, mode, page_title).encode('utf-8')).hexdigest()
+
+    def get_cache_path(self, page_title:str, mode:str)->str:
+        cache_key = self.get_cache_key(page_title, mode)
+        return os.path.join(self.path_cache_dir, self.lang, mode, cache_key[:2], '{}.json'.format(cache_key))
+
+    def __contains__(self, title_mode:Tuple[str, str])->bool:
+        return os.path.exists(self.get_cache_path(title_mode[0], title_mode[1]))
+
+    def get(self, page_title:str, mode:str)->Optional[str]:
+        path_cache_file = self.get_cache_path(page_title, mode)
+        if not os.path.exists(path_cache_file):
+            return None
+        with open(path_cache_file, 'r') as f:
+            return json.load(f)['text']
+
+    def put(self, page_title:str, mode:str, text:str)->None:
+        path_cache_file = self.get_cache_path(page_title, mode)
+        path_cache_sub_dir = os.path.dirname(path_cache_file)
+        if not os.path.exists(path_cache_sub_dir):
+            os.makedirs(path_cache_sub_dir, exist_ok=True)
+        cache_record = {'lang': self.lang, 'mode': mode, 'page_title': page_title, 'text': text}
+        file_descriptor, path_temporary_file = tempfile.mkstemp(dir=path_cache_sub_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as f:
+                f.write(json.dumps(cache_record, ensure_ascii=False))
+            os.replace(path_temporary_file, path_cache_file)
+            if instrumentation.is_enabled():
+                instrumentation.increment('fetch_cache.bytes_written', os.path.getsize(path_cache_file))
+        except:
+            if os.path.exists(path_temporary_file):
+                os.remove(path_temporary_file)
+            raise
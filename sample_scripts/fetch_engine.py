@@ -0,0 +1,222 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+import urllib.parse
+import urllib.request
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""wikipediaテキストを並列に取得するためのエンジンです。
+一定時間のsleepでアクセス間隔を空けるのではなく、トークンバケットでリクエストレートを制御します。
+取得処理は差し替え可能なクライアントクラスに委譲するので、ローカルのスタブサーバーに向けてテストすることもできます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+MODE_FULL = 'full'
+MODE_SUMMARY = 'summary'
+
+
+class TokenBucket(object):
+    """* What you can do
+    - トークンバケット方式でリクエストレートを制限します。
+    - 1秒あたり`rate_per_second`個のトークンが補充され、最大`capacity`個まで貯められます。
+    - acquire()はトークンが1つ取れるまでブロックします。複数スレッドから呼び出しても安全です。
+    """
+    def __init__(self, rate_per_second:float, capacity:int=1):
+        if rate_per_second <= 0:
+            raise ValueError('rate_per_second must be positive. Got {}'.format(rate_per_second))
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1. Got {}'.format(capacity))
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self)->None:
+        now = time.monotonic()
+        self._tokens = min(float(self.capacity), self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+
+    def acquire(self)->None:
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_time = (1.0 - self._tokens) / self.rate_per_second
+            time.sleep(wait_time)
+
+
+class WikipediaClient(object):
+    """* What you can do
+    - `wikipedia`パッケージを使って本文・要約を取得するデフォルトのクライアントです。
+    - 失敗時は例外をそのまま送出します。リトライはConcurrentFetcher側で行います。
+    """
+    def __init__(self, lang:str='ja'):
+        self.lang = lang
+        self._lock = threading.Lock()
+        self._is_initialized = False
+
+    def _get_module(self):
+        import wikipedia
+        ### set_lang()はモジュールのグローバル状態を書き換えるので、1度だけ呼び出す ###
+        with self._lock:
+            if not self._is_initialized:
+                wikipedia.set_lang(self.lang)
+                self._is_initialized = True
+        return wikipedia
+
+    def is_permanent_error(self, exception_obj:Exception)->bool:
+        ### ページが存在しない・曖昧さ回避ページの場合は、何度リトライしても結果は変わらない ###
+        import wikipedia
+        return isinstance(exception_obj, (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError))
+
+    def fetch_page(self, page_title:str)->str:
+        return self._get_module().page(page_title).content
+
+    def fetch_summary(self, page_title:str, n_summary_sentence:int=3)->str:
+        return self._get_module().summary(page_title, n_summary_sentence)
+
+
+class MediaWikiApiClient(object):
+    """* What you can do
+    - MediaWiki APIに直接HTTPリクエストを投げるクライアントです。
+    - `api_url`をローカルのスタブサーバーに向ければ、ネットワークなしで取得処理を試せます。
+
+    * Params
+    - api_url
+        >>> 'https://ja.wikipedia.org/w/api.php' or 'http://127.0.0.1:8080/w/api.php'
+    """
+    def __init__(self, api_url:str='https://ja.wikipedia.org/w/api.php', timeout:float=30.0):
+        self.api_url = api_url
+        self.timeout = timeout
+
+    def _get_extract(self, page_title:str, extra_params:Dict[str, str])->str:
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'prop': 'extracts',
+            'explaintext': '1',
+            'redirects': '1',
+            'titles': page_title
+        }
+        params.update(extra_params)
+        url = '{}?{}'.format(self.api_url, urllib.parse.urlencode(params))
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            response_obj = json.loads(response.read().decode('utf-8'))
+        for page_obj in response_obj['query']['pages'].values():
+            if 'missing' in page_obj or 'extract' not in page_obj:
+                raise KeyError('Page not found. page-title={}'.format(page_title))
+            return page_obj['extract']
+        raise KeyError('Page not found. page-title={}'.format(page_title))
+
+    def is_permanent_error(self, exception_obj:Exception)->bool:
+        return isinstance(exception_obj, KeyError)
+
+    def fetch_page(self, page_title:str)->str:
+        return self._get_extract(page_title, {})
+
+    def fetch_summary(self, page_title:str, n_summary_sentence:int=3)->str:
+        return self._get_extract(page_title, {'exintro': '1', 'exsentences': str(n_summary_sentence)})
+
+
+class ConcurrentFetcher(object):
+    """* What you can do
+    - スレッドプールで複数のページを並列に取得します。
+    - スループットはトークンバケットのレート(requests_per_second)で決まります。固定のsleepは入りません。
+    - 失敗したリクエストは指数バックオフ(+ジッター)で`max_retry`回まで再試行します。
+        - クライアントがis_permanent_error()を持っていれば、それがTrueを返す例外(ページが存在しない等)は再試行しません。
+
+    * Output
+    - fetch()は取得が完了した順に以下の辞書をyieldします。取得に失敗したページのtextはFalseです。
+        >>> {'page_title': 'ウイスキー', 'text': '...', 'gold_label': 'アルコール'}
+    """
+    def __init__(self,
+                 client:Any=None,
+                 requests_per_second:float=1.0,
+                 burst:int=1,
+                 max_workers:int=4,
+                 max_retry:int=3,
+                 backoff_seconds:float=1.0,
+                 max_backoff_seconds:float=60.0):
+        self.client = client if client is not None else WikipediaClient()
+        self.rate_limiter = TokenBucket(rate_per_second=requests_per_second, capacity=burst)
+        self.max_workers = max_workers
+        self.max_retry = max_retry
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+    def _call_client(self, page_title:str, mode:str, n_summary_sentence:int)->str:
+        if mode == MODE_FULL:
+            return self.client.fetch_page(page_title)
+        else:
+            return self.client.fetch_summary(page_title, n_summary_sentence)
+
+    def fetch_one(self, page_title:str, mode:str=MODE_FULL, n_summary_sentence:int=3)->Union[bool, str]:
+        """* What you can do
+        - 1ページを取得します。リトライ回数を使い切った場合はFalseを返します。
+        """
+        if mode not in (MODE_FULL, MODE_SUMMARY):
+            raise ValueError('mode must be either of {} or {}. Got {}'.format(MODE_FULL, MODE_SUMMARY, mode))
+
+        for n_trial in range(self.max_retry + 1):
+            ### リトライも1リクエストなので、毎回トークンを消費する ###
+            self.rate_limiter.acquire()
+            try:
+                text = self._call_client(page_title, mode, n_summary_sentence)
+                logger.debug('Got {} page page-title={}'.format(mode, page_title))
+                return text
+            except Exception as exception_obj:
+                is_permanent_error = getattr(self.client, 'is_permanent_error', lambda e: False)(exception_obj)
+                if is_permanent_error or n_trial == self.max_retry:
+                    logger.error(traceback.format_exc())
+                    break
+                wait_time = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** n_trial))
+                wait_time *= random.uniform(0.5, 1.0)
+                logger.warning('Failed to get page-title={}. Retry after {:.2f} sec ({}/{})'.format(
+                    page_title, wait_time, n_trial + 1, self.max_retry))
+                time.sleep(wait_time)
+        return False
+
+    def fetch(self,
+              wikipedia_article_names:Iterable[Tuple[str, str]],
+              mode:str=MODE_FULL,
+              n_summary_sentence:int=3)->Iterator[Dict[str, Any]]:
+        """* What you can do
+        - (ページタイトル, ラベル)のリストを受け取り、並列に取得します。
+        - 結果は取得が完了した順にyieldします。
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future2article = {
+                executor.submit(self.fetch_one, article_name[0], mode, n_summary_sentence): article_name
+                for article_name in wikipedia_article_names
+            }
+            for future in as_completed(future2article):
+                article_name = future2article[future]
+                wikipedia_text_format = {}
+                wikipedia_text_format["page_title"] = article_name[0]
+                wikipedia_text_format["text"] = future.result()
+                wikipedia_text_format["gold_label"] = article_name[1]
+                yield wikipedia_text_format
+
+    def fetch_in_order(self,
+                       wikipedia_article_names:List[Tuple[str, str]],
+                       mode:str=MODE_FULL,
+                       n_summary_sentence:int=3)->List[Dict[str, Any]]:
+        """* What you can do
+        - fetch()と同じですが、入力と同じ順番のリストで返します。
+        """
+        title2order = {article_name[0]: i for i, article_name in enumerate(wikipedia_article_names)}
+        seq_result = list(self.fetch(wikipedia_article_names, mode=mode, n_summary_sentence=n_summary_sentence))
+        return sorted(seq_result, key=lambda wikipedia_text_format: title2order[wikipedia_text_format["page_title"]])
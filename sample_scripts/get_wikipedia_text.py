@@ -1,15 +1,20 @@
-from typing import List, Tuple, Dict, Union
-import wikipedia
+from typing import List, Tuple, Dict, Union, Any, Iterator
+from sample_scripts.fetch_engine import ConcurrentFetcher, WikipediaClient, MODE_FULL, MODE_SUMMARY
+from sample_scripts.fetch_cache import FetchCache, derive_summary
+from sample_scripts.corpus_io import CorpusWriter
+from sample_scripts.wikipedia_dump import iter_dump_documents
+from sample_scripts import instrumentation
+import argparse
 import json
-import time
-import traceback
 import logging
 import tqdm
 import os
 logger = logging.getLogger()
 logger.setLevel(10)
 
-SLEEP_TIME = 2
+### 1秒あたりのリクエスト数の上限と、同時に実行するリクエスト数の上限 ###
+REQUESTS_PER_SECOND = 1.0
+MAX_WORKERS = 4
 
 """サンプルとして利用するテキストデータを生成します。
 wikipediaからテキストを選択し、ローカルディレクトリに保存します。
@@ -22,227 +27,335 @@ __author_email__ = "kensuke.mit@gmail.com"
 __license_name__ = "MIT"
 
 
-def get_wikipedia_page(page_title):
-    # type: (str) -> Union[bool, str]
-    try:
-        logger.debug('Got full page page-title={}'.format(page_title))
-        return wikipedia.page(page_title).content
-    except:
-        logger.error(traceback.format_exc())
-        return False
+def fetch_into_cache(fetcher:ConcurrentFetcher,
+                     fetch_cache:FetchCache,
+                     wikipedia_article_names:List[Tuple[str, str]],
+                     mode:str=MODE_FULL)->int:
+    """* What you can do
+    - キャッシュにないページだけを並列に取得し、取得できた時点でキャッシュに書き込みます。
+    - 途中で落ちても、再実行時には取得済みのページを飛ばして再開できます。
 
+    * Output
+    - 新たに取得できたページ数
+    """
+    seq_article_not_cached = []
+    seen_titles = set()
+    for article_name in wikipedia_article_names:
+        if article_name[0] in seen_titles or (article_name[0], mode) in fetch_cache:
+            continue
+        seen_titles.add(article_name[0])
+        seq_article_not_cached.append(article_name)
+    logger.info('{} pages are cached. Fetch {} pages. mode={}'.format(len(wikipedia_article_names) - len(seq_article_not_cached),
+                                                                     len(seq_article_not_cached),
+                                                                     mode))
 
-def get_wikipedia_summary(page_title:str, n_summary_sentence:int=3):
-    # type: (str, int)->Union[bool, str]
-    try:
-        logger.debug('Got summary page page-title={}'.format(page_title))
-        return wikipedia.summary(page_title, n_summary_sentence)
-    except:
-        logger.error(traceback.format_exc())
-        return False
+    instrumentation.increment('fetch.cache_hits', len(wikipedia_article_names) - len(seq_article_not_cached))
 
+    n_fetched = 0
+    with instrumentation.span('fetch'):
+        for wikipedia_text_format in tqdm.tqdm(fetcher.fetch(seq_article_not_cached, mode=mode),
+                                               total=len(seq_article_not_cached)):
+            if not wikipedia_text_format["text"] is False:
+                fetch_cache.put(wikipedia_text_format["page_title"], mode, wikipedia_text_format["text"])
+                n_fetched += 1
+    instrumentation.increment('fetch.pages', n_fetched)
+    instrumentation.increment('fetch.failures', len(seq_article_not_cached) - n_fetched)
+    return n_fetched
 
-def main(path_extracted_wikipedia_text:str,
-         wikipedia_article_names:List[Tuple[str, str]],
-         evaluation_data_wikipedia_article_names:List[Tuple[str, str]]):
-    wikipedia.set_lang('ja')
-    extracted_summary_text = []
-    for article_name in tqdm.tqdm(wikipedia_article_names):
-        text = get_wikipedia_summary(article_name[0])
-        wikipedia_text_format = {}
-        wikipedia_text_format["page_title"] = article_name[0]
-        wikipedia_text_format["text"] = text
-        wikipedia_text_format["gold_label"] = article_name[1]
-        if not text is False:
-            extracted_summary_text.append(wikipedia_text_format)
-        time.sleep(SLEEP_TIME)
 
-    with open(os.path.join(path_extracted_wikipedia_text, 'wikipedia-summary.json'), 'w') as f:
-        f.write(json.dumps(extracted_summary_text, ensure_ascii=False, indent=4))
+def get_summary_records(fetcher:ConcurrentFetcher,
+                        fetch_cache:FetchCache,
+                        wikipedia_article_names:List[Tuple[str, str]],
+                        n_summary_sentence:int=3)->Iterator[Dict[str, Any]]:
+    """* What you can do
+    - 要約はキャッシュ済みの全文から手元で作ります。全文1回の取得で要約も手に入るので、通信回数が半分になります。
+    - 全文から要約が作れなかったページだけ、要約をwikipediaから取得します。
+    """
+    seq_article_to_fetch = []
+    for article_name in wikipedia_article_names:
+        if (article_name[0], MODE_SUMMARY) in fetch_cache:
+            continue
+        full_text = fetch_cache.get(article_name[0], MODE_FULL)
+        summary_text = derive_summary(full_text, n_summary_sentence) if full_text is not None else ''
+        if summary_text == '':
+            seq_article_to_fetch.append(article_name)
+        else:
+            fetch_cache.put(article_name[0], MODE_SUMMARY, summary_text)
+    fetch_into_cache(fetcher, fetch_cache, seq_article_to_fetch, mode=MODE_SUMMARY)
 
-    extracted_full_text = []
-    for article_name in tqdm.tqdm(wikipedia_article_names):
-        text = get_wikipedia_page(article_name[0])
-        wikipedia_text_format = {}
-        wikipedia_text_format["page_title"] = article_name[0]
-        wikipedia_text_format["text"] = text
-        wikipedia_text_format["gold_label"] = article_name[1]
-        if not text is False:
-            extracted_full_text.append(wikipedia_text_format)
-        time.sleep(SLEEP_TIME)
+    return iter_cached_records(fetch_cache, wikipedia_article_names, mode=MODE_SUMMARY)
 
-    with open(os.path.join(path_extracted_wikipedia_text, 'wikipedia-full.json'), 'w') as f:
-        f.write(json.dumps(extracted_full_text, ensure_ascii=False, indent=4))
 
-    extracted_full_text = []
-    for article_name in tqdm.tqdm(evaluation_data_wikipedia_article_names):
-        text = get_wikipedia_page(article_name[0])
+def iter_cached_records(fetch_cache:FetchCache,
+                        wikipedia_article_names:List[Tuple[str, str]],
+                        mode:str=MODE_FULL)->Iterator[Dict[str, Any]]:
+    """* What you can do
+    - キャッシュ済みのページを入力と同じ順番でyieldします。取得できなかったページは含まれません。
+    """
+    for article_name in wikipedia_article_names:
+        text = fetch_cache.get(article_name[0], mode)
+        if text is None:
+            continue
         wikipedia_text_format = {}
         wikipedia_text_format["page_title"] = article_name[0]
         wikipedia_text_format["text"] = text
         wikipedia_text_format["gold_label"] = article_name[1]
-        if not text is False:
-            extracted_full_text.append(wikipedia_text_format)
-        time.sleep(SLEEP_TIME)
+        yield wikipedia_text_format
 
-    with open(os.path.join(path_extracted_wikipedia_text, 'wikipedia-evaluation-full.json'), 'w') as f:
-        f.write(json.dumps(extracted_full_text, ensure_ascii=False, indent=4))
 
+def main(path_extracted_wikipedia_text:str,
+         wikipedia_article_names:List[Tuple[str, str]],
+         evaluation_data_wikipedia_article_names:List[Tuple[str, str]],
+         requests_per_second:float=REQUESTS_PER_SECOND,
+         max_workers:int=MAX_WORKERS,
+         client:Any=None,
+         path_cache_dir:str=None):
+    """* What you can do
+    - wikipediaからページを取得し、1行1文書のjson(JSON Lines)ファイルに保存します。
+    - アクセス間隔はrequests_per_secondで制御します。wikipediaに負荷をかけすぎないように注意しましょう。
+    - clientを差し替えると、wikipedia以外(ローカルのスタブサーバーなど)から取得できます。
+    - 取得結果はpath_cache_dirにキャッシュされます。再実行すると、取得済みのページは通信せずにキャッシュから読みます。
+    """
+    if client is None:
+        client = WikipediaClient(lang='ja')
+    if path_cache_dir is None:
+        path_cache_dir = os.path.join(path_extracted_wikipedia_text, 'fetch_cache')
+    fetcher = ConcurrentFetcher(client=client,
+                                requests_per_second=requests_per_second,
+                                max_workers=max_workers)
+    fetch_cache = FetchCache(path_cache_dir=path_cache_dir, lang='ja')
+
+    ### 学習用・評価用の全文をまとめて取得する ###
+    fetch_into_cache(fetcher, fetch_cache, wikipedia_article_names + evaluation_data_wikipedia_article_names, mode=MODE_FULL)
+
+    ### キャッシュから1文書ずつ読み出して書き出すので、全文書がメモリに載ることはありません ###
+    extracted_summary_text = get_summary_records(fetcher, fetch_cache, wikipedia_article_names)
+    with CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-summary.jsonl'), mode='w') as writer:
+        writer.write_all(extracted_summary_text)
+
+    extracted_full_text = iter_cached_records(fetch_cache, wikipedia_article_names, mode=MODE_FULL)
+    with CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-full.jsonl'), mode='w') as writer:
+        writer.write_all(extracted_full_text)
+
+    extracted_full_text = iter_cached_records(fetch_cache, evaluation_data_wikipedia_article_names, mode=MODE_FULL)
+    with CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-evaluation-full.jsonl'), mode='w') as writer:
+        writer.write_all(extracted_full_text)
+
+
+def main_from_dump(path_dump:str,
+                   path_extracted_wikipedia_text:str,
+                   wikipedia_article_names:List[Tuple[str, str]],
+                   evaluation_data_wikipedia_article_names:List[Tuple[str, str]],
+                   n_process:int=None,
+                   n_summary_sentence:int=3,
+                   path_index:str=None):
+    """* What you can do
+    - ネットワークを使わず、ローカルのXMLダンプ(jawiki-*-pages-articles.xml.bz2)からmain()と同じファイルを作ります。
+    - ダンプは1回だけ先頭から読みます。ラベルは(ページタイトル, ラベル)のリストから付与します。
+    - 出力の順番はダンプ内の順番になります。
+    - path_indexにmultistreamダンプのインデックスを与えると、必要なストリームだけを並列に展開して読みます。
+    """
+    title2attribute = {}
+    for article_name in wikipedia_article_names:
+        title2attribute.setdefault(article_name[0], []).append(('training', article_name[1]))
+    for article_name in evaluation_data_wikipedia_article_names:
+        title2attribute.setdefault(article_name[0], []).append(('evaluation', article_name[1]))
+
+    with CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-summary.jsonl'), mode='w') as summary_writer, \
+            CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-full.jsonl'), mode='w') as full_writer, \
+            CorpusWriter(os.path.join(path_extracted_wikipedia_text, 'wikipedia-evaluation-full.jsonl'), mode='w') as evaluation_writer:
+        seq_document = iter_dump_documents(path_dump=path_dump, title2attribute=title2attribute, n_process=n_process,
+                                           path_index=path_index)
+        for page_title, text, seq_attribute in tqdm.tqdm(seq_document):
+            for data_type, gold_label in seq_attribute:
+                wikipedia_text_format = {}
+                wikipedia_text_format["page_title"] = page_title
+                wikipedia_text_format["text"] = text
+                wikipedia_text_format["gold_label"] = gold_label
+                if data_type == 'evaluation':
+                    evaluation_writer.write(wikipedia_text_format)
+                    continue
+                full_writer.write(wikipedia_text_format)
+                summary_text = derive_summary(text, n_summary_sentence)
+                if summary_text != '':
+                    summary_writer.write(dict(wikipedia_text_format, text=summary_text))
+
+    logger.info('Wrote {} training and {} evaluation documents.'.format(full_writer.n_written, evaluation_writer.n_written))
+
+
+# sample-keyword.pyでモデルを構築するためのwikipedia文書を取得します。
+TRAINING_DATA_WIKIPEDIA_ARTICLE_NAMES = [
+    ### 映画 ###
+    ("スター・ウォーズ エピソード4/新たなる希望", "映画"),
+    ("大脱走", "映画"),
+    ("史上最大の作戦", "映画"),
+    ("遠すぎた橋", "映画"),
+    ("特攻大作戦", "映画"),
+    ("雨に唄えば", "映画"),
+    ("ティファニーで朝食を", "映画"),
+    ("ANNIE / アニー", "映画"),
+    ("ウエスト・サイド物語(映画)", "映画"),
+    ("ブルース・ブラザース", "映画"),
+    ("フットルース(1984年の映画)", "映画"),
+    ("グラン・トリノ", "映画"),
+    ("インディ・ジョーンズ / 魔宮の伝説", "映画"),
+    ("男はつらいよ(映画)", "映画"),
+    ### テレビ番組名 ###
+    ("世界の果てまでイッテQ!", "テレビ番組"),
+    ("日経スペシャル 未来世紀ジパング〜沸騰現場の経済学〜", "テレビ番組"),
+    ("日経スペシャル カンブリア宮殿", "テレビ番組"),
+    ("開運!なんでも鑑定団", "テレビ番組"),
+    ("真田丸 (NHK大河ドラマ)", "テレビ番組"),
+    ("坂の上の雲 (テレビドラマ)", "テレビ番組"),
+    ("秘密のケンミンSHOW", "テレビ番組"),
+    ("和風総本家", "テレビ番組"),
+    ("ぴったんこカン・カン", "テレビ番組"),
+    ("アナザースカイ", "テレビ番組"),
+    ("世界の車窓から", "テレビ番組"),
+    ("ぶらり途中下車の旅", "テレビ番組"),
+    ("満天☆青空レストラン", "テレビ番組"),
+    ("ザ!鉄腕!DASH!!", "テレビ番組"),
+    ("金曜ロードSHOW!", "テレビ番組"),
+    ### アルコール類 ###
+    ("第三のビール", "アルコール"),
+    ("ウイスキー", "アルコール"),
+    ("ブランデー", "アルコール"),
+    ("バーボン・ウイスキー", "アルコール"),
+    ("日本酒", "アルコール"),
+    ("焼酎", "アルコール"),
+    ("竹鶴 (ウイスキー)", "アルコール"),
+    ("ブラックニッカ", "アルコール"),
+    ("ワイルドターキー", "アルコール"),
+    ("オールド・パー", "アルコール"),
+    ("旭酒造 (山口県)", "アルコール"),
+    ### 外食・店舗 ###
+    ("大戸屋ホールディングス", "レストラン"),
+    ("マクドナルド", "レストラン"),
+    ("昭和お好み焼き劇場うまいもん横丁", "レストラン"),
+    ("立ち食いそば・うどん店", "レストラン"),
+    ("ジョナサン (ファミリーレストラン)", "レストラン"),
+    ("バーミヤン (レストランチェーン)", "レストラン"),
+    ("すかいらーく", "レストラン"),
+    ("ロイヤルホスト", "レストラン"),
+    ("ハイデイ日高", "レストラン"),
+    ("名代富士そば", "レストラン"),
+    ("阪急そば", "レストラン"),
+    ("餃子の王将", "レストラン"),
+    ("ぎょうざの満洲", "レストラン"),
+    ("ドミノ・ピザ", "レストラン"),
+    ### バイク ###
+    ("ヤマハ・SR", "バイク"),
+    ("ホンダ・アフリカツイン", "バイク"),
+    ("ホンダ・VTR", "バイク"),
+    ("ホンダ・VTR1000F", "バイク"),
+    ("ホンダ・VFR", "バイク"),
+    ("ヤマハ・TZR", "バイク"),
+    ("ヤマハ・XT1200Zスーパーテネレ", "バイク"),
+    ("ホンダ・CB400スーパーフォア", "バイク"),
+    ("カワサキ・Dトラッカー", "バイク"),
+    ("スズキ・バンディット400", "バイク"),
+    ("スズキ・GSX1300Rハヤブサ", "バイク"),
+    ("スズキ・アドレス", "バイク"),
+    ("ホンダ・リード", "バイク"),
+    ### スマートフォン ###
+    ("iPhone 6", "スマートフォン"),
+    ("Xperia", "スマートフォン"),
+    ("Nokia E71", "スマートフォン"),
+    ("SoftBank 705NK", "スマートフォン"),
+    ("Google Nexus", "スマートフォン"),
+    ("Samsung Galaxy", "スマートフォン"),
+    ("AQUOS PHONE", "スマートフォン"),
+    ("HTV32", "スマートフォン"),
+    ("BlackBerry Bold", "スマートフォン"),
+    ("LGV34", "スマートフォン"),
+    ("F1100", "スマートフォン"),
+    ("IS06", "スマートフォン"),
+    ### PC ###
+    ("VAIO", "パソコン"),
+    ("Let'snote", "パソコン"),
+    ("MacBook", "パソコン"),
+    ("iMac", "パソコン"),
+    ("LAVIE", "パソコン"),
+    ("ThinkPad", "パソコン"),
+    ("ダイナブック (東芝)", "パソコン"),
+    ("Inter Link", "パソコン"),
+    ("カシオペア (コンピュータ)", "パソコン"),
+    ("チャンドラ2", "パソコン"),
+    ("Dell Inspiron", "パソコン"),
+    ("Compaq Portable", "パソコン"),
+    ### レジャー施設 ###
+    ("ユニバーサル・スタジオ・ジャパン", "レジャー施設"),
+    ("志摩スペイン村", "レジャー施設"),
+    ("リトルワールド", "レジャー施設"),
+    ("スペースワールド", "レジャー施設"),
+    ("ムツゴロウ動物王国", "レジャー施設"),
+    ### 教育関係 ###
+    ("奈良先端科学技術大学院大学", "教育"),
+    ("Z会", "教育"),
+    ("東進ハイスクール", "教育"),
+    ("大学院大学", "教育"),
+    ("日本ジャーナリスト専門学校", "教育"),
+    ("HAL (専門学校)", "教育"),
+    ("日本大学東北高等学校", "教育"),
+    ("PL学園中学校・高等学校", "教育"),
+    ("学習院初等科", "教育"),
+]
+
+# sample_category_classificaion.pyで評価として使うwikipedia文書を用意します。
+# 基本的に1カテゴリに3文書を用意します。
+# モデルの強さを見極めるために3つのうち、1つはモデル構築のための文書とは内容が大きくかけはなれた、けど同じカテゴリ、という文書を混入します。
+EVALUATION_DATA_WIKIPEDIA_ARTICLE_NAMES = [
+    ### 映画 ###
+    ("スター・ウォーズ/フォースの覚醒", "映画"),
+    ("タイタニック (1997年の映画)", "映画"),
+    ("おとうと (2010年の映画)", "映画"),
+    ### テレビ番組名 ###
+    ("天才!志村どうぶつ園", "テレビ番組"),
+    ("はいすくーる落書", "テレビ番組"),
+    ("ブリテンズ・ゴット・タレント", "テレビ番組"),
+    ### 外食・店舗 ###
+    ("吉野家", "レストラン"),
+    ("壱番屋", "レストラン"),
+    ("かんだやぶそば", "レストラン"),
+    ### バイク ###
+    ("ホンダ・カブ", "バイク"),
+    ("カワサキ・W", "バイク"),
+    ("鈴鹿8時間耐久ロードレース", "バイク"),
+    ### PC ###
+    ("MacBook Air", "パソコン"),
+    ("リブレット", "パソコン"),
+    ("ぴゅう太", "パソコン"),
+    ### レジャー施設 ###
+    ("生駒山上遊園地", "レジャー施設"),
+    ("ディズニーランド", "レジャー施設"),
+    ("鷲羽山ハイランド", "レジャー施設"),
+    ### 教育関係 ###
+    ("イートン・カレッジ", "教育"),
+    ("東京大学", "教育"),
+    ("国立情報学研究所", "教育"),
+]
 
 
 if __name__ == '__main__':
+    ### --dumpを指定すると、wikipediaにアクセスせずにローカルのXMLダンプから取り出します ###
+    arg_parser = argparse.ArgumentParser(description='wikipediaからサンプルテキストを取得します。')
+    arg_parser.add_argument('--dump', dest='path_dump', default=None,
+                            help='jawiki-*-pages-articles.xml.bz2へのパス')
+    arg_parser.add_argument('--n-process', dest='n_process', type=int, default=None,
+                            help='--dump利用時のプロセス数。省略時はCPUコア数')
+    arg_parser.add_argument('--dump-index', dest='path_index', default=None,
+                            help='--dumpがmultistreamダンプの場合のインデックス(jawiki-*-pages-articles-multistream-index.txt.bz2)へのパス')
+    args = arg_parser.parse_args()
+
     path_extracted_wikipedia_dir = './wikipedia_data'
-    # sample-keyword.pyでモデルを構築するためのwikipedia文書を取得します。
-    training_data_wikipedia_article_names = [
-        ### 映画 ###
-        ("スター・ウォーズ エピソード4/新たなる希望", "映画"),
-        ("大脱走", "映画"),
-        ("史上最大の作戦", "映画"),
-        ("遠すぎた橋", "映画"),
-        ("特攻大作戦", "映画"),
-        ("雨に唄えば", "映画"),
-        ("ティファニーで朝食を", "映画"),
-        ("ANNIE / アニー", "映画"),
-        ("ウエスト・サイド物語(映画)", "映画"),
-        ("ブルース・ブラザース", "映画"),
-        ("フットルース(1984年の映画)", "映画"),
-        ("グラン・トリノ", "映画"),
-        ("インディ・ジョーンズ / 魔宮の伝説", "映画"),
-        ("男はつらいよ(映画)", "映画"),
-        ### テレビ番組名 ###
-        ("世界の果てまでイッテQ!", "テレビ番組"),
-        ("日経スペシャル 未来世紀ジパング〜沸騰現場の経済学〜", "テレビ番組"),
-        ("日経スペシャル カンブリア宮殿", "テレビ番組"),
-        ("開運!なんでも鑑定団", "テレビ番組"),
-        ("真田丸 (NHK大河ドラマ)", "テレビ番組"),
-        ("坂の上の雲 (テレビドラマ)", "テレビ番組"),
-        ("秘密のケンミンSHOW", "テレビ番組"),
-        ("和風総本家", "テレビ番組"),
-        ("ぴったんこカン・カン", "テレビ番組"),
-        ("アナザースカイ", "テレビ番組"),
-        ("世界の車窓から", "テレビ番組"),
-        ("ぶらり途中下車の旅", "テレビ番組"),
-        ("満天☆青空レストラン", "テレビ番組"),
-        ("ザ!鉄腕!DASH!!", "テレビ番組"),
-        ("金曜ロードSHOW!", "テレビ番組"),
-        ### アルコール類 ###
-        ("第三のビール", "アルコール"),
-        ("ウイスキー", "アルコール"),
-        ("ブランデー", "アルコール"),
-        ("バーボン・ウイスキー", "アルコール"),
-        ("日本酒", "アルコール"),
-        ("焼酎", "アルコール"),
-        ("竹鶴 (ウイスキー)", "アルコール"),
-        ("ブラックニッカ", "アルコール"),
-        ("ワイルドターキー", "アルコール"),
-        ("オールド・パー", "アルコール"),
-        ("旭酒造 (山口県)", "アルコール"),
-        ### 外食・店舗 ###
-        ("大戸屋ホールディングス", "レストラン"),
-        ("マクドナルド", "レストラン"),
-        ("昭和お好み焼き劇場うまいもん横丁", "レストラン"),
-        ("立ち食いそば・うどん店", "レストラン"),
-        ("ジョナサン (ファミリーレストラン)", "レストラン"),
-        ("バーミヤン (レストランチェーン)", "レストラン"),
-        ("すかいらーく", "レストラン"),
-        ("ロイヤルホスト", "レストラン"),
-        ("ハイデイ日高", "レストラン"),
-        ("名代富士そば", "レストラン"),
-        ("阪急そば", "レストラン"),
-        ("餃子の王将", "レストラン"),
-        ("ぎょうざの満洲", "レストラン"),
-        ("ドミノ・ピザ", "レストラン"),
-        ### バイク ###
-        ("ヤマハ・SR", "バイク"),
-        ("ホンダ・アフリカツイン", "バイク"),
-        ("ホンダ・VTR", "バイク"),
-        ("ホンダ・VTR1000F", "バイク"),
-        ("ホンダ・VFR", "バイク"),
-        ("ヤマハ・TZR", "バイク"),
-        ("ヤマハ・XT1200Zスーパーテネレ", "バイク"),
-        ("ホンダ・CB400スーパーフォア", "バイク"),
-        ("カワサキ・Dトラッカー", "バイク"),
-        ("スズキ・バンディット400", "バイク"),
-        ("スズキ・GSX1300Rハヤブサ", "バイク"),
-        ("スズキ・アドレス", "バイク"),
-        ("ホンダ・リード", "バイク"),
-        ### スマートフォン ###
-        ("iPhone 6", "スマートフォン"),
-        ("Xperia", "スマートフォン"),
-        ("Nokia E71", "スマートフォン"),
-        ("SoftBank 705NK", "スマートフォン"),
-        ("Google Nexus", "スマートフォン"),
-        ("Samsung Galaxy", "スマートフォン"),
-        ("AQUOS PHONE", "スマートフォン"),
-        ("HTV32", "スマートフォン"),
-        ("BlackBerry Bold", "スマートフォン"),
-        ("LGV34", "スマートフォン"),
-        ("F1100", "スマートフォン"),
-        ("IS06", "スマートフォン"),
-        ### PC ###
-        ("VAIO", "パソコン"),
-        ("Let'snote", "パソコン"),
-        ("MacBook", "パソコン"),
-        ("iMac", "パソコン"),
-        ("LAVIE", "パソコン"),
-        ("ThinkPad", "パソコン"),
-        ("ダイナブック (東芝)", "パソコン"),
-        ("Inter Link", "パソコン"),
-        ("カシオペア (コンピュータ)", "パソコン"),
-        ("チャンドラ2", "パソコン"),
-        ("Dell Inspiron", "パソコン"),
-        ("Compaq Portable", "パソコン"),
-        ### レジャー施設 ###
-        ("ユニバーサル・スタジオ・ジャパン", "レジャー施設"),
-        ("志摩スペイン村", "レジャー施設"),
-        ("リトルワールド", "レジャー施設"),
-        ("スペースワールド", "レジャー施設"),
-        ("ムツゴロウ動物王国", "レジャー施設"),
-        ### 教育関係 ###
-        ("奈良先端科学技術大学院大学", "教育"),
-        ("Z会", "教育"),
-        ("東進ハイスクール", "教育"),
-        ("大学院大学", "教育"),
-        ("日本ジャーナリスト専門学校", "教育"),
-        ("HAL (専門学校)", "教育"),
-        ("日本大学東北高等学校", "教育"),
-        ("PL学園中学校・高等学校", "教育"),
-        ("学習院初等科", "教育"),
-    ]
-
-    # sample_category_classificaion.pyで評価として使うwikipedia文書を用意します。
-    # 基本的に1カテゴリに3文書を用意します。
-    # モデルの強さを見極めるために3つのうち、1つはモデル構築のための文書とは内容が大きくかけはなれた、けど同じカテゴリ、という文書を混入します。
-    evaluation_data_wikipedia_article_names = [
-        ### 映画 ###
-        ("スター・ウォーズ/フォースの覚醒", "映画"),
-        ("タイタニック (1997年の映画)", "映画"),
-        ("おとうと (2010年の映画)", "映画"),
-        ### テレビ番組名 ###
-        ("天才!志村どうぶつ園", "テレビ番組"),
-        ("はいすくーる落書", "テレビ番組"),
-        ("ブリテンズ・ゴット・タレント", "テレビ番組"),
-        ### 外食・店舗 ###
-        ("吉野家", "レストラン"),
-        ("壱番屋", "レストラン"),
-        ("かんだやぶそば", "レストラン"),
-        ### バイク ###
-        ("ホンダ・カブ", "バイク"),
-        ("カワサキ・W", "バイク"),
-        ("鈴鹿8時間耐久ロードレース", "バイク"),
-        ### PC ###
-        ("MacBook Air", "パソコン"),
-        ("リブレット", "パソコン"),
-        ("ぴゅう太", "パソコン"),
-        ### レジャー施設 ###
-        ("生駒山上遊園地", "レジャー施設"),
-        ("ディズニーランド", "レジャー施設"),
-        ("鷲羽山ハイランド", "レジャー施設"),
-        ### 教育関係 ###
-        ("イートン・カレッジ", "教育"),
-        ("東京大学", "教育"),
-        ("国立情報学研究所", "教育"),
-    ]
-
-    main(path_extracted_wikipedia_dir, training_data_wikipedia_article_names, evaluation_data_wikipedia_article_names)
+
+    if args.path_dump is None:
+        main(path_extracted_wikipedia_dir, TRAINING_DATA_WIKIPEDIA_ARTICLE_NAMES, EVALUATION_DATA_WIKIPEDIA_ARTICLE_NAMES)
+    else:
+        main_from_dump(args.path_dump,
+                       path_extracted_wikipedia_dir,
+                       TRAINING_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                       EVALUATION_DATA_WIKIPEDIA_ARTICLE_NAMES,
+                       n_process=args.n_process,
+                       path_index=args.path_index)
 
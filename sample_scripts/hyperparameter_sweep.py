@@ -0,0 +1,242 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Hashable
+from sample_scripts.corpus_io import Corpus
+from sample_scripts.tokenizer_cache import TokenizationCache
+from sample_scripts.batch_tokenizer import BatchTokenizer
+from sample_scripts.token_corpus import TokenCorpus
+from sample_scripts.sample_keyword import iter_tokenized_documents, construct_multi_ngram_cached_dicts
+from sample_scripts.multi_method_selection import LabelTermMatrices, score_matrices, METHOD_NAMES, DOCUMENT_FREQUENCY
+from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+from sample_scripts.classification_evaluation import EvaluationResult
+import collections
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""品詞の条件・n-gramの次数・特徴量抽出の手法・評価の順位の組み合わせを総当たりで試します。
+各組み合わせについて、特徴量抽出 -> モデル作成 -> 分類の評価 を実行し、精度と段階ごとの計算時間を1つの表にまとめます。
+上流の設定が同じ組み合わせは、途中の結果を使い回します。
+- 形態素分割は品詞の条件ごとに1回だけ実施します。
+- ラベル x 単語 の行列は (品詞の条件, 次数) ごとに1回だけ作り、手法ごとのワーカーはmemmapで読み込みます。
+- 評価の順位はaccuracy@kを計算するだけなので、分類は1回だけです。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+RESULT_COLUMNS = ('pos_condition', 'n_value', 'selection_method', 'ranking_cutoff',
+                  'accuracy', 'macro_precision', 'macro_recall', 'macro_f1',
+                  'n_features', 'n_records',
+                  'tokenize_seconds', 'count_seconds', 'selection_seconds', 'evaluation_seconds')
+
+
+def _to_model_feature(feature:Any)->Hashable:
+    ### DocumentFeatureSelectionはn-gramをリストで返すので、評価文書のn-gramと同じタプルにする ###
+    return tuple(feature) if isinstance(feature, list) else feature
+
+
+def to_ngram_features(seq_tokens:List[str], n_value:int)->List[Hashable]:
+    """* What you can do
+    - トークン列を、特徴量抽出に使った次数の特徴量に変換します。1は単語、2以上はタプルのn-gramです。
+    """
+    if n_value == 1:
+        return list(seq_tokens)
+    import nltk
+    return list(nltk.ngrams(sequence=seq_tokens, n=n_value))
+
+
+def _run_sweep_point(pos_condition_name:str,
+                     n_value:int,
+                     selection_method:str,
+                     seq_ranking_cutoff:List[int],
+                     path_matrix_dir:str,
+                     path_evaluation_corpus_dir:str,
+                     use_cython:bool)->List[Dict[str, Any]]:
+    """プロセスプールのワーカーで実行される関数です。1つの組み合わせのモデルを作って評価し、順位ごとの結果の行を返します。"""
+    start_time = time.perf_counter()
+    label_term_matrices = LabelTermMatrices.load(path_matrix_dir)
+    seq_score_dict = score_matrices(label_term_matrices, selection_method, use_cython=use_cython).ScoreMatrix2ScoreDictionary()
+    word_score_dictionary = collections.defaultdict(list)
+    for score_object in seq_score_dict:
+        ### DocumentFeatureSelectionのバージョンによって、単語のキーは'word'または'feature'です ###
+        feature = score_object['word'] if 'word' in score_object else score_object['feature']
+        word_score_dictionary[_to_model_feature(feature)].append((score_object['label'], float(score_object['score'])))
+    score_matrix_scorer = ScoreMatrixScorer.from_word_score_dictionary(word_score_dictionary)
+    selection_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    evaluation_corpus = TokenCorpus.load(path_evaluation_corpus_dir)
+    seq_gold_label = []  # type: List[str]
+    seq_document_features = []  # type: List[List[Hashable]]
+    for gold_label, seq_tokens in evaluation_corpus.iter_documents():
+        seq_gold_label.append(gold_label)
+        seq_document_features.append(to_ngram_features(seq_tokens, n_value))
+    evaluation_result = EvaluationResult.from_ranked_results(seq_gold_label,
+                                                             score_matrix_scorer.score_documents(seq_document_features),
+                                                             labels=score_matrix_scorer.labels)
+    macro_average = evaluation_result.get_precision_recall_f1()['macro_average']
+    evaluation_seconds = time.perf_counter() - start_time
+
+    return [{'pos_condition': pos_condition_name,
+             'n_value': n_value,
+             'selection_method': selection_method,
+             'ranking_cutoff': ranking_cutoff,
+             'accuracy': accuracy,
+             'macro_precision': macro_average['precision'],
+             'macro_recall': macro_average['recall'],
+             'macro_f1': macro_average['f1'],
+             'n_features': label_term_matrices.matrices[DOCUMENT_FREQUENCY].shape[1],
+             'n_records': len(seq_score_dict),
+             'selection_seconds': selection_seconds,
+             'evaluation_seconds': evaluation_seconds}
+            for ranking_cutoff, accuracy in sorted(evaluation_result.get_accuracy_at_k(seq_ranking_cutoff).items())]
+
+
+def run_hyperparameter_sweep(seq_training_data:Iterable[Dict[str, Any]],
+                             seq_evaluation_data:Iterable[Dict[str, Any]],
+                             dict_pos_condition:Dict[str, List[Tuple[str, ...]]],
+                             seq_n_value:Iterable[int]=(1, 2),
+                             seq_selection_method:Iterable[str]=('soa', 'pmi', 'tf_idf'),
+                             seq_ranking_cutoff:Iterable[int]=(1, 3),
+                             tokenizer_obj:Any=None,
+                             batch_tokenizer:BatchTokenizer=None,
+                             tokenization_cache:TokenizationCache=None,
+                             n_process:int=None,
+                             use_cython:bool=True,
+                             path_output_dir:str='./models/sweep')->List[Dict[str, Any]]:
+    """* What you can do
+    - 設定の組み合わせを総当たりで評価し、結果の表を path_output_dir/sweep_results.csv と .json に保存します。
+    - 特徴量抽出と評価は、組み合わせごとにプロセスプールで並列に実行します。
+    - 表の1行は (品詞の条件, 次数, 手法, 評価の順位) の組み合わせです。
+        - tokenize_secondsとcount_secondsは、上流の設定が同じ行で共有した段階の計算時間です。
+
+    * Params
+    - seq_training_data, seq_evaluation_data: 'text'と'gold_label'を持つ文書のイテラブル。品詞の条件ごとに読み直すので、corpus_io.Corpusのように何度でも読めるものを渡してください。
+    - dict_pos_condition: {品詞の条件の名前: pos_condition}。名前は結果の表に使います。
+    - tokenizer_obj, batch_tokenizer: 形態素解析機。batch_tokenizerを与えると形態素分割を並列に実行します。
+
+    >>> run_hyperparameter_sweep(Corpus('./wikipedia_data/wikipedia-full.jsonl'),
+    ...                          Corpus('./wikipedia_data/wikipedia-evaluation-full.jsonl'),
+    ...                          dict_pos_condition={'proper_noun': [('名詞', '固有名詞')]},
+    ...                          tokenizer_obj=mecab_obj)
+    """
+    seq_n_value = sorted(set(seq_n_value))
+    seq_selection_method = list(seq_selection_method)
+    seq_ranking_cutoff = sorted(set(seq_ranking_cutoff))
+    for selection_method in seq_selection_method:
+        if selection_method not in METHOD_NAMES:
+            raise ValueError('selection_method must be either of {}. Got {}'.format(METHOD_NAMES, selection_method))
+    if not os.path.exists(path_output_dir):
+        os.makedirs(path_output_dir)
+
+    stage_seconds = {}  # type: Dict[Tuple[Any, ...], float]
+    seq_sweep_point = []  # type: List[Tuple[str, int, str, str, str]]
+    for pos_condition_name, pos_condition in sorted(dict_pos_condition.items()):
+        path_pos_dir = os.path.join(path_output_dir, 'pos={}'.format(pos_condition_name))
+        # ------------------------------------------------------------------------
+        # 形態素分割; 品詞の条件ごとに1回だけ。学習・評価文書ともTokenCorpusに保存し、ワーカーはmmapで読み込む
+        start_time = time.perf_counter()
+        token_corpus = TokenCorpus.from_tokenized_documents(
+            (document_obj['gold_label'], seq_tokens) for document_obj, seq_tokens
+            in iter_tokenized_documents(tokenizer_obj, seq_training_data, pos_condition,
+                                        tokenization_cache=tokenization_cache, batch_tokenizer=batch_tokenizer))
+        evaluation_corpus = TokenCorpus.from_tokenized_documents(
+            (document_obj['gold_label'], seq_tokens) for document_obj, seq_tokens
+            in iter_tokenized_documents(tokenizer_obj, seq_evaluation_data, pos_condition,
+                                        tokenization_cache=tokenization_cache, batch_tokenizer=batch_tokenizer))
+        path_evaluation_corpus_dir = os.path.join(path_pos_dir, 'evaluation_corpus')
+        evaluation_corpus.save(path_evaluation_corpus_dir)
+        stage_seconds[(pos_condition_name,)] = time.perf_counter() - start_time
+        logger.info('Tokenized pos_condition={} N(training)={}, N(evaluation)={} in {:.2f} sec'.format(
+            pos_condition_name, len(token_corpus), len(evaluation_corpus), stage_seconds[(pos_condition_name,)]))
+        # ------------------------------------------------------------------------
+        # ラベル x 単語 の行列; (品詞の条件, 次数)ごとに1回だけ作り、全ての手法で使い回す
+        start_time = time.perf_counter()
+        ngram_cached_dicts = construct_multi_ngram_cached_dicts(tokenizer_obj=tokenizer_obj,
+                                                                seq_text_data=token_corpus,
+                                                                pos_condition=pos_condition,
+                                                                seq_n_value=seq_n_value)
+        count_start_seconds = time.perf_counter() - start_time
+        for n_value in seq_n_value:
+            start_time = time.perf_counter()
+            path_matrix_dir = os.path.join(path_pos_dir, 'n={}'.format(n_value), 'matrices')
+            LabelTermMatrices.from_label_documents(ngram_cached_dicts[n_value]).save(path_matrix_dir)
+            ### n-gramの抽出は全ての次数でまとめて1回なので、次数の数で割って配分する ###
+            stage_seconds[(pos_condition_name, n_value)] = time.perf_counter() - start_time + count_start_seconds / len(seq_n_value)
+            for selection_method in seq_selection_method:
+                seq_sweep_point.append((pos_condition_name, n_value, selection_method, path_matrix_dir, path_evaluation_corpus_dir))
+        del token_corpus, evaluation_corpus, ngram_cached_dicts
+
+    # ------------------------------------------------------------------------
+    # 特徴量抽出 -> モデル作成 -> 評価; 組み合わせごとに並列に実行する
+    if n_process is None:
+        n_process = min(len(seq_sweep_point), multiprocessing.cpu_count())
+    logger.info('Running {} sweep points with {} processes.'.format(len(seq_sweep_point), n_process))
+    pool = multiprocessing.Pool(processes=max(n_process, 1))
+    try:
+        seq_async_result = [pool.apply_async(_run_sweep_point, (pos_condition_name, n_value, selection_method, seq_ranking_cutoff,
+                                                                path_matrix_dir, path_evaluation_corpus_dir, use_cython))
+                            for pos_condition_name, n_value, selection_method, path_matrix_dir, path_evaluation_corpus_dir
+                            in seq_sweep_point]
+        seq_result_row = list(itertools.chain.from_iterable(async_result.get() for async_result in seq_async_result))
+    finally:
+        pool.close()
+        pool.join()
+
+    for result_row in seq_result_row:
+        result_row['tokenize_seconds'] = stage_seconds[(result_row['pos_condition'],)]
+        result_row['count_seconds'] = stage_seconds[(result_row['pos_condition'], result_row['n_value'])]
+    seq_result_row.sort(key=lambda result_row: (-result_row['accuracy'], -result_row['macro_f1'], result_row['pos_condition'],
+                                                result_row['n_value'], result_row['selection_method'], result_row['ranking_cutoff']))
+    save_sweep_results(seq_result_row, path_output_dir)
+    return seq_result_row
+
+
+def save_sweep_results(seq_result_row:List[Dict[str, Any]], path_output_dir:str)->None:
+    """* What you can do
+    - 結果の表をcsvとjsonで保存し、ログに出します。
+    """
+    with open(os.path.join(path_output_dir, 'sweep_results.csv'), 'w', newline='') as f:
+        csv_writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        csv_writer.writeheader()
+        csv_writer.writerows(seq_result_row)
+    with open(os.path.join(path_output_dir, 'sweep_results.json'), 'w') as f:
+        f.write(json.dumps(seq_result_row, ensure_ascii=False, indent=4))
+
+    logger.info(msg='='*40)
+    for result_row in seq_result_row:
+        logger.info(msg='pos={pos_condition} n={n_value} method={selection_method} rank={ranking_cutoff}; '
+                        'accuracy={accuracy:.3f} macro_f1={macro_f1:.3f} '
+                        'tokenize={tokenize_seconds:.2f}s count={count_seconds:.2f}s '
+                        'selection={selection_seconds:.2f}s evaluation={evaluation_seconds:.2f}s'.format(**result_row))
+
+
+if __name__ == '__main__':
+    from JapaneseTokenizer import MecabWrapper
+    tokenizer_kwargs = {'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}
+    mecab_obj = MecabWrapper(**tokenizer_kwargs)
+    ### 試したい品詞の条件を名前つきで定義する ###
+    dict_pos_condition = {
+        'proper_noun_verb_adjective': [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')],
+        'proper_noun': [('名詞', '固有名詞')],
+        'noun': [('名詞', )],
+    }
+
+    with TokenizationCache('./wikipedia_data/tokenization_cache.sqlite3') as tokenization_cache, \
+            BatchTokenizer(tokenizer_kwargs=tokenizer_kwargs) as batch_tokenizer:
+        run_hyperparameter_sweep(seq_training_data=Corpus('./wikipedia_data/wikipedia-full.jsonl'),
+                                 seq_evaluation_data=Corpus('./wikipedia_data/wikipedia-evaluation-full.jsonl'),
+                                 dict_pos_condition=dict_pos_condition,
+                                 seq_n_value=(1, 2),
+                                 seq_selection_method=('soa', 'pmi', 'tf_idf'),
+                                 seq_ranking_cutoff=(1, 3),
+                                 tokenizer_obj=mecab_obj,
+                                 batch_tokenizer=batch_tokenizer,
+                                 tokenization_cache=tokenization_cache)
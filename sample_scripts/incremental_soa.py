@@ -0,0 +1,197 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+import json
+import logging
+import math
+import os
+import tempfile
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""文書を追加・削除しながら、SOAスコアを差分で更新します。
+DocumentFeatureSelectionは文書が増えるたびに、全ラベル x 全単語のスコア行列を作り直します。
+SOAは ラベルごとの文書数 と 単語 x ラベルの文書頻度 だけで決まるので、これらの集計を保持しておけば、
+文書を追加・削除したときに計算し直すのは、その文書に含まれる単語のスコアだけで済みます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+ZERO_SCORE_TOLERANCE = 1e-12
+
+
+def _to_json_feature(feature:Hashable)->Any:
+    return list(feature) if isinstance(feature, tuple) else feature
+
+
+def _from_json_feature(feature:Any)->Hashable:
+    return tuple(feature) if isinstance(feature, list) else feature
+
+
+class IncrementalSOAScorer(object):
+    """* What you can do
+    - ラベル x 単語の文書頻度を保持し、SOAスコアを差分で計算します。
+    - スコアはDocumentFeatureSelectionのSOA(use_cython=True)と、浮動小数点の丸め誤差の範囲で同じ値です。
+        - SOA(w, e) = log2( df(w, e) * N(not e) / (N(e) * df(w, not e)) )
+        - df(w, e)はラベルeで単語wを含む文書数, N(e)はラベルeの文書数。いずれかが0の場合は0です。
+    - 上の式は log2(df(w, e)) - log2(df(w, not e)) + log2(N(not e)) - log2(N(e)) と分解できます。
+        - 前半(単語の項)は、その単語を含む文書が追加・削除されたときだけ計算し直します。
+        - 後半(ラベルの項)はラベル数分の計算なので、出力するときに毎回計算します。
+        - 2つの項を別々に計算して足すので、1つの式で計算した値と最後の桁まで一致するとは限りません。
+
+    >>> scorer = IncrementalSOAScorer()
+    >>> scorer.add_documents(cached_dict.items())
+    >>> scorer.save('./models/soa_scorer_state.json')
+    >>> scorer = IncrementalSOAScorer.load('./models/soa_scorer_state.json')
+    >>> scorer.add_document('映画', ['スターウォーズ', 'おもしろい'])
+    >>> seq_score_dict = scorer.get_score_records()
+    """
+    def __init__(self):
+        ### ラベル -> 文書数 ###
+        self.label_document_count = {}  # type: Dict[str, int]
+        ### 単語 -> {ラベル -> 単語を含む文書数} ###
+        self.document_frequency = {}  # type: Dict[Hashable, Dict[str, int]]
+        ### 単語 -> {ラベル -> 単語の項}; 単語の項が計算できない(df(w, e) = 0 または df(w, not e) = 0)ラベルは含まない ###
+        self.term_scores = {}  # type: Dict[Hashable, Dict[str, float]]
+        ### 単語の項を計算し直す必要がある単語 ###
+        self._dirty_words = set()
+
+    @property
+    def n_documents(self)->int:
+        return sum(self.label_document_count.values())
+
+    def _update_document(self, label_name:str, seq_features:Iterable[Hashable], delta:int)->None:
+        document_count = self.label_document_count.get(label_name, 0) + delta
+        if document_count < 0:
+            raise ValueError('Label {} has no document to remove.'.format(label_name))
+        if document_count == 0:
+            del self.label_document_count[label_name]
+        else:
+            self.label_document_count[label_name] = document_count
+
+        ### SOAは文書頻度を使うので、1文書内で重複した単語は1回だけ数える ###
+        for feature in set(seq_features):
+            label_frequency = self.document_frequency.setdefault(feature, {})
+            frequency = label_frequency.get(label_name, 0) + delta
+            if frequency < 0:
+                raise ValueError('Feature {} is not in any document of label {}.'.format(feature, label_name))
+            if frequency == 0:
+                label_frequency.pop(label_name, None)
+                if len(label_frequency) == 0:
+                    del self.document_frequency[feature]
+            else:
+                label_frequency[label_name] = frequency
+            self._dirty_words.add(feature)
+
+    def add_document(self, label_name:str, seq_features:Iterable[Hashable])->None:
+        self._update_document(label_name, seq_features, delta=1)
+
+    def remove_document(self, label_name:str, seq_features:Iterable[Hashable])->None:
+        """* What you can do
+        - add_document()で追加した文書を取り除きます。追加したときと同じ特徴量を渡してください。
+        """
+        self._update_document(label_name, seq_features, delta=-1)
+
+    def add_documents(self, seq_label_documents:Iterable[Tuple[str, Iterable[Iterable[Hashable]]]])->None:
+        """* What you can do
+        - {'ラベル名': [ [特徴量] ]}.items() の形で、まとめて文書を追加します。cached dictの.items()をそのまま渡せます。
+        """
+        for label_name, seq_document in seq_label_documents:
+            for seq_features in seq_document:
+                self.add_document(label_name, seq_features)
+
+    def _update_term_scores(self)->None:
+        for feature in self._dirty_words:
+            label_frequency = self.document_frequency.get(feature)
+            if label_frequency is None:
+                self.term_scores.pop(feature, None)
+                continue
+            total_frequency = sum(label_frequency.values())
+            label_term_score = {}
+            for label_name, frequency in label_frequency.items():
+                frequency_not_label = total_frequency - frequency
+                if frequency_not_label > 0:
+                    label_term_score[label_name] = math.log(frequency, 2) - math.log(frequency_not_label, 2)
+            if len(label_term_score) == 0:
+                self.term_scores.pop(feature, None)
+            else:
+                self.term_scores[feature] = label_term_score
+        logger.debug('Updated term scores of {} words.'.format(len(self._dirty_words)))
+        self._dirty_words = set()
+
+    def _get_label_scores(self)->Dict[str, float]:
+        n_documents = self.n_documents
+        label_scores = {}
+        for label_name, document_count in self.label_document_count.items():
+            if n_documents - document_count > 0:
+                label_scores[label_name] = math.log(n_documents - document_count, 2) - math.log(document_count, 2)
+        return label_scores
+
+    def get_score(self, feature:Hashable, label_name:str)->float:
+        self._update_term_scores()
+        label_scores = self._get_label_scores()
+        term_score = self.term_scores.get(feature, {}).get(label_name)
+        if term_score is None or label_name not in label_scores:
+            return 0.0
+        score = term_score + label_scores[label_name]
+        return score if abs(score) >= ZERO_SCORE_TOLERANCE else 0.0
+
+    def iter_score_records(self)->Iterator[Dict[str, Any]]:
+        """* What you can do
+        - スコアが0でない (ラベル, 単語) の組を、ScoreMatrix2ScoreDictionary()と同じ形のレコードでyieldします。順番は不定です。
+        """
+        self._update_term_scores()
+        label_scores = self._get_label_scores()
+        for feature, label_term_score in self.term_scores.items():
+            label_frequency = self.document_frequency[feature]
+            for label_name, term_score in label_term_score.items():
+                if label_name not in label_scores:
+                    continue
+                score = term_score + label_scores[label_name]
+                ### 分解して足し合わせるので、本来0のスコアが丸め誤差で0にならないことがある ###
+                if abs(score) < ZERO_SCORE_TOLERANCE:
+                    continue
+                yield {'label': label_name,
+                       'word': feature,
+                       'score': score,
+                       'frequency': label_frequency[label_name]}
+
+    def get_score_records(self, sort_desc:bool=True)->List[Dict[str, Any]]:
+        """* What you can do
+        - run_feature_selection()の戻り値と同じ形の、スコアのレコードのリストを返します。
+        >>> [{"label": "レストラン", "score": 0.02942301705479622, "word": "お金", "frequency": 3}]
+        """
+        seq_score_record = list(self.iter_score_records())
+        if sort_desc:
+            seq_score_record.sort(key=lambda score_record: score_record['score'], reverse=True)
+        return seq_score_record
+
+    def save(self, path_state_file:str)->None:
+        """* What you can do
+        - 集計と単語の項をjsonで保存します。一時ファイルに書いてから置き換えるので、途中で落ちても前回の保存内容は壊れません。
+        """
+        self._update_term_scores()
+        state_obj = {
+            'label_document_count': self.label_document_count,
+            'document_frequency': [[_to_json_feature(feature), label_frequency, self.term_scores.get(feature, {})]
+                                   for feature, label_frequency in self.document_frequency.items()]
+        }
+        path_state_dir = os.path.dirname(os.path.abspath(path_state_file))
+        file_descriptor, path_tmp = tempfile.mkstemp(dir=path_state_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as f:
+            f.write(json.dumps(state_obj, ensure_ascii=False))
+        os.replace(path_tmp, path_state_file)
+
+    @classmethod
+    def load(cls, path_state_file:str)->'IncrementalSOAScorer':
+        with open(path_state_file, 'r') as f:
+            state_obj = json.load(f)
+        scorer = cls()
+        scorer.label_document_count = state_obj['label_document_count']
+        for feature, label_frequency, label_term_score in state_obj['document_frequency']:
+            feature = _from_json_feature(feature)
+            scorer.document_frequency[feature] = label_frequency
+            if len(label_term_score) > 0:
+                scorer.term_scores[feature] = label_term_score
+        return scorer
@@ -0,0 +1,299 @@
+from typing import List, Tuple, Dict, Union, Any, Optional
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+### import時にルートロガーのレベルを変えないように、モジュールのロガーを使う ###
+logger = logging.getLogger(__name__)
+
+"""処理の段階(取得・形態素分割・cached dictの構築・特徴量抽出・スコアリング)ごとに、計算時間・件数・メモリ使用量を集計します。
+span()で囲んだ区間の時間と、increment()で数えた件数(文書数、トークン数、キャッシュヒット数、書き込んだバイト数など)を集計し、
+JSONかPrometheusのテキスト形式で書き出せます。
+無効の間(デフォルト)は、span()は何もしない共有オブジェクトを返し、increment()はすぐにreturnするので、ほとんどコストがかかりません。
+環境変数 SAMPLE_SCRIPTS_METRICS に出力先(.jsonまたは.prom)を指定すると、import時に有効になり、プロセスの終了時に書き出します。
+SAMPLE_SCRIPTS_TRACE_MEMORY=1 を指定すると、tracemallocで区間ごとのピークメモリも計測します。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+PROMETHEUS_PREFIX = 'sample_scripts'
+ENV_METRICS_OUTPUT = 'SAMPLE_SCRIPTS_METRICS'
+ENV_TRACE_MEMORY = 'SAMPLE_SCRIPTS_TRACE_MEMORY'
+
+
+class SpanStatistics(object):
+    """* What you can do
+    - 同じ名前の区間の、実行回数・合計時間・最大時間・ピークメモリを保持します。
+    """
+    def __init__(self):
+        self.n_calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.peak_memory_bytes = None  # type: Optional[int]
+
+    def add(self, elapsed_seconds:float, peak_memory_bytes:Optional[int])->None:
+        self.n_calls += 1
+        self.total_seconds += elapsed_seconds
+        self.max_seconds = max(self.max_seconds, elapsed_seconds)
+        if peak_memory_bytes is not None:
+            self.peak_memory_bytes = max(self.peak_memory_bytes or 0, peak_memory_bytes)
+
+    def to_dict(self)->Dict[str, Any]:
+        return {'n_calls': self.n_calls,
+                'total_seconds': self.total_seconds,
+                'max_seconds': self.max_seconds,
+                'peak_memory_bytes': self.peak_memory_bytes}
+
+
+class _NullSpan(object):
+    """無効なときにspan()が返す、何もしないコンテキストマネージャです。"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    def __init__(self, registry:'MetricsRegistry', name:str):
+        self.registry = registry
+        self.name = name
+        self.start_time = 0.0
+        self.start_memory_bytes = 0
+        self.peak_memory_bytes = 0
+
+    def __enter__(self):
+        if self.registry.is_trace_memory:
+            self.registry._push_memory_span(self)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed_seconds = time.perf_counter() - self.start_time
+        peak_memory_bytes = None
+        if self.registry.is_trace_memory:
+            peak_memory_bytes = self.registry._pop_memory_span(self)
+        self.registry._record_span(self.name, elapsed_seconds, peak_memory_bytes)
+        return False
+
+
+class MetricsRegistry(object):
+    """* What you can do
+    - 区間の時間と件数のカウンタを集計します。複数のスレッドから使えます。
+    - 通常はモジュールのspan(), increment()を使います。このクラスを直接使うのは、集計を分けたい場合です。
+
+    * Tips
+    - ピークメモリは、区間に入った時点からの増加量です。tracemallocは全スレッド共通なので、並列に動く区間の分も含みます。
+    - tracemalloc.reset_peak()のないPython(3.8以前)では、tracemallocを開始してからのピークを使うので、値は上限になります。
+
+    >>> registry = MetricsRegistry()
+    >>> registry.enable()
+    >>> with registry.span('tokenize'):
+    ...     registry.increment('tokenize.documents')
+    >>> registry.to_dict()['counters']
+    {'tokenize.documents': 1}
+    """
+    def __init__(self):
+        self.is_enabled = False
+        self.is_trace_memory = False
+        self._lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+        ### reset_peak()はプロセス全体に効くので、開いている区間はスレッドをまたいで1つのリストで持つ ###
+        self._open_memory_spans = []  # type: List[_Span]
+        self._is_started_tracemalloc = False
+        self.span_statistics = {}  # type: Dict[str, SpanStatistics]
+        self.counters = {}  # type: Dict[str, Union[int, float]]
+
+    def enable(self, is_trace_memory:bool=False)->None:
+        if is_trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._is_started_tracemalloc = True
+        self.is_trace_memory = is_trace_memory
+        self.is_enabled = True
+
+    def disable(self)->None:
+        self.is_enabled = False
+        self.is_trace_memory = False
+        if self._is_started_tracemalloc:
+            tracemalloc.stop()
+            self._is_started_tracemalloc = False
+
+    def reset(self)->None:
+        with self._lock:
+            self.span_statistics = {}
+            self.counters = {}
+
+    def span(self, name:str)->Union[_Span, _NullSpan]:
+        """* What you can do
+        - with構文で囲んだ区間の時間(と有効ならピークメモリ)を、nameごとに集計します。
+        """
+        if not self.is_enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def increment(self, name:str, value:Union[int, float]=1)->None:
+        if not self.is_enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _record_span(self, name:str, elapsed_seconds:float, peak_memory_bytes:Optional[int])->None:
+        with self._lock:
+            if name not in self.span_statistics:
+                self.span_statistics[name] = SpanStatistics()
+            self.span_statistics[name].add(elapsed_seconds, peak_memory_bytes)
+
+    def _observe_peak(self)->None:
+        ### reset_peak()で消える前に、今のピークを開いている区間すべてに反映する ###
+        if not hasattr(tracemalloc, 'reset_peak'):
+            return
+        _, peak_traced_bytes = tracemalloc.get_traced_memory()
+        for span_obj in self._open_memory_spans:
+            span_obj.peak_memory_bytes = max(span_obj.peak_memory_bytes, peak_traced_bytes)
+        tracemalloc.reset_peak()
+
+    def _push_memory_span(self, span_obj:_Span)->None:
+        with self._memory_lock:
+            self._observe_peak()
+            span_obj.start_memory_bytes, span_obj.peak_memory_bytes = tracemalloc.get_traced_memory()
+            self._open_memory_spans.append(span_obj)
+
+    def _pop_memory_span(self, span_obj:_Span)->int:
+        with self._memory_lock:
+            self._observe_peak()
+            _, peak_traced_bytes = tracemalloc.get_traced_memory()
+            span_obj.peak_memory_bytes = max(span_obj.peak_memory_bytes, peak_traced_bytes)
+            self._open_memory_spans.remove(span_obj)
+            return max(span_obj.peak_memory_bytes - span_obj.start_memory_bytes, 0)
+
+    def to_dict(self)->Dict[str, Any]:
+        with self._lock:
+            return {'spans': {name: statistics.to_dict() for name, statistics in sorted(self.span_statistics.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+    def to_json(self)->str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=4)
+
+    def to_prometheus(self)->str:
+        """* What you can do
+        - Prometheusのテキスト形式(exposition format)の文字列を返します。node_exporterのtextfile collectorで読み込めます。
+        """
+        metrics_obj = self.to_dict()
+        seq_line = []
+
+        def add_family(metric_name:str, metric_type:str, help_text:str, seq_sample:List[Tuple[str, str, Any]])->None:
+            if len(seq_sample) == 0:
+                return
+            full_name = '{}_{}'.format(PROMETHEUS_PREFIX, metric_name)
+            seq_line.append('# HELP {} {}'.format(full_name, help_text))
+            seq_line.append('# TYPE {} {}'.format(full_name, metric_type))
+            for label_key, label_value, value in seq_sample:
+                seq_line.append('{}{{{}="{}"}} {}'.format(full_name, label_key, _escape_label_value(label_value), _format_value(value)))
+
+        seq_span = list(metrics_obj['spans'].items())
+        add_family('span_calls_total', 'counter', 'Number of times the span was entered.',
+                   [('span', name, statistics['n_calls']) for name, statistics in seq_span])
+        add_family('span_seconds_total', 'counter', 'Total wall clock seconds spent in the span.',
+                   [('span', name, statistics['total_seconds']) for name, statistics in seq_span])
+        add_family('span_seconds_max', 'gauge', 'Longest single run of the span in seconds.',
+                   [('span', name, statistics['max_seconds']) for name, statistics in seq_span])
+        add_family('span_peak_memory_bytes', 'gauge', 'Peak traced memory growth inside the span.',
+                   [('span', name, statistics['peak_memory_bytes']) for name, statistics in seq_span
+                    if statistics['peak_memory_bytes'] is not None])
+        add_family('counter_total', 'counter', 'Counted events such as documents, tokens, cache hits and bytes written.',
+                   [('name', name, value) for name, value in metrics_obj['counters'].items()])
+        return '\n'.join(seq_line) + '\n'
+
+    def save(self, path_output:str)->None:
+        """* What you can do
+        - 拡張子が.promならPrometheusのテキスト形式、それ以外はJSONで書き出します。書き出しはアトミックです。
+        """
+        content = self.to_prometheus() if path_output.endswith('.prom') else self.to_json()
+        path_output_dir = os.path.dirname(os.path.abspath(path_output))
+        if not os.path.exists(path_output_dir):
+            os.makedirs(path_output_dir)
+        path_temporary = '{}.tmp.{}'.format(path_output, os.getpid())
+        with open(path_temporary, 'w') as f:
+            f.write(content)
+        os.replace(path_temporary, path_output)
+
+
+def _escape_label_value(label_value:str)->str:
+    return label_value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value:Union[int, float])->str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+### モジュール全体で共有する集計 ###
+registry = MetricsRegistry()
+
+
+def span(name:str)->Union[_Span, _NullSpan]:
+    """* What you can do
+    - 区間の時間を計測します。無効な場合は何もしません。
+
+    >>> with span('feature_selection'):
+    ...     run_feature_selection(cached_dict)
+    """
+    if not registry.is_enabled:
+        return _NULL_SPAN
+    return _Span(registry, name)
+
+
+def increment(name:str, value:Union[int, float]=1)->None:
+    """* What you can do
+    - カウンタnameにvalueを足します。無効な場合は何もしません。
+    """
+    if not registry.is_enabled:
+        return
+    registry.increment(name, value)
+
+
+def is_enabled()->bool:
+    return registry.is_enabled
+
+
+def enable(is_trace_memory:bool=False)->None:
+    registry.enable(is_trace_memory=is_trace_memory)
+
+
+def disable()->None:
+    registry.disable()
+
+
+def reset()->None:
+    registry.reset()
+
+
+def get_metrics()->Dict[str, Any]:
+    return registry.to_dict()
+
+
+def save_metrics(path_output:str)->None:
+    registry.save(path_output)
+
+
+def _save_at_exit(path_output:str)->None:
+    try:
+        registry.save(path_output)
+        logger.info('Saved metrics into {}'.format(path_output))
+    except Exception:
+        logger.exception('Failed to save metrics into {}'.format(path_output))
+
+
+if os.environ.get(ENV_METRICS_OUTPUT):
+    enable(is_trace_memory=os.environ.get(ENV_TRACE_MEMORY, '') not in ('', '0'))
+    atexit.register(_save_at_exit, os.environ[ENV_METRICS_OUTPUT])
@@ -0,0 +1,175 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+from collections.abc import Mapping
+import json
+import logging
+import os
+import tempfile
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""ラベル -> 文書リスト のデータを、追記専用のファイルでディスク上に保持します。
+SqliteDictでは cached_dict[label].append() のたびにラベルの文書リスト全体を読み直すので、文書数が増えると2乗の時間がかかります。
+このストアはラベルごとのファイルに1行1文書で追記するだけなので、追記1回あたりの時間は文書数に依存しません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+FILE_NAME_MANIFEST = 'manifest.json'
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.jsonl'
+
+
+def _to_json_features(seq_features:Iterable[Hashable])->List[Any]:
+    ### jsonはタプルを扱えないので、n-gramはリストにして保存する ###
+    return [list(feature) if isinstance(feature, tuple) else feature for feature in seq_features]
+
+
+def _from_json_features(seq_features:List[Any])->List[Hashable]:
+    return [tuple(feature) if isinstance(feature, list) else feature for feature in seq_features]
+
+
+class LabelDocumentStore(Mapping):
+    """* What you can do
+    - {'ラベル名': [ [特徴量] ]} のデータを、ラベルごとのセグメントファイル(JSON Lines)に追記して保存します。
+    - 追記はメモリ上のバッファに溜め、flush_interval文書ごとにまとめてファイルに書き込みます。
+    - 書き込みが終わったら、ラベルごとの文書数とファイルサイズをマニフェストに記録します。マニフェストは一時ファイルを置き換えて更新するので、途中で落ちても前回のflushまでの状態に戻れます。
+    - 読み出し専用のMapping(keys(), items(), [])として振る舞い、1ラベルずつファイルから読みます。
+        - DocumentFeatureSelectionにはdictに変換せず、そのまま渡せます。
+
+    * Params
+    - path_store_dir: 保存先ディレクトリ。Noneの場合は一時ディレクトリを作ります。既存のストアを指定すると続きから追記します。
+    - flush_interval: この文書数を溜めたらファイルに書き込みます。
+
+    >>> store = LabelDocumentStore()
+    >>> store.append('映画', ['スターウォーズ', 'おもしろい'])
+    >>> store.flush()
+    >>> store['映画']
+    [['スターウォーズ', 'おもしろい']]
+    """
+    def __init__(self, path_store_dir:str=None, flush_interval:int=1000):
+        if path_store_dir is None:
+            path_store_dir = tempfile.mkdtemp()
+        if not os.path.exists(path_store_dir):
+            os.makedirs(path_store_dir)
+        self.path_store_dir = path_store_dir
+        self.flush_interval = flush_interval
+        ### ラベル名 -> {'segment': ファイル名, 'n_documents': 文書数, 'n_bytes': 書き込み済みサイズ} ###
+        self.manifest = self._load_manifest()  # type: Dict[str, Dict[str, Any]]
+        self._buffer = {}  # type: Dict[str, List[str]]
+        self._n_buffered = 0
+
+    @property
+    def path_manifest(self)->str:
+        return os.path.join(self.path_store_dir, FILE_NAME_MANIFEST)
+
+    def _load_manifest(self)->Dict[str, Dict[str, Any]]:
+        if os.path.exists(self.path_manifest):
+            with open(self.path_manifest, 'r') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {}
+        ### マニフェストに記録される前に落ちたラベルのセグメントは、次に同じファイル名で作るラベルに混ざるので削除する ###
+        set_segment = set(segment_info['segment'] for segment_info in manifest.values())
+        for file_name in os.listdir(self.path_store_dir):
+            if file_name.startswith(SEGMENT_PREFIX) and file_name.endswith(SEGMENT_SUFFIX) and file_name not in set_segment:
+                logger.warning('Removed uncommitted segment {}'.format(os.path.join(self.path_store_dir, file_name)))
+                os.remove(os.path.join(self.path_store_dir, file_name))
+        ### 前回のflushの途中で書かれた、マニフェストに記録されていない末尾を切り捨てる ###
+        for label_name, segment_info in manifest.items():
+            path_segment = os.path.join(self.path_store_dir, segment_info['segment'])
+            if os.path.getsize(path_segment) > segment_info['n_bytes']:
+                logger.warning('Truncated uncommitted data in {}'.format(path_segment))
+                with open(path_segment, 'r+b') as f:
+                    f.truncate(segment_info['n_bytes'])
+        return manifest
+
+    def _write_manifest(self)->None:
+        file_descriptor, path_tmp = tempfile.mkstemp(dir=self.path_store_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as f:
+            f.write(json.dumps(self.manifest, ensure_ascii=False))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path_tmp, self.path_manifest)
+
+    def append(self, label_name:str, seq_features:Iterable[Hashable])->None:
+        self._buffer.setdefault(label_name, []).append(json.dumps(_to_json_features(seq_features), ensure_ascii=False))
+        self._n_buffered += 1
+        if self._n_buffered >= self.flush_interval:
+            self.flush()
+
+    def extend(self, seq_label_features:Iterable[Tuple[str, Iterable[Hashable]]])->None:
+        for label_name, seq_features in seq_label_features:
+            self.append(label_name, seq_features)
+
+    def flush(self)->None:
+        """* What you can do
+        - バッファの文書をセグメントファイルに追記し、マニフェストを更新します。
+        """
+        if self._n_buffered == 0:
+            return
+        for label_name, seq_line in self._buffer.items():
+            if label_name not in self.manifest:
+                self.manifest[label_name] = {'segment': '{0}{1:05d}{2}'.format(SEGMENT_PREFIX, len(self.manifest), SEGMENT_SUFFIX),
+                                             'n_documents': 0,
+                                             'n_bytes': 0}
+            segment_info = self.manifest[label_name]
+            ### 新しいラベルのセグメントは、残っているファイルがあっても空から書き始める ###
+            file_mode = 'wb' if segment_info['n_bytes'] == 0 else 'ab'
+            with open(os.path.join(self.path_store_dir, segment_info['segment']), file_mode) as f:
+                f.write(''.join(line + '\n' for line in seq_line).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                segment_info['n_bytes'] = f.tell()
+            segment_info['n_documents'] += len(seq_line)
+        self._write_manifest()
+        self._buffer = {}
+        self._n_buffered = 0
+
+    def iter_label_documents(self, label_name:str)->Iterator[List[Hashable]]:
+        """* What you can do
+        - 1ラベルの文書を1つずつyieldします。flush()済みの文書だけが対象です。
+        """
+        segment_info = self.manifest[label_name]
+        n_read = 0
+        with open(os.path.join(self.path_store_dir, segment_info['segment']), 'r', encoding='utf-8') as f:
+            for line in f:
+                if n_read >= segment_info['n_documents']:
+                    break
+                n_read += 1
+                yield _from_json_features(json.loads(line))
+
+    def __getitem__(self, label_name:str)->List[List[Hashable]]:
+        if label_name not in self.manifest:
+            raise KeyError(label_name)
+        return list(self.iter_label_documents(label_name))
+
+    def __contains__(self, label_name:Any)->bool:
+        return label_name in self.manifest
+
+    def __len__(self)->int:
+        return len(self.manifest)
+
+    def __iter__(self)->Iterator[str]:
+        ### items()とvalues()はMappingの実装で、ここで返すラベルごとに__getitem__()で1ラベルずつ読みます ###
+        return iter(list(self.manifest.keys()))
+
+    def count_documents(self, label_name:str)->int:
+        return self.manifest[label_name]['n_documents']
+
+    def to_dict(self)->Dict[str, List[List[Hashable]]]:
+        """* What you can do
+        - 全ラベルの文書をメモリに読み込んで、{'ラベル名': [ [特徴量] ]} のdictにします。
+        """
+        return dict(self.items())
+
+    def close(self)->None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,278 @@
+from DocumentFeatureSelection.models import ScoredResultObject
+from DocumentFeatureSelection.soa.soa_python3 import SOA
+from DocumentFeatureSelection.pmi.PMI_python3 import PMI
+from DocumentFeatureSelection.tf_idf.tf_idf import TFIDF
+from DocumentFeatureSelection.bns.bns_python3 import BNS
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+from scipy.sparse import csr_matrix
+from sample_scripts.token_corpus import TokenCorpus
+import collections
+import json
+import logging
+import multiprocessing
+import numpy
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""複数の特徴量抽出の手法(soa, pmi, tf_idf, bns)を、同じ行列から並列に計算します。
+interface.run_feature_selection()は呼び出すたびに、cached dictから ラベル x 単語 の行列を作り直します。
+ここでは行列を1回だけ作って.npyファイルに保存し、各ワーカープロセスはmemmapで読み込みます。行列をプロセス間でコピーしません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+METHOD_NAMES = ('soa', 'pmi', 'tf_idf', 'bns')
+### 手法ごとに使う行列. tf_idfとbnsの分母は単語頻度、soaとpmiは文書頻度を使います(interface.run_feature_selection()と同じ) ###
+DOCUMENT_FREQUENCY = 'document_frequency'
+TERM_FREQUENCY = 'term_frequency'
+FILE_NAME_INDEX = 'index.json'
+
+
+def _to_feature_key(feature:Hashable)->str:
+    ### DocumentFeatureSelectionと同じく、特徴量をjson文字列にして語彙のキーにする ###
+    if isinstance(feature, str):
+        return json.dumps([feature], ensure_ascii=False)
+    return json.dumps(list(feature), ensure_ascii=False)
+
+
+def _to_json_value(value:Any)->Any:
+    ### 頻度・スコアはnumpyの数値型なので、jsonに書けるPythonの数値に変換する ###
+    if isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError('{} is not JSON serializable'.format(type(value).__name__))
+
+
+def _iter_label_documents(tokenized_documents:Any)->Iterator[Tuple[str, Iterable[List[Hashable]]]]:
+    if isinstance(tokenized_documents, TokenCorpus):
+        for label_name, seq_features in tokenized_documents.iter_documents():
+            yield label_name, [seq_features]
+    else:
+        for label_name, seq_document in tokenized_documents.items():
+            yield label_name, seq_document
+
+
+class LabelTermMatrices(object):
+    """* What you can do
+    - ラベル x 単語 の文書頻度行列・単語頻度行列を、文書を1回なめるだけで作ります。
+    - save()でCSRの配列を.npyファイルに保存し、load()でmemmapとして読み込みます。
+
+    * Params
+    - label2id_dict, feature2id_dict: DocumentFeatureSelectionのScoredResultObjectに渡す形式です。特徴量はjson文字列です。
+    """
+    def __init__(self,
+                 label2id_dict:Dict[str, int],
+                 feature2id_dict:Dict[str, int],
+                 document_frequency_matrix:csr_matrix,
+                 term_frequency_matrix:csr_matrix,
+                 n_docs_distribution:numpy.ndarray,
+                 n_term_freq_distribution:numpy.ndarray):
+        self.label2id_dict = label2id_dict
+        self.feature2id_dict = feature2id_dict
+        self.matrices = {DOCUMENT_FREQUENCY: document_frequency_matrix, TERM_FREQUENCY: term_frequency_matrix}
+        self.n_docs_distribution = n_docs_distribution
+        self.n_term_freq_distribution = n_term_freq_distribution
+
+    @classmethod
+    def from_label_documents(cls, tokenized_documents:Any)->'LabelTermMatrices':
+        """* What you can do
+        - {'ラベル名': [ [特徴量] ]}(dict, cached dict, LabelDocumentStore)またはTokenCorpusから行列を作ります。
+        """
+        label2id_dict = {}  # type: Dict[str, int]
+        feature2id_dict = {}  # type: Dict[str, int]
+        ### ラベルID -> {単語ID -> 頻度} ###
+        label_document_frequency = collections.defaultdict(collections.Counter)
+        label_term_frequency = collections.defaultdict(collections.Counter)
+        n_docs = collections.Counter()
+        for label_name, seq_document in _iter_label_documents(tokenized_documents):
+            label_id = label2id_dict.setdefault(label_name, len(label2id_dict))
+            for seq_features in seq_document:
+                n_docs[label_id] += 1
+                term_frequency = collections.Counter(
+                    feature2id_dict.setdefault(feature_key, len(feature2id_dict))
+                    for feature_key in map(_to_feature_key, seq_features))
+                label_term_frequency[label_id].update(term_frequency)
+                label_document_frequency[label_id].update(term_frequency.keys())
+
+        shape = (len(label2id_dict), len(feature2id_dict))
+        return cls(label2id_dict=label2id_dict,
+                   feature2id_dict=feature2id_dict,
+                   document_frequency_matrix=cls._to_csr_matrix(label_document_frequency, shape),
+                   term_frequency_matrix=cls._to_csr_matrix(label_term_frequency, shape),
+                   n_docs_distribution=numpy.array([n_docs[label_id] for label_id in range(shape[0])], dtype='i8'),
+                   n_term_freq_distribution=numpy.array([sum(label_term_frequency[label_id].values())
+                                                         for label_id in range(shape[0])], dtype='i8'))
+
+    @staticmethod
+    def _to_csr_matrix(label_frequency:Dict[int, collections.Counter], shape:Tuple[int, int])->csr_matrix:
+        seq_row = []
+        seq_column = []
+        seq_value = []
+        for label_id, frequency in label_frequency.items():
+            seq_row.extend([label_id] * len(frequency))
+            seq_column.extend(frequency.keys())
+            seq_value.extend(frequency.values())
+        return csr_matrix((numpy.array(seq_value, dtype='i8'), (seq_row, seq_column)), shape=shape)
+
+    def save(self, path_matrix_dir:str)->None:
+        if not os.path.exists(path_matrix_dir):
+            os.makedirs(path_matrix_dir)
+        for matrix_name, matrix_obj in self.matrices.items():
+            for array_name in ('data', 'indices', 'indptr'):
+                numpy.save(os.path.join(path_matrix_dir, '{}.{}.npy'.format(matrix_name, array_name)), getattr(matrix_obj, array_name))
+        numpy.save(os.path.join(path_matrix_dir, 'n_docs_distribution.npy'), self.n_docs_distribution)
+        numpy.save(os.path.join(path_matrix_dir, 'n_term_freq_distribution.npy'), self.n_term_freq_distribution)
+        with open(os.path.join(path_matrix_dir, FILE_NAME_INDEX), 'w') as f:
+            f.write(json.dumps({'label2id_dict': self.label2id_dict,
+                                'feature2id_dict': self.feature2id_dict,
+                                'shape': list(self.matrices[DOCUMENT_FREQUENCY].shape)}, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path_matrix_dir:str)->'LabelTermMatrices':
+        """* What you can do
+        - save()で保存した行列を読み込みます。配列はmemmapなので、複数のプロセスが読んでもメモリ上のコピーは1つです。
+        """
+        with open(os.path.join(path_matrix_dir, FILE_NAME_INDEX), 'r') as f:
+            index_obj = json.load(f)
+        matrices = {}
+        for matrix_name in (DOCUMENT_FREQUENCY, TERM_FREQUENCY):
+            seq_array = [numpy.load(os.path.join(path_matrix_dir, '{}.{}.npy'.format(matrix_name, array_name)), mmap_mode='r')
+                         for array_name in ('data', 'indices', 'indptr')]
+            matrices[matrix_name] = csr_matrix(tuple(seq_array), shape=tuple(index_obj['shape']), copy=False)
+        return cls(label2id_dict=index_obj['label2id_dict'],
+                   feature2id_dict=index_obj['feature2id_dict'],
+                   document_frequency_matrix=matrices[DOCUMENT_FREQUENCY],
+                   term_frequency_matrix=matrices[TERM_FREQUENCY],
+                   n_docs_distribution=numpy.load(os.path.join(path_matrix_dir, 'n_docs_distribution.npy')),
+                   n_term_freq_distribution=numpy.load(os.path.join(path_matrix_dir, 'n_term_freq_distribution.npy')))
+
+
+def score_matrices(label_term_matrices:LabelTermMatrices,
+                   selection_method:str,
+                   use_cython:bool=True)->ScoredResultObject:
+    """* What you can do
+    - 作成済みの行列に対して、1つの手法でスコアを計算します。行列の作り方以外はinterface.run_feature_selection()と同じです。
+    """
+    if selection_method == 'tf_idf':
+        frequency_matrix = label_term_matrices.matrices[TERM_FREQUENCY]
+        scored_sparse_matrix = TFIDF().fit_transform(X=frequency_matrix)
+    elif selection_method == 'soa':
+        frequency_matrix = label_term_matrices.matrices[DOCUMENT_FREQUENCY]
+        scored_sparse_matrix = SOA().fit_transform(X=frequency_matrix,
+                                                   unit_distribution=label_term_matrices.n_docs_distribution,
+                                                   use_cython=use_cython)
+    elif selection_method == 'pmi':
+        frequency_matrix = label_term_matrices.matrices[DOCUMENT_FREQUENCY]
+        scored_sparse_matrix = PMI().fit_transform(X=frequency_matrix,
+                                                   n_docs_distribution=label_term_matrices.n_docs_distribution,
+                                                   use_cython=use_cython)
+    elif selection_method == 'bns':
+        if len(label_term_matrices.label2id_dict) != 2:
+            raise ValueError('bns needs exactly 2 labels. Got {}'.format(len(label_term_matrices.label2id_dict)))
+        ### interface.run_feature_selection()と同じく、名前の短いラベルを正例とする ###
+        positive_label_name = sorted(label_term_matrices.label2id_dict.keys(), key=lambda x: len(x))[0]
+        frequency_matrix = label_term_matrices.matrices[DOCUMENT_FREQUENCY]
+        scored_sparse_matrix = BNS().fit_transform(X=frequency_matrix,
+                                                   unit_distribution=label_term_matrices.n_term_freq_distribution,
+                                                   true_index=label_term_matrices.label2id_dict[positive_label_name],
+                                                   use_cython=use_cython)
+    else:
+        raise ValueError('selection_method must be either of {}. Got {}'.format(METHOD_NAMES, selection_method))
+    return ScoredResultObject(scored_matrix=scored_sparse_matrix,
+                              label2id_dict=label_term_matrices.label2id_dict,
+                              feature2id_dict=label_term_matrices.feature2id_dict,
+                              method=selection_method,
+                              frequency_matrix=frequency_matrix)
+
+
+def _run_method(selection_method:str,
+                path_matrix_dir:str,
+                path_output_dir:str,
+                use_cython:bool)->Dict[str, Any]:
+    """プロセスプールのワーカーで実行される関数です。1手法のスコアを計算してjsonに保存し、計測結果を返します。"""
+    label_term_matrices = LabelTermMatrices.load(path_matrix_dir)
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    score_result_obj = score_matrices(label_term_matrices, selection_method, use_cython=use_cython)
+    seq_score_dict = score_result_obj.ScoreMatrix2ScoreDictionary()
+    elapsed_seconds = time.perf_counter() - start_time
+    _, peak_traced_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    path_score_file = os.path.join(path_output_dir, 'word_score_{}.json'.format(selection_method))
+    with open(path_score_file, 'w') as f:
+        f.write(json.dumps(seq_score_dict, ensure_ascii=False, default=_to_json_value))
+    return {
+        'method': selection_method,
+        'elapsed_seconds': elapsed_seconds,
+        'peak_traced_memory_bytes': peak_traced_bytes,
+        ### ru_maxrssはLinuxではKB単位. 1タスクごとにワーカーを作り直すので、この手法だけの最大値です ###
+        'peak_rss_kilobytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'n_records': len(seq_score_dict),
+        'path_score_file': path_score_file
+    }
+
+
+def run_multi_method_feature_selection(tokenized_documents:Any,
+                                       seq_selection_method:Iterable[str]=METHOD_NAMES,
+                                       path_output_dir:str='./models',
+                                       n_process:int=None,
+                                       use_cython:bool=True,
+                                       path_matrix_dir:str=None)->List[Dict[str, Any]]:
+    """* What you can do
+    - 行列を1回だけ作り、複数の手法のスコアをプロセスプールで並列に計算します。
+    - 手法ごとに path_output_dir/word_score_{手法}.json を保存します。中身はrun_feature_selection()の戻り値と同じ形です。
+    - 手法ごとの計算時間とメモリ使用量を返し、path_output_dir/feature_selection_report.json にも保存します。
+    - bnsはラベルが2つの場合だけ計算できます。それ以外の場合はスキップします。
+
+    * Params
+    - tokenized_documents: {'ラベル名': [ [特徴量] ]}(dict, cached dict, LabelDocumentStore)またはTokenCorpus
+    - n_process: プロセス数。Noneの場合は min(手法の数, CPUコア数) です。
+    - path_matrix_dir: 行列を保存するディレクトリ。Noneの場合は一時ディレクトリです。
+
+    >>> run_multi_method_feature_selection(cached_dict, seq_selection_method=('soa', 'pmi'))
+    """
+    seq_selection_method = list(seq_selection_method)
+    for selection_method in seq_selection_method:
+        if selection_method not in METHOD_NAMES:
+            raise ValueError('selection_method must be either of {}. Got {}'.format(METHOD_NAMES, selection_method))
+
+    start_time = time.perf_counter()
+    label_term_matrices = LabelTermMatrices.from_label_documents(tokenized_documents)
+    if 'bns' in seq_selection_method and len(label_term_matrices.label2id_dict) != 2:
+        logger.warning('Skip bns. It needs exactly 2 labels, but got {}'.format(len(label_term_matrices.label2id_dict)))
+        seq_selection_method.remove('bns')
+    if path_matrix_dir is None:
+        path_matrix_dir = tempfile.mkdtemp()
+    label_term_matrices.save(path_matrix_dir)
+    logger.info('Built label-term matrices {} in {:.2f} sec.'.format(label_term_matrices.matrices[DOCUMENT_FREQUENCY].shape,
+                                                                    time.perf_counter() - start_time))
+    del label_term_matrices
+
+    if not os.path.exists(path_output_dir):
+        os.makedirs(path_output_dir)
+    if n_process is None:
+        n_process = min(len(seq_selection_method), multiprocessing.cpu_count())
+    ### maxtasksperchild=1で手法ごとにワーカーを作り直し、メモリ使用量を手法ごとに計測できるようにする ###
+    pool = multiprocessing.Pool(processes=max(n_process, 1), maxtasksperchild=1)
+    try:
+        seq_async_result = [pool.apply_async(_run_method, (selection_method, path_matrix_dir, path_output_dir, use_cython))
+                            for selection_method in seq_selection_method]
+        seq_report = [async_result.get() for async_result in seq_async_result]
+    finally:
+        pool.close()
+        pool.join()
+
+    for report_obj in seq_report:
+        logger.info('method={method} elapsed={elapsed_seconds:.2f} sec, peak(traced)={peak_traced_memory_bytes} bytes, '
+                    'peak(rss)={peak_rss_kilobytes} KB, N(record)={n_records}'.format(**report_obj))
+    with open(os.path.join(path_output_dir, 'feature_selection_report.json'), 'w') as f:
+        f.write(json.dumps(seq_report, ensure_ascii=False, indent=4))
+    return seq_report
@@ -0,0 +1,281 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+from sample_scripts.token_corpus import Vocabulary
+import array
+import logging
+import math
+import zlib
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""複数の次数のn-gramを、トークン列を1回なめるだけで同時に取り出します。
+n-gramは文字列のタプルでなく整数IDで保持するので、フレーズ特徴量のメモリ使用量が小さくなります。
+IDの付け方は2通りです。
+- インターン: n-gram = (1つ短いn-gramのID, 最後の単語のID) として採番します。IDから元のn-gramに戻せます。
+- ハッシュ: n-gramのハッシュ値をhash_bitsビットに切り詰めます。対応表を持たないので、メモリ使用量は語彙数に依存しません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### ハッシュ計算の定数(FNV-1a 64bit, 黄金比) ###
+MASK_64BIT = (1 << 64) - 1
+FNV_OFFSET_BASIS = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+GOLDEN_RATIO_64BIT = 0x9E3779B97F4A7C15
+### インターンIDで、親がいない(unigram)ことを表す値 ###
+ROOT_NGRAM_ID = -1
+### ハッシュIDを、DocumentFeatureSelectionに渡す文字列にするときの接頭辞 ###
+HASHED_FEATURE_PREFIX = '#ngram:'
+
+
+class NgramVocabulary(object):
+    """* What you can do
+    - n-gramを (1つ短いn-gramのID, 最後の単語のID) の組としてインターンします。トライ木と同じ構造です。
+    - 1つのn-gramあたり整数2つ分のメモリで済み、同じ接頭辞のn-gramは接頭辞を共有します。
+    - decode()でIDから単語のタプルに戻せます。
+    """
+    def __init__(self):
+        self.words = Vocabulary()
+        self.ngram2id = {}  # type: Dict[Tuple[int, int], int]
+        self.parent_ids = array.array('q')
+        self.word_ids = array.array('i')
+
+    def get_child_id(self, parent_id:int, word_id:int)->int:
+        ngram_key = (parent_id, word_id)
+        ngram_id = self.ngram2id.get(ngram_key)
+        if ngram_id is None:
+            ngram_id = len(self.parent_ids)
+            self.ngram2id[ngram_key] = ngram_id
+            self.parent_ids.append(parent_id)
+            self.word_ids.append(word_id)
+        return ngram_id
+
+    def decode(self, ngram_id:int)->Tuple[str, ...]:
+        seq_word = []
+        while ngram_id != ROOT_NGRAM_ID:
+            seq_word.append(self.words[self.word_ids[ngram_id]])
+            ngram_id = self.parent_ids[ngram_id]
+        return tuple(reversed(seq_word))
+
+    def __len__(self)->int:
+        return len(self.parent_ids)
+
+
+class NgramExtractor(object):
+    """* What you can do
+    - 1つのトークン列から、seq_n_valueで指定した全ての次数のn-gramのIDを1回のループで取り出します。
+    - 各開始位置で、1-gram -> 2-gram -> ... と1単語ずつ伸ばしながらIDを計算するので、n-gramのタプルを作りません。
+
+    * Params
+    - seq_n_value: 取り出すn-gramの次数
+        >>> (1, 2, 3)
+    - hash_bits: Noneの場合はインターンでIDを付けます。整数の場合はハッシュ値をこのビット数に切り詰めます。
+        - ビット数が小さいほど衝突(別のn-gramが同じIDになる)が増えます。目安は n-gramの異なり数 の10倍以上 = 2 ** hash_bits です。
+    """
+    def __init__(self, seq_n_value:Iterable[int]=(1, 2, 3), hash_bits:int=None):
+        self.seq_n_value = tuple(sorted(set(seq_n_value)))
+        if len(self.seq_n_value) == 0 or self.seq_n_value[0] < 1:
+            raise ValueError('seq_n_value must be positive integers. Got {}'.format(seq_n_value))
+        if hash_bits is not None and not 1 <= hash_bits <= 63:
+            raise ValueError('hash_bits must be in [1, 63]. Got {}'.format(hash_bits))
+        self.max_n_value = self.seq_n_value[-1]
+        self.is_target_order = [n_value in self.seq_n_value for n_value in range(self.max_n_value + 1)]
+        self.hash_bits = hash_bits
+        self.ngram_vocabulary = NgramVocabulary() if hash_bits is None else None
+        ### 単語のハッシュ値のメモ。Pythonのhash()はプロセスごとに値が変わるので、crc32を使う ###
+        self._word_hash = {}  # type: Dict[str, int]
+
+    @property
+    def is_hashed(self)->bool:
+        return self.hash_bits is not None
+
+    def _get_word_hash(self, word:str)->int:
+        word_hash = self._word_hash.get(word)
+        if word_hash is None:
+            word_hash = zlib.crc32(word.encode('utf-8'))
+            self._word_hash[word] = word_hash
+        return word_hash
+
+    def extract(self, seq_tokens:List[str])->Dict[int, array.array]:
+        """* What you can do
+        - {次数: n-gramのIDの配列} を返します。
+        """
+        seq_ngram_ids = {n_value: array.array('q') for n_value in self.seq_n_value}
+        is_target_order = self.is_target_order
+        n_tokens = len(seq_tokens)
+        if self.is_hashed:
+            seq_word_value = [self._get_word_hash(token) for token in seq_tokens]
+            shift_bits = 64 - self.hash_bits
+            for start_index in range(n_tokens):
+                hash_value = FNV_OFFSET_BASIS
+                for n_value in range(1, min(self.max_n_value, n_tokens - start_index) + 1):
+                    hash_value = ((hash_value ^ seq_word_value[start_index + n_value - 1]) * FNV_PRIME) & MASK_64BIT
+                    if is_target_order[n_value]:
+                        ### 下位ビットは偏るので、黄金比を掛けて上位ビットを使う ###
+                        seq_ngram_ids[n_value].append(((hash_value * GOLDEN_RATIO_64BIT) & MASK_64BIT) >> shift_bits)
+        else:
+            intern = self.ngram_vocabulary.words.intern
+            get_child_id = self.ngram_vocabulary.get_child_id
+            seq_word_value = [intern(token) for token in seq_tokens]
+            for start_index in range(n_tokens):
+                ngram_id = ROOT_NGRAM_ID
+                for n_value in range(1, min(self.max_n_value, n_tokens - start_index) + 1):
+                    ngram_id = get_child_id(ngram_id, seq_word_value[start_index + n_value - 1])
+                    if is_target_order[n_value]:
+                        seq_ngram_ids[n_value].append(ngram_id)
+        return seq_ngram_ids
+
+    def decode(self, ngram_id:int)->Union[str, Tuple[str, ...]]:
+        """* What you can do
+        - n-gramのIDを、DocumentFeatureSelectionに渡せる特徴量に戻します。
+        - インターンの場合は単語のタプル(unigramは単語そのもの)、ハッシュの場合は '#ngram:ID' の文字列です。
+        """
+        if self.is_hashed:
+            return '{}{}'.format(HASHED_FEATURE_PREFIX, ngram_id)
+        seq_word = self.ngram_vocabulary.decode(ngram_id)
+        return seq_word[0] if len(seq_word) == 1 else seq_word
+
+
+class LossyCounter(object):
+    """* What you can do
+    - Lossy Countingで、n-gramの頻度を数えながら、まれなn-gramのカウンタを随時捨てます。
+    - 捨てたn-gramの頻度は epsilon * (総数) 以下であることが保証されます。カウンタの数は O(1 / epsilon * log(epsilon * 総数)) に抑えられます。
+    """
+    def __init__(self, epsilon:float=0.0001):
+        if not 0.0 < epsilon < 1.0:
+            raise ValueError('epsilon must be in (0, 1). Got {}'.format(epsilon))
+        self.epsilon = epsilon
+        self.bucket_width = int(math.ceil(1.0 / epsilon))
+        self.total_count = 0
+        ### ID -> [頻度, 数え始めた時点での最大誤差] ###
+        self.counters = {}  # type: Dict[Hashable, List[int]]
+
+    def update_many(self, seq_item:Iterable[Hashable])->None:
+        counters = self.counters
+        for item in seq_item:
+            counter = counters.get(item)
+            if counter is None:
+                counters[item] = [1, self.total_count // self.bucket_width]
+            else:
+                counter[0] += 1
+            self.total_count += 1
+            if self.total_count % self.bucket_width == 0:
+                self._prune()
+
+    def _prune(self)->None:
+        bucket_id = self.total_count // self.bucket_width
+        self.counters = {item: counter for item, counter in self.counters.items() if counter[0] + counter[1] > bucket_id}
+
+    def get(self, item:Hashable, default:int=0)->int:
+        counter = self.counters.get(item)
+        return default if counter is None else counter[0]
+
+
+class NgramFeatureSet(object):
+    """* What you can do
+    - 複数次数のn-gram特徴量を、次数ごとに (n-gramのIDを1本に並べた配列, 文書の区切り位置の配列) で保持します。
+    - to_label_documents()でDocumentFeatureSelectionの入力フォーマットに変換します。min_count未満のn-gramはここで落とします。
+
+    * Params
+    - min_count: コーパス全体での頻度がこの値未満のn-gramを捨てます。
+    - lossy_count_epsilon: 与えると、頻度をLossy Countingで数え、まれなn-gramのカウンタを随時捨てます。
+        - 頻度の表が語彙数に比例して大きくならないので、n-gramの異なり数が多い場合に使います。
+
+    >>> feature_set = NgramFeatureSet(NgramExtractor(seq_n_value=(1, 2)), min_count=2)
+    >>> feature_set.add_document('映画', ['スターウォーズ', 'は', 'おもしろい'])
+    >>> feature_set.to_label_documents(n_value=2)
+    """
+    def __init__(self,
+                 ngram_extractor:NgramExtractor,
+                 min_count:int=1,
+                 lossy_count_epsilon:float=None):
+        self.ngram_extractor = ngram_extractor
+        self.min_count = min_count
+        self.labels = Vocabulary()
+        self.label_ids = array.array('i')
+        self.ngram_ids = {n_value: array.array('q') for n_value in ngram_extractor.seq_n_value}
+        self.offsets = {n_value: array.array('q', [0]) for n_value in ngram_extractor.seq_n_value}
+        if lossy_count_epsilon is not None:
+            self.ngram_frequency = {n_value: LossyCounter(lossy_count_epsilon) for n_value in ngram_extractor.seq_n_value}
+        elif min_count > 1:
+            self.ngram_frequency = {n_value: {} for n_value in ngram_extractor.seq_n_value}
+        else:
+            self.ngram_frequency = None
+
+    @property
+    def seq_n_value(self)->Tuple[int, ...]:
+        return self.ngram_extractor.seq_n_value
+
+    def add_document(self, label_name:str, seq_tokens:List[str])->None:
+        self.label_ids.append(self.labels.intern(label_name))
+        for n_value, seq_ngram_id in self.ngram_extractor.extract(seq_tokens).items():
+            self.ngram_ids[n_value].extend(seq_ngram_id)
+            self.offsets[n_value].append(len(self.ngram_ids[n_value]))
+            if self.ngram_frequency is None:
+                continue
+            frequency_obj = self.ngram_frequency[n_value]
+            if isinstance(frequency_obj, LossyCounter):
+                frequency_obj.update_many(seq_ngram_id)
+            else:
+                for ngram_id in seq_ngram_id:
+                    frequency_obj[ngram_id] = frequency_obj.get(ngram_id, 0) + 1
+
+    def __len__(self)->int:
+        return len(self.label_ids)
+
+    def n_ngrams(self, n_value:int)->int:
+        return len(self.ngram_ids[n_value])
+
+    def iter_documents(self, n_value:int)->Iterator[Tuple[str, List[Union[str, Tuple[str, ...]]]]]:
+        """* What you can do
+        - (ラベル, n-gram特徴量のリスト)をyieldします。min_count未満のn-gramは含みません。
+        """
+        if n_value not in self.ngram_ids:
+            raise KeyError('n_value={} was not extracted. Available: {}'.format(n_value, self.seq_n_value))
+        seq_ngram_ids = self.ngram_ids[n_value]
+        seq_offset = self.offsets[n_value]
+        frequency_obj = self.ngram_frequency[n_value] if self.ngram_frequency is not None else None
+        decode = self.ngram_extractor.decode
+        ### 同じn-gramを何度もデコードしないようにメモする ###
+        decoded_features = {}  # type: Dict[int, Union[str, Tuple[str, ...]]]
+        for document_index, label_id in enumerate(self.label_ids):
+            seq_feature = []
+            for ngram_id in seq_ngram_ids[seq_offset[document_index]:seq_offset[document_index + 1]]:
+                if frequency_obj is not None and frequency_obj.get(ngram_id, 0) < self.min_count:
+                    continue
+                feature = decoded_features.get(ngram_id)
+                if feature is None:
+                    feature = decode(ngram_id)
+                    decoded_features[ngram_id] = feature
+                seq_feature.append(feature)
+            yield self.labels[label_id], seq_feature
+
+    def to_label_documents(self, n_value:int)->Dict[str, List[List[Union[str, Tuple[str, ...]]]]]:
+        """* What you can do
+        - DocumentFeatureSelectionの入力フォーマット {'ラベル名': [ [特徴量] ]} に変換します。
+        """
+        label_documents = {}
+        for label_name, seq_feature in self.iter_documents(n_value):
+            label_documents.setdefault(label_name, []).append(seq_feature)
+        return label_documents
+
+
+def extract_ngram_features(seq_label_tokens:Iterable[Tuple[str, List[str]]],
+                           seq_n_value:Iterable[int]=(1, 2, 3),
+                           hash_bits:int=None,
+                           min_count:int=1,
+                           lossy_count_epsilon:float=None)->NgramFeatureSet:
+    """* What you can do
+    - (ラベル, トークン列)のイテラブルを1回なめて、複数次数のn-gram特徴量を作ります。
+    """
+    feature_set = NgramFeatureSet(NgramExtractor(seq_n_value=seq_n_value, hash_bits=hash_bits),
+                                  min_count=min_count,
+                                  lossy_count_epsilon=lossy_count_epsilon)
+    for label_name, seq_tokens in seq_label_tokens:
+        feature_set.add_document(label_name, seq_tokens)
+    logger.info('Extracted n-grams from {} documents. {}'.format(
+        len(feature_set), ', '.join('N({}-gram)={}'.format(n_value, feature_set.n_ngrams(n_value))
+                                    for n_value in feature_set.seq_n_value)))
+    return feature_set
@@ -1,6 +1,12 @@
-from JapaneseTokenizer import MecabWrapper
-from typing import List, Tuple, Dict, Union, Any
-from DocumentFeatureSelection.models import PersistentDict
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator
+from sample_scripts.corpus_io import Corpus
+from sample_scripts.tokenizer_cache import TokenizationCache
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+from sample_scripts.binary_model import BinaryScoreModel, write_binary_model
+from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+from sample_scripts.batch_tokenizer import BatchTokenizer
+from sample_scripts.classification_evaluation import EvaluationResult, log_evaluation_result
+from sample_scripts import instrumentation
 import json
 import tempfile
 import os
@@ -21,86 +27,84 @@ __license_name__ = "MIT"
 
 
 def tokenize_text(input_text:str,
-                  tokenizer_obj:MecabWrapper,
-                  pos_condition:List[Tuple[str,...]])->List[str]:
+                  tokenizer_obj:'MecabWrapper',
+                  pos_condition:List[Tuple[str,...]],
+                  is_surface:bool=False,
+                  tokenization_cache:TokenizationCache=None)->List[str]:
     """* What you can do
     - １文書に対して、形態素分割を実施する
+    - tokenization_cacheを与えると、同じテキスト・同じ設定の形態素分割はキャッシュから返します。
     """
+    if tokenization_cache is not None:
+        return tokenization_cache.get_or_tokenize(input_text, tokenizer_obj, pos_condition, is_surface=is_surface)
     ### 形態素分割;tokenize() -> 品詞フィルタリング;filter() -> List[str]に変換;convert_list_object()
-    return tokenizer_obj.tokenize(input_text).filter(pos_condition=pos_condition).convert_list_object()
     ### 原型(辞書系)に変換せず、活用された状態のまま、欲しい場合は is_surface=True のフラグを与える
-    #return tokenizer_obj.tokenize(input_text, is_surface=True).filter(pos_condition=pos_condition).convert_list_object()
-
-
-def save_into_cached_dictionary(dict_object:Dict[str, List[List[str]]], cached_dict_object:PersistentDict)->PersistentDict:
-    for key, values in dict_object.items():
-        if not key in cached_dict_object:
-            cached_dict_object[key] = values
-        else:
-            cached_dict_object[key] += values
-
-    del dict_object
-    return cached_dict_object
+    with instrumentation.span('tokenize'):
+        return tokenizer_obj.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
 
 
 def reformat_dictionary(score_dictionary,
                         batch_size=10000,
                         is_use_cache=False):
-    # type: (List[Dict[str,Any]], int)->Union[PersistentDict, Dict[str, List[Tuple[str,float]]]]
+    # type: (Iterable[Dict[str,Any]], int, bool)->Union[BinaryScoreModel, Dict[str, List[Tuple[str,float]]]]
     """* What you can do
     - 辞書の形を変形します。
+    - is_use_cache=Trueの場合は、レコードをexternal_groupbyで単語ごとにまとめ、一時ディレクトリのバイナリモデル(BinaryScoreModel)に書き出して返します。
+        - メモリに載るのはbatch_size件のレコードまでです。score_dictionaryはgeneratorでも構いません。
+        - 巨大なモデル(数千万レコード)の場合は、batch_sizeを数十万~数百万にするとディスクへの書き出しが少なくなります。
     * Input
     >>> [{"label": "レストラン", "score": 0.02942301705479622, "word": "お金"}]
     * Output
     >>> {"お金": [("レストラン", 0.02942301705479622)]}
     """
-    temporary_dir = tempfile.mkdtemp()
     if is_use_cache:
-        word_score_dictionary = PersistentDict(os.path.join(temporary_dir, 'temporary_dict.json'))
-    else:
-        word_score_dictionary = {}
+        path_model_file = os.path.join(tempfile.mkdtemp(), 'word_score.bin')
+        write_binary_model(score_dictionary, path_model_file, max_records_in_memory=batch_size)
+        return BinaryScoreModel(path_model_file)
 
+    word_score_dictionary = {}
     logger.info(msg="Loaded N(record)={}".format(len(score_dictionary)))
-
-    if is_use_cache:
-        counter = 0  # type: int
-        temporary_dict_obj = {}
-
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in temporary_dict_obj:
-                temporary_dict_obj[score_object['word']] = [score_tuple]
-            else:
-                temporary_dict_obj[score_object['word']].append(score_tuple)
-
-            counter += 1
-            if counter % batch_size == 0:
-                word_score_dictionary = save_into_cached_dictionary(temporary_dict_obj, word_score_dictionary)
-                del temporary_dict_obj
-                temporary_dict_obj = {}
-                logger.info(msg='Processed {} records now.'.format(counter))
-    else:
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in word_score_dictionary:
-                word_score_dictionary[score_object['word']] = [score_tuple]
-            else:
-                word_score_dictionary[score_object['word']].append(score_tuple)
+    for score_object in score_dictionary:
+        score_tuple = (score_object['label'], score_object['score'])
+        if not score_object['word'] in word_score_dictionary:
+            word_score_dictionary[score_object['word']] = [score_tuple]
+        else:
+            word_score_dictionary[score_object['word']].append(score_tuple)
 
     return word_score_dictionary
 
 
 
 def get_text_score(input_text:str,
-                   word_score_dictionary:Dict[str, List[Tuple[str,float]]],
-                   tokenizer_obj:MecabWrapper,
-                   pos_condition:List[Tuple[str,...]]):
+                   word_score_dictionary:Union[Dict[str, List[Tuple[str,float]]], BinaryScoreModel, ScoreMatrixScorer],
+                   tokenizer_obj:'MecabWrapper',
+                   pos_condition:List[Tuple[str,...]],
+                   tokenization_cache:TokenizationCache=None,
+                   vocabulary_pruner:VocabularyPruner=None):
     """* What you can do
     - スコアリング関数
     - カテゴリごとにスコアを算出することができます。
+    - vocabulary_prunerを与えると、学習時と同じ語彙にない単語を取り除いてからスコアを計算します。
+    - word_score_dictionaryにScoreMatrixScorerを与えると、スコア行列を使ってnumpyで計算します。
+    """
+    list_tokens = tokenize_text(input_text=input_text, tokenizer_obj=tokenizer_obj, pos_condition=pos_condition,
+                                tokenization_cache=tokenization_cache)
+    if vocabulary_pruner is not None:
+        list_tokens = vocabulary_pruner.transform(list_tokens)
+    instrumentation.increment('classify.documents')
+    instrumentation.increment('classify.tokens', len(list_tokens))
+    return score_tokens(list_tokens, word_score_dictionary)
+
+
+def score_tokens(list_tokens:List[str],
+                 word_score_dictionary:Union[Dict[str, List[Tuple[str,float]]], BinaryScoreModel, ScoreMatrixScorer])->List[Tuple[str, float]]:
+    """* What you can do
+    - 形態素分割済みの1文書のカテゴリごとのスコアを、スコアの降順で返します。get_text_score()のスコアリング部分です。
     """
     key_function = lambda tuple_obj: tuple_obj[0]
-    list_tokens = tokenize_text(input_text=input_text, tokenizer_obj=tokenizer_obj, pos_condition=pos_condition)
+    ### スコア行列がある場合は、numpyで計算する(結果は下の計算と同じ) ###
+    if isinstance(word_score_dictionary, ScoreMatrixScorer):
+        return word_score_dictionary.score_tokens(list_tokens)
     seq_score_elements = [word_score_dictionary[token] for token in list_tokens if token in word_score_dictionary]
 
     score_category = []
@@ -111,92 +115,154 @@ def get_text_score(input_text:str,
     return sorted(score_category, key=lambda tuple_obj: tuple_obj[1], reverse=True)
 
 
-def evaluate_result(gold_label,
-                    predicred_result):
-    # type: (str, List[Tuple[str, float]])->Tuple[str, bool]
+def classify_batch(seq_text:Iterable[str],
+                   word_score_model:Union[ScoreMatrixScorer, BinaryScoreModel, Dict[str, List[Tuple[str,float]]]],
+                   pos_condition:List[Tuple[str,...]],
+                   batch_tokenizer:BatchTokenizer=None,
+                   tokenizer_obj:'MecabWrapper'=None,
+                   k:int=3,
+                   chunk_size:int=1000,
+                   tokenization_cache:TokenizationCache=None,
+                   vocabulary_pruner:VocabularyPruner=None)->Iterator[List[Tuple[str, float]]]:
     """* What you can do
-    - 評価用の文書の正解ラベルと予測結果の比較をします。
+    - 大量の文書をまとめて分類し、文書ごとに上位k件の [(ラベル, スコア)] を入力と同じ順番でyieldします。
+    - batch_tokenizerを与えると、形態素分割をプロセスプールで並列に実施します。与えない場合はtokenizer_objで1文書ずつ分割します。
+    - chunk_size件ずつ 文書 x 単語 の疎行列を作り、スコア行列との1回の行列積で全ラベルのスコアを計算します。
+    - メモリに載るのはchunk_size件分の文書だけなので、入力はgeneratorでも構いません。
+    - 結果の並び順はget_text_score()と同じです。
+
+    >>> with BatchTokenizer(tokenizer_kwargs={'dictType': 'ipadic'}) as batch_tokenizer:
+    ...     for seq_score_tuple in classify_batch(seq_text, word_score_model, pos_condition, batch_tokenizer=batch_tokenizer):
+    ...         print(seq_score_tuple)
+    [('映画', 3.2), ('アニメ', 1.1), ('小説', 0.3)]
     """
-    seq_category_name = set([category_name_tuple[0] for category_name_tuple in predicred_result])
-    if gold_label in seq_category_name: return (gold_label, True)
-    else: return (gold_label, False)
-
+    if batch_tokenizer is None and tokenizer_obj is None:
+        raise ValueError('Either batch_tokenizer or tokenizer_obj is required.')
+    if isinstance(word_score_model, ScoreMatrixScorer):
+        score_matrix_scorer = word_score_model
+    else:
+        score_matrix_scorer = ScoreMatrixScorer.from_word_score_dictionary(word_score_model)
 
-def  get_result_statistics(seq_result_tuple:List[Tuple[str, bool]])->None:
+    if batch_tokenizer is not None:
+        seq_document_tokens = batch_tokenizer.tokenize_documents(seq_text,
+                                                                 pos_condition=pos_condition,
+                                                                 tokenization_cache=tokenization_cache)
+    else:
+        seq_document_tokens = (tokenize_text(input_text=input_text, tokenizer_obj=tokenizer_obj, pos_condition=pos_condition,
+                                             tokenization_cache=tokenization_cache)
+                               for input_text in seq_text)
+    if vocabulary_pruner is not None:
+        seq_document_tokens = (vocabulary_pruner.transform(list_tokens) for list_tokens in seq_document_tokens)
+
+    n_documents = 0
+    while True:
+        with instrumentation.span('classify_batch.tokenize'):
+            seq_chunk_tokens = list(itertools.islice(seq_document_tokens, chunk_size))
+        if len(seq_chunk_tokens) == 0:
+            break
+        with instrumentation.span('classify_batch.score'):
+            seq_chunk_result = score_matrix_scorer.score_documents(seq_chunk_tokens, k=k)
+        if instrumentation.is_enabled():
+            instrumentation.increment('classify.documents', len(seq_chunk_tokens))
+            instrumentation.increment('classify.tokens', sum(len(list_tokens) for list_tokens in seq_chunk_tokens))
+        for seq_score_tuple in seq_chunk_result:
+            yield seq_score_tuple
+        n_documents += len(seq_chunk_tokens)
+        logger.debug(msg='Classified {} documents now.'.format(n_documents))
+
+
+def main(word_score_model:Union[List[Dict[str,Any]], BinaryScoreModel],
+         seq_evaluation_data:Iterable[Dict[str,Any]],
+         tokenizer_obj:'MecabWrapper',
+         pos_condition:List[Tuple[str,...]],
+         ranking_evaluation:Union[int, List[int]]=3,
+         tokenization_cache:TokenizationCache=None,
+         vocabulary_pruner:VocabularyPruner=None,
+         batch_tokenizer:BatchTokenizer=None,
+         path_evaluation_report:str=None)->EvaluationResult:
     """* What you can do
-    - カテゴリごとに性能評価を出す
+    - 評価文書を1回だけスコアリングし、ranking_evaluationに与えた全てのkでaccuracy@kを計算します。
+    - ラベルごとのPrecision / Recall / F1と混同行列も計算し、path_evaluation_reportを与えるとjsonで保存します。
     """
-    key_function = lambda eval_res_tuple: eval_res_tuple[0]
-
-    seq_eval_result = [(tuple_eval_result[0], tuple_eval_result[1]) for tuple_eval_result in seq_result_tuple]
-    g_object = itertools.groupby(sorted(seq_eval_result, key=key_function, reverse=True), key=key_function)
-    for category_name, seq_eval_res in g_object:
-        seq_result_flags = [seq_eval_tuple[1] for seq_eval_tuple in seq_eval_res]
-        accuracy_of_category = len([res_flag for res_flag in seq_result_flags if res_flag is True]) / len(seq_result_flags)
-        logger.info(msg='Accuracy of category={}; {} = {} / {}'.format(category_name,
-                                                                        accuracy_of_category,
-                                                                        len([res_flag for res_flag in seq_result_flags if res_flag is True]),
-                                                                        len(seq_result_flags)))
-
-
-def main(word_score_model:List[Dict[str,Any]],
-         seq_evaluation_data:List[Dict[str,Any]],
-         tokenizer_obj:MecabWrapper,
-         pos_condition:List[Tuple[str,...]],
-         ranking_evaluation:int=3):
-    ### モデル辞書ファイルを変形; ついでにcache dictにしておく ###
-    dict_word_model = reformat_dictionary(score_dictionary=word_score_model)
-
-    flags = []
-    ### wikipediaリードテキストに対する評価 ###
-    for evaluation_obj in seq_evaluation_data:
-        #### スコアリングの実施 ####
-        seq_score_tuple = get_text_score(input_text=evaluation_obj['text'],
-                                         word_score_dictionary=dict_word_model,
-                                         tokenizer_obj=tokenizer_obj,
-                                         pos_condition=pos_condition)
-        #### 評価 ####
-        tuple_boolean_flag = evaluate_result(gold_label=evaluation_obj['gold_label'],
-                                       predicred_result=seq_score_tuple[:ranking_evaluation])
-        logger.info(msg='Page-name={} -> Evaluation-flag={}, Score = {}'.format(evaluation_obj['page_title'],
-                                                                        tuple_boolean_flag[1],
-                                                                        seq_score_tuple[:ranking_evaluation]))
-        flags.append(tuple_boolean_flag)
-
-    ### 評価の統計値算出 ###
-    true_flags = [True for tuple_flag in flags if tuple_flag[1] is True]
-    logger.info(msg='='*40)
-    logger.info(msg='Accuracy of wikipedia summary text when rank={}'.format(ranking_evaluation))
-    logger.info(msg='Accuracy; {} = {} / {}'.format(len(true_flags)/len(flags), len(true_flags), len(flags)))
-    ### カテゴリごとの正解率統計算出に対する評価 ###
-    get_result_statistics(flags)
-    logger.info('+'*40)
-
+    seq_k = [ranking_evaluation] if isinstance(ranking_evaluation, int) else list(ranking_evaluation)
+    if isinstance(word_score_model, BinaryScoreModel):
+        ### バイナリモデルは 単語 -> [(ラベル, スコア)] の形で保存されているので、変形は不要 ###
+        ### 語彙にない単語は、get_text_score()で文書側から取り除く ###
+        dict_word_model = word_score_model
+    else:
+        ### 語彙ファイルがある場合は、語彙にない単語をモデルから取り除く ###
+        if vocabulary_pruner is not None:
+            word_score_model = [score_object for score_object in word_score_model if vocabulary_pruner.is_kept(score_object['word'])]
+        ### モデル辞書ファイルを変形; ついでにcache dictにしておく ###
+        dict_word_model = reformat_dictionary(score_dictionary=word_score_model)
+    ### 単語 x ラベルのスコア行列にしておく; 文書ごとのスコア計算が行の足し算だけになる ###
+    dict_word_model = ScoreMatrixScorer.from_word_score_dictionary(dict_word_model)
+
+    ### wikipediaリードテキストに対する評価; 全ラベルの順位を残しておき、どのkの評価にも使う ###
+    seq_gold_label = []  # type: List[str]
+    seq_ranked_result = []  # type: List[List[Tuple[str, float]]]
+    seq_evaluation_a, seq_evaluation_b = itertools.tee(seq_evaluation_data)
+    seq_batch_result = classify_batch(seq_text=(evaluation_obj['text'] for evaluation_obj in seq_evaluation_b),
+                                      word_score_model=dict_word_model,
+                                      pos_condition=pos_condition,
+                                      batch_tokenizer=batch_tokenizer,
+                                      tokenizer_obj=tokenizer_obj,
+                                      k=None,
+                                      tokenization_cache=tokenization_cache,
+                                      vocabulary_pruner=vocabulary_pruner)
+    for evaluation_obj, seq_score_tuple in zip(seq_evaluation_a, seq_batch_result):
+        seq_gold_label.append(evaluation_obj['gold_label'])
+        seq_ranked_result.append(seq_score_tuple)
+        seq_category_name = [category_name for category_name, _ in seq_score_tuple]
+        gold_rank = seq_category_name.index(evaluation_obj['gold_label']) + 1 if evaluation_obj['gold_label'] in seq_category_name else None
+        logger.info(msg='Page-name={} -> Gold-rank={}, Score = {}'.format(evaluation_obj['page_title'],
+                                                                          gold_rank,
+                                                                          seq_score_tuple[:max(seq_k)]))
+
+    ### 評価の統計値算出; 保存した順位から全てのkについて計算する ###
+    evaluation_result = EvaluationResult.from_ranked_results(seq_gold_label, seq_ranked_result, labels=dict_word_model.labels)
+    log_evaluation_result(evaluation_result, seq_k)
+    if path_evaluation_report is not None:
+        with open(path_evaluation_report, 'w') as f:
+            f.write(json.dumps(evaluation_result.to_dict(seq_k), ensure_ascii=False, indent=4))
+    return evaluation_result
 
 
 if __name__ == '__main__':
+    from JapaneseTokenizer import MecabWrapper
     ### MecabWrapperを作る ###
     mecab_obj = MecabWrapper(dictType='ipadic', path_mecab_config='/usr/local/bin/')
     ### 取得したい品詞だけを定義する ###
     pos_condition = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
 
-    ### スコアモデルデータを読み込み ###
+    ### スコアモデルデータを読み込み; バイナリモデルがあればmmapで開く(パース不要なので大きなモデルでもすぐに使える) ###
+    path_word_model_bin = './models/word_score_soa.bin'
     path_word_model_json = './models/word_score_soa.json'
-    with open(path_word_model_json, 'r') as f:
-        word_score_model = json.load(f)
-
-    ### 評価用文書の読み込み ###
-    path_evaluation_document = './wikipedia_data/wikipedia-evaluation-full.json'
-    with open(path_evaluation_document, 'r') as f:
-        seq_evaluation_data = json.loads(f.read())
-
-    main(word_score_model=word_score_model,
-         seq_evaluation_data=seq_evaluation_data,
-         tokenizer_obj=mecab_obj,
-         pos_condition=pos_condition,
-         ranking_evaluation=1)
-    main(word_score_model=word_score_model,
-         seq_evaluation_data=seq_evaluation_data,
-         tokenizer_obj=mecab_obj,
-         pos_condition=pos_condition,
-         ranking_evaluation=3)
+    if os.path.exists(path_word_model_bin):
+        word_score_model = BinaryScoreModel(path_word_model_bin)
+    else:
+        with open(path_word_model_json, 'r') as f:
+            word_score_model = json.load(f)
+
+    ### 学習時に絞り込んだ語彙を読み込み; 学習と同じ特徴量で分類する ###
+    path_vocabulary_file = './models/vocabulary.json'
+    vocabulary_pruner = VocabularyPruner.load(path_vocabulary_file) if os.path.exists(path_vocabulary_file) else None
+
+    ### 評価用文書の読み込み; 1文書ずつ遅延読み込みする ###
+    path_evaluation_document = './wikipedia_data/wikipedia-evaluation-full.jsonl'
+    seq_evaluation_data = Corpus(path_evaluation_document)
+
+    ### 形態素分割はCPUコア数分のプロセスで並列に実行し、結果をキャッシュする ###
+    ### 評価文書は1回だけスコアリングし、rank=1とrank=3の評価をまとめて計算する ###
+    tokenization_cache = TokenizationCache('./wikipedia_data/tokenization_cache.sqlite3')
+    with BatchTokenizer(tokenizer_kwargs={'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}) as batch_tokenizer:
+        main(word_score_model=word_score_model,
+             seq_evaluation_data=seq_evaluation_data,
+             tokenizer_obj=mecab_obj,
+             pos_condition=pos_condition,
+             ranking_evaluation=[1, 3],
+             tokenization_cache=tokenization_cache,
+             vocabulary_pruner=vocabulary_pruner,
+             batch_tokenizer=batch_tokenizer,
+             path_evaluation_report='./models/evaluation_report.json')
+    tokenization_cache.close()
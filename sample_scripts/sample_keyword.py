@@ -1,11 +1,16 @@
-from JapaneseTokenizer import MecabWrapper
-from DocumentFeatureSelection import interface
-from DocumentFeatureSelection.models import PersistentDict
-from typing import List, Tuple, Dict, Union, Any
-from sqlitedict import SqliteDict
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator
+from sample_scripts.corpus_io import Corpus
+from sample_scripts.tokenizer_cache import TokenizationCache
+from sample_scripts.batch_tokenizer import BatchTokenizer
+from sample_scripts.token_corpus import TokenCorpus
+from sample_scripts.label_document_store import LabelDocumentStore
+from sample_scripts.ngram_features import NgramFeatureSet, extract_ngram_features
+from sample_scripts.incremental_soa import IncrementalSOAScorer
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+from sample_scripts.binary_model import write_binary_model
+from sample_scripts import instrumentation
 import json
 import logging
-import nltk
 import tempfile
 import os
 logger = logging.getLogger()
@@ -21,23 +26,107 @@ __author__ = "Kensuke Mitsuzawa"
 __author_email__ = "kensuke.mit@gmail.com"
 __license_name__ = "MIT"
 
+### JapaneseTokenizer, DocumentFeatureSelection, sqlitedict, nltkは使う関数の中で読み込む. Mecabのない環境でもimportできるように ###
+
 
 def tokenize_text(input_text:str,
-                  tokenizer_obj:MecabWrapper,
-                  pos_condition:List[Tuple[str,...]])->List[str]:
+                  tokenizer_obj:'MecabWrapper',
+                  pos_condition:List[Tuple[str,...]],
+                  is_surface:bool=False,
+                  tokenization_cache:TokenizationCache=None)->List[str]:
     """* What you can do
     - １文書に対して、形態素分割を実施する
+    - tokenization_cacheを与えると、同じテキスト・同じ設定の形態素分割はキャッシュから返します。
     """
+    if tokenization_cache is not None:
+        return tokenization_cache.get_or_tokenize(input_text, tokenizer_obj, pos_condition, is_surface=is_surface)
     ### 形態素分割;tokenize() -> 品詞フィルタリング;filter() -> List[str]に変換;convert_list_object()
-    return tokenizer_obj.tokenize(input_text).filter(pos_condition=pos_condition).convert_list_object()
     ### 原型(辞書系)に変換せず、活用された状態のまま、欲しい場合は is_surface=True のフラグを与える
-    #return tokenizer_obj.tokenize(input_text, is_surface=True).filter(pos_condition=pos_condition).convert_list_object()
+    with instrumentation.span('tokenize'):
+        return tokenizer_obj.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
+
+
+def iter_tokenized_documents(tokenizer_obj:'MecabWrapper',
+                             seq_text_data:Union[Iterable[Dict[str,Any]], TokenCorpus],
+                             pos_condition:List[Tuple[str,...]],
+                             tokenization_cache:TokenizationCache=None,
+                             batch_tokenizer:BatchTokenizer=None)->Iterator[Tuple[Dict[str,Any], List[str]]]:
+    """* What you can do
+    - (文書, トークン列)をyieldします。
+    - batch_tokenizerを与えると、複数プロセスで並列に形態素分割します。与えない場合はtokenizer_objで1文書ずつ形態素分割します。
+    - seq_text_dataが形態素分割済みのTokenCorpusの場合は、形態素分割せずに({'gold_label': ラベル}, トークン列)をyieldします。
+    """
+    if isinstance(seq_text_data, TokenCorpus):
+        return (({'gold_label': label_name}, seq_tokens) for label_name, seq_tokens in seq_text_data.iter_documents())
+    if batch_tokenizer is not None:
+        return batch_tokenizer.iter_tokenized_documents(seq_text_data, pos_condition=pos_condition, tokenization_cache=tokenization_cache)
+    return (
+        (wiki_document_obj, tokenize_text(input_text=wiki_document_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition,
+                                          tokenization_cache=tokenization_cache))
+        for wiki_document_obj in seq_text_data
+    )
+
+
+def open_cached_dict(engine:str='LabelDocumentStore')->Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict']:
+    """* What you can do
+    - ディスク上に {'ラベル名': [ [特徴量] ]} を展開するための、dictと互換性のあるオブジェクトを作ります。
+    - engineは'LabelDocumentStore', 'PersistentDict', 'SqliteDict'のいずれかです。
+
+    * Tips
+    - sqliteDictはsqliteベースのキャッシュdict, PersistentDictはjsonベースのキャッシュdictです。
+    - どちらも1文書追加するたびにラベルの文書リスト全体を読み書きするので、文書数が増えると遅くなります。
+    - LabelDocumentStoreはラベルごとのファイルに追記するだけなので、文書数が増えても追加の速度は変わりません。
+    """
+    ### tempfile.mkdtemp()はシステム一時ディレクトリ（たいていは/var/tmp/以下のどこか）を作ってくれます。
+    ### システムが定期的にディレクトリごと削除してくれるので、一時ファイル生成に適しています。
+    path_cached_dict = os.path.join(tempfile.mkdtemp(), 'cached_dict')
+    if engine == 'LabelDocumentStore':
+        return LabelDocumentStore(path_store_dir=path_cached_dict)
+    elif engine == 'PersistentDict':
+        from DocumentFeatureSelection.models import PersistentDict
+        return PersistentDict(filename=path_cached_dict)
+    elif engine == 'SqliteDict':
+        from sqlitedict import SqliteDict
+        ### 1文書ごとにcommitすると遅いので、close_cached_dict()でまとめてcommitする ###
+        return SqliteDict(filename=path_cached_dict, autocommit=False)
+    else:
+        raise ValueError('engine must be either of LabelDocumentStore, PersistentDict or SqliteDict. Got {}'.format(engine))
+
+
+def append_document(cached_dict:Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict'],
+                    label_name:str,
+                    seq_features:List[Any])->None:
+    """* What you can do
+    - ラベルの文書リストに1文書を追加します。
+    - SqliteDictは cached_dict[label_name] のたびにコピーを返すので、append()しただけでは保存されません。追加したリストを書き戻します。
+    """
+    if isinstance(cached_dict, LabelDocumentStore):
+        cached_dict.append(label_name, seq_features)
+    elif label_name not in cached_dict:
+        cached_dict[label_name] = [seq_features]
+    else:
+        seq_documents = cached_dict[label_name]
+        seq_documents.append(seq_features)
+        cached_dict[label_name] = seq_documents
+
 
+def close_cached_dict(cached_dict:Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict'])->None:
+    if isinstance(cached_dict, LabelDocumentStore):
+        cached_dict.flush()
+        return
+    from sqlitedict import SqliteDict
+    if isinstance(cached_dict, SqliteDict):
+        cached_dict.commit()
+        cached_dict.close()
 
-def construct_cached_dict(tokenizer_obj:MecabWrapper,
-                          seq_text_data:List[Dict[str,Any]],
+
+def construct_cached_dict(tokenizer_obj:'MecabWrapper',
+                          seq_text_data:Union[Iterable[Dict[str,Any]], TokenCorpus],
                           pos_condition:List[Tuple[str,...]],
-                          engine:str='PersistentDict')->Union[PersistentDict, SqliteDict]:
+                          engine:str='LabelDocumentStore',
+                          tokenization_cache:TokenizationCache=None,
+                          batch_tokenizer:BatchTokenizer=None,
+                          vocabulary_pruner:VocabularyPruner=None)->Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict']:
     """* What you can do
     - wikipediaテキスト形態素分割して、DocumentFeatureSelectionの入力フォーマットを整えます。
     - dictと互換性のあるクラスを使って、ディクス上にデータを展開します。
@@ -49,73 +138,121 @@ def construct_cached_dict(tokenizer_obj:MecabWrapper,
         >>> {'映画': [ ['スターウォーズ', 'おもしろい'], ['インディ・ジョーンズ', 'クソワロ'] ]}
 
     * Tips
-    - 今回は、if __name__ == '__main__': で json -> dict しているので、この時点でデータの大部分がメモリ上に展開されてしまっています。
-    - なので、この関数は「サンプル」ということで、今回のケースではそれほど、大きな意味はありません。
-    - DBからfetchするときなど、一気にfetchせずに、generatorオブジェクトを使いながら、DB -> cached dictの手順でメモリに載せるデータを少なくすると効果的です。
+    - seq_text_dataにはcorpus_io.Corpusを渡せます。1文書ずつファイルから読むので、文書全体がメモリに載ることはありません。
+    - DBからfetchするときなども同様に、一気にfetchせずに、generatorオブジェクトを使いながら、DB -> cached dictの手順でメモリに載せるデータを少なくすると効果的です。
+    - 文書数が多い場合はbatch_tokenizerを与えると、形態素分割をCPUコア数分並列に実行します。
+    - 形態素分割済みのTokenCorpusを渡すと、形態素分割を省略します。
+    - engineのデフォルトはLabelDocumentStoreです。詳しくはopen_cached_dict()を見てください。
+    - fit済みのvocabulary_prunerを与えると、語彙にない単語を取り除いてから保存します。
     """
-    """sqliteDictはsqliteベースのキャッシュdict, PersistentDictはjsonベースのキャッシュdict
-    sqliteDictの方が定期的にメンテナンスされていますが、PersistentDictの方が速度が早いです。"""
-    ### tempfile.mkdtemp()はシステム一時ディレクトリ（たいていは/var/tmp/以下のどこか）を作ってくれます。
-    ### システムが定期的にディレクトリごと削除してくれるので、一時ファイル生成に適しています。
-    path_cached_dict = os.path.join(tempfile.mkdtemp(), 'cached_dict')
-    if engine == 'PersistentDict':
-        cached_dict = PersistentDict(filename=path_cached_dict)
-    else:
-        cached_dict = SqliteDict(filename=path_cached_dict, autocommit=Tuple)
+    with instrumentation.span('construct_cached_dict'):
+        cached_dict = open_cached_dict(engine)
 
-    for wiki_document_obj in seq_text_data:
-        seq_tokens_wiki_document = tokenize_text(input_text=wiki_document_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition)
-        label_name = wiki_document_obj['gold_label']
+        seq_tokenized_document = iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition,
+                                                          tokenization_cache=tokenization_cache,
+                                                          batch_tokenizer=batch_tokenizer)
+        for wiki_document_obj, seq_tokens_wiki_document in seq_tokenized_document:
+            label_name = wiki_document_obj['gold_label']
+            if vocabulary_pruner is not None:
+                seq_tokens_wiki_document = vocabulary_pruner.transform(seq_tokens_wiki_document)
 
-        if label_name not in cached_dict:
-            cached_dict[label_name] = [seq_tokens_wiki_document]
-        else:
-            cached_dict[label_name].append(seq_tokens_wiki_document)
+            append_document(cached_dict, label_name, seq_tokens_wiki_document)
+            instrumentation.increment('construct_cached_dict.documents')
+            instrumentation.increment('construct_cached_dict.tokens', len(seq_tokens_wiki_document))
 
-    if isinstance(cached_dict, SqliteDict):
-        cached_dict.close()
+        close_cached_dict(cached_dict)
 
     ### printを実行してみると、cache dictが通常のdictと同じインターフェースを持っていることが確認できます。
     #print(cached_dict)
     return cached_dict
 
 
-def construct_ngram_cached_dict(tokenizer_obj:MecabWrapper,
-                                seq_text_data:List[Dict[str,Any]],
+def construct_ngram_cached_dict(tokenizer_obj:'MecabWrapper',
+                                seq_text_data:Union[Iterable[Dict[str,Any]], TokenCorpus],
                                 pos_condition:List[Tuple[str,...]],
                                 n_value:int=2,
-                                engine:str='PersistentDict')->Union[PersistentDict, SqliteDict]:
+                                engine:str='LabelDocumentStore',
+                                tokenization_cache:TokenizationCache=None,
+                                batch_tokenizer:BatchTokenizer=None)->Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict']:
     """* What you can do
     - 基本的にconstruct_cached_dict()と同じです。
     - 単語でなく、「フレーズ」で入力データを作成します。
         - フレーズに拡張すると、「単語」では失われていた意味が見える・・・可能性があります。
     """
-    path_cached_dict = os.path.join(tempfile.mkdtemp(), 'cached_dict')
-    if engine == 'PersistentDict':
-        cached_dict = PersistentDict(filename=path_cached_dict)
-    else:
-        cached_dict = SqliteDict(filename=path_cached_dict, autocommit=Tuple)
+    import nltk
+    with instrumentation.span('construct_ngram_cached_dict'):
+        cached_dict = open_cached_dict(engine)
 
-    for wiki_document_obj in seq_text_data:
-        seq_tokens_wiki_document = tokenize_text(input_text=wiki_document_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition)
-        ### n-gramの作成 ###
-        seq_ngram_wiki_document = list(nltk.ngrams(sequence=seq_tokens_wiki_document, n=n_value))
-        label_name = wiki_document_obj['gold_label']
+        seq_tokenized_document = iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition,
+                                                          tokenization_cache=tokenization_cache,
+                                                          batch_tokenizer=batch_tokenizer)
+        for wiki_document_obj, seq_tokens_wiki_document in seq_tokenized_document:
+            ### n-gramの作成 ###
+            seq_ngram_wiki_document = list(nltk.ngrams(sequence=seq_tokens_wiki_document, n=n_value))
+            label_name = wiki_document_obj['gold_label']
 
-        if label_name not in cached_dict:
-            cached_dict[label_name] = [seq_ngram_wiki_document]
-        else:
-            cached_dict[label_name].append(seq_ngram_wiki_document)
+            append_document(cached_dict, label_name, seq_ngram_wiki_document)
+            instrumentation.increment('construct_ngram_cached_dict.documents')
+            instrumentation.increment('construct_ngram_cached_dict.ngrams', len(seq_ngram_wiki_document))
 
-    if isinstance(cached_dict, SqliteDict):
-        cached_dict.close()
+        close_cached_dict(cached_dict)
 
     ### printを実行してみると、cache dictが通常のdictと同じインターフェースを持っていることが確認できます。
     #print(cached_dict)
     return cached_dict
 
 
-def run_feature_selection(tokenized_documents:Union[SqliteDict, PersistentDict],
+def construct_multi_ngram_cached_dicts(tokenizer_obj:'MecabWrapper',
+                                       seq_text_data:Union[Iterable[Dict[str,Any]], TokenCorpus],
+                                       pos_condition:List[Tuple[str,...]],
+                                       seq_n_value:Iterable[int]=(1, 2, 3),
+                                       hash_bits:int=None,
+                                       min_count:int=1,
+                                       lossy_count_epsilon:float=None,
+                                       engine:str='LabelDocumentStore',
+                                       tokenization_cache:TokenizationCache=None,
+                                       batch_tokenizer:BatchTokenizer=None,
+                                       vocabulary_pruner:VocabularyPruner=None)->Dict[int, Union[LabelDocumentStore, 'PersistentDict', 'SqliteDict']]:
+    """* What you can do
+    - construct_ngram_cached_dict()を複数の次数でまとめて実行します。
+    - 形態素分割・n-gramの抽出は1回だけで、全ての次数のn-gramを同時に取り出します。
+    - n-gramは抽出中は整数IDで保持し、cached dictに書き込むときに特徴量に戻します。
+
+    * Params
+    - seq_n_value: n-gramの次数。1を含めると単語の特徴量も作ります。
+    - hash_bits: 与えると、n-gramをハッシュ値のIDで扱います。特徴量は '#ngram:ID' の文字列になります。詳しくはngram_features.NgramExtractorを見てください。
+    - min_count, lossy_count_epsilon: まれなn-gramを捨てる条件です。詳しくはngram_features.NgramFeatureSetを見てください。
+    - vocabulary_pruner: fit済みのVocabularyPrunerを与えると、語彙にない単語を含むn-gramを捨てます。hash_bitsとは併用できません。
+
+    * Output
+    - {次数: cached dict}
+        >>> {1: {'映画': [ ['スターウォーズ', 'おもしろい'] ]}, 2: {'映画': [ [('スターウォーズ', 'おもしろい')] ]}}
+    """
+    if vocabulary_pruner is not None and hash_bits is not None:
+        raise ValueError('vocabulary_pruner can not be used with hash_bits. Hashed n-grams can not be decoded into words.')
+    seq_tokenized_document = iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition,
+                                                      tokenization_cache=tokenization_cache,
+                                                      batch_tokenizer=batch_tokenizer)
+    ngram_feature_set = extract_ngram_features(
+        ((wiki_document_obj['gold_label'], seq_tokens) for wiki_document_obj, seq_tokens in seq_tokenized_document),
+        seq_n_value=seq_n_value,
+        hash_bits=hash_bits,
+        min_count=min_count,
+        lossy_count_epsilon=lossy_count_epsilon)
+
+    ngram_cached_dicts = {}
+    for n_value in ngram_feature_set.seq_n_value:
+        cached_dict = open_cached_dict(engine)
+        for label_name, seq_feature in ngram_feature_set.iter_documents(n_value):
+            if vocabulary_pruner is not None:
+                seq_feature = vocabulary_pruner.transform(seq_feature)
+            append_document(cached_dict, label_name, seq_feature)
+        close_cached_dict(cached_dict)
+        ngram_cached_dicts[n_value] = cached_dict
+    return ngram_cached_dicts
+
+
+def run_feature_selection(tokenized_documents:Union['SqliteDict', 'PersistentDict', TokenCorpus, LabelDocumentStore],
                           selection_method:str='soa'):
     """* What you can do
     - 特徴量抽出を実行します。
@@ -124,59 +261,160 @@ def run_feature_selection(tokenized_documents:Union[SqliteDict, PersistentDict],
         - マイナス∞ から プラス∞の値を取ります。
         - マイナスは「ラベルと関係性が低い」、プラスは「ラベルと関係が深い」と解釈できます。
         - [注意] soaでは、「すべてのラベルに共通した単語」しか重み付けをすることができません。いずれかのラベルで頻度が0の場合、その単語重みは0になります。
+    - TokenCorpusを渡した場合は、DocumentFeatureSelectionの入力フォーマットに変換してから実行します。
+    - LabelDocumentStoreは読み出し専用のMappingなので、cached dictと同じくそのまま渡します。
     """
-    score_result_obj = interface.run_feature_selection(input_dict=tokenized_documents,
-                                                       method=selection_method,
-                                                       use_cython=True,  # 計算にcythonを利用する可否。cythonを使うと50倍~200倍近く早くなります。
-                                                       is_use_cache=True,  # データが大規模すぎる場合にTrueにします。中間データをメモリでなくディスクに載せます
-                                                       is_use_memmap=True  # データが大規模すぎる場合にTrueにします。中間データをメモリでなくディスクに載せます
-                                                       )
-    assert isinstance(score_result_obj, interface.ScoredResultObject)
-    """戻り値はinterface.ScoredResultObject, 計算の過程で利用したmatrixオブジェクトなどが格納されています。"""
-    # 重み行列が必要な人はアトリビュートにアクセスすると内容を取得できます。
-    #print(score_result_obj.scored_matrix)  # 重み行列(scipy.sparse.csr_matrix)
-    # 重み行列とか興味ない人はScoreMatrix2ScoreDictionary()メソッドを実行します。
-    # レコード状のタプルオブジェクトが、重みが大きい順にソートされて、返却されます。
-    seq_score_dict = score_result_obj.ScoreMatrix2ScoreDictionary()
+    from DocumentFeatureSelection import interface
+    if isinstance(tokenized_documents, TokenCorpus):
+        tokenized_documents = tokenized_documents.to_label_documents()
+    with instrumentation.span('feature_selection'):
+        score_result_obj = interface.run_feature_selection(input_dict=tokenized_documents,
+                                                           method=selection_method,
+                                                           use_cython=True,  # 計算にcythonを利用する可否。cythonを使うと50倍~200倍近く早くなります。
+                                                           is_use_cache=True,  # データが大規模すぎる場合にTrueにします。中間データをメモリでなくディスクに載せます
+                                                           is_use_memmap=True  # データが大規模すぎる場合にTrueにします。中間データをメモリでなくディスクに載せます
+                                                           )
+        assert isinstance(score_result_obj, interface.ScoredResultObject)
+        """戻り値はinterface.ScoredResultObject, 計算の過程で利用したmatrixオブジェクトなどが格納されています。"""
+        # 重み行列が必要な人はアトリビュートにアクセスすると内容を取得できます。
+        #print(score_result_obj.scored_matrix)  # 重み行列(scipy.sparse.csr_matrix)
+        # 重み行列とか興味ない人はScoreMatrix2ScoreDictionary()メソッドを実行します。
+        # レコード状のタプルオブジェクトが、重みが大きい順にソートされて、返却されます。
+        seq_score_dict = score_result_obj.ScoreMatrix2ScoreDictionary()
+    instrumentation.increment('feature_selection.records', len(seq_score_dict))
     print(seq_score_dict[:5])
 
     return seq_score_dict
 
 
-def main(tokenizer_obj:MecabWrapper,
-         seq_text_data:List[Dict[str,Any]],
-         pos_condition:List[Tuple[str,...]]):
+def update_word_score_model(tokenizer_obj:'MecabWrapper',
+                            seq_added_text_data:Iterable[Dict[str,Any]],
+                            pos_condition:List[Tuple[str,...]],
+                            seq_removed_text_data:Iterable[Dict[str,Any]]=None,
+                            path_scorer_state:str='./models/soa_scorer_state.json',
+                            path_word_score:str='./models/word_score_soa.json',
+                            tokenization_cache:TokenizationCache=None,
+                            batch_tokenizer:BatchTokenizer=None,
+                            vocabulary_pruner:VocabularyPruner=None,
+                            path_vocabulary_file:str='./models/vocabulary.json')->IncrementalSOAScorer:
+    """* What you can do
+    - 追加・削除された文書だけを形態素分割し、単語のSOAスコアを差分で更新して word_score_soa.json と word_score_soa.bin を書き直します。
+    - 集計はpath_scorer_stateに保存します。初回(ファイルがない場合)は空の状態から始めるので、全文書を seq_added_text_data に渡してください。
+    - seq_removed_text_dataには、以前に追加した文書をそのまま渡してください。
+    - vocabulary_prunerを与えると、更新後の文書頻度の集計から語彙を決め直してpath_vocabulary_fileに保存し、語彙にない単語のスコアを捨てます。
+    - vocabulary_prunerを与えない場合、前回の学習の語彙ファイルは今のモデルと合わないので削除します。
+        - 残しておくと、分類時に更新で増えた単語が語彙にないとして捨てられてしまいます。
+
+    >>> update_word_score_model(mecab_obj, Corpus('./wikipedia_data/wikipedia-full-new.jsonl'), pos_condition)
+    """
+    if os.path.exists(path_scorer_state):
+        scorer = IncrementalSOAScorer.load(path_scorer_state)
+    else:
+        scorer = IncrementalSOAScorer()
+
+    for seq_text_data, update_function in ((seq_added_text_data, scorer.add_document),
+                                           (seq_removed_text_data, scorer.remove_document)):
+        if seq_text_data is None:
+            continue
+        seq_tokenized_document = iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition,
+                                                          tokenization_cache=tokenization_cache,
+                                                          batch_tokenizer=batch_tokenizer)
+        for wiki_document_obj, seq_tokens in seq_tokenized_document:
+            update_function(wiki_document_obj['gold_label'], seq_tokens)
+
+    scorer.save(path_scorer_state)
+    seq_word_score_object = scorer.get_score_records()
+    if vocabulary_pruner is not None:
+        ### SOAは単語ごとに文書頻度とラベルの文書数だけで決まるので、後から単語を捨てても残った単語のスコアは変わらない ###
+        vocabulary_pruner.fit_document_frequency(scorer.document_frequency, scorer.n_documents)
+        vocabulary_pruner.save(path_vocabulary_file)
+        seq_word_score_object = [score_record for score_record in seq_word_score_object
+                                 if vocabulary_pruner.is_kept(score_record['word'])]
+    elif os.path.exists(path_vocabulary_file):
+        logger.warning('Removed {} because it was made for the previous model.'.format(path_vocabulary_file))
+        os.remove(path_vocabulary_file)
+    logger.info('Updated word score model. N(document)={}, N(record)={}'.format(scorer.n_documents, len(seq_word_score_object)))
+    with open(path_word_score, 'w') as f:
+        f.write(json.dumps(seq_word_score_object, ensure_ascii=False))
+    write_binary_model(seq_word_score_object, os.path.splitext(path_word_score)[0] + '.bin')
+    return scorer
+
+
+def main(tokenizer_obj:'MecabWrapper',
+         seq_text_data:Iterable[Dict[str,Any]],
+         pos_condition:List[Tuple[str,...]],
+         tokenization_cache:TokenizationCache=None,
+         batch_tokenizer:BatchTokenizer=None,
+         vocabulary_pruner:VocabularyPruner=None,
+         path_vocabulary_file:str='./models/vocabulary.json'):
+    """* What you can do
+    - 単語・フレーズで特徴量抽出を実施し、単語のスコアをモデルとして保存します。
+    - tokenization_cacheを与えると、2回目以降の実行では形態素分割の結果をキャッシュから読みます。
+    - batch_tokenizerを与えると、形態素分割を複数プロセスで並列に実行します。
+    - 形態素分割は1回だけ実行し、結果は整数IDの配列(TokenCorpus)で保持します。単語・フレーズの両方で使い回します。
+    - 単語・フレーズの特徴量は、TokenCorpusを1回なめるだけで同時に作ります。
+    - vocabulary_prunerを与えると、特徴量抽出の前に語彙を絞り込み、語彙をpath_vocabulary_fileに保存します。
+        - sample_category_classification.pyは同じ語彙ファイルを読み込んで、分類時の特徴量を揃えます。
+    - vocabulary_prunerを与えない場合は全ての単語を使い、前回の学習の語彙ファイルが残っていれば削除します。
+    """
+    # ------------------------------------------------------------------------
+    # 形態素分割; 結果はTokenCorpusにコンパクトに保持する
+    seq_tokenized_document = iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition,
+                                                      tokenization_cache=tokenization_cache,
+                                                      batch_tokenizer=batch_tokenizer)
+    token_corpus = TokenCorpus.from_tokenized_documents(
+        (wiki_document_obj['gold_label'], seq_tokens) for wiki_document_obj, seq_tokens in seq_tokenized_document)
+    logger.info('Tokenized N(document)={}, N(token)={}, N(vocabulary)={}'.format(len(token_corpus),
+                                                                                token_corpus.n_tokens,
+                                                                                len(token_corpus.words)))
+    # ------------------------------------------------------------------------
+    # 語彙の絞り込み; まれな単語・どの文書にも出てくる単語を特徴量抽出に渡さない
+    if vocabulary_pruner is not None:
+        vocabulary_pruner.fit(token_corpus.iter_documents())
+        vocabulary_pruner.save(path_vocabulary_file)
+    elif os.path.exists(path_vocabulary_file):
+        logger.warning('Removed {} because it was made for the previous model.'.format(path_vocabulary_file))
+        os.remove(path_vocabulary_file)
+    # ------------------------------------------------------------------------
+    # 単語(1-gram)とフレーズ(2-gram)の入力データを、1回のループでまとめて作る
+    ngram_cached_dicts = construct_multi_ngram_cached_dicts(tokenizer_obj=tokenizer_obj,
+                                                            seq_text_data=token_corpus,
+                                                            pos_condition=pos_condition,
+                                                            seq_n_value=(1, 2),
+                                                            vocabulary_pruner=vocabulary_pruner)
     # ------------------------------------------------------------------------
     # 単語で特徴量抽出の場合
-    cached_dict = construct_cached_dict(tokenizer_obj=tokenizer_obj,
-                                        seq_text_data=seq_text_data,
-                                        pos_condition=pos_condition)
-    seq_word_score_object = run_feature_selection(tokenized_documents=cached_dict)
+    seq_word_score_object = run_feature_selection(tokenized_documents=ngram_cached_dicts[1])
 
     # ------------------------------------------------------------------------
     # フレーズで特徴量抽出の場合
-    ngram_cached_dict = construct_ngram_cached_dict(tokenizer_obj=tokenizer_obj,
-                                                    seq_text_data=seq_text_data,
-                                                    pos_condition=pos_condition,
-                                                    n_value=2)
-    seq_ngram_score_object = run_feature_selection(tokenized_documents=ngram_cached_dict)
+    seq_ngram_score_object = run_feature_selection(tokenized_documents=ngram_cached_dicts[2])
     # ------------------------------------------------------------------------
     # 別のタスクの利用するので、単語の特徴量抽出は結果を保存しておきます
     with open('./models/word_score_soa.json', 'w') as f:
         f.write(json.dumps(seq_word_score_object, ensure_ascii=False))
+    ### 分類ではmmapで読み込めるバイナリ形式を使います。jsonのパースと辞書の組み替えが不要になります ###
+    write_binary_model(seq_word_score_object, './models/word_score_soa.bin')
 
 if __name__ == '__main__':
+    from JapaneseTokenizer import MecabWrapper
     ### MecabWrapperを作る ###
     mecab_obj = MecabWrapper(dictType='ipadic', path_mecab_config='/usr/local/bin/')
     ### 取得したい品詞だけを定義する ###
     pos_condition = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
 
-    ### wikipedia fullデータを読み込み ###
+    ### wikipedia fullデータを読み込み; 1文書ずつ遅延読み込みする ###
     print('=' * 50)
-    path_wikipedia_full_json = './wikipedia_data/wikipedia-full.json'
-    with open(path_wikipedia_full_json, 'r') as f:
-        seq_wiki_full_text = json.load(f)
+    path_wikipedia_full_jsonl = './wikipedia_data/wikipedia-full.jsonl'
+    seq_wiki_full_text = Corpus(path_wikipedia_full_jsonl)
 
-    main(tokenizer_obj=mecab_obj,
-         pos_condition=pos_condition,
-         seq_text_data=seq_wiki_full_text)
+    ### 形態素分割の結果をキャッシュする。2回目以降の実行ではMecabを呼び出さない ###
+    ### 形態素分割はCPUコア数分のプロセスで並列に実行する。各プロセスが自分のMecabWrapperを作る ###
+    with TokenizationCache('./wikipedia_data/tokenization_cache.sqlite3') as tokenization_cache, \
+            BatchTokenizer(tokenizer_kwargs={'dictType': 'ipadic', 'path_mecab_config': '/usr/local/bin/'}) as batch_tokenizer:
+        main(tokenizer_obj=mecab_obj,
+             pos_condition=pos_condition,
+             seq_text_data=seq_wiki_full_text,
+             tokenization_cache=tokenization_cache,
+             batch_tokenizer=batch_tokenizer)
+        ### 語彙を絞り込む場合は vocabulary_pruner=VocabularyPruner(min_df=2, max_df=0.95) のように与える ###
@@ -1,8 +1,13 @@
-from JapaneseTokenizer import MecabWrapper
-from typing import List, Tuple, Dict, Union, Any
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator
+from sample_scripts.corpus_io import Corpus
+from sample_scripts.tokenizer_cache import TokenizationCache
+from sample_scripts.batch_tokenizer import BatchTokenizer
+from sample_scripts.token_corpus import TokenCorpus
+from sample_scripts.counting_sketch import FrequencySketch, LabeledFrequencySketch
 import json
 import logging
 import collections
+import heapq
 import itertools
 logger = logging.getLogger()
 logger.setLevel(10)
@@ -19,110 +24,230 @@ __license_name__ = "MIT"
 
 
 def tokenize_text(input_text:str,
-                  tokenizer_obj:MecabWrapper,
-                  pos_condition:List[Tuple[str,...]])->List[str]:
+                  tokenizer_obj:'MecabWrapper',
+                  pos_condition:List[Tuple[str,...]],
+                  is_surface:bool=False,
+                  tokenization_cache:TokenizationCache=None)->List[str]:
     """* What you can do
     - １文書に対して、形態素分割を実施する
+    - tokenization_cacheを与えると、同じテキスト・同じ設定の形態素分割はキャッシュから返します。
     """
+    if tokenization_cache is not None:
+        return tokenization_cache.get_or_tokenize(input_text, tokenizer_obj, pos_condition, is_surface=is_surface)
     ### 形態素分割;tokenize() -> 品詞フィルタリング;filter() -> List[str]に変換;convert_list_object()
-    return tokenizer_obj.tokenize(input_text).filter(pos_condition=pos_condition).convert_list_object()
     ### 原型(辞書系)に変換せず、活用された状態のまま、欲しい場合は is_surface=True のフラグを与える
-    #return tokenizer_obj.tokenize(input_text, is_surface=True).filter(pos_condition=pos_condition).convert_list_object()
+    return tokenizer_obj.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
 
 
-def aggregate_words(seq_tokenized:List[List[str]])->collections.Counter:
+def iter_tokenized_documents(tokenizer_obj:'MecabWrapper',
+                             seq_text_data:Iterable[Dict[str,Any]],
+                             pos_condition:List[Tuple[str,...]],
+                             tokenization_cache:TokenizationCache=None,
+                             batch_tokenizer:BatchTokenizer=None)->Iterator[Tuple[Dict[str,Any], List[str]]]:
+    """* What you can do
+    - (文書, トークン列)をyieldします。
+    - batch_tokenizerを与えると、複数プロセスで並列に形態素分割します。与えない場合はtokenizer_objで1文書ずつ形態素分割します。
+    """
+    if batch_tokenizer is not None:
+        return batch_tokenizer.iter_tokenized_documents(seq_text_data, pos_condition=pos_condition, tokenization_cache=tokenization_cache)
+    return (
+        (wiki_text_obj, tokenize_text(input_text=wiki_text_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition,
+                                      tokenization_cache=tokenization_cache))
+        for wiki_text_obj in seq_text_data
+    )
+
+
+def aggregate_words(seq_tokenized:Union[Iterable[List[str]], TokenCorpus])->collections.Counter:
     """* What you can do
     - 形態素の集計カウントを実施する
 
     * Params
     - seq_tokenized
         >>> [['スター・ウォーズ', 'エピソード4', '新たなる希望', 'スター・ウォーズ', 'エピソード4', 'なる', 'きぼう', 'STAR WARS', 'IV', 'A NEW HOPE', '1977年', 'する', 'アメリカ映画']]
+        - TokenCorpusも渡せます。その場合は単語IDの配列のまま数えます。
 
     """
+    if isinstance(seq_tokenized, TokenCorpus):
+        return seq_tokenized.count_words()
     ### 二次元リストを１次元に崩す; List[List[str]] -> List[str] ###
     seq_words = itertools.chain.from_iterable(seq_tokenized)
     word_frequency_obj = collections.Counter(seq_words)
     return word_frequency_obj
 
 
-def aggregate_words_by_label():
+def aggregate_words_by_label(seq_label_tokenized:Union[Iterable[Tuple[str, List[str]]], TokenCorpus])->Dict[str, collections.Counter]:
+    """* What you can do
+    - ラベルごとに形態素の集計カウントを実施する
+    - 文書を1回なめるだけで、全ラベルを同時に集計します。ラベルでソートしてgroupbyする必要はありません。
+    - メモリ使用量は文書数ではなく、(ラベル数 x 語彙数)で決まります。
+
+    * Params
+    - seq_label_tokenized: (ラベル, トークン列)のイテラブル。TokenCorpusも渡せます。
+        >>> [('映画', ['スター・ウォーズ', 'エピソード4', '新たなる希望'])]
+
+    * Output
+        >>> {'映画': Counter({'スター・ウォーズ': 1, 'エピソード4': 1, '新たなる希望': 1})}
+    """
+    if isinstance(seq_label_tokenized, TokenCorpus):
+        ### 単語IDのまま数えて、最後に文字列に戻す ###
+        label_id_frequency = collections.defaultdict(collections.Counter)
+        for label_id, seq_token_ids in seq_label_tokenized.iter_document_ids():
+            label_id_frequency[label_id].update(seq_token_ids)
+        return {
+            seq_label_tokenized.labels[label_id]: collections.Counter({seq_label_tokenized.words[word_id]: frequency
+                                                                      for word_id, frequency in id_frequency.items()})
+            for label_id, id_frequency in label_id_frequency.items()
+        }
+
+    label_word_frequency = collections.defaultdict(collections.Counter)
+    for label_name, seq_tokens in seq_label_tokenized:
+        label_word_frequency[label_name].update(seq_tokens)
+    return dict(label_word_frequency)
+
+
+def aggregate_words_approximately(seq_tokenized:Iterable[List[str]],
+                                  epsilon:float=0.0001,
+                                  delta:float=0.001,
+                                  n_heavy_hitters:int=1000)->FrequencySketch:
+    """* What you can do
+    - aggregate_words()の近似版です。語彙がメモリに載り切らない場合に使います。
+    - メモリ使用量は固定で、頻度の誤差は 確率 1 - delta で epsilon * (総単語数) 以下です。
+    - 戻り値はCounterと同じく most_common() と [] で頻度を取り出せます。
+    - 別プロセスで集計したスケッチは merge() で合算できます。
+    """
+    frequency_sketch = FrequencySketch(epsilon=epsilon, delta=delta, n_heavy_hitters=n_heavy_hitters)
+    for seq_tokens in seq_tokenized:
+        frequency_sketch.update(seq_tokens)
+    return frequency_sketch
+
+
+def aggregate_words_by_label_approximately(seq_label_tokenized:Iterable[Tuple[str, List[str]]],
+                                           epsilon:float=0.0001,
+                                           delta:float=0.001,
+                                           n_heavy_hitters:int=1000)->LabeledFrequencySketch:
     """* What you can do
-    -
+    - aggregate_words_by_label()の近似版です。全体とラベルごとの頻度を、固定メモリのスケッチで同時に集計します。
     """
-    pass
+    labeled_frequency_sketch = LabeledFrequencySketch(epsilon=epsilon, delta=delta, n_heavy_hitters=n_heavy_hitters)
+    for label_name, seq_tokens in seq_label_tokenized:
+        labeled_frequency_sketch.update(label_name, seq_tokens)
+    return labeled_frequency_sketch
 
 
-def main(tokenizer_obj:MecabWrapper,
-         seq_text_data:List[Dict[str,Any]],
-         pos_condition:List[Tuple[str,...]]):
+def get_top_k_words(word_frequency_obj:Union[collections.Counter, FrequencySketch], k:int=100)->List[Tuple[str, int]]:
+    """* What you can do
+    - 頻度の上位k件を返します。
+    - 全体をソートせず、ヒープで上位k件だけを選びます。計算量は O(語彙数 * log k) です。
+    """
+    if isinstance(word_frequency_obj, FrequencySketch):
+        return word_frequency_obj.most_common(k)
+    return heapq.nlargest(k, word_frequency_obj.items(), key=lambda x:x[1])
+
+
+def construct_label_word_matrix(label_word_frequency:Dict[str, collections.Counter]):
+    # type: (Dict[str, collections.Counter])->Tuple[List[str], List[str], Any]
+    """* What you can do
+    - ラベル x 単語の頻度行列(scipy.sparse.csr_matrix)を作ります。
+
+    * Output
+    - (行に対応するラベルのリスト, 列に対応する単語のリスト, 頻度行列)
+    """
+    from scipy.sparse import csr_matrix
+
+    seq_label = sorted(label_word_frequency.keys())
+    word2column = {}  # type: Dict[str, int]
+    row_index = []
+    column_index = []
+    values = []
+    for i, label_name in enumerate(seq_label):
+        for word, frequency in label_word_frequency[label_name].items():
+            row_index.append(i)
+            column_index.append(word2column.setdefault(word, len(word2column)))
+            values.append(frequency)
+    seq_word = sorted(word2column, key=word2column.get)
+    label_word_matrix = csr_matrix((values, (row_index, column_index)), shape=(len(seq_label), len(seq_word)))
+    return seq_label, seq_word, label_word_matrix
+
+
+def main(tokenizer_obj:'MecabWrapper',
+         seq_text_data:Iterable[Dict[str,Any]],
+         pos_condition:List[Tuple[str,...]],
+         tokenization_cache:TokenizationCache=None,
+         batch_tokenizer:BatchTokenizer=None,
+         is_approximate:bool=False):
     """* What you can do
     - 形態素解析機の呼び出し
     - 単語集計
+    - tokenization_cacheを与えると、2回目以降の実行では形態素分割の結果をキャッシュから読みます。
+    - batch_tokenizerを与えると、形態素分割を複数プロセスで並列に実行します。
+    - is_approximate=Trueの場合は、固定メモリのスケッチで近似的に集計します。語彙がメモリに載り切らない場合に使います。
     """
     # --------------------------------------------------------------------------------------------------------------#
-    # 単純単語集計をする
-    ### Python独特のリスト内包表記を利用する(リスト内包表記の方が実行速度が早い) ###
-    seq_tokenized_text = [
-        tokenize_text(input_text=wiki_text_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition)
-        for wiki_text_obj in seq_text_data
-    ]
-    ### 単語集計を実施する ###
-    word_frequency_obj = aggregate_words(seq_tokenized_text)
-    ### Counterオブジェクトはdict()関数で辞書化が可能 ###
-    dict(word_frequency_obj)
-    ### 頻度順にソートするために [(word, 頻度)] の形にする
-    seq_word_frequency = [(word, frequency) for word, frequency in dict(word_frequency_obj).items()]
-    ### 単語頻度順にソート ###
+    # ラベルごとに単語を集計する
+    ### ラベル情報も保持しながら形態素分割の実行; ジェネレータ式なので、形態素分割の結果をすべてメモリに載せずに済む ###
+    seq_tokenized_text = (
+        (wiki_text_obj['gold_label'], seq_tokens)
+        for wiki_text_obj, seq_tokens
+        in iter_tokenized_documents(tokenizer_obj, seq_text_data, pos_condition, tokenization_cache, batch_tokenizer)
+    )
+    ### 文書を1回なめるだけで、全ラベルの単語集計を実施する ###
+    if is_approximate:
+        labeled_frequency_sketch = aggregate_words_by_label_approximately(seq_tokenized_text)
+        label_word_frequency = labeled_frequency_sketch.label_sketches
+        word_frequency_obj = labeled_frequency_sketch.global_sketch
+    else:
+        label_word_frequency = aggregate_words_by_label(seq_tokenized_text)
+        ### ラベルごとの集計を足し合わせれば、ラベルなしの集計になる(もう一度形態素分割する必要はない) ###
+        word_frequency_obj = collections.Counter()
+        for word_frequency_obj_label in label_word_frequency.values():
+            word_frequency_obj.update(word_frequency_obj_label)
+
+    # --------------------------------------------------------------------------------------------------------------#
+    # 単純単語集計の結果を表示する
+    ### 単語頻度の上位100件を取り出す ###
     print('Top 100 word frequency without label')
-    print(sorted(seq_word_frequency, key=lambda x:x[1], reverse=True)[:100])
+    print(get_top_k_words(word_frequency_obj, k=100))
 
     # --------------------------------------------------------------------------------------------------------------#
-    # ラベルごとに単語を集計する
-    ### ラベル情報も保持しながら形態素分割の実行 ###
-    seq_tokenized_text = [
-        (wiki_text_obj['gold_label'], tokenize_text(input_text=wiki_text_obj['text'],tokenizer_obj=tokenizer_obj, pos_condition=pos_condition))
-        for wiki_text_obj in seq_text_data
-    ]
-    #### ラベルごとの集約する ####
-    ##### ラベルごとに集計するためのキーを返す匿名関数 #####
-    key_function= lambda x:x[0]
-    #### 必ず、groupbyの前にsortedを実施すること
-    g_object = itertools.groupby(sorted(seq_tokenized_text, key=key_function), key=key_function)
-    ### リスト内包表記化も可能。わかりやすさのために、通常のループ表記をする ###
-    for label_name, element_in_label in g_object:
-        ### element_in_label はgenerator objectで [(label, [word])]の構造を作る ###
-        seq_list_tokens_with_label = list(element_in_label)
-        seq_list_tokens = [label_tokens[1] for label_tokens in seq_list_tokens_with_label]
-        word_frequency_obj_label = aggregate_words(seq_list_tokens)
-        seq_word_frequency_label = [(word, frequency) for word, frequency in dict(word_frequency_obj_label).items()]
+    # ラベルごとの集計結果を表示する
+    for label_name in sorted(label_word_frequency.keys()):
         print('*'*30)
         print('Top 100 words For label = {}'.format(label_name))
-        print(sorted(seq_word_frequency_label, key=lambda x:x[1], reverse=True)[:100])
+        print(get_top_k_words(label_word_frequency[label_name], k=100))
 
 
 if __name__ == '__main__':
+    from JapaneseTokenizer import MecabWrapper
     ### MecabWrapperを作る ###
     mecab_obj = MecabWrapper(dictType='ipadic')
     ### 取得したい品詞だけを定義する ###
     pos_condition = [('名詞', '固有名詞'), ('動詞', '自立'), ('形容詞', '自立')]
 
-    ### wikipedia summaryデータを読み込み ###
+    ### wikipedia summaryデータを読み込み; 1文書ずつ遅延読み込みする ###
     print('=' * 50)
-    path_wikipedia_summary_json = './wikipedia_data/wikipedia-summary.json'
-    with open(path_wikipedia_summary_json, 'r') as f:
-        seq_wiki_summary_text = json.load(f)
+    path_wikipedia_summary_jsonl = './wikipedia_data/wikipedia-summary.jsonl'
+    seq_wiki_summary_text = Corpus(path_wikipedia_summary_jsonl)
 
 
+    ### 形態素分割の結果をキャッシュする。2回目以降の実行ではMecabを呼び出さない ###
+    tokenization_cache = TokenizationCache('./wikipedia_data/tokenization_cache.sqlite3')
+    ### 形態素分割はCPUコア数分のプロセスで並列に実行する。各プロセスが自分のMecabWrapperを作る ###
+    batch_tokenizer = BatchTokenizer(tokenizer_kwargs={'dictType': 'ipadic'})
     main(tokenizer_obj=mecab_obj,
          pos_condition=pos_condition,
-         seq_text_data=seq_wiki_summary_text)
+         seq_text_data=seq_wiki_summary_text,
+         tokenization_cache=tokenization_cache,
+         batch_tokenizer=batch_tokenizer)
 
-    ### wikipedia fullデータを読み込み ###
+    ### wikipedia fullデータを読み込み; 1文書ずつ遅延読み込みする ###
     print('=' * 50)
-    path_wikipedia_full_json = './wikipedia_data/wikipedia-full.json'
-    with open(path_wikipedia_full_json, 'r') as f:
-        seq_wiki_full_text = json.load(f)
+    path_wikipedia_full_jsonl = './wikipedia_data/wikipedia-full.jsonl'
+    seq_wiki_full_text = Corpus(path_wikipedia_full_jsonl)
 
     main(tokenizer_obj=mecab_obj,
          pos_condition=pos_condition,
-         seq_text_data=seq_wiki_full_text)
\ No newline at end of file
+         seq_text_data=seq_wiki_full_text,
+         tokenization_cache=tokenization_cache,
+         batch_tokenizer=batch_tokenizer)
+    batch_tokenizer.close()
+    tokenization_cache.close()
\ No newline at end of file
@@ -0,0 +1,228 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+import array
+import collections
+import json
+import logging
+import mmap
+import os
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""形態素分割済みの文書を、整数IDの配列でコンパクトに保持します。
+List[List[str]]で保持すると、文字列・リスト1つ1つのオブジェクトのオーバーヘッドでメモリが膨らみます。
+単語を語彙表で整数IDに変換し、全文書のIDを1本の配列に並べ、文書の区切り位置を別の配列に持ちます(CSR形式)。
+保存したファイルはmmapで読み込めるので、コピーなしで大きなコーパスを扱えます。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### 配列の型. 'i'は4byte符号付き整数, 'q'は8byte符号付き整数 ###
+TOKEN_ID_TYPECODE = 'i'
+OFFSET_TYPECODE = 'q'
+LABEL_ID_TYPECODE = 'i'
+
+FILE_NAME_META = 'meta.json'
+FILE_NAME_WORDS = 'words.json'
+FILE_NAME_LABELS = 'labels.json'
+FILE_NAME_TOKEN_IDS = 'token_ids.bin'
+FILE_NAME_OFFSETS = 'offsets.bin'
+FILE_NAME_LABEL_IDS = 'label_ids.bin'
+
+
+class Vocabulary(object):
+    """* What you can do
+    - 単語 <-> 整数IDの対応表です。同じ単語には常に同じIDを返します(インターン)。
+    - n-gramのようにタプルの特徴量も扱えます。
+    """
+    def __init__(self, seq_word:Iterable[Hashable]=None):
+        self.word2id = {}  # type: Dict[Hashable, int]
+        self.id2word = []  # type: List[Hashable]
+        if seq_word is not None:
+            for word in seq_word:
+                self.intern(word)
+
+    def intern(self, word:Hashable)->int:
+        word_id = self.word2id.get(word)
+        if word_id is None:
+            word_id = len(self.id2word)
+            self.word2id[word] = word_id
+            self.id2word.append(word)
+        return word_id
+
+    def get_id(self, word:Hashable, default:int=None)->int:
+        return self.word2id.get(word, default)
+
+    def __getitem__(self, word_id:int)->Hashable:
+        return self.id2word[word_id]
+
+    def __contains__(self, word:Hashable)->bool:
+        return word in self.word2id
+
+    def __len__(self)->int:
+        return len(self.id2word)
+
+    def __iter__(self)->Iterator[Hashable]:
+        return iter(self.id2word)
+
+    def save(self, path_file:str)->None:
+        with open(path_file, 'w') as f:
+            ### jsonはタプルを扱えないので、リストにして保存する ###
+            f.write(json.dumps([list(word) if isinstance(word, tuple) else word for word in self.id2word], ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path_file:str)->'Vocabulary':
+        with open(path_file, 'r') as f:
+            return cls(tuple(word) if isinstance(word, list) else word for word in json.load(f))
+
+
+def _load_array(path_file:str, typecode:str, is_use_mmap:bool)->Union[array.array, memoryview]:
+    """* What you can do
+    - TokenCorpus.save()で保存した配列ファイルを読み込みます。is_use_mmap=Trueの場合はmmapで読み込み、コピーしません。
+    """
+    if os.path.getsize(path_file) == 0:
+        return array.array(typecode)
+    if not is_use_mmap:
+        array_obj = array.array(typecode)
+        with open(path_file, 'rb') as f:
+            array_obj.frombytes(f.read())
+        return array_obj
+    with open(path_file, 'rb') as f:
+        ### mmapはファイルを閉じても有効です ###
+        mmap_obj = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mmap_obj).cast(typecode)
+
+
+class TokenCorpus(object):
+    """* What you can do
+    - 形態素分割済みの文書を、以下の配列で保持します。
+        - token_ids: 全文書の単語IDを1本に並べた配列
+        - offsets: 文書iの単語IDは token_ids[offsets[i]:offsets[i+1]]
+        - label_ids: 文書iのラベルID
+    - save()でディレクトリに保存し、load()でmmapとして読み込めます。mmapで読み込んだコーパスは読み込み専用です。
+
+    >>> token_corpus = TokenCorpus()
+    >>> token_corpus.add_document('映画', ['スターウォーズ', 'おもしろい'])
+    >>> token_corpus.save('./wikipedia_data/token_corpus')
+    >>> token_corpus = TokenCorpus.load('./wikipedia_data/token_corpus')
+    """
+    def __init__(self,
+                 words:Vocabulary=None,
+                 labels:Vocabulary=None,
+                 token_ids:Union[array.array, memoryview]=None,
+                 offsets:Union[array.array, memoryview]=None,
+                 label_ids:Union[array.array, memoryview]=None):
+        self.words = words if words is not None else Vocabulary()
+        self.labels = labels if labels is not None else Vocabulary()
+        self.token_ids = token_ids if token_ids is not None else array.array(TOKEN_ID_TYPECODE)
+        self.offsets = offsets if offsets is not None else array.array(OFFSET_TYPECODE, [0])
+        self.label_ids = label_ids if label_ids is not None else array.array(LABEL_ID_TYPECODE)
+
+    @classmethod
+    def from_tokenized_documents(cls, seq_label_tokens:Iterable[Tuple[str, List[Hashable]]])->'TokenCorpus':
+        """* What you can do
+        - (ラベル, トークン列)のイテラブルからコーパスを作ります。
+        """
+        token_corpus = cls()
+        for label_name, seq_tokens in seq_label_tokens:
+            token_corpus.add_document(label_name, seq_tokens)
+        return token_corpus
+
+    @property
+    def is_read_only(self)->bool:
+        return isinstance(self.token_ids, memoryview)
+
+    def add_document(self, label_name:str, seq_tokens:Iterable[Hashable])->int:
+        if self.is_read_only:
+            raise TypeError('TokenCorpus loaded with mmap is read-only.')
+        intern = self.words.intern
+        self.token_ids.extend(intern(token) for token in seq_tokens)
+        self.offsets.append(len(self.token_ids))
+        self.label_ids.append(self.labels.intern(label_name))
+        return len(self.label_ids) - 1
+
+    def __len__(self)->int:
+        return len(self.label_ids)
+
+    @property
+    def n_tokens(self)->int:
+        return len(self.token_ids)
+
+    def get_document_ids(self, document_index:int)->Union[array.array, memoryview]:
+        return self.token_ids[self.offsets[document_index]:self.offsets[document_index + 1]]
+
+    def get_document(self, document_index:int)->List[Hashable]:
+        id2word = self.words.id2word
+        return [id2word[word_id] for word_id in self.get_document_ids(document_index)]
+
+    def get_label(self, document_index:int)->str:
+        return self.labels[self.label_ids[document_index]]
+
+    def iter_documents(self)->Iterator[Tuple[str, List[Hashable]]]:
+        """* What you can do
+        - (ラベル, トークン列)をyieldします。
+        """
+        for document_index in range(len(self)):
+            yield self.get_label(document_index), self.get_document(document_index)
+
+    def iter_document_ids(self)->Iterator[Tuple[int, Union[array.array, memoryview]]]:
+        """* What you can do
+        - (ラベルID, 単語IDの配列)をyieldします。単語を文字列に戻さないので高速です。
+        """
+        for document_index in range(len(self)):
+            yield self.label_ids[document_index], self.get_document_ids(document_index)
+
+    def count_words(self)->collections.Counter:
+        """* What you can do
+        - 単語IDのまま頻度を数え、最後に単語に戻したCounterを返します。
+        """
+        id_frequency = collections.Counter(self.token_ids)
+        return collections.Counter({self.words[word_id]: frequency for word_id, frequency in id_frequency.items()})
+
+    def to_label_documents(self)->Dict[str, List[List[Hashable]]]:
+        """* What you can do
+        - DocumentFeatureSelectionの入力フォーマット {'ラベル名': [ [特徴量] ]} に変換します。
+        """
+        label_documents = {}
+        for label_name, seq_tokens in self.iter_documents():
+            label_documents.setdefault(label_name, []).append(seq_tokens)
+        return label_documents
+
+    def save(self, path_corpus_dir:str)->None:
+        if not os.path.exists(path_corpus_dir):
+            os.makedirs(path_corpus_dir)
+        self.words.save(os.path.join(path_corpus_dir, FILE_NAME_WORDS))
+        self.labels.save(os.path.join(path_corpus_dir, FILE_NAME_LABELS))
+        for file_name, array_obj in ((FILE_NAME_TOKEN_IDS, self.token_ids),
+                                     (FILE_NAME_OFFSETS, self.offsets),
+                                     (FILE_NAME_LABEL_IDS, self.label_ids)):
+            with open(os.path.join(path_corpus_dir, file_name), 'wb') as f:
+                f.write(array_obj.tobytes())
+        meta_obj = {
+            'n_documents': len(self),
+            'n_tokens': self.n_tokens,
+            'typecode': {'token_ids': TOKEN_ID_TYPECODE, 'offsets': OFFSET_TYPECODE, 'label_ids': LABEL_ID_TYPECODE},
+            'itemsize': {'token_ids': array.array(TOKEN_ID_TYPECODE).itemsize,
+                         'offsets': array.array(OFFSET_TYPECODE).itemsize,
+                         'label_ids': array.array(LABEL_ID_TYPECODE).itemsize}
+        }
+        with open(os.path.join(path_corpus_dir, FILE_NAME_META), 'w') as f:
+            f.write(json.dumps(meta_obj))
+
+    @classmethod
+    def load(cls, path_corpus_dir:str, is_use_mmap:bool=True)->'TokenCorpus':
+        with open(os.path.join(path_corpus_dir, FILE_NAME_META), 'r') as f:
+            meta_obj = json.load(f)
+        for array_name, typecode in meta_obj['typecode'].items():
+            if array.array(typecode).itemsize != meta_obj['itemsize'][array_name]:
+                raise ValueError('{} was saved on a platform with a different integer size.'.format(path_corpus_dir))
+        return cls(words=Vocabulary.load(os.path.join(path_corpus_dir, FILE_NAME_WORDS)),
+                   labels=Vocabulary.load(os.path.join(path_corpus_dir, FILE_NAME_LABELS)),
+                   token_ids=_load_array(os.path.join(path_corpus_dir, FILE_NAME_TOKEN_IDS),
+                                         meta_obj['typecode']['token_ids'], is_use_mmap),
+                   offsets=_load_array(os.path.join(path_corpus_dir, FILE_NAME_OFFSETS),
+                                       meta_obj['typecode']['offsets'], is_use_mmap),
+                   label_ids=_load_array(os.path.join(path_corpus_dir, FILE_NAME_LABEL_IDS),
+                                         meta_obj['typecode']['label_ids'], is_use_mmap))
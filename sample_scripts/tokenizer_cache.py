@@ -0,0 +1,194 @@
+from typing import List, Tuple, Dict, Union, Any, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from sample_scripts import instrumentation
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""形態素分割の結果をディスクにキャッシュします。
+同じテキストを同じ設定で形態素分割する場合は、キャッシュから結果を返すのでMecabを呼び出しません。
+キャッシュキーは テキストのハッシュ値 + 品詞条件 + 辞書 + 表層形/原形フラグ です。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### トークン列を1つのバイト列にまとめるときの区切り文字 ###
+TOKEN_SEPARATOR = '\x00'
+
+
+def get_tokenizer_signature(tokenizer_obj:Any)->Dict[str, Any]:
+    """* What you can do
+    - 形態素分割の結果に影響する、形態素解析機の設定(辞書の種類など)を取り出します。
+    """
+    signature = {'class': tokenizer_obj.__class__.__name__}
+    for attribute_name in ('_dictType', 'dictType', '_path_userdict', '_path_dictionary'):
+        if hasattr(tokenizer_obj, attribute_name):
+            signature[attribute_name.lstrip('_')] = str(getattr(tokenizer_obj, attribute_name))
+    return signature
+
+
+def get_config_hash(tokenizer_obj:Any,
+                    pos_condition:List[Tuple[str,...]],
+                    is_surface:bool)->str:
+    """* What you can do
+    - 形態素分割の設定をハッシュ値にします。設定が1つでも違えば、キャッシュは共有されません。
+    """
+    config_obj = {
+        'tokenizer': get_tokenizer_signature(tokenizer_obj),
+        'pos_condition': [list(pos_tuple) for pos_tuple in pos_condition] if pos_condition is not None else None,
+        'is_surface': is_surface
+    }
+    return hashlib.sha1(json.dumps(config_obj, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class TokenizationCache(object):
+    """* What you can do
+    - 形態素分割の結果をsqliteファイルに保存するキャッシュです。
+    - トークン列は区切り文字で連結してzlib圧縮して保存します。
+    - 保存サイズの上限(max_bytes)を超えたら、最後に使われたのが古い順(LRU)に削除します。
+
+    * Params
+    - path_cache_db: sqliteファイルのパス
+    - max_bytes: 保存する圧縮後トークン列の合計サイズの上限
+    - commit_interval: この回数の書き込みごとにcommitします。close()でも必ずcommitします。
+
+    >>> cache = TokenizationCache('./wikipedia_data/tokenization_cache.sqlite3')
+    >>> cache.get_or_tokenize('探偵ナイトスクープはおもしろい', mecab_obj, pos_condition)
+    """
+    def __init__(self,
+                 path_cache_db:str,
+                 max_bytes:int=1024 * 1024 * 1024,
+                 commit_interval:int=1000):
+        path_cache_dir = os.path.dirname(os.path.abspath(path_cache_db))
+        if not os.path.exists(path_cache_dir):
+            os.makedirs(path_cache_dir)
+        self.path_cache_db = path_cache_db
+        self.max_bytes = max_bytes
+        self.commit_interval = commit_interval
+        self.n_hit = 0
+        self.n_miss = 0
+
+        self._connection = sqlite3.connect(path_cache_db)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS tokens '
+                                 '(cache_key TEXT PRIMARY KEY, tokens BLOB, n_bytes INTEGER, last_access INTEGER)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS tokens_last_access ON tokens (last_access)')
+        self._connection.commit()
+        total_bytes, last_access = self._connection.execute('SELECT SUM(n_bytes), MAX(last_access) FROM tokens').fetchone()
+        self._total_bytes = total_bytes or 0
+        self._access_clock = last_access or 0
+        self._config_hash_cache = {}  # type: Dict[Tuple[Tuple[Tuple[str, str], ...], str, bool], str]
+        ### 読み出しのたびにlast_accessを書き込むと遅いので、まとめて書き込む ###
+        self._pending_access = {}  # type: Dict[str, int]
+        self._n_uncommitted = 0
+
+    def get_tokenizer_config_hash(self, tokenizer_obj:Any, pos_condition:List[Tuple[str,...]], is_surface:bool)->str:
+        ### id(tokenizer_obj)はGCの後に別の形態素解析機で使い回されることがあるので、設定そのものをキーにする ###
+        memo_key = (tuple(sorted(get_tokenizer_signature(tokenizer_obj).items())), repr(pos_condition), is_surface)
+        if memo_key not in self._config_hash_cache:
+            self._config_hash_cache[memo_key] = get_config_hash(tokenizer_obj, pos_condition, is_surface)
+        return self._config_hash_cache[memo_key]
+
+    def get_cache_key(self, input_text:str, config_hash:str)->str:
+        return '{}:{}'.format(config_hash, hashlib.sha1(input_text.encode('utf-8')).hexdigest())
+
+    def _tick(self)->int:
+        self._access_clock += 1
+        return self._access_clock
+
+    def get(self, cache_key:str)->Optional[List[str]]:
+        record = self._connection.execute('SELECT tokens FROM tokens WHERE cache_key = ?', (cache_key,)).fetchone()
+        if record is None:
+            self.n_miss += 1
+            instrumentation.increment('tokenization_cache.misses')
+            return None
+        self.n_hit += 1
+        instrumentation.increment('tokenization_cache.hits')
+        self._pending_access[cache_key] = self._tick()
+        self._count_write()
+        tokens_text = zlib.decompress(record[0]).decode('utf-8')
+        return tokens_text.split(TOKEN_SEPARATOR) if tokens_text != '' else []
+
+    def put(self, cache_key:str, seq_tokens:List[str])->None:
+        compressed_tokens = zlib.compress(TOKEN_SEPARATOR.join(seq_tokens).encode('utf-8'))
+        record = self._connection.execute('SELECT n_bytes FROM tokens WHERE cache_key = ?', (cache_key,)).fetchone()
+        if record is not None:
+            self._total_bytes -= record[0]
+        self._connection.execute('INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)',
+                                 (cache_key, compressed_tokens, len(compressed_tokens), self._tick()))
+        self._total_bytes += len(compressed_tokens)
+        instrumentation.increment('tokenization_cache.bytes_written', len(compressed_tokens))
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+        self._count_write()
+
+    def get_or_tokenize(self,
+                        input_text:str,
+                        tokenizer_obj:Any,
+                        pos_condition:List[Tuple[str,...]],
+                        is_surface:bool=False)->List[str]:
+        """* What you can do
+        - キャッシュにあれば、その結果を返します。なければ形態素分割を実行し、結果をキャッシュに保存します。
+        """
+        cache_key = self.get_cache_key(input_text, self.get_tokenizer_config_hash(tokenizer_obj, pos_condition, is_surface))
+        seq_tokens = self.get(cache_key)
+        if seq_tokens is None:
+            seq_tokens = tokenizer_obj.tokenize(input_text, is_surface=is_surface).filter(pos_condition=pos_condition).convert_list_object()
+            self.put(cache_key, seq_tokens)
+        return seq_tokens
+
+    def evict(self, target_ratio:float=0.9)->int:
+        """* What you can do
+        - 合計サイズがmax_bytes * target_ratio以下になるまで、最後に使われたのが古い順に削除します。
+        """
+        self._flush_access()
+        target_bytes = int(self.max_bytes * target_ratio)
+        n_evicted = 0
+        cursor = self._connection.execute('SELECT cache_key, n_bytes FROM tokens ORDER BY last_access ASC')
+        seq_evict_key = []
+        for cache_key, n_bytes in cursor:
+            if self._total_bytes <= target_bytes:
+                break
+            seq_evict_key.append((cache_key,))
+            self._total_bytes -= n_bytes
+            n_evicted += 1
+        cursor.close()
+        self._connection.executemany('DELETE FROM tokens WHERE cache_key = ?', seq_evict_key)
+        logger.debug('Evicted {} entries from tokenization cache.'.format(n_evicted))
+        return n_evicted
+
+    def _flush_access(self)->None:
+        if len(self._pending_access) == 0:
+            return
+        self._connection.executemany('UPDATE tokens SET last_access = ? WHERE cache_key = ?',
+                                     [(last_access, cache_key) for cache_key, last_access in self._pending_access.items()])
+        self._pending_access = {}
+
+    def _count_write(self)->None:
+        self._n_uncommitted += 1
+        if self._n_uncommitted >= self.commit_interval:
+            self.commit()
+
+    def commit(self)->None:
+        self._flush_access()
+        self._connection.commit()
+        self._n_uncommitted = 0
+
+    def __len__(self)->int:
+        return self._connection.execute('SELECT COUNT(*) FROM tokens').fetchone()[0]
+
+    def close(self)->None:
+        self.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,301 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Optional
+from sample_scripts.binary_model import BinaryScoreModel
+import heapq
+import logging
+import numpy
+import operator
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""単語スコアモデルを 単語 x ラベル の疎行列(CSR)にして、文書のラベルスコアをnumpyで計算します。
+get_text_score()は単語ごとの [(ラベル, スコア)] を連結し、ラベルでソート・groupbyしてから足し合わせています。
+行列にしておけば、文書のスコアは文書中の単語の行を足し合わせるだけです。
+BinaryScoreModelからはmmapした配列をそのまま使うので、モデルの大きさに関わらずすぐに使え、メモリも増えません。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### ラベル数がこれ以下のモデルでは、1文書の順位付けをPythonのsorted()で行う. ラベルが少ないとnumpyの関数呼び出しのコストの方が大きい ###
+MAX_LABELS_SORT_IN_PYTHON = 64
+
+_get_score = operator.itemgetter(1)
+
+
+class BinaryModelWordIndex(object):
+    """* What you can do
+    - BinaryScoreModelの単語の番号を、dictと同じget()で引けるようにします。単語の番号をそのまま行番号に使います。
+    """
+    def __init__(self, binary_score_model:BinaryScoreModel):
+        self.binary_score_model = binary_score_model
+
+    def get(self, token:str, default:int=None)->Optional[int]:
+        word_index = self.binary_score_model.find_word_index(token)
+        return default if word_index == -1 else word_index
+
+    def __contains__(self, token:str)->bool:
+        return self.binary_score_model.find_word_index(token) != -1
+
+    def __len__(self)->int:
+        return len(self.binary_score_model)
+
+
+class ScoreMatrixScorer(object):
+    """* What you can do
+    - 単語 -> 行番号 の表と、単語 x ラベル のスコアの疎行列(CSR形式の3つの配列)を持ちます。
+        - 行iのスコアは entry_label_ids/entry_scores[entry_offsets[i]:entry_offsets[i+1]] です。BinaryScoreModelと同じ形です。
+    - score_tokens()はget_text_score()と同じ [(ラベル, スコア)] を、スコアの降順で返します。
+        - 文書中のどの単語にもスコアがないラベルは返しません。
+        - スコアが同じラベルは、get_text_score()と同じくラベル名の降順に並べます。
+        - スコアは単語の出現順に足し合わせるので、get_text_score()と同じ値になります。
+    - kを与えると、上位k件だけを選んでから並べます。ラベルがMAX_LABELS_SORT_IN_PYTHONより多い場合はargpartitionを使います。
+
+    * Params
+    - is_dense: Trueの場合は 単語 x ラベル の密行列も作り、文書のスコアを行の足し算で計算します。
+        - 少し速くなりますが、N(単語) x N(ラベル) x 9 byteのメモリを使います。小さいモデルだけで使ってください。
+
+    >>> scorer = ScoreMatrixScorer.from_word_score_dictionary(reformat_dictionary(word_score_model))
+    >>> scorer.score_tokens(['スターウォーズ', 'おもしろい'], k=3)
+    [('映画', 3.2), ('アニメ', 1.1), ('小説', 0.3)]
+    """
+    def __init__(self,
+                 token2row:Union[Dict[str, int], BinaryModelWordIndex],
+                 labels:List[str],
+                 entry_offsets:numpy.ndarray,
+                 entry_label_ids:numpy.ndarray,
+                 entry_scores:numpy.ndarray,
+                 is_dense:bool=False):
+        self.token2row = token2row
+        self.labels = labels
+        self.entry_offsets = entry_offsets
+        self.entry_label_ids = entry_label_ids
+        self.entry_scores = entry_scores
+        ### スコアが同じ場合にラベル名の降順で並べるための順位. 0がラベル名の最も大きいラベル ###
+        seq_label_index_desc = sorted(range(len(labels)), key=lambda label_index: labels[label_index], reverse=True)
+        self.label_rank = numpy.empty(len(labels), dtype=numpy.int64)
+        self.label_rank[seq_label_index_desc] = numpy.arange(len(labels))
+        self._seq_label_index_desc = seq_label_index_desc
+
+        self.score_matrix = None  # type: Optional[numpy.ndarray]
+        self.presence_matrix = None  # type: Optional[numpy.ndarray]
+        if is_dense:
+            shape = (len(entry_offsets) - 1, len(labels))
+            seq_row = numpy.repeat(numpy.arange(shape[0]), numpy.diff(entry_offsets.astype(numpy.int64)))
+            self.score_matrix = numpy.zeros(shape, dtype=numpy.float64)
+            self.presence_matrix = numpy.zeros(shape, dtype=numpy.bool_)
+            ### 同じ (単語, ラベル) が複数ある場合は先に足し合わせる。特徴量抽出の結果では (単語, ラベル) は1件ずつなので、通常は起きない ###
+            numpy.add.at(self.score_matrix, (seq_row, entry_label_ids), entry_scores.astype(numpy.float64))
+            self.presence_matrix[seq_row, entry_label_ids] = True
+            logger.info('Built dense score matrix N(word)={}, N(label)={}'.format(shape[0], shape[1]))
+
+    @classmethod
+    def from_word_score_dictionary(cls, word_score_dictionary:Any, is_dense:bool=False)->'ScoreMatrixScorer':
+        """* What you can do
+        - 単語 -> [(ラベル, スコア)] の辞書から作ります。reformat_dictionary()の戻り値、BinaryScoreModelを渡せます。
+        - BinaryScoreModelの場合はfrom_binary_model()を使います。
+        """
+        if isinstance(word_score_dictionary, BinaryScoreModel):
+            return cls.from_binary_model(word_score_dictionary, is_dense=is_dense)
+        token2row = {}  # type: Dict[str, int]
+        label2id = {}  # type: Dict[str, int]
+        seq_entry_offset = [0]
+        seq_label_id = []
+        seq_score = []
+        for token, seq_label_score in word_score_dictionary.items():
+            token2row[token] = len(token2row)
+            for label_name, score in seq_label_score:
+                seq_label_id.append(label2id.setdefault(label_name, len(label2id)))
+                seq_score.append(score)
+            seq_entry_offset.append(len(seq_score))
+        labels = sorted(label2id.keys(), key=lambda label_name: label2id[label_name])
+        logger.info('Built score matrix N(word)={}, N(label)={}, N(entry)={}'.format(len(token2row), len(labels), len(seq_score)))
+        return cls(token2row=token2row,
+                   labels=labels,
+                   entry_offsets=numpy.array(seq_entry_offset, dtype=numpy.int64),
+                   entry_label_ids=numpy.array(seq_label_id, dtype=numpy.int64),
+                   entry_scores=numpy.array(seq_score, dtype=numpy.float64),
+                   is_dense=is_dense)
+
+    @classmethod
+    def from_binary_model(cls, binary_score_model:BinaryScoreModel, is_dense:bool=False)->'ScoreMatrixScorer':
+        """* What you can do
+        - BinaryScoreModelのCSR配列をコピーせずに使います。mmapしたままなので、開くのはすぐで、メモリも増えません。
+        - 単語の文字列は読み込まず、単語 -> 行番号 はBinaryScoreModelの二分探索で引きます。
+        - mmapを参照しているので、BinaryScoreModel.close()はこのオブジェクトを破棄してから呼び出してください。
+        """
+        return cls(token2row=BinaryModelWordIndex(binary_score_model),
+                   labels=list(binary_score_model.labels),
+                   entry_offsets=numpy.frombuffer(binary_score_model._entry_offsets, dtype=numpy.uint64),
+                   entry_label_ids=numpy.frombuffer(binary_score_model._entry_label_ids, dtype=numpy.uint32),
+                   entry_scores=numpy.frombuffer(binary_score_model._entry_scores, dtype=numpy.float32),
+                   is_dense=is_dense)
+
+    def get_row_ids(self, seq_tokens:Iterable[str])->List[int]:
+        return [row_id for row_id in map(self.token2row.get, seq_tokens) if row_id is not None]
+
+    def _gather_entries(self, row_ids:numpy.ndarray, row_keys:numpy.ndarray=None)->Tuple[numpy.ndarray, numpy.ndarray, Optional[numpy.ndarray]]:
+        """* What you can do
+        - 行番号の順に、各行の (ラベル番号, スコア) を連結して返します。
+        - row_keysを渡すと、3つ目に各エントリへ行ごとの値を繰り返したものを返します。
+        """
+        entry_starts = self.entry_offsets[row_ids].astype(numpy.int64)
+        entry_lengths = self.entry_offsets[row_ids + 1].astype(numpy.int64) - entry_starts
+        ### 行ごとの [start, end) を連結した番号の列を、repeatとarangeで作る ###
+        seq_first_position = numpy.cumsum(entry_lengths) - entry_lengths
+        entry_index = numpy.repeat(entry_starts - seq_first_position, entry_lengths) + numpy.arange(int(entry_lengths.sum()))
+        ### スコアはfloat32のまま返す. bincountがdoubleへ変換してから足すので、値は変わらない ###
+        return (self.entry_label_ids[entry_index],
+                self.entry_scores[entry_index],
+                None if row_keys is None else numpy.repeat(row_keys, entry_lengths))
+
+    def score_row_ids(self, seq_row_id:List[int], k:int=None)->List[Tuple[str, float]]:
+        """* What you can do
+        - 単語の行番号のリストから、ラベルのスコアを計算します。
+        """
+        if len(seq_row_id) == 0:
+            return []
+        n_labels = len(self.labels)
+        ### 行番号は1回だけ配列にし、take()で取り出す. リストでのfancy indexingは呼び出しごとに配列への変換が入る ###
+        row_ids = numpy.array(seq_row_id, dtype=numpy.intp)
+        if self.score_matrix is not None:
+            score_rows = self.score_matrix.take(row_ids, axis=0)
+            ### axis=0の和は行を先頭から順に足すので、Pythonで出現順に足した値と一致する ###
+            ### ただしラベルが1つだと1次元の和になり、pairwise summationで足す順番が変わるので、add.accumulateで順に足す ###
+            if n_labels == 1:
+                label_scores = numpy.add.accumulate(score_rows, axis=0)[-1]
+            else:
+                label_scores = score_rows.sum(axis=0)
+            label_presence = self.presence_matrix.take(row_ids, axis=0).any(axis=0)
+        else:
+            ### bincountは入力の順番に足し込むので、ラベルごとに単語の出現順で足した値になる ###
+            entry_label_ids, entry_scores, _ = self._gather_entries(row_ids)
+            label_scores = numpy.bincount(entry_label_ids, weights=entry_scores, minlength=n_labels)
+            label_presence = numpy.bincount(entry_label_ids, minlength=n_labels) > 0
+        return self._rank_labels(label_scores, label_presence, k)
+
+    def _rank_labels(self, label_scores:numpy.ndarray, label_presence:numpy.ndarray, k:int=None)->List[Tuple[str, float]]:
+        """* What you can do
+        - 1文書のラベルを スコアの降順 -> ラベル名の降順 に並べます。
+        - ラベルが多いモデルでは、kを与えると、argpartitionで上位k件の候補に絞ってからnumpyでソートします。
+        """
+        if len(self.labels) <= MAX_LABELS_SORT_IN_PYTHON:
+            ### get_text_score()と同じく、ラベル名の降順に並べてからスコアの降順に安定ソートする ###
+            seq_score = label_scores.tolist()
+            seq_presence = label_presence.tolist()
+            seq_score_tuple = [(self.labels[label_index], seq_score[label_index])
+                               for label_index in self._seq_label_index_desc if seq_presence[label_index]]
+            if k is not None:
+                ### heapq.nlargest()は sorted(reverse=True)[:k] と同じ並び順を返す ###
+                return heapq.nlargest(k, seq_score_tuple, key=_get_score)
+            return sorted(seq_score_tuple, key=_get_score, reverse=True)
+
+        candidate_index = numpy.flatnonzero(label_presence)
+        candidate_scores = label_scores[candidate_index]
+        if k is not None and k < len(candidate_index):
+            ### 上位k件の境界と同じスコアのラベルも候補に残し、同点の並び順を全件ソートの場合と揃える ###
+            kth_score = candidate_scores[numpy.argpartition(-candidate_scores, k - 1)[k - 1]]
+            is_selected = candidate_scores >= kth_score
+            candidate_index = candidate_index[is_selected]
+            candidate_scores = candidate_scores[is_selected]
+
+        ### lexsortは最後のキーが第1キー. スコアの降順 -> ラベル名の降順 ###
+        seq_order = numpy.lexsort((self.label_rank[candidate_index], -candidate_scores))
+        if k is not None:
+            seq_order = seq_order[:k]
+        return [(self.labels[candidate_index[i]], float(candidate_scores[i])) for i in seq_order]
+
+    def score_tokens(self, seq_tokens:Iterable[str], k:int=None)->List[Tuple[str, float]]:
+        return self.score_row_ids(self.get_row_ids(seq_tokens), k=k)
+
+    def build_document_matrix(self, seq_document_tokens:List[List[str]])->'csr_matrix':
+        """* What you can do
+        - トークン列のリストから、文書 x 単語 の疎行列(CSR)を作ります。モデルにない単語は無視します。
+        - 同じ単語は足し合わせず、出現順に1件ずつ持ちます。
+        """
+        ### scipyは文書 x 単語の行列を使う場合だけ必要なので、ここで読み込む ###
+        from scipy.sparse import csr_matrix
+        seq_indptr = [0]
+        seq_indices = []  # type: List[int]
+        for seq_tokens in seq_document_tokens:
+            seq_indices.extend(self.get_row_ids(seq_tokens))
+            seq_indptr.append(len(seq_indices))
+        return csr_matrix((numpy.ones(len(seq_indices), dtype=numpy.float64),
+                           numpy.array(seq_indices, dtype=numpy.int64),
+                           numpy.array(seq_indptr, dtype=numpy.int64)),
+                          shape=(len(seq_document_tokens), len(self)))
+
+    def _sum_document_rows_dense(self, indptr:numpy.ndarray, indices:numpy.ndarray)->Tuple[numpy.ndarray, numpy.ndarray]:
+        ### 行列積を、文書中の単語の位置ごとに全文書まとめて足し込んで計算する ###
+        ### scipyの行列積やnumpy.add.reduceatでは足す順番が変わり、get_text_score()と最後の桁が変わって同点付近の順位が入れ替わる ###
+        ### 文書を単語数の降順に並べておけば、j番目の単語を持つ文書は先頭からn件に揃う ###
+        n_documents = len(indptr) - 1
+        seq_length = numpy.diff(indptr)
+        seq_document_order = numpy.argsort(-seq_length, kind='mergesort')
+        seq_start = indptr[:-1][seq_document_order]
+        seq_length_desc = seq_length[seq_document_order]
+        sorted_scores = numpy.zeros((n_documents, len(self.labels)), dtype=numpy.float64)
+        sorted_presence = numpy.zeros((n_documents, len(self.labels)), dtype=numpy.bool_)
+        ### 単語数がpositionより多い文書数 ###
+        seq_n_active = numpy.searchsorted(-seq_length_desc, -numpy.arange(seq_length_desc[0]), side='left')
+        for position, n_active in enumerate(seq_n_active):
+            seq_row_id = indices[seq_start[:n_active] + position]
+            sorted_scores[:n_active] += self.score_matrix[seq_row_id]
+            sorted_presence[:n_active] |= self.presence_matrix[seq_row_id]
+        label_scores = numpy.empty_like(sorted_scores)
+        label_scores[seq_document_order] = sorted_scores
+        label_presence = numpy.empty_like(sorted_presence)
+        label_presence[seq_document_order] = sorted_presence
+        return label_scores, label_presence
+
+    def _sum_document_rows_sparse(self, indptr:numpy.ndarray, indices:numpy.ndarray)->Tuple[numpy.ndarray, numpy.ndarray]:
+        ### 全文書の単語のエントリを文書順・出現順に連結し、(文書, ラベル) ごとにbincountで足し込む ###
+        n_documents = len(indptr) - 1
+        n_labels = len(self.labels)
+        ### 単語ごとに所属する文書の (文書番号 * ラベル数) を持たせ、エントリへ展開してからラベル番号を足す ###
+        seq_cell_base = numpy.repeat(numpy.arange(n_documents, dtype=numpy.int64) * n_labels, numpy.diff(indptr))
+        entry_label_ids, entry_scores, entry_cell_base = self._gather_entries(indices.astype(numpy.intp), seq_cell_base)
+        cell_ids = entry_cell_base + entry_label_ids
+        label_scores = numpy.bincount(cell_ids, weights=entry_scores, minlength=n_documents * n_labels)
+        label_presence = numpy.bincount(cell_ids, minlength=n_documents * n_labels) > 0
+        return label_scores.reshape((n_documents, n_labels)), label_presence.reshape((n_documents, n_labels))
+
+    def score_document_matrix(self, document_matrix:'csr_matrix', k:int=None)->List[List[Tuple[str, float]]]:
+        """* What you can do
+        - 文書 x 単語 の疎行列から、全文書のラベルスコアをまとめて計算します。
+        - 文書ごとの結果はscore_tokens()と同じ値・同じ並び順です。
+        """
+        n_documents = document_matrix.shape[0]
+        if n_documents == 0:
+            return []
+        if document_matrix.nnz == 0:
+            return [[] for _ in range(n_documents)]
+        if self.score_matrix is not None:
+            label_scores, label_presence = self._sum_document_rows_dense(document_matrix.indptr, document_matrix.indices)
+        else:
+            label_scores, label_presence = self._sum_document_rows_sparse(document_matrix.indptr, document_matrix.indices)
+
+        ### 全文書をまとめて スコアの降順 -> ラベル名の降順 に並べる. 出現していないラベルは末尾に回す ###
+        label_rank = numpy.broadcast_to(self.label_rank, label_scores.shape)
+        seq_order = numpy.lexsort((label_rank, -label_scores, ~label_presence), axis=-1)
+        if k is not None:
+            seq_order = seq_order[:, :k]
+        n_presence = label_presence.sum(axis=1)
+
+        seq_result = []
+        for document_index in range(n_documents):
+            seq_label_index = seq_order[document_index, :n_presence[document_index]]
+            seq_score = label_scores[document_index, seq_label_index]
+            seq_result.append([(self.labels[label_index], float(score))
+                               for label_index, score in zip(seq_label_index, seq_score)])
+        return seq_result
+
+    def score_documents(self, seq_document_tokens:List[List[str]], k:int=None)->List[List[Tuple[str, float]]]:
+        return self.score_document_matrix(self.build_document_matrix(seq_document_tokens), k=k)
+
+    def __contains__(self, token:str)->bool:
+        return token in self.token2row
+
+    def __len__(self)->int:
+        return len(self.token2row)
@@ -0,0 +1,175 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Hashable
+import collections
+import heapq
+import json
+import logging
+import os
+import tempfile
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""特徴量抽出の前に、語彙を絞り込みます。
+1回しか出てこない単語や、ほぼ全ての文書に出てくる単語まで特徴量抽出に渡すと、行列が大きくなり計算時間も伸びます。
+文書頻度の下限・上限、ラベルごとの上位N件、語彙数の上限で語彙を決め、ファイルに保存します。
+学習(sample_keyword.py)と分類(sample_category_classification.py)で同じ語彙ファイルを使えば、特徴量の空間が揃います。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+
+class VocabularyPruner(object):
+    """* What you can do
+    - fit()で文書を1回なめて文書頻度を数え、残す語彙を決めます。
+    - transform()で、トークン列から語彙にない単語を取り除きます。
+    - n-gram(タプル)は、構成する単語が全て語彙にある場合だけ残します。
+
+    * Params
+    - min_df: 文書頻度がこの値未満の単語を捨てます。
+    - max_df: 文書頻度がこの値より大きい単語を捨てます。1.0以下の小数は全文書数に対する割合、整数は文書数です。
+    - top_n_per_label: 与えると、ラベルごとに文書頻度の上位N件を選び、その和集合を語彙にします。
+    - max_vocabulary_size: 与えると、全体の文書頻度の上位この件数までに語彙を絞ります。
+
+    >>> vocabulary_pruner = VocabularyPruner(min_df=2, max_df=0.5, max_vocabulary_size=50000)
+    >>> vocabulary_pruner.fit(token_corpus.iter_documents())
+    >>> vocabulary_pruner.transform(['スターウォーズ', 'おもしろい'])
+    >>> vocabulary_pruner.save('./models/vocabulary.json')
+    """
+    def __init__(self,
+                 min_df:int=1,
+                 max_df:Union[int, float]=1.0,
+                 top_n_per_label:int=None,
+                 max_vocabulary_size:int=None):
+        if min_df < 1:
+            raise ValueError('min_df must be >= 1. Got {}'.format(min_df))
+        if isinstance(max_df, float) and not 0.0 < max_df <= 1.0:
+            raise ValueError('max_df must be in (0.0, 1.0] when it is a ratio. Got {}'.format(max_df))
+        self.min_df = min_df
+        self.max_df = max_df
+        self.top_n_per_label = top_n_per_label
+        self.max_vocabulary_size = max_vocabulary_size
+        self.vocabulary = None  # type: set
+        self.n_documents = 0
+        self.n_original_vocabulary = 0
+
+    @property
+    def is_fitted(self)->bool:
+        return self.vocabulary is not None
+
+    def _get_max_df_count(self, n_documents:int)->int:
+        if isinstance(self.max_df, float):
+            return int(self.max_df * n_documents)
+        return self.max_df
+
+    def fit(self, seq_label_tokens:Iterable[Tuple[str, Iterable[Hashable]]])->'VocabularyPruner':
+        """* What you can do
+        - (ラベル, トークン列)のイテラブルを1回なめて、語彙を決めます。
+        - TokenCorpus.iter_documents()やcached dictから作ったイテラブルを渡せます。
+        """
+        document_frequency = collections.Counter()
+        label_document_frequency = collections.defaultdict(collections.Counter)
+        n_documents = 0
+        for label_name, seq_tokens in seq_label_tokens:
+            n_documents += 1
+            set_token = set(seq_tokens)
+            document_frequency.update(set_token)
+            if self.top_n_per_label is not None:
+                label_document_frequency[label_name].update(set_token)
+        return self._select_vocabulary(document_frequency, label_document_frequency, n_documents)
+
+    def fit_document_frequency(self,
+                               word_label_frequency:Dict[Hashable, Dict[str, int]],
+                               n_documents:int)->'VocabularyPruner':
+        """* What you can do
+        - 単語 -> {ラベル -> 単語を含む文書数} の集計から、語彙を決めます。文書をなめ直さずに済みます。
+        - IncrementalSOAScorer.document_frequencyをそのまま渡せます。fit()と同じ語彙になります。
+        """
+        document_frequency = collections.Counter()
+        label_document_frequency = collections.defaultdict(collections.Counter)
+        for token, label_frequency in word_label_frequency.items():
+            document_frequency[token] = sum(label_frequency.values())
+            if self.top_n_per_label is not None:
+                for label_name, frequency in label_frequency.items():
+                    label_document_frequency[label_name][token] = frequency
+        return self._select_vocabulary(document_frequency, label_document_frequency, n_documents)
+
+    def _select_vocabulary(self,
+                           document_frequency:Dict[Hashable, int],
+                           label_document_frequency:Dict[str, Dict[Hashable, int]],
+                           n_documents:int)->'VocabularyPruner':
+        ### 文書頻度の下限・上限 ###
+        max_df_count = self._get_max_df_count(n_documents)
+        set_candidate = set(token for token, frequency in document_frequency.items()
+                            if self.min_df <= frequency <= max_df_count)
+        ### ラベルごとの上位N件; 同じ頻度の単語は文字列の順で選び、実行ごとに結果が変わらないようにする ###
+        if self.top_n_per_label is not None:
+            set_selected = set()
+            for label_frequency in label_document_frequency.values():
+                seq_label_candidate = ((token, frequency) for token, frequency in label_frequency.items() if token in set_candidate)
+                set_selected.update(token for token, _ in heapq.nsmallest(self.top_n_per_label, seq_label_candidate,
+                                                                            key=lambda x: (-x[1], str(x[0]))))
+            set_candidate = set_selected
+        ### 語彙数の上限 ###
+        if self.max_vocabulary_size is not None and len(set_candidate) > self.max_vocabulary_size:
+            set_candidate = set(heapq.nsmallest(self.max_vocabulary_size, set_candidate,
+                                                key=lambda token: (-document_frequency[token], str(token))))
+
+        self.vocabulary = set_candidate
+        self.n_documents = n_documents
+        self.n_original_vocabulary = len(document_frequency)
+        logger.info('Pruned vocabulary {} -> {} words with {} documents.'.format(self.n_original_vocabulary,
+                                                                               len(self.vocabulary),
+                                                                               n_documents))
+        return self
+
+    def is_kept(self, feature:Hashable)->bool:
+        if isinstance(feature, (tuple, list)):
+            return all(token in self.vocabulary for token in feature)
+        return feature in self.vocabulary
+
+    def transform(self, seq_features:Iterable[Hashable])->List[Hashable]:
+        if not self.is_fitted:
+            raise ValueError('VocabularyPruner is not fitted yet. Call fit() or load() first.')
+        return [feature for feature in seq_features if self.is_kept(feature)]
+
+    def __contains__(self, feature:Hashable)->bool:
+        return self.is_kept(feature)
+
+    def __len__(self)->int:
+        return len(self.vocabulary) if self.is_fitted else 0
+
+    def save(self, path_vocabulary_file:str)->None:
+        """* What you can do
+        - 条件と語彙をjsonで保存します。語彙はソートして保存するので、同じ語彙なら同じファイルになります。
+        """
+        if not self.is_fitted:
+            raise ValueError('VocabularyPruner is not fitted yet. Call fit() first.')
+        vocabulary_obj = {
+            'min_df': self.min_df,
+            'max_df': self.max_df,
+            'top_n_per_label': self.top_n_per_label,
+            'max_vocabulary_size': self.max_vocabulary_size,
+            'n_documents': self.n_documents,
+            'n_original_vocabulary': self.n_original_vocabulary,
+            'vocabulary': sorted(self.vocabulary, key=str)
+        }
+        path_vocabulary_dir = os.path.dirname(os.path.abspath(path_vocabulary_file))
+        file_descriptor, path_tmp = tempfile.mkstemp(dir=path_vocabulary_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as f:
+            f.write(json.dumps(vocabulary_obj, ensure_ascii=False))
+        os.replace(path_tmp, path_vocabulary_file)
+
+    @classmethod
+    def load(cls, path_vocabulary_file:str)->'VocabularyPruner':
+        with open(path_vocabulary_file, 'r') as f:
+            vocabulary_obj = json.load(f)
+        vocabulary_pruner = cls(min_df=vocabulary_obj['min_df'],
+                                max_df=vocabulary_obj['max_df'],
+                                top_n_per_label=vocabulary_obj['top_n_per_label'],
+                                max_vocabulary_size=vocabulary_obj['max_vocabulary_size'])
+        vocabulary_pruner.vocabulary = set(vocabulary_obj['vocabulary'])
+        vocabulary_pruner.n_documents = vocabulary_obj['n_documents']
+        vocabulary_pruner.n_original_vocabulary = vocabulary_obj['n_original_vocabulary']
+        return vocabulary_pruner
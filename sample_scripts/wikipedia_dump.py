@@ -0,0 +1,290 @@
+from typing import List, Tuple, Dict, Union, Any, Iterable, Iterator, Optional
+from xml.etree import ElementTree
+import bz2
+import collections
+import html
+import io
+import itertools
+import logging
+import multiprocessing
+import re
+logger = logging.getLogger()
+logger.setLevel(10)
+
+"""ローカルに保存したwikipediaのXMLダンプ(jawiki-*-pages-articles.xml.bz2)からテキストを取り出します。
+XMLは1ページずつストリームで読むので、数GBのダンプでもメモリ使用量は一定です。
+通常のダンプでは、bz2の展開とXMLの読み込みは親プロセスの1コアで行い、wikiマークアップの除去だけをプロセスプールで並列に実行します。
+multistream形式のダンプ(jawiki-*-pages-articles-multistream.xml.bz2)とそのインデックスを与えると、
+必要なページを含むbz2ストリームだけを、ワーカーがバイト範囲を指定して展開・読み込みするので、展開と読み込みも並列になります。
+Python3.5.1の環境下で動作を確認しています。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke.mit@gmail.com"
+__license_name__ = "MIT"
+
+### マークアップ除去に使う正規表現 ###
+COMMENT_PATTERN = re.compile(r'<!--.*?-->', flags=re.DOTALL)
+REF_PATTERN = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', flags=re.DOTALL | re.IGNORECASE)
+TEMPLATE_PATTERN = re.compile(r'\{\{[^{}]*\}\}')
+TABLE_PATTERN = re.compile(r'\{\|(?:(?!\{\|).)*?\|\}', flags=re.DOTALL)
+FILE_LINK_PATTERN = re.compile(r'\[\[(?:File|Image|ファイル|画像|Category|カテゴリ):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]',
+                               flags=re.IGNORECASE)
+INTERNAL_LINK_PATTERN = re.compile(r'\[\[(?:[^|\[\]]*\|)?([^\[\]]*)\]\]')
+EXTERNAL_LINK_PATTERN = re.compile(r'\[(?:https?|ftp)://[^\s\]]+\s*([^\]]*)\]')
+EMPHASIS_PATTERN = re.compile(r"'{2,5}")
+HEADING_PATTERN = re.compile(r'^(={2,6})\s*(.*?)\s*\1\s*$', flags=re.MULTILINE)
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+MAGIC_WORD_PATTERN = re.compile(r'__[A-Z]+__')
+LIST_MARKER_PATTERN = re.compile(r'^[*#:;]+\s*', flags=re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+### multistreamのワーカープロセスごとの title2attribute。_initialize_multistream_worker()で1度だけ受け取る ###
+_worker_title2attribute = None
+
+
+def remove_nested(pattern, text:str)->str:
+    """* What you can do
+    - {{テンプレート}}のように入れ子になるマークアップを、内側から順に取り除きます。
+    """
+    while True:
+        text, n_replaced = pattern.subn('', text)
+        if n_replaced == 0:
+            return text
+
+
+def strip_wiki_markup(wikitext:str)->str:
+    """* What you can do
+    - wikiマークアップを取り除き、プレーンテキストにします。
+    - 見出しは`wikipedia`パッケージのcontentと同じ「== 見出し ==」の形で残します。
+
+    * Tips
+    - 完全なパーサーではありません。テンプレートや表は中身ごと捨てます。
+    """
+    text = COMMENT_PATTERN.sub('', wikitext)
+    text = REF_PATTERN.sub('', text)
+    text = remove_nested(TEMPLATE_PATTERN, text)
+    text = remove_nested(TABLE_PATTERN, text)
+    text = FILE_LINK_PATTERN.sub('', text)
+    text = INTERNAL_LINK_PATTERN.sub(r'\1', text)
+    text = EXTERNAL_LINK_PATTERN.sub(r'\1', text)
+    text = EMPHASIS_PATTERN.sub('', text)
+    text = HEADING_PATTERN.sub(lambda match_obj: '\n\n{0} {1} {0}\n'.format(match_obj.group(1), match_obj.group(2)), text)
+    text = HTML_TAG_PATTERN.sub('', text)
+    text = MAGIC_WORD_PATTERN.sub('', text)
+    text = LIST_MARKER_PATTERN.sub('', text)
+    text = html.unescape(text)
+    text = BLANK_LINES_PATTERN.sub('\n\n\n', text)
+    return text.strip()
+
+
+def _local_tag_name(tag:str)->str:
+    ### {http://www.mediawiki.org/xml/export-0.10/}page -> page ###
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iter_pages(file_obj)->Iterator[Tuple[str, str]]:
+    root_element = None
+    for event, element in ElementTree.iterparse(file_obj, events=('start', 'end')):
+        if event == 'start':
+            if root_element is None:
+                root_element = element
+            continue
+        if _local_tag_name(element.tag) != 'page':
+            continue
+
+        page_title = None
+        namespace = None
+        wikitext = None
+        is_redirect = False
+        for child_element in element.iter():
+            tag_name = _local_tag_name(child_element.tag)
+            if tag_name == 'title':
+                page_title = child_element.text
+            elif tag_name == 'ns':
+                namespace = child_element.text
+            elif tag_name == 'redirect':
+                is_redirect = True
+            elif tag_name == 'text':
+                wikitext = child_element.text or ''
+        ### 処理済みのページ要素をルートから切り離し、メモリを解放する ###
+        element.clear()
+        root_element.clear()
+
+        if page_title is None or wikitext is None or is_redirect or namespace not in (None, '0'):
+            continue
+        yield page_title, wikitext
+
+
+def iter_dump_pages(path_dump:str)->Iterator[Tuple[str, str]]:
+    """* What you can do
+    - XMLダンプを1ページずつ読み、(ページタイトル, wikiテキスト)をyieldします。
+    - 標準名前空間(ns=0)の記事だけを返します。リダイレクトページは返しません。
+    - 読み終わったページの要素はすぐに破棄するので、ダンプの大きさに関わらずメモリ使用量は一定です。
+    """
+    file_obj = bz2.open(path_dump, 'rb') if path_dump.endswith('.bz2') else open(path_dump, 'rb')
+    with file_obj:
+        for page_title, wikitext in _iter_pages(file_obj):
+            yield page_title, wikitext
+
+
+def read_multistream_index(path_index:str,
+                           set_title:Iterable[str])->List[Tuple[int, Optional[int]]]:
+    """* What you can do
+    - multistreamダンプのインデックス(jawiki-*-pages-articles-multistream-index.txt.bz2)を読み、
+      set_titleのページを含むbz2ストリームのバイト範囲 (開始位置, 終了位置) をダンプ内の順番で返します。
+    - 最後のストリームの終了位置はNone(ファイルの最後まで)です。
+
+    * Input
+    - インデックスは1行1ページの「ストリームの開始位置:ページID:ページタイトル」です。タイトルには:が含まれることがあります。
+        >>> 617:10:アンパサンド
+    """
+    set_title = set(set_title)
+    seq_offset = []  # type: List[int]
+    set_wanted_offset = set()
+    file_obj = bz2.open(path_index, 'rt', encoding='utf-8') if path_index.endswith('.bz2') else open(path_index, 'r', encoding='utf-8')
+    with file_obj:
+        for line in file_obj:
+            offset, _, page_title = line.rstrip('\n').split(':', 2)
+            offset = int(offset)
+            if len(seq_offset) == 0 or seq_offset[-1] != offset:
+                seq_offset.append(offset)
+            if page_title in set_title:
+                set_wanted_offset.add(offset)
+    seq_end_offset = seq_offset[1:] + [None]  # type: List[Optional[int]]
+    return [(offset, end_offset) for offset, end_offset in zip(seq_offset, seq_end_offset) if offset in set_wanted_offset]
+
+
+def _read_stream_pages(path_dump:str, start_offset:int, end_offset:Optional[int])->Iterator[Tuple[str, str]]:
+    with open(path_dump, 'rb') as f:
+        f.seek(start_offset)
+        compressed_data = f.read() if end_offset is None else f.read(end_offset - start_offset)
+    xml_fragment = bz2.decompress(compressed_data)
+    ### ストリームはルート要素のない<page>の並びなので、ルート要素で囲んでから読む. 最後のストリームには閉じタグが含まれる ###
+    xml_fragment = xml_fragment.replace(b'</mediawiki>', b'')
+    for page_title, wikitext in _iter_pages(io.BytesIO(b'<mediawiki>' + xml_fragment + b'</mediawiki>')):
+        yield page_title, wikitext
+
+
+def _initialize_multistream_worker(title2attribute:Dict[str, Any])->None:
+    global _worker_title2attribute
+    _worker_title2attribute = title2attribute
+
+
+def _parse_stream_chunk(path_dump:str,
+                        seq_stream_range:List[Tuple[int, Optional[int]]])->List[Tuple[str, str, Any]]:
+    """プロセスプールのワーカーで実行される関数です。bz2の展開・XMLの読み込み・マークアップ除去をまとめて行います。"""
+    title2attribute = _worker_title2attribute
+    seq_document = []
+    for start_offset, end_offset in seq_stream_range:
+        for page_title, wikitext in _read_stream_pages(path_dump, start_offset, end_offset):
+            if page_title in title2attribute:
+                seq_document.append((page_title, strip_wiki_markup(wikitext), title2attribute[page_title]))
+    return seq_document
+
+
+def _strip_page_chunk(seq_page:List[Tuple[str, str, Any]])->List[Tuple[str, str, Any]]:
+    """プロセスプールのワーカーで実行される関数です。"""
+    return [(page_title, strip_wiki_markup(wikitext), attribute) for page_title, wikitext, attribute in seq_page]
+
+
+def _iter_multistream_documents(path_dump:str,
+                                path_index:str,
+                                title2attribute:Dict[str, Any],
+                                n_process:int,
+                                n_streams_per_chunk:int,
+                                max_pending_chunks:int)->Iterator[Tuple[str, str, Any]]:
+    seq_stream_range = read_multistream_index(path_index, title2attribute.keys())
+    logger.info('Reading {} streams of {}'.format(len(seq_stream_range), path_dump))
+    n_found = 0
+    pending_results = collections.deque()
+    ### title2attributeはタスクごとに送ると毎回pickleされるので、ワーカーの起動時に1度だけ送る ###
+    pool = multiprocessing.Pool(processes=n_process,
+                                initializer=_initialize_multistream_worker,
+                                initargs=(title2attribute,))
+    try:
+        iter_stream_range = iter(seq_stream_range)
+        while True:
+            seq_chunk_range = list(itertools.islice(iter_stream_range, n_streams_per_chunk))
+            if len(seq_chunk_range) == 0:
+                break
+            pending_results.append(pool.apply_async(_parse_stream_chunk, (path_dump, seq_chunk_range)))
+            ### 先頭のチャンクから順に結果を受け取る ###
+            while len(pending_results) >= max_pending_chunks:
+                for document_tuple in pending_results.popleft().get():
+                    n_found += 1
+                    yield document_tuple
+        while len(pending_results) > 0:
+            for document_tuple in pending_results.popleft().get():
+                n_found += 1
+                yield document_tuple
+    finally:
+        pool.terminate()
+        pool.join()
+
+    logger.info('Found {} / {} pages in {}'.format(n_found, len(title2attribute), path_dump))
+
+
+def iter_dump_documents(path_dump:str,
+                        title2attribute:Dict[str, Any],
+                        n_process:int=None,
+                        chunk_size:int=64,
+                        max_pending_chunks:int=None,
+                        path_index:str=None,
+                        n_streams_per_chunk:int=4)->Iterator[Tuple[str, str, Any]]:
+    """* What you can do
+    - ダンプからtitle2attributeに含まれるページだけを取り出し、マークアップを除去して(ページタイトル, テキスト, 属性)をyieldします。
+    - path_indexがない場合、bz2の展開とXMLの読み込みは親プロセス、マークアップ除去はプロセスプールで行います。
+      親プロセスの展開が1コア分の速さで頭打ちになるので、プロセス数を増やして速くなるのはマークアップ除去だけです。
+    - path_indexにmultistreamダンプのインデックスを与えると、必要なページを含むストリームだけを、
+      ワーカーがバイト範囲ごとに展開・読み込み・マークアップ除去します。この場合path_dumpはmultistreamダンプです。
+    - プールに投げたまま結果を受け取っていないチャンクはmax_pending_chunks個までに制限するので、メモリ使用量は一定です。
+
+    * Params
+    - title2attribute: ページタイトル -> 任意の属性(ラベルなど)
+        >>> {'ウイスキー': 'アルコール'}
+    - n_process: プロセス数。Noneの場合はCPUコア数です。
+    - chunk_size: (インデックスなし) 1回ワーカーに渡すページ数
+    - path_index: jawiki-*-pages-articles-multistream-index.txt.bz2へのパス
+    - n_streams_per_chunk: (インデックスあり) 1回ワーカーに渡すストリーム数。1ストリームは100ページです。
+    """
+    if n_process is None:
+        n_process = multiprocessing.cpu_count()
+    if max_pending_chunks is None:
+        max_pending_chunks = n_process * 2
+    if path_index is not None:
+        for document_tuple in _iter_multistream_documents(path_dump, path_index, title2attribute,
+                                                          n_process=n_process,
+                                                          n_streams_per_chunk=n_streams_per_chunk,
+                                                          max_pending_chunks=max_pending_chunks):
+            yield document_tuple
+        return
+
+    n_found = 0
+    pending_results = collections.deque()
+    pool = multiprocessing.Pool(processes=n_process)
+    try:
+        chunk = []
+        for page_title, wikitext in iter_dump_pages(path_dump):
+            if page_title not in title2attribute:
+                continue
+            chunk.append((page_title, wikitext, title2attribute[page_title]))
+            n_found += 1
+            if len(chunk) < chunk_size:
+                continue
+            pending_results.append(pool.apply_async(_strip_page_chunk, (chunk,)))
+            chunk = []
+            ### 先頭のチャンクから順に結果を受け取る ###
+            while len(pending_results) >= max_pending_chunks:
+                for document_tuple in pending_results.popleft().get():
+                    yield document_tuple
+        if len(chunk) > 0:
+            pending_results.append(pool.apply_async(_strip_page_chunk, (chunk,)))
+        while len(pending_results) > 0:
+            for document_tuple in pending_results.popleft().get():
+                yield document_tuple
+    finally:
+        pool.terminate()
+        pool.join()
+
+    logger.info('Found {} / {} pages in {}'.format(n_found, len(title2attribute), path_dump))
@@ -20,6 +20,12 @@ install_requires = [
 
 dependency_links = []
 
+entry_points = {
+    'console_scripts': [
+        'sample-scripts = sample_scripts.cli:main',
+    ]
+}
+
 setup(
     name=name,
     version=version,
@@ -27,6 +33,7 @@ setup(
     author=author,
     install_requires=install_requires,
     dependency_links=dependency_links,
+    entry_points=entry_points,
     author_email=author_email,
     url=url,
     license=license_name,
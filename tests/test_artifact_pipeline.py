@@ -0,0 +1,211 @@
+import collections
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from sample_scripts import artifact_pipeline
+from sample_scripts.artifact_pipeline import ArtifactStore, ArtifactPipeline, Stage, build_wikipedia_pipeline
+
+
+class TestArtifactPipeline(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp()
+        self.path_store_dir = os.path.join(self.path_work_dir, 'artifacts')
+        self.path_input_file = os.path.join(self.path_work_dir, 'input.txt')
+        self.write_input('Hello World')
+        ### 段階ごとの実行回数 ###
+        self.stage_runs = collections.Counter()
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir)
+
+    def write_input(self, text, mtime_seconds=None):
+        with open(self.path_input_file, 'w') as f:
+            f.write(text)
+        if mtime_seconds is not None:
+            os.utime(self.path_input_file, (mtime_seconds, mtime_seconds))
+
+    def normalize_stage(self, path_output_dir, inputs, is_lower=True):
+        self.stage_runs['normalize'] += 1
+        with open(inputs['text'], 'r') as f:
+            text = f.read()
+        with open(os.path.join(path_output_dir, 'normalized.txt'), 'w') as f:
+            f.write(text.lower() if is_lower else text)
+
+    def count_stage(self, path_output_dir, inputs, suffix=''):
+        self.stage_runs['count'] += 1
+        with open(os.path.join(inputs['normalized'], 'normalized.txt'), 'r') as f:
+            text = f.read()
+        with open(os.path.join(path_output_dir, 'count.json'), 'w') as f:
+            f.write(json.dumps({'n_characters': len(text), 'suffix': suffix}))
+
+    def build_pipeline(self, normalize_params=None, count_params=None, normalize_version='1'):
+        pipeline = ArtifactPipeline(ArtifactStore(self.path_store_dir))
+        pipeline.add_stage(Stage('normalize', self.normalize_stage, inputs={'text': self.path_input_file},
+                                 params=normalize_params, version=normalize_version))
+        pipeline.add_stage(Stage('count', self.count_stage, inputs={'normalized': 'normalize'}, params=count_params))
+        return pipeline
+
+    def test_artifact_key(self):
+        dict_artifact_path = self.build_pipeline().run()
+        self.assertEqual(self.stage_runs, {'normalize': 1, 'count': 1})
+        with open(os.path.join(dict_artifact_path['count'], 'count.json')) as f:
+            self.assertEqual(json.load(f)['n_characters'], 11)
+
+        ### キーは (段階の名前, version, パラメータ, 入力のハッシュ) のハッシュで、manifestに元の値が残る ###
+        path_normalize = dict_artifact_path['normalize']
+        normalize_key = os.path.basename(path_normalize)
+        self.assertEqual(os.path.dirname(path_normalize), os.path.join(self.path_store_dir, 'normalize'))
+        with open(os.path.join(path_normalize, artifact_pipeline.FILE_NAME_MANIFEST)) as f:
+            manifest_obj = json.load(f)
+        key_obj = {name: manifest_obj[name] for name in ('stage', 'version', 'params', 'inputs')}
+        self.assertEqual(artifact_pipeline._hash_json(key_obj), normalize_key)
+        self.assertEqual(manifest_obj['inputs'], {'text': 'file:{}'.format(artifact_pipeline.hash_content(self.path_input_file))})
+        self.assertEqual(manifest_obj['content_hash'],
+                         artifact_pipeline.hash_content(path_normalize, seq_excluded_file_name=(artifact_pipeline.FILE_NAME_MANIFEST,)))
+        with open(os.path.join(dict_artifact_path['count'], artifact_pipeline.FILE_NAME_MANIFEST)) as f:
+            self.assertEqual(json.load(f)['inputs'], {'normalized': 'artifact:normalize:{}'.format(manifest_obj['content_hash'])})
+
+        ### 何も変えなければ実行しない ###
+        self.assertEqual(self.build_pipeline().run(), dict_artifact_path)
+        self.assertEqual(self.stage_runs, {'normalize': 1, 'count': 1})
+
+        ### パラメータやversionを変えると、その段階と出力が変わった後ろの段階を作り直す ###
+        dict_artifact_path_upper = self.build_pipeline(normalize_params={'is_lower': False}).run()
+        self.assertNotEqual(dict_artifact_path_upper['normalize'], path_normalize)
+        self.assertEqual(self.stage_runs, {'normalize': 2, 'count': 2})
+        self.build_pipeline(normalize_version='2').run()
+        self.assertEqual(self.stage_runs, {'normalize': 3, 'count': 2})
+
+    def test_identical_upstream_content(self):
+        ### 前の段階を作り直しても出力が同じなら、後ろの段階は作り直さない ###
+        dict_artifact_path = self.build_pipeline().run()
+        self.write_input('HELLO WORLD')
+        dict_artifact_path_new = self.build_pipeline().run()
+        self.assertEqual(self.stage_runs, {'normalize': 2, 'count': 1})
+        self.assertNotEqual(dict_artifact_path_new['normalize'], dict_artifact_path['normalize'])
+        self.assertEqual(dict_artifact_path_new['count'], dict_artifact_path['count'])
+
+        self.write_input('Hello World!')
+        self.build_pipeline().run()
+        self.assertEqual(self.stage_runs, {'normalize': 3, 'count': 2})
+
+    def test_force(self):
+        dict_artifact_path = self.build_pipeline().run()
+        self.assertEqual(self.build_pipeline().run(is_force=True), dict_artifact_path)
+        self.assertEqual(self.stage_runs, {'normalize': 2, 'count': 2})
+        ### 作り直した成果物だけが残る ###
+        self.assertEqual(os.listdir(os.path.join(self.path_store_dir, 'normalize')), [os.path.basename(dict_artifact_path['normalize'])])
+
+    def test_target(self):
+        dict_artifact_path = self.build_pipeline().run(seq_target=['normalize'])
+        self.assertEqual(list(dict_artifact_path), ['normalize'])
+        self.assertEqual(self.stage_runs, {'normalize': 1})
+        with self.assertRaises(ValueError):
+            self.build_pipeline().run(seq_target=['unknown'])
+
+        pipeline = ArtifactPipeline(ArtifactStore(self.path_store_dir))
+        pipeline.add_stage(Stage('count', self.count_stage, inputs={'normalized': 'normalize'}))
+        pipeline.add_stage(Stage('normalize', self.normalize_stage, inputs={'text': self.path_input_file}))
+        with self.assertRaises(ValueError):
+            pipeline.run()
+        with self.assertRaises(ValueError):
+            pipeline.add_stage(Stage('count', self.count_stage))
+
+    def test_failed_stage(self):
+        def failing_stage(path_output_dir, inputs):
+            with open(os.path.join(path_output_dir, 'partial.txt'), 'w') as f:
+                f.write('partial')
+            raise RuntimeError('failed')
+        pipeline = ArtifactPipeline(ArtifactStore(self.path_store_dir))
+        pipeline.add_stage(Stage('failing', failing_stage, inputs={'text': self.path_input_file}))
+        with self.assertRaises(RuntimeError):
+            pipeline.run()
+        ### 作りかけの成果物は残らない ###
+        self.assertEqual(os.listdir(os.path.join(self.path_store_dir, 'failing')), [])
+
+    def test_file_hash_cache(self):
+        ### 外部ファイルの内容のハッシュは (サイズ, 更新時刻) が変わったときだけ計算し直す ###
+        self.write_input('Hello World', mtime_seconds=1000000000)
+        with mock.patch.object(artifact_pipeline, 'hash_content', wraps=artifact_pipeline.hash_content) as hash_content_mock:
+            artifact_store = ArtifactStore(self.path_store_dir)
+            content_hash = artifact_store.hash_external_input(self.path_input_file)
+            self.assertEqual(artifact_store.hash_external_input(self.path_input_file), content_hash)
+            self.assertEqual(hash_content_mock.call_count, 1)
+
+            ### キャッシュはファイルに保存され、次のArtifactStoreでも使われる ###
+            self.assertEqual(ArtifactStore(self.path_store_dir).hash_external_input(self.path_input_file), content_hash)
+            self.assertEqual(hash_content_mock.call_count, 1)
+
+            ### 更新時刻だけが変わった場合は読み直すが、内容のハッシュは同じ ###
+            self.write_input('Hello World', mtime_seconds=1000000001)
+            self.assertEqual(artifact_store.hash_external_input(self.path_input_file), content_hash)
+            self.assertEqual(hash_content_mock.call_count, 2)
+
+            ### サイズが変わった場合 ###
+            self.write_input('Hello World!', mtime_seconds=1000000001)
+            self.assertNotEqual(artifact_store.hash_external_input(self.path_input_file), content_hash)
+            self.assertEqual(hash_content_mock.call_count, 3)
+
+        with self.assertRaises(FileNotFoundError):
+            artifact_store.hash_external_input(os.path.join(self.path_work_dir, 'missing.txt'))
+
+    def test_touched_input_does_not_rebuild(self):
+        self.write_input('Hello World', mtime_seconds=1000000000)
+        self.build_pipeline().run()
+        self.write_input('Hello World', mtime_seconds=1000000001)
+        self.build_pipeline().run()
+        self.assertEqual(self.stage_runs, {'normalize': 1, 'count': 1})
+
+
+class TestWikipediaPipeline(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp()
+        self.stage_runs = collections.Counter()
+        self.seq_path_corpus = []
+        for file_name in ('training.jsonl', 'evaluation.jsonl'):
+            self.seq_path_corpus.append(os.path.join(self.path_work_dir, file_name))
+            with open(self.seq_path_corpus[-1], 'w') as f:
+                f.write(json.dumps({'gold_label': 'a', 'text': file_name}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir)
+
+    def get_counting_stage(self, stage_name):
+        def counting_stage(path_output_dir, inputs, **params):
+            self.stage_runs[stage_name] += 1
+            with open(os.path.join(path_output_dir, 'output.json'), 'w') as f:
+                f.write(json.dumps({'stage': stage_name}))
+        return counting_stage
+
+    def run_pipeline(self, **pipeline_kwargs):
+        with mock.patch.object(artifact_pipeline, 'tokenize_stage', self.get_counting_stage('tokenize')), \
+                mock.patch.object(artifact_pipeline, 'feature_selection_stage', self.get_counting_stage('feature_selection')), \
+                mock.patch.object(artifact_pipeline, 'evaluation_stage', self.get_counting_stage('evaluation')):
+            pipeline = build_wikipedia_pipeline(ArtifactStore(os.path.join(self.path_work_dir, 'artifacts')),
+                                                path_training_corpus=self.seq_path_corpus[0],
+                                                path_evaluation_corpus=self.seq_path_corpus[1],
+                                                **pipeline_kwargs)
+            return pipeline.run()
+
+    def test_change_evaluation_only(self):
+        ### 評価の設定だけを変えた場合は、形態素分割と特徴量抽出を実行しない ###
+        self.run_pipeline(ranking_evaluation=[1, 3])
+        self.run_pipeline(ranking_evaluation=[1, 5])
+        self.assertEqual(self.stage_runs, {'tokenize': 1, 'feature_selection': 1, 'evaluation': 2})
+
+        ### 評価データを変えた場合も同じ ###
+        with open(self.seq_path_corpus[1], 'a') as f:
+            f.write(json.dumps({'gold_label': 'b', 'text': 'new'}) + '\n')
+        self.run_pipeline(ranking_evaluation=[1, 5])
+        self.assertEqual(self.stage_runs, {'tokenize': 1, 'feature_selection': 1, 'evaluation': 3})
+
+        ### 特徴量抽出の設定を変えた場合は、形態素分割だけを省略する ###
+        self.run_pipeline(ranking_evaluation=[1, 5], min_df=3)
+        self.assertEqual(self.stage_runs, {'tokenize': 1, 'feature_selection': 2, 'evaluation': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+from sample_scripts.binary_model import BinaryModelWriter, BinaryScoreModel, write_binary_model
+from sample_scripts.sample_category_classification import reformat_dictionary
+
+
+def to_float32(score):
+    return struct.unpack('<f', struct.pack('<f', score))[0]
+
+
+class TestBinaryModel(unittest.TestCase):
+    def setUp(self):
+        self.path_model_dir = tempfile.mkdtemp()
+        self.path_model_file = os.path.join(self.path_model_dir, 'word_score_soa.bin')
+        random_obj = random.Random(0)
+        seq_word = ['a', 'ab', 'abc', 'b', 'Z', '映画', '映画館', 'お金', 'スター', 'wé'] + ['w{}'.format(i) for i in range(100)]
+        ### 0.1などfloat32で表せないスコアを含める ###
+        self.seq_score_record = [{'word': random_obj.choice(seq_word),
+                                  'label': random_obj.choice(['映画', 'レストラン', 'label_c']),
+                                  'score': random_obj.choice([0.1, -1e-3, 1.0 / 3.0, random_obj.gauss(0.0, 100.0)])}
+                                 for _ in range(2000)]
+        self.word_score_dictionary = reformat_dictionary(self.seq_score_record)
+
+    def tearDown(self):
+        shutil.rmtree(self.path_model_dir)
+
+    def test_write_and_lookup(self):
+        ### 何度もディスクに書き出しながらまとめても、reformat_dictionary()とfloat32の丸めを除いて一致する ###
+        write_binary_model(iter(self.seq_score_record), self.path_model_file, max_records_in_memory=64)
+        with BinaryScoreModel(self.path_model_file) as binary_score_model:
+            self.assertEqual(len(binary_score_model), len(self.word_score_dictionary))
+            self.assertEqual(sorted(binary_score_model.labels), ['label_c', 'レストラン', '映画'])
+            self.assertEqual(list(binary_score_model.keys()),
+                             sorted(self.word_score_dictionary, key=lambda word: word.encode('utf-8')))
+            for word, seq_label_score in self.word_score_dictionary.items():
+                expected = [(label_name, to_float32(score)) for label_name, score in seq_label_score]
+                self.assertEqual(binary_score_model[word], expected)
+                self.assertEqual(binary_score_model.get(word), expected)
+                self.assertIn(word, binary_score_model)
+            self.assertEqual(dict(binary_score_model.items()),
+                             {word: binary_score_model[word] for word in self.word_score_dictionary})
+
+            ### 先頭より前・単語の間・前方一致・末尾より後の、ない単語 ###
+            for word in ('', 'A', 'aa', 'abcd', 'w', 'w100', '映', '￿'):
+                self.assertNotIn(word, binary_score_model)
+                self.assertIsNone(binary_score_model.get(word))
+                self.assertEqual(binary_score_model.find_word_index(word), -1)
+                with self.assertRaises(KeyError):
+                    binary_score_model[word]
+
+    def test_reformat_dictionary_with_cache(self):
+        binary_score_model = reformat_dictionary(self.seq_score_record, batch_size=100, is_use_cache=True)
+        try:
+            self.assertEqual(dict(binary_score_model.items()),
+                             {word: [(label_name, to_float32(score)) for label_name, score in seq_label_score]
+                              for word, seq_label_score in self.word_score_dictionary.items()})
+        finally:
+            binary_score_model.close()
+
+    def test_writer_order(self):
+        with self.assertRaises(ValueError):
+            with BinaryModelWriter(self.path_model_file) as writer:
+                writer.write('b', [('x', 1.0)])
+                writer.write('a', [('x', 1.0)])
+        ### 失敗した場合は書きかけのモデルを残さない ###
+        self.assertEqual(os.listdir(self.path_model_dir), [])
+
+    def test_empty_model(self):
+        write_binary_model([], self.path_model_file)
+        with BinaryScoreModel(self.path_model_file) as binary_score_model:
+            self.assertEqual(len(binary_score_model), 0)
+            self.assertNotIn('a', binary_score_model)
+
+
+if __name__ == '__main__':
+    unittest.main()
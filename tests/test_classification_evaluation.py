@@ -0,0 +1,25 @@
+import unittest
+import numpy
+from sample_scripts.classification_evaluation import EvaluationResult
+
+
+class TestEvaluationResult(unittest.TestCase):
+    def test_accuracy_at_k(self):
+        evaluation_result = EvaluationResult.from_ranked_results(['a', 'b', 'a'],
+                                                                 [[('b', 2.0), ('a', 1.0)], [('b', 1.0)], [('b', 1.0)]])
+        self.assertEqual(evaluation_result.get_accuracy_at_k([1, 2]), {1: 1 / 3, 2: 2 / 3})
+        self.assertEqual(evaluation_result.get_label_accuracy_at_k(2), {'a': (0.5, 1, 2), 'b': (1.0, 1, 1)})
+
+    def test_missing_prediction_is_not_counted_when_k_exceeds_labels(self):
+        ### 正解ラベルが予測にない文書は、kがラベル数以上でも正解にしない ###
+        evaluation_result = EvaluationResult.from_ranked_results(['a', 'b'], [[('a', 1.0)], []])
+        self.assertEqual(evaluation_result.get_accuracy_at_k([1, 3]), {1: 0.5, 3: 0.5})
+        self.assertEqual(evaluation_result.get_label_accuracy_at_k(3), {'a': (1.0, 1, 1), 'b': (0.0, 0, 1)})
+
+    def test_confusion_matrix(self):
+        evaluation_result = EvaluationResult.from_ranked_results(['a', 'b', 'b'], [[('a', 1.0)], [('a', 1.0)], []])
+        numpy.testing.assert_array_equal(evaluation_result.get_confusion_matrix(), [[1, 0, 0], [1, 0, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from sample_scripts.benchmarks.fake_tokenizer import FakeTokenizer
+from sample_scripts.classification_service import ClassificationService, ClassificationHTTPServer, load_classification_model
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+
+WORD_SCORE_MODEL = [{'word': 'スター', 'label': 'a', 'score': 1.0},
+                    {'word': 'スター', 'label': 'b', 'score': 0.5},
+                    {'word': '映画', 'label': 'a', 'score': -2.0},
+                    {'word': '映画', 'label': 'b', 'score': 1.0},
+                    {'word': '小説', 'label': 'c', 'score': 0.25}]
+
+
+class ClassificationServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path_model_dir = tempfile.mkdtemp()
+        self.path_word_model_json = os.path.join(self.path_model_dir, 'word_score_soa.json')
+        self.path_vocabulary_file = os.path.join(self.path_model_dir, 'vocabulary.json')
+        with open(self.path_word_model_json, 'w') as f:
+            f.write(json.dumps(WORD_SCORE_MODEL, ensure_ascii=False))
+        self.service = ClassificationService(model_loader=self.load_model,
+                                             tokenizer_obj=FakeTokenizer(),
+                                             pos_condition=[('名詞',)],
+                                             max_batch_size=4,
+                                             max_wait_seconds=0.2)
+
+    def tearDown(self):
+        self.service.close()
+        shutil.rmtree(self.path_model_dir)
+
+    def load_model(self):
+        return load_classification_model(path_word_model_bin=os.path.join(self.path_model_dir, 'word_score_soa.bin'),
+                                         path_word_model_json=self.path_word_model_json,
+                                         path_vocabulary_file=self.path_vocabulary_file)
+
+    def save_vocabulary(self, set_vocabulary, mtime_seconds):
+        vocabulary_pruner = VocabularyPruner()
+        vocabulary_pruner.vocabulary = set_vocabulary
+        vocabulary_pruner.save(self.path_vocabulary_file)
+        ### 同じ時刻に書き直してもバージョンが変わるように、更新時刻を指定する ###
+        os.utime(self.path_vocabulary_file, (mtime_seconds, mtime_seconds))
+
+
+class TestClassificationService(ClassificationServiceTestCase):
+    def test_batching(self):
+        ### キューに同時に入った文書は、max_batch_size件ずつ1つのバッチになる ###
+        seq_text = ['スター 映画', 'スター', '映画', '小説', '映画 小説']
+        seq_result = self.service.classify_many(seq_text, k=None)
+        self.assertEqual(seq_result[0], [('b', 1.5), ('a', -1.0)])
+        self.assertEqual(seq_result[3], [('c', 0.25)])
+        stats = self.service.get_stats()
+        self.assertEqual(stats['n_batches'], 2)
+        self.assertEqual(stats['n_batched_requests'], 5)
+
+        ### 2回目はキャッシュから返し、ワーカーには渡さない ###
+        self.assertEqual(self.service.classify_many(seq_text, k=1), [result[:1] for result in seq_result])
+        stats = self.service.get_stats()
+        self.assertEqual(stats['n_batches'], 2)
+        self.assertEqual(stats['n_cache_hits'], 5)
+
+    def test_reload_vocabulary(self):
+        ### 語彙ファイルだけを変えて読み込み直すと、キャッシュされた結果は使われない ###
+        self.assertEqual(self.service.classify('スター 映画'), [('b', 1.5), ('a', -1.0)])
+        version_without_vocabulary = self.service.model_version
+
+        self.save_vocabulary({'スター'}, 1000000000)
+        self.assertEqual(self.service.reload(), self.service.model_version)
+        self.assertNotEqual(self.service.model_version, version_without_vocabulary)
+        self.assertEqual(self.service.classify('スター 映画'), [('a', 1.0), ('b', 0.5)])
+
+        self.save_vocabulary({'スター', '映画'}, 1000000001)
+        self.service.reload()
+        self.assertEqual(self.service.classify('スター 映画'), [('b', 1.5), ('a', -1.0)])
+
+        os.remove(self.path_vocabulary_file)
+        self.service.reload()
+        self.assertEqual(self.service.model_version, version_without_vocabulary)
+
+
+class TestClassificationHTTPServer(ClassificationServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.http_server = ClassificationHTTPServer(('127.0.0.1', 0), self.service)
+        self.server_thread = threading.Thread(target=self.http_server.serve_forever)
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.server_thread.join()
+        super().tearDown()
+
+    def post(self, path, request_body):
+        request_obj = urllib.request.Request('http://127.0.0.1:{}{}'.format(self.http_server.server_address[1], path),
+                                             data=request_body.encode('utf-8'))
+        try:
+            with urllib.request.urlopen(request_obj, timeout=10) as response_obj:
+                return response_obj.status, json.loads(response_obj.read().decode('utf-8'))
+        except urllib.error.HTTPError as exception_obj:
+            return exception_obj.code, json.loads(exception_obj.read().decode('utf-8'))
+
+    def test_classify(self):
+        status_code, response_obj = self.post('/classify', json.dumps({'text': 'スター 映画', 'k': 1}))
+        self.assertEqual(status_code, 200)
+        self.assertEqual(response_obj['result'], [['b', 1.5]])
+        self.assertEqual(response_obj['model_version'], self.service.model_version)
+
+        status_code, response_obj = self.post('/classify', json.dumps({'texts': ['スター 映画', '小説'], 'k': None}))
+        self.assertEqual(status_code, 200)
+        self.assertEqual(response_obj['results'], [[['b', 1.5], ['a', -1.0]], [['c', 0.25]]])
+
+    def test_bad_request(self):
+        for request_body in ('{"text": ', '[1]', '{}', '{"text": 1}', '{"texts": "abc"}', '{"texts": ["abc", 2]}',
+                             '{"text": "abc", "k": 0}', '{"text": "abc", "k": "3"}', '{"text": "abc", "k": true}'):
+            status_code, response_obj = self.post('/classify', request_body)
+            self.assertEqual(status_code, 400, request_body)
+            self.assertIn('error', response_obj)
+        ### 不正なリクエストはワーカーに渡らない ###
+        self.assertNotIn('n_batches', self.service.get_stats())
+
+    def test_internal_error(self):
+        def fail_score_batch(model_obj, seq_text):
+            raise RuntimeError('scoring failed')
+        self.service._score_batch = fail_score_batch
+        status_code, response_obj = self.post('/classify', json.dumps({'text': 'スター'}))
+        self.assertEqual(status_code, 500)
+        self.assertEqual(response_obj['error'], 'scoring failed')
+
+        os.remove(self.path_word_model_json)
+        status_code, response_obj = self.post('/reload', '')
+        self.assertEqual(status_code, 500)
+        self.assertEqual(response_obj['model_version'], self.service.model_version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import bisect
+import collections
+import itertools
+import random
+import unittest
+from sample_scripts.counting_sketch import CountMinSketch, MisraGries, FrequencySketch, LabeledFrequencySketch, merge_sketches
+
+
+def generate_stream(n_items, seed):
+    ### 頻度がZipf分布に従う単語の列. 少数の単語が大部分を占める ###
+    random_obj = random.Random(seed)
+    seq_word = ['w{}'.format(i) for i in range(500)] + [('w0', 'w{}'.format(i)) for i in range(20)]
+    seq_cumulative_weight = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(seq_word))))
+    return [seq_word[bisect.bisect(seq_cumulative_weight, random_obj.random() * seq_cumulative_weight[-1])]
+            for _ in range(n_items)]
+
+
+class TestCountMinSketch(unittest.TestCase):
+    def test_never_underestimate(self):
+        ### 表を小さくして衝突を起こしても、推定値は真の頻度以上 ###
+        seq_item = generate_stream(5000, seed=0)
+        sketch = CountMinSketch(width=64, depth=4)
+        sketch.update_many(seq_item)
+        item_frequency = collections.Counter(seq_item)
+        self.assertEqual(sketch.total_count, len(seq_item))
+        self.assertTrue(all(sketch[item] >= frequency for item, frequency in item_frequency.items()))
+        self.assertTrue(any(sketch[item] > frequency for item, frequency in item_frequency.items()))
+        self.assertGreaterEqual(sketch['unseen'], 0)
+
+    def test_merge(self):
+        ### シャードごとのスケッチを合算すると、全体を1つのスケッチで数えたものと同じになる ###
+        seq_item = generate_stream(3000, seed=1)
+        whole_sketch = CountMinSketch(width=128, depth=3, seed=7)
+        whole_sketch.update_many(seq_item)
+        seq_shard_sketch = []
+        for shard_index in range(3):
+            shard_sketch = CountMinSketch(width=128, depth=3, seed=7)
+            shard_sketch.update_many(seq_item[shard_index::3])
+            seq_shard_sketch.append(shard_sketch)
+        merged_sketch = merge_sketches(seq_shard_sketch)
+        self.assertEqual(merged_sketch.table, whole_sketch.table)
+        self.assertEqual(merged_sketch.total_count, whole_sketch.total_count)
+        with self.assertRaises(ValueError):
+            merged_sketch.merge(CountMinSketch(width=128, depth=3, seed=8))
+
+
+class TestMisraGries(unittest.TestCase):
+    def check_error_bound(self, summary, seq_item):
+        item_frequency = collections.Counter(seq_item)
+        error_bound = len(seq_item) / (summary.capacity + 1)
+        self.assertEqual(summary.error_bound, error_bound)
+        for item, frequency in item_frequency.items():
+            estimated_frequency = summary.estimate(item)
+            self.assertLessEqual(estimated_frequency, frequency)
+            self.assertGreaterEqual(estimated_frequency, frequency - error_bound)
+            ### 頻度が 総頻度 / (capacity + 1) より大きい要素は必ず残る ###
+            if frequency > error_bound:
+                self.assertIn(item, summary.counters)
+        self.assertLessEqual(len(summary.most_common()), summary.capacity)
+
+    def test_error_bound(self):
+        for capacity in (1, 5, 20):
+            seq_item = generate_stream(4000, seed=capacity)
+            summary = MisraGries(capacity=capacity)
+            summary.update_many(seq_item)
+            self.check_error_bound(summary, seq_item)
+
+    def test_merge(self):
+        seq_item_1 = generate_stream(3000, seed=2)
+        seq_item_2 = generate_stream(1000, seed=3)[::-1]
+        summary_1 = MisraGries(capacity=10)
+        summary_1.update_many(seq_item_1)
+        summary_2 = MisraGries(capacity=10)
+        summary_2.update_many(seq_item_2)
+        summary_1.merge(summary_2)
+        self.assertEqual(summary_1.total_count, len(seq_item_1) + len(seq_item_2))
+        self.check_error_bound(summary_1, seq_item_1 + seq_item_2)
+        with self.assertRaises(ValueError):
+            summary_1.merge(MisraGries(capacity=11))
+
+
+class TestLabeledFrequencySketch(unittest.TestCase):
+    def setUp(self):
+        self.sketch_params = {'epsilon': 0.01, 'delta': 0.01, 'n_heavy_hitters': 20}
+        self.seq_label_items = [('a', generate_stream(50, seed=seed)) if seed % 3 else ('b', generate_stream(30, seed=seed))
+                                for seed in range(30)]
+
+    def test_merge(self):
+        whole_sketch = LabeledFrequencySketch(**self.sketch_params)
+        seq_shard_sketch = [LabeledFrequencySketch(**self.sketch_params) for _ in range(2)]
+        for document_index, (label_name, seq_item) in enumerate(self.seq_label_items):
+            whole_sketch.update(label_name, seq_item)
+            seq_shard_sketch[document_index % 2].update(label_name, seq_item)
+        merged_sketch = LabeledFrequencySketch(**self.sketch_params)
+        for shard_sketch in seq_shard_sketch:
+            merged_sketch.merge(shard_sketch)
+
+        self.assertEqual(sorted(merged_sketch.label_sketches), ['a', 'b'])
+        self.assertEqual(merged_sketch.global_sketch.count_min_sketch.table, whole_sketch.global_sketch.count_min_sketch.table)
+        for label_name, label_sketch in whole_sketch.label_sketches.items():
+            self.assertEqual(merged_sketch.label_sketches[label_name].count_min_sketch.table, label_sketch.count_min_sketch.table)
+            self.assertEqual(merged_sketch.label_sketches[label_name].total_count, label_sketch.total_count)
+
+        restored_sketch = LabeledFrequencySketch.from_bytes(merged_sketch.to_bytes())
+        self.assertEqual(restored_sketch.label_sketches['a'].most_common(5), merged_sketch.label_sketches['a'].most_common(5))
+        with self.assertRaises(TypeError):
+            LabeledFrequencySketch.from_bytes(FrequencySketch(**self.sketch_params).to_bytes())
+
+    def test_merge_does_not_share_label_sketch(self):
+        ### 合算した後に元のスケッチを更新しても、合算結果は変わらない ###
+        shard_sketch = LabeledFrequencySketch(**self.sketch_params)
+        shard_sketch.update('a', ['x', 'y'])
+        merged_sketch = LabeledFrequencySketch(**self.sketch_params)
+        merged_sketch.merge(shard_sketch)
+        self.assertIsNot(merged_sketch.label_sketches['a'], shard_sketch.label_sketches['a'])
+
+        shard_sketch.update('a', ['x'])
+        merged_sketch.update('a', ['y'])
+        self.assertEqual(merged_sketch.label_sketches['a']['x'], 1)
+        self.assertEqual(shard_sketch.label_sketches['a']['x'], 2)
+        self.assertEqual(shard_sketch.label_sketches['a']['y'], 1)
+        self.assertEqual(merged_sketch.label_sketches['a'].total_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
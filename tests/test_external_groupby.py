@@ -0,0 +1,78 @@
+import os
+import random
+import unittest
+from sample_scripts import external_groupby
+from sample_scripts.external_groupby import ExternalGroupBy, iter_grouped_score_records
+from sample_scripts.sample_category_classification import reformat_dictionary
+
+
+def generate_score_records(n_records, seed):
+    random_obj = random.Random(seed)
+    ### 前方一致する単語・日本語・記号を混ぜて、文字列の順番を確かめる ###
+    seq_word = ['a', 'ab', 'abc', 'b', 'Z', '映画', '映画館', 'お金', 'スター', 'ｶﾀｶﾅ', '~', 'wé'] + \
+               ['w{}'.format(i) for i in range(50)]
+    return [{'word': random_obj.choice(seq_word),
+             'label': random_obj.choice(['映画', 'レストラン', 'label_c']),
+             'score': random_obj.gauss(0.0, 1.0)}
+            for _ in range(n_records)]
+
+
+class TestExternalGroupBy(unittest.TestCase):
+    def setUp(self):
+        self.chunk_size = external_groupby.CHUNK_SIZE
+        ### ランファイルが複数のチャンクになるように小さくする ###
+        external_groupby.CHUNK_SIZE = 7
+
+    def tearDown(self):
+        external_groupby.CHUNK_SIZE = self.chunk_size
+
+    def group(self, seq_score_record, **groupby_kwargs):
+        with ExternalGroupBy(**groupby_kwargs) as groupby_obj:
+            for score_record in seq_score_record:
+                groupby_obj.add(score_record['word'], score_record['label'], score_record['score'])
+            seq_group = list(groupby_obj.iter_groups())
+            path_run_dir = groupby_obj._path_run_dir
+            n_spilled_runs = groupby_obj.n_spilled_runs
+        self.assertFalse(os.path.exists(path_run_dir))
+        return seq_group, n_spilled_runs
+
+    def check_groups(self, seq_group, seq_score_record):
+        ### 単語の昇順で、単語ごとの (ラベル, スコア) は受け取った順番のまま. reformat_dictionary()と一致する ###
+        word_score_dictionary = reformat_dictionary(seq_score_record)
+        self.assertEqual([word for word, _ in seq_group], sorted(word_score_dictionary))
+        self.assertEqual(dict(seq_group), word_score_dictionary)
+
+    def test_spill(self):
+        ### 100件ずつ10回書き出し、残りの3件(最後のバッチ)はiter_groups()で書き出す ###
+        seq_score_record = generate_score_records(1003, seed=0)
+        seq_group, n_spilled_runs = self.group(seq_score_record, max_records_in_memory=100)
+        self.assertEqual(n_spilled_runs, 11)
+        self.check_groups(seq_group, seq_score_record)
+
+    def test_multi_level_merge(self):
+        ### ランがmax_merge_fan_inより多いと、隣り合うランを何段かに分けてマージする ###
+        seq_score_record = generate_score_records(1000, seed=1)
+        seq_group, n_spilled_runs = self.group(seq_score_record, max_records_in_memory=30, max_merge_fan_in=3)
+        self.assertEqual(n_spilled_runs, 34)
+        self.check_groups(seq_group, seq_score_record)
+
+    def test_in_memory(self):
+        seq_score_record = generate_score_records(99, seed=2)
+        seq_group, n_spilled_runs = self.group(seq_score_record, max_records_in_memory=100)
+        self.assertEqual(n_spilled_runs, 0)
+        self.check_groups(seq_group, seq_score_record)
+        self.assertEqual(self.group([], max_records_in_memory=100), ([], 0))
+
+    def test_iter_grouped_score_records(self):
+        seq_score_record = generate_score_records(500, seed=3)
+        ### DocumentFeatureSelectionのバージョンによっては、単語のキーが'feature'になる ###
+        seq_feature_record = [{'feature': score_record['word'], 'label': score_record['label'], 'score': score_record['score']}
+                              for score_record in seq_score_record]
+        seq_group = list(iter_grouped_score_records(iter(seq_feature_record), max_records_in_memory=64))
+        self.check_groups(seq_group, seq_score_record)
+        with self.assertRaises(TypeError):
+            list(iter_grouped_score_records([{'word': ('a', 'b'), 'label': 'x', 'score': 1.0}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+from unittest import mock
+from sample_scripts import fetch_engine
+from sample_scripts.fetch_engine import TokenBucket, ConcurrentFetcher, MediaWikiApiClient, MODE_FULL, MODE_SUMMARY
+
+
+class FakeClock(object):
+    """time.monotonic()とtime.sleep()の代わりに使う、sleepした分だけ進む時計です。"""
+    def __init__(self):
+        self.now = 0.0
+        self.seq_sleep = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.seq_sleep.append(seconds)
+        self.now += seconds
+
+
+class PageNotFoundError(Exception):
+    pass
+
+
+class FlakyClient(object):
+    """ページごとに、指定した回数だけ失敗してから成功するクライアントです。永続的なエラーを区別しません。"""
+    def __init__(self, title2n_failure=None, seq_missing_title=()):
+        self.title2n_failure = dict(title2n_failure or {})
+        self.seq_missing_title = seq_missing_title
+        self.seq_call = []
+
+    def _fetch(self, page_title, mode):
+        self.seq_call.append((page_title, mode))
+        if page_title in self.seq_missing_title:
+            raise PageNotFoundError(page_title)
+        if self.title2n_failure.get(page_title, 0) > 0:
+            self.title2n_failure[page_title] -= 1
+            raise IOError('temporary error')
+        return '{}:{}'.format(mode, page_title)
+
+    def fetch_page(self, page_title):
+        return self._fetch(page_title, MODE_FULL)
+
+    def fetch_summary(self, page_title, n_summary_sentence=3):
+        return self._fetch(page_title, MODE_SUMMARY)
+
+
+class ClassifyingFlakyClient(FlakyClient):
+    def is_permanent_error(self, exception_obj):
+        return isinstance(exception_obj, PageNotFoundError)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(fetch_engine.time, monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rate(self):
+        ### 1秒に2個の補充で、最初の1個はすぐに取れて、以降は0.5秒ごとに取れる ###
+        token_bucket = TokenBucket(rate_per_second=2.0)
+        seq_acquired_time = []
+        for _ in range(5):
+            token_bucket.acquire()
+            seq_acquired_time.append(self.clock.now)
+        for acquired_time, expected_time in zip(seq_acquired_time, [0.0, 0.5, 1.0, 1.5, 2.0]):
+            self.assertAlmostEqual(acquired_time, expected_time)
+
+    def test_burst(self):
+        ### 貯まったトークンの分だけは待たずに取れるが、capacityより多くは貯まらない ###
+        token_bucket = TokenBucket(rate_per_second=1.0, capacity=3)
+        self.clock.now = 100.0
+        for _ in range(3):
+            token_bucket.acquire()
+        self.assertEqual(self.clock.seq_sleep, [])
+        token_bucket.acquire()
+        self.assertAlmostEqual(self.clock.now, 101.0)
+
+    def test_invalid_params(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate_per_second=0.0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate_per_second=1.0, capacity=0)
+
+
+class TestConcurrentFetcher(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(fetch_engine.time, monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ### ジッターは常に最大(1.0倍)にする ###
+        patcher = mock.patch.object(fetch_engine.random, 'uniform', lambda low, high: high)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_fetcher(self, client, **fetcher_kwargs):
+        ### レート制限の待ち時間がバックオフの待ち時間に混ざらないよう、十分に速いレートにする ###
+        return ConcurrentFetcher(client, requests_per_second=1e9, burst=100, **fetcher_kwargs)
+
+    def test_retry_with_backoff(self):
+        client = FlakyClient(title2n_failure={'ウイスキー': 3})
+        fetcher = self.get_fetcher(client, max_retry=3, backoff_seconds=1.0, max_backoff_seconds=3.0)
+        self.assertEqual(fetcher.fetch_one('ウイスキー'), 'full:ウイスキー')
+        self.assertEqual(len(client.seq_call), 4)
+        ### 待ち時間は 1, 2, 4秒 と倍になり、max_backoff_secondsで頭打ちになる ###
+        self.assertEqual(self.clock.seq_sleep, [1.0, 2.0, 3.0])
+
+    def test_jitter(self):
+        with mock.patch.object(fetch_engine.random, 'uniform', lambda low, high: low):
+            client = FlakyClient(title2n_failure={'ウイスキー': 2})
+            self.get_fetcher(client, backoff_seconds=2.0).fetch_one('ウイスキー')
+        self.assertEqual(self.clock.seq_sleep, [1.0, 2.0])
+
+    def test_give_up(self):
+        ### リトライ回数を使い切ったらFalse ###
+        client = FlakyClient(title2n_failure={'ウイスキー': 10})
+        self.assertIs(self.get_fetcher(client, max_retry=2).fetch_one('ウイスキー'), False)
+        self.assertEqual(len(client.seq_call), 3)
+        self.assertEqual(len(self.clock.seq_sleep), 2)
+
+    def test_permanent_error(self):
+        ### 永続的なエラーはリトライしない ###
+        client = ClassifyingFlakyClient(seq_missing_title=['存在しないページ'])
+        self.assertIs(self.get_fetcher(client, max_retry=3).fetch_one('存在しないページ'), False)
+        self.assertEqual(len(client.seq_call), 1)
+        self.assertEqual(self.clock.seq_sleep, [])
+
+        ### is_permanent_error()を持たないクライアントでは、全ての例外をリトライする ###
+        client = FlakyClient(seq_missing_title=['存在しないページ'])
+        self.assertIs(self.get_fetcher(client, max_retry=3).fetch_one('存在しないページ'), False)
+        self.assertEqual(len(client.seq_call), 4)
+
+        self.assertTrue(MediaWikiApiClient().is_permanent_error(KeyError('missing')))
+        self.assertFalse(MediaWikiApiClient().is_permanent_error(IOError('timeout')))
+
+    def test_fetch_in_order(self):
+        client = ClassifyingFlakyClient(title2n_failure={'ウイスキー': 1}, seq_missing_title=['存在しないページ'])
+        wikipedia_article_names = [('ウイスキー', 'アルコール'), ('存在しないページ', 'アルコール'), ('ラーメン', '食べ物')]
+        seq_result = self.get_fetcher(client).fetch_in_order(wikipedia_article_names, mode=MODE_SUMMARY)
+        self.assertEqual(seq_result, [
+            {'page_title': 'ウイスキー', 'text': 'summary:ウイスキー', 'gold_label': 'アルコール'},
+            {'page_title': '存在しないページ', 'text': False, 'gold_label': 'アルコール'},
+            {'page_title': 'ラーメン', 'text': 'summary:ラーメン', 'gold_label': '食べ物'}
+        ])
+        with self.assertRaises(ValueError):
+            self.get_fetcher(client).fetch_one('ウイスキー', mode='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
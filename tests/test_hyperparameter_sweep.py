@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from sample_scripts.benchmarks.fake_tokenizer import FakeTokenizer
+from sample_scripts.ngram_features import extract_ngram_features
+try:
+    from sample_scripts.hyperparameter_sweep import run_hyperparameter_sweep, to_ngram_features, _to_model_feature, RESULT_COLUMNS
+except ImportError:
+    run_hyperparameter_sweep = None
+try:
+    import nltk
+except ImportError:
+    nltk = None
+
+TRAINING_DATA = [
+    {'gold_label': '映画', 'text': 'スター ウォーズ 映画 公開'},
+    {'gold_label': '映画', 'text': 'インディ ジョーンズ 映画 俳優'},
+    {'gold_label': '映画', 'text': 'スター 俳優 監督'},
+    {'gold_label': '料理', 'text': 'ラーメン 醤油 スープ'},
+    {'gold_label': '料理', 'text': 'カレー スープ 野菜'},
+    {'gold_label': '料理', 'text': 'ラーメン 野菜 麺'}
+]
+EVALUATION_DATA = [
+    {'gold_label': '映画', 'text': 'スター 映画 監督'},
+    {'gold_label': '料理', 'text': 'ラーメン スープ'}
+]
+DICT_POS_CONDITION = {'noun': [('名詞',)], 'proper_noun': [('名詞', '固有名詞')]}
+
+
+@unittest.skipUnless(run_hyperparameter_sweep is not None, 'DocumentFeatureSelection is not installed')
+class TestHyperparameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.path_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path_output_dir)
+
+    def test_to_ngram_features(self):
+        seq_tokens = ['スター', 'ウォーズ', 'は', 'おもしろい']
+        self.assertEqual(to_ngram_features(seq_tokens, 1), seq_tokens)
+        ### DocumentFeatureSelectionがリストで返すn-gramは、評価文書と同じタプルにする ###
+        self.assertEqual(_to_model_feature(['スター', 'ウォーズ']), ('スター', 'ウォーズ'))
+        self.assertEqual(_to_model_feature('スター'), 'スター')
+
+    @unittest.skipUnless(nltk is not None, 'nltk is not installed')
+    def test_ngram_features_match_training(self):
+        ### 評価文書のn-gramは、学習時にNgramFeatureSetが作るn-gramと同じ ###
+        seq_tokens = ['スター', 'ウォーズ', 'は', 'スター', 'おもしろい']
+        feature_set = extract_ngram_features([('映画', seq_tokens)], seq_n_value=(1, 2, 3))
+        for n_value in (1, 2, 3):
+            self.assertEqual(to_ngram_features(seq_tokens, n_value), list(feature_set.iter_documents(n_value))[0][1])
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            run_hyperparameter_sweep(TRAINING_DATA, EVALUATION_DATA, DICT_POS_CONDITION,
+                                     seq_selection_method=('soa', 'unknown'),
+                                     tokenizer_obj=FakeTokenizer(),
+                                     path_output_dir=self.path_output_dir)
+
+    def test_sweep(self):
+        seq_result_row = run_hyperparameter_sweep(TRAINING_DATA, EVALUATION_DATA, DICT_POS_CONDITION,
+                                                  seq_n_value=(1,),
+                                                  seq_selection_method=('soa', 'tf_idf'),
+                                                  seq_ranking_cutoff=(2, 1, 2),
+                                                  tokenizer_obj=FakeTokenizer(),
+                                                  n_process=2,
+                                                  path_output_dir=self.path_output_dir)
+        ### 品詞の条件 x 次数 x 手法 x 評価の順位 の総当たり ###
+        self.assertEqual(sorted((row['pos_condition'], row['n_value'], row['selection_method'], row['ranking_cutoff'])
+                                for row in seq_result_row),
+                         sorted((pos_condition_name, 1, selection_method, ranking_cutoff)
+                                for pos_condition_name in DICT_POS_CONDITION
+                                for selection_method in ('soa', 'tf_idf')
+                                for ranking_cutoff in (1, 2)))
+        self.assertTrue(all(set(row) == set(RESULT_COLUMNS) for row in seq_result_row))
+        self.assertEqual([row['accuracy'] for row in seq_result_row],
+                         sorted((row['accuracy'] for row in seq_result_row), reverse=True))
+
+        ### 評価の順位だけが違う行は、1回の分類を共有するので、順位が大きいほど精度は下がらない ###
+        row2accuracy = {(row['pos_condition'], row['selection_method'], row['ranking_cutoff']): row['accuracy'] for row in seq_result_row}
+        for pos_condition_name in DICT_POS_CONDITION:
+            for selection_method in ('soa', 'tf_idf'):
+                self.assertLessEqual(row2accuracy[(pos_condition_name, selection_method, 1)],
+                                     row2accuracy[(pos_condition_name, selection_method, 2)])
+        ### 上流の段階の計算時間は、同じ品詞の条件の行で同じ値 ###
+        for pos_condition_name in DICT_POS_CONDITION:
+            self.assertEqual(len(set(row['tokenize_seconds'] for row in seq_result_row if row['pos_condition'] == pos_condition_name)), 1)
+
+        with open(os.path.join(self.path_output_dir, 'sweep_results.csv'), 'r', newline='') as f:
+            csv_reader = csv.DictReader(f)
+            self.assertEqual(tuple(csv_reader.fieldnames), RESULT_COLUMNS)
+            self.assertEqual(len(list(csv_reader)), len(seq_result_row))
+        with open(os.path.join(self.path_output_dir, 'sweep_results.json'), 'r') as f:
+            self.assertEqual(json.load(f), seq_result_row)
+
+
+if __name__ == '__main__':
+    unittest.main()
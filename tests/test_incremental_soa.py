@@ -0,0 +1,110 @@
+import copy
+import math
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from sample_scripts.incremental_soa import IncrementalSOAScorer, ZERO_SCORE_TOLERANCE
+
+
+def compute_soa_scores(seq_label_features):
+    """文書の一覧から、SOAの式をそのまま使って (単語, ラベル) -> スコア を計算します。"""
+    label_document_count = {}
+    document_frequency = {}
+    for label_name, seq_features in seq_label_features:
+        label_document_count[label_name] = label_document_count.get(label_name, 0) + 1
+        for feature in set(seq_features):
+            document_frequency.setdefault(feature, {})
+            document_frequency[feature][label_name] = document_frequency[feature].get(label_name, 0) + 1
+    n_documents = sum(label_document_count.values())
+    feature_label2score = {}
+    for feature, label_frequency in document_frequency.items():
+        for label_name, frequency in label_frequency.items():
+            frequency_not_label = sum(label_frequency.values()) - frequency
+            n_documents_not_label = n_documents - label_document_count[label_name]
+            if frequency_not_label == 0 or n_documents_not_label == 0:
+                continue
+            score = math.log(frequency * n_documents_not_label / (label_document_count[label_name] * frequency_not_label), 2)
+            if abs(score) >= ZERO_SCORE_TOLERANCE:
+                feature_label2score[(feature, label_name)] = score
+    return feature_label2score
+
+
+def get_state(scorer):
+    scorer._update_term_scores()
+    return copy.deepcopy((scorer.label_document_count, scorer.document_frequency, scorer.term_scores))
+
+
+class TestIncrementalSOAScorer(unittest.TestCase):
+    def setUp(self):
+        random_obj = random.Random(0)
+        seq_word = ['w{}'.format(i) for i in range(40)] + [('w0', 'w{}'.format(i)) for i in range(5)]
+        self.seq_label_features = [(random_obj.choice(['a', 'b', 'c']), random_obj.sample(seq_word, random_obj.randint(1, 8)) * 2)
+                                   for _ in range(300)]
+
+    def check_scores(self, scorer, seq_label_features):
+        ### 分解して計算したスコアは、式のまま計算したスコアと丸め誤差の範囲で一致する ###
+        expected = compute_soa_scores(seq_label_features)
+        actual = {(score_record['word'], score_record['label']): score_record['score'] for score_record in scorer.get_score_records()}
+        self.assertEqual(set(actual), set(expected))
+        for feature_label, score in expected.items():
+            self.assertAlmostEqual(actual[feature_label], score, delta=1e-9 * max(1.0, abs(score)))
+            self.assertEqual(scorer.get_score(*feature_label), actual[feature_label])
+
+    def test_scores(self):
+        scorer = IncrementalSOAScorer()
+        for label_name, seq_features in self.seq_label_features:
+            scorer.add_document(label_name, seq_features)
+        self.check_scores(scorer, self.seq_label_features)
+        self.assertEqual(scorer.get_score('unknown', 'a'), 0.0)
+
+    def test_add_then_remove(self):
+        ### 追加してから同じ文書を取り除くと、集計もスコアも追加する前と同じになる ###
+        scorer = IncrementalSOAScorer()
+        for label_name, seq_features in self.seq_label_features[:200]:
+            scorer.add_document(label_name, seq_features)
+        previous_state = get_state(scorer)
+        previous_records = scorer.get_score_records()
+
+        for label_name, seq_features in self.seq_label_features[200:]:
+            scorer.add_document(label_name, seq_features)
+        self.check_scores(scorer, self.seq_label_features)
+        for label_name, seq_features in reversed(self.seq_label_features[200:]):
+            scorer.remove_document(label_name, seq_features)
+        self.assertEqual(get_state(scorer), previous_state)
+        self.assertEqual(scorer.get_score_records(), previous_records)
+        self.check_scores(scorer, self.seq_label_features[:200])
+
+        ### 途中の文書を取り除いた結果は、残りの文書から作り直した結果と一致する ###
+        for label_name, seq_features in self.seq_label_features[50:100]:
+            scorer.remove_document(label_name, seq_features)
+        rebuilt_scorer = IncrementalSOAScorer()
+        for label_name, seq_features in self.seq_label_features[:50] + self.seq_label_features[100:200]:
+            rebuilt_scorer.add_document(label_name, seq_features)
+        self.assertEqual(get_state(scorer), get_state(rebuilt_scorer))
+
+    def test_remove_unknown(self):
+        scorer = IncrementalSOAScorer()
+        scorer.add_document('a', ['x'])
+        with self.assertRaises(ValueError):
+            scorer.remove_document('b', ['x'])
+        with self.assertRaises(ValueError):
+            scorer.remove_document('a', ['y'])
+
+    def test_save_and_load(self):
+        scorer = IncrementalSOAScorer()
+        scorer.add_documents([('a', [['x', 'y'], [('x', 'y')]]), ('b', [['y', 'z'], ['x']])])
+        path_state_dir = tempfile.mkdtemp()
+        try:
+            path_state_file = os.path.join(path_state_dir, 'soa_scorer_state.json')
+            scorer.save(path_state_file)
+            loaded_scorer = IncrementalSOAScorer.load(path_state_file)
+        finally:
+            shutil.rmtree(path_state_dir)
+        self.assertEqual(get_state(loaded_scorer), get_state(scorer))
+        self.assertEqual(loaded_scorer.get_score_records(), scorer.get_score_records())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from sample_scripts import instrumentation
+from sample_scripts.instrumentation import MetricsRegistry
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.is_enabled = instrumentation.is_enabled()
+        instrumentation.disable()
+        instrumentation.reset()
+        self.path_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrumentation.reset()
+        if self.is_enabled:
+            instrumentation.enable()
+        shutil.rmtree(self.path_output_dir)
+
+    def test_no_root_logger_level(self):
+        ### importしてもルートロガーのレベルは変わらない ###
+        self.assertEqual(instrumentation.logger.name, 'sample_scripts.instrumentation')
+        self.assertEqual(instrumentation.logger.level, logging.NOTSET)
+
+    def test_disabled(self):
+        ### 無効の間は共有の何もしないオブジェクトを返し、何も集計しない ###
+        self.assertIs(instrumentation.span('tokenize'), instrumentation.span('feature_selection'))
+        with instrumentation.span('tokenize'):
+            instrumentation.increment('tokenize.documents')
+        instrumentation.increment('tokenize.tokens', 10)
+        self.assertEqual(instrumentation.get_metrics(), {'spans': {}, 'counters': {}})
+
+        registry = MetricsRegistry()
+        with registry.span('tokenize'):
+            registry.increment('tokenize.documents')
+        self.assertEqual(registry.to_dict(), {'spans': {}, 'counters': {}})
+
+    def test_json(self):
+        instrumentation.enable()
+        for _ in range(3):
+            with instrumentation.span('tokenize'):
+                instrumentation.increment('tokenize.documents')
+                instrumentation.increment('tokenize.tokens', 5)
+        instrumentation.increment('write.bytes', 0.5)
+        instrumentation.disable()
+        with instrumentation.span('tokenize'):
+            instrumentation.increment('tokenize.documents')
+
+        metrics_obj = instrumentation.get_metrics()
+        self.assertEqual(metrics_obj['counters'], {'tokenize.documents': 3, 'tokenize.tokens': 15, 'write.bytes': 0.5})
+        self.assertEqual(list(metrics_obj['spans']), ['tokenize'])
+        span_obj = metrics_obj['spans']['tokenize']
+        self.assertEqual(span_obj['n_calls'], 3)
+        self.assertLessEqual(span_obj['max_seconds'], span_obj['total_seconds'])
+        self.assertIsNone(span_obj['peak_memory_bytes'])
+
+        path_output = os.path.join(self.path_output_dir, 'metrics', 'metrics.json')
+        instrumentation.save_metrics(path_output)
+        with open(path_output) as f:
+            self.assertEqual(json.load(f), metrics_obj)
+
+    def test_prometheus(self):
+        registry = MetricsRegistry()
+        registry.enable()
+        with registry.span('feature_selection'):
+            pass
+        registry.increment('tokenize.documents', 2)
+        registry.increment('a "quoted"\\name', 0.25)
+        span_obj = registry.to_dict()['spans']['feature_selection']
+
+        expected_text = '\n'.join([
+            '# HELP sample_scripts_span_calls_total Number of times the span was entered.',
+            '# TYPE sample_scripts_span_calls_total counter',
+            'sample_scripts_span_calls_total{span="feature_selection"} 1',
+            '# HELP sample_scripts_span_seconds_total Total wall clock seconds spent in the span.',
+            '# TYPE sample_scripts_span_seconds_total counter',
+            'sample_scripts_span_seconds_total{{span="feature_selection"}} {!r}'.format(span_obj['total_seconds']),
+            '# HELP sample_scripts_span_seconds_max Longest single run of the span in seconds.',
+            '# TYPE sample_scripts_span_seconds_max gauge',
+            'sample_scripts_span_seconds_max{{span="feature_selection"}} {!r}'.format(span_obj['max_seconds']),
+            '# HELP sample_scripts_counter_total Counted events such as documents, tokens, cache hits and bytes written.',
+            '# TYPE sample_scripts_counter_total counter',
+            'sample_scripts_counter_total{name="a \\"quoted\\"\\\\name"} 0.25',
+            'sample_scripts_counter_total{name="tokenize.documents"} 2',
+        ]) + '\n'
+        self.assertEqual(registry.to_prometheus(), expected_text)
+
+        path_output = os.path.join(self.path_output_dir, 'metrics.prom')
+        registry.save(path_output)
+        with open(path_output) as f:
+            self.assertEqual(f.read(), expected_text)
+        self.assertEqual(os.listdir(self.path_output_dir), ['metrics.prom'])
+
+    def test_trace_memory(self):
+        registry = MetricsRegistry()
+        registry.enable(is_trace_memory=True)
+        try:
+            with registry.span('allocate'):
+                list_obj = [0] * 100000
+            del list_obj
+        finally:
+            registry.disable()
+        self.assertGreater(registry.to_dict()['spans']['allocate']['peak_memory_bytes'], 0)
+        self.assertIn('sample_scripts_span_peak_memory_bytes{span="allocate"}', registry.to_prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
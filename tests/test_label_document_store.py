@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections.abc import Mapping
+from unittest import mock
+from sample_scripts.label_document_store import LabelDocumentStore
+from sample_scripts.sample_keyword import run_feature_selection
+
+
+class TestLabelDocumentStore(unittest.TestCase):
+    def setUp(self):
+        self.path_store_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path_store_dir)
+
+    def test_reopen(self):
+        with LabelDocumentStore(self.path_store_dir) as store:
+            store.append('a', ['x'])
+            store.append('b', [('y', 'z')])
+        store = LabelDocumentStore(self.path_store_dir)
+        store.append('a', ['w'])
+        store.flush()
+        self.assertEqual(store.to_dict(), {'a': [['x'], ['w']], 'b': [[('y', 'z')]]})
+
+    def test_orphan_segment(self):
+        ### 新しいラベルのセグメントを書いた後、マニフェストを更新する前に落ちた状態 ###
+        with LabelDocumentStore(self.path_store_dir) as store:
+            store.append('a', ['x'])
+        with open(os.path.join(self.path_store_dir, 'segment_00001.jsonl'), 'wb') as f:
+            f.write(b'GARBAGE\n')
+        store = LabelDocumentStore(self.path_store_dir)
+        store.append('b', ['real'])
+        store.flush()
+        self.assertEqual(store.to_dict(), {'a': [['x']], 'b': [['real']]})
+
+    def test_uncommitted_tail(self):
+        with LabelDocumentStore(self.path_store_dir) as store:
+            store.append('a', ['x'])
+        with open(os.path.join(self.path_store_dir, 'segment_00000.jsonl'), 'ab') as f:
+            f.write(b'["partial"')
+        store = LabelDocumentStore(self.path_store_dir)
+        store.append('a', ['y'])
+        store.flush()
+        self.assertEqual(store.to_dict(), {'a': [['x'], ['y']]})
+
+    def test_mapping(self):
+        with LabelDocumentStore(self.path_store_dir) as store:
+            store.extend([('a', ['x']), ('b', ['y']), ('a', ['z'])])
+        store = LabelDocumentStore(self.path_store_dir)
+        self.assertIsInstance(store, Mapping)
+        self.assertEqual(sorted(store.keys()), ['a', 'b'])
+        self.assertEqual(len(store), 2)
+        self.assertIn('a', store)
+        self.assertEqual(store['a'], [['x'], ['z']])
+        self.assertIsNone(store.get('unknown'))
+        with self.assertRaises(KeyError):
+            store['unknown']
+        self.assertEqual(store, {'a': [['x'], ['z']], 'b': [['y']]})
+        ### 読み出し専用 ###
+        with self.assertRaises(TypeError):
+            store['c'] = [['w']]
+
+        ### items()は1ラベルずつファイルから読む ###
+        with mock.patch.object(LabelDocumentStore, 'iter_label_documents', wraps=store.iter_label_documents) as read_mock:
+            seq_item = iter(store.items())
+            self.assertEqual(read_mock.call_count, 0)
+            next(seq_item)
+            self.assertEqual(read_mock.call_count, 1)
+            next(seq_item)
+            self.assertEqual(read_mock.call_count, 2)
+
+    def test_run_feature_selection_without_copy(self):
+        ### dictに変換せず、ストアをそのままDocumentFeatureSelectionに渡す ###
+        with LabelDocumentStore(self.path_store_dir) as store:
+            store.append('a', ['x'])
+        document_feature_selection = mock.MagicMock()
+        document_feature_selection.interface.ScoredResultObject = object
+        document_feature_selection.interface.run_feature_selection.return_value.ScoreMatrix2ScoreDictionary.return_value = []
+        with mock.patch.dict(sys.modules, {'DocumentFeatureSelection': document_feature_selection}), \
+                mock.patch.object(LabelDocumentStore, 'to_dict', side_effect=AssertionError('copied')):
+            run_feature_selection(store)
+        self.assertIs(document_feature_selection.interface.run_feature_selection.call_args[1]['input_dict'], store)
+
+
+if __name__ == '__main__':
+    unittest.main()
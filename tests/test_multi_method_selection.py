@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from sample_scripts.label_document_store import LabelDocumentStore
+from sample_scripts.token_corpus import TokenCorpus
+try:
+    from sample_scripts.multi_method_selection import LabelTermMatrices, score_matrices, run_multi_method_feature_selection, \
+        DOCUMENT_FREQUENCY, TERM_FREQUENCY
+except ImportError:
+    LabelTermMatrices = None
+
+LABEL_DOCUMENTS = {
+    '映画': [['スター', 'ウォーズ', 'スター'], ['映画', ('スター', 'ウォーズ')]],
+    '料理': [['ラーメン', 'スター'], ['ラーメン'], []],
+    '音楽': [['ロック', 'スター']]
+}
+
+
+def to_frequency_dict(label_term_matrices, matrix_name):
+    """行列を {(ラベル, 特徴量のキー): 頻度} にします。ラベル・特徴量のIDの振り方によらず比較できます。"""
+    id2label = {label_id: label_name for label_name, label_id in label_term_matrices.label2id_dict.items()}
+    id2feature = {feature_id: feature_key for feature_key, feature_id in label_term_matrices.feature2id_dict.items()}
+    matrix_obj = label_term_matrices.matrices[matrix_name].tocoo()
+    return {(id2label[row], id2feature[column]): int(value) for row, column, value in zip(matrix_obj.row, matrix_obj.col, matrix_obj.data)}
+
+
+def is_memory_mapped(array_obj):
+    """scipyは配列をndarrayのビューにするので、元をたどってmemmapかどうかを調べます。"""
+    while array_obj is not None:
+        if isinstance(array_obj, numpy.memmap):
+            return True
+        array_obj = getattr(array_obj, 'base', None)
+    return False
+
+
+@unittest.skipUnless(LabelTermMatrices is not None, 'DocumentFeatureSelection is not installed')
+class TestMultiMethodSelection(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir)
+
+    def test_matrices(self):
+        label_term_matrices = LabelTermMatrices.from_label_documents(LABEL_DOCUMENTS)
+        document_frequency = to_frequency_dict(label_term_matrices, DOCUMENT_FREQUENCY)
+        term_frequency = to_frequency_dict(label_term_matrices, TERM_FREQUENCY)
+        ### 文書頻度は1文書内の重複を1回と数え、単語頻度は重複も数える ###
+        self.assertEqual(document_frequency[('映画', '["スター"]')], 1)
+        self.assertEqual(term_frequency[('映画', '["スター"]')], 2)
+        self.assertEqual(document_frequency[('映画', '["スター", "ウォーズ"]')], 1)
+        self.assertEqual(document_frequency[('料理', '["ラーメン"]')], 2)
+        self.assertNotIn(('音楽', '["ラーメン"]'), document_frequency)
+        ### 空の文書も文書数に数える ###
+        label2id_dict = label_term_matrices.label2id_dict
+        self.assertEqual(label_term_matrices.n_docs_distribution[label2id_dict['料理']], 3)
+        self.assertEqual(label_term_matrices.n_term_freq_distribution[label2id_dict['映画']], 5)
+
+        ### TokenCorpus, LabelDocumentStoreから作っても同じ行列 ###
+        token_corpus = TokenCorpus.from_tokenized_documents(
+            (label_name, seq_features) for label_name, seq_document in LABEL_DOCUMENTS.items() for seq_features in seq_document)
+        with LabelDocumentStore(os.path.join(self.path_work_dir, 'store')) as store:
+            for label_name, seq_document in LABEL_DOCUMENTS.items():
+                for seq_features in seq_document:
+                    store.append(label_name, seq_features)
+        for tokenized_documents in (token_corpus, store):
+            other_matrices = LabelTermMatrices.from_label_documents(tokenized_documents)
+            self.assertEqual(to_frequency_dict(other_matrices, DOCUMENT_FREQUENCY), document_frequency)
+            self.assertEqual(to_frequency_dict(other_matrices, TERM_FREQUENCY), term_frequency)
+
+    def test_save_and_load(self):
+        label_term_matrices = LabelTermMatrices.from_label_documents(LABEL_DOCUMENTS)
+        path_matrix_dir = os.path.join(self.path_work_dir, 'matrices')
+        label_term_matrices.save(path_matrix_dir)
+        loaded_matrices = LabelTermMatrices.load(path_matrix_dir)
+        ### 配列はコピーせず、memmapのまま読み込む ###
+        for matrix_obj in loaded_matrices.matrices.values():
+            self.assertTrue(all(is_memory_mapped(array_obj) for array_obj in (matrix_obj.data, matrix_obj.indices, matrix_obj.indptr)))
+        self.assertEqual(loaded_matrices.label2id_dict, label_term_matrices.label2id_dict)
+        self.assertEqual(loaded_matrices.feature2id_dict, label_term_matrices.feature2id_dict)
+        for matrix_name in (DOCUMENT_FREQUENCY, TERM_FREQUENCY):
+            self.assertEqual(to_frequency_dict(loaded_matrices, matrix_name), to_frequency_dict(label_term_matrices, matrix_name))
+        numpy.testing.assert_array_equal(loaded_matrices.n_docs_distribution, label_term_matrices.n_docs_distribution)
+        numpy.testing.assert_array_equal(loaded_matrices.n_term_freq_distribution, label_term_matrices.n_term_freq_distribution)
+
+    def test_invalid_method(self):
+        label_term_matrices = LabelTermMatrices.from_label_documents(LABEL_DOCUMENTS)
+        with self.assertRaises(ValueError):
+            score_matrices(label_term_matrices, 'unknown')
+        ### bnsはラベルが2つの場合だけ ###
+        with self.assertRaises(ValueError):
+            score_matrices(label_term_matrices, 'bns')
+        with self.assertRaises(ValueError):
+            run_multi_method_feature_selection(LABEL_DOCUMENTS, seq_selection_method=('soa', 'unknown'),
+                                               path_output_dir=self.path_work_dir)
+
+    def test_run_multi_method_feature_selection(self):
+        ### ラベルが3つなので、bnsはスキップする ###
+        path_output_dir = os.path.join(self.path_work_dir, 'models')
+        seq_report = run_multi_method_feature_selection(LABEL_DOCUMENTS, seq_selection_method=('soa', 'tf_idf', 'bns'),
+                                                        path_output_dir=path_output_dir, n_process=2,
+                                                        path_matrix_dir=os.path.join(self.path_work_dir, 'matrices'))
+        self.assertEqual([report_obj['method'] for report_obj in seq_report], ['soa', 'tf_idf'])
+        for report_obj in seq_report:
+            with open(report_obj['path_score_file'], 'r') as f:
+                seq_score_dict = json.load(f)
+            self.assertEqual(len(seq_score_dict), report_obj['n_records'])
+            self.assertTrue(all(score_dict['label'] in LABEL_DOCUMENTS for score_dict in seq_score_dict))
+        with open(os.path.join(path_output_dir, 'feature_selection_report.json'), 'r') as f:
+            self.assertEqual(json.load(f), seq_report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import collections
+import math
+import random
+import unittest
+from sample_scripts.ngram_features import NgramExtractor, LossyCounter, extract_ngram_features, HASHED_FEATURE_PREFIX
+try:
+    import nltk
+except ImportError:
+    nltk = None
+
+
+def to_ngrams(seq_tokens, n_value):
+    """nltk.ngrams()と同じn-gramを作ります。unigramはタプルでなく単語そのものです。"""
+    if n_value == 1:
+        return list(seq_tokens)
+    return list(zip(*[seq_tokens[i:] for i in range(n_value)]))
+
+
+class TestNgramFeatures(unittest.TestCase):
+    def setUp(self):
+        random_obj = random.Random(0)
+        seq_word = ['スター', 'ウォーズ', 'は', 'おもしろい', '映画', 'です']
+        self.seq_label_tokens = [(random_obj.choice(['a', 'b']), [random_obj.choice(seq_word) for _ in range(random_obj.randint(0, 12))])
+                                 for _ in range(100)]
+
+    def test_decode(self):
+        ### IDから戻したn-gramは、トークン列から直接作ったn-gramと同じ ###
+        feature_set = extract_ngram_features(self.seq_label_tokens, seq_n_value=(1, 2, 4))
+        for n_value in (1, 2, 4):
+            self.assertEqual(list(feature_set.iter_documents(n_value)),
+                             [(label_name, to_ngrams(seq_tokens, n_value)) for label_name, seq_tokens in self.seq_label_tokens])
+        with self.assertRaises(KeyError):
+            list(feature_set.iter_documents(3))
+
+    @unittest.skipUnless(nltk is not None, 'nltk is not installed')
+    def test_same_as_nltk(self):
+        feature_set = extract_ngram_features(self.seq_label_tokens, seq_n_value=(2, 3))
+        for n_value in (2, 3):
+            self.assertEqual([seq_feature for _, seq_feature in feature_set.iter_documents(n_value)],
+                             [list(nltk.ngrams(seq_tokens, n_value)) for _, seq_tokens in self.seq_label_tokens])
+
+    def test_hashed(self):
+        ### 同じn-gramは同じID. プロセスやインスタンスが違っても同じ ###
+        seq_tokens = ['スター', 'ウォーズ', 'は', 'スター', 'ウォーズ']
+        seq_ngram_ids = NgramExtractor(seq_n_value=(1, 2), hash_bits=20).extract(seq_tokens)
+        self.assertEqual(seq_ngram_ids, NgramExtractor(seq_n_value=(1, 2), hash_bits=20).extract(seq_tokens))
+        self.assertEqual([len(seq_ngram_ids[1]), len(seq_ngram_ids[2])], [5, 4])
+        self.assertEqual(seq_ngram_ids[2][0], seq_ngram_ids[2][3])
+        self.assertNotEqual(seq_ngram_ids[2][0], seq_ngram_ids[2][1])
+        self.assertTrue(all(0 <= ngram_id < 2 ** 20 for ngram_id in seq_ngram_ids[1] + seq_ngram_ids[2]))
+
+        feature_set = extract_ngram_features([('a', seq_tokens)], seq_n_value=(2,), hash_bits=20)
+        self.assertEqual(list(feature_set.iter_documents(2))[0][1],
+                         ['{}{}'.format(HASHED_FEATURE_PREFIX, ngram_id) for ngram_id in seq_ngram_ids[2]])
+
+    def test_min_count(self):
+        feature_set = extract_ngram_features(self.seq_label_tokens, seq_n_value=(2,), min_count=3)
+        ngram_frequency = collections.Counter(ngram for _, seq_tokens in self.seq_label_tokens for ngram in to_ngrams(seq_tokens, 2))
+        self.assertEqual(list(feature_set.iter_documents(2)),
+                         [(label_name, [ngram for ngram in to_ngrams(seq_tokens, 2) if ngram_frequency[ngram] >= 3])
+                          for label_name, seq_tokens in self.seq_label_tokens])
+
+    def test_invalid_params(self):
+        with self.assertRaises(ValueError):
+            NgramExtractor(seq_n_value=(0, 1))
+        with self.assertRaises(ValueError):
+            NgramExtractor(hash_bits=64)
+        with self.assertRaises(ValueError):
+            LossyCounter(epsilon=1.0)
+
+
+class TestLossyCounter(unittest.TestCase):
+    def test_error_bound(self):
+        ### Zipf分布に近い、まれな要素が多いストリーム ###
+        random_obj = random.Random(0)
+        epsilon = 0.01
+        seq_item = [int(1.0 / random_obj.random()) for _ in range(20000)]
+        true_frequency = collections.Counter(seq_item)
+
+        lossy_counter = LossyCounter(epsilon=epsilon)
+        max_n_counters = 0
+        for start_index in range(0, len(seq_item), lossy_counter.bucket_width):
+            lossy_counter.update_many(seq_item[start_index:start_index + lossy_counter.bucket_width])
+            max_n_counters = max(max_n_counters, len(lossy_counter.counters))
+        n_total = lossy_counter.total_count
+        self.assertEqual(n_total, len(seq_item))
+
+        for item, frequency in true_frequency.items():
+            ### 数えた頻度は、真の頻度より大きくならず、小さくなる分は epsilon * 総数 以下 ###
+            self.assertLessEqual(lossy_counter.get(item), frequency)
+            self.assertGreaterEqual(lossy_counter.get(item), frequency - epsilon * n_total)
+            ### 頻度が epsilon * 総数 を超える要素は捨てられない ###
+            if frequency > epsilon * n_total:
+                self.assertIn(item, lossy_counter.counters)
+        ### カウンタの数は 1 / epsilon * log(epsilon * 総数) 以下で、異なり数よりずっと少ない ###
+        self.assertLessEqual(max_n_counters, 1.0 / epsilon * math.log(epsilon * n_total))
+        self.assertLess(len(lossy_counter.counters), len(true_frequency) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
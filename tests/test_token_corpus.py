@@ -0,0 +1,81 @@
+import collections
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from sample_scripts.token_corpus import TokenCorpus, Vocabulary, FILE_NAME_META
+
+
+class TestTokenCorpus(unittest.TestCase):
+    def setUp(self):
+        self.path_corpus_dir = os.path.join(tempfile.mkdtemp(), 'token_corpus')
+        ### n-gramのタプルと、空の文書を含む ###
+        self.seq_label_tokens = [('映画', ['スターウォーズ', 'おもしろい', 'スターウォーズ']),
+                                 ('料理', ['ラーメン', ('ラーメン', 'おいしい')]),
+                                 ('映画', []),
+                                 ('料理', ['おもしろい'])]
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.path_corpus_dir))
+
+    def check_corpus(self, token_corpus):
+        self.assertEqual(len(token_corpus), 4)
+        self.assertEqual(token_corpus.n_tokens, 6)
+        self.assertEqual(list(token_corpus.iter_documents()), self.seq_label_tokens)
+        self.assertEqual(token_corpus.to_label_documents(),
+                         {'映画': [['スターウォーズ', 'おもしろい', 'スターウォーズ'], []],
+                          '料理': [['ラーメン', ('ラーメン', 'おいしい')], ['おもしろい']]})
+        self.assertEqual(token_corpus.count_words(),
+                         collections.Counter({'スターウォーズ': 2, 'おもしろい': 2, 'ラーメン': 1, ('ラーメン', 'おいしい'): 1}))
+
+    def test_vocabulary(self):
+        vocabulary = Vocabulary(['a', ('a', 'b')])
+        self.assertEqual(vocabulary.intern('a'), 0)
+        self.assertEqual(vocabulary.intern('c'), 2)
+        self.assertEqual(vocabulary[1], ('a', 'b'))
+        self.assertIsNone(vocabulary.get_id('unknown'))
+
+    def test_save_and_load(self):
+        token_corpus = TokenCorpus.from_tokenized_documents(self.seq_label_tokens)
+        self.check_corpus(token_corpus)
+        token_corpus.save(self.path_corpus_dir)
+
+        ### mmapで読み込んでも、コピーして読み込んでも、保存前と同じ内容 ###
+        for is_use_mmap in (True, False):
+            loaded_corpus = TokenCorpus.load(self.path_corpus_dir, is_use_mmap=is_use_mmap)
+            self.assertEqual(loaded_corpus.is_read_only, is_use_mmap)
+            self.check_corpus(loaded_corpus)
+            self.assertEqual(list(loaded_corpus.token_ids), list(token_corpus.token_ids))
+            self.assertEqual(list(loaded_corpus.offsets), list(token_corpus.offsets))
+            self.assertEqual(list(loaded_corpus.label_ids), list(token_corpus.label_ids))
+
+        ### mmapで読み込んだコーパスには追加できない ###
+        with self.assertRaises(TypeError):
+            TokenCorpus.load(self.path_corpus_dir).add_document('映画', ['x'])
+        ### コピーして読み込んだコーパスには追加できる ###
+        loaded_corpus = TokenCorpus.load(self.path_corpus_dir, is_use_mmap=False)
+        loaded_corpus.add_document('映画', ['スターウォーズ', '新作'])
+        self.assertEqual(loaded_corpus.get_document(4), ['スターウォーズ', '新作'])
+        self.assertEqual(loaded_corpus.get_document_ids(4)[0], loaded_corpus.get_document_ids(0)[0])
+
+    def test_empty_corpus(self):
+        TokenCorpus().save(self.path_corpus_dir)
+        loaded_corpus = TokenCorpus.load(self.path_corpus_dir)
+        self.assertEqual(len(loaded_corpus), 0)
+        self.assertEqual(list(loaded_corpus.iter_documents()), [])
+
+    def test_different_integer_size(self):
+        TokenCorpus.from_tokenized_documents(self.seq_label_tokens).save(self.path_corpus_dir)
+        path_meta = os.path.join(self.path_corpus_dir, FILE_NAME_META)
+        with open(path_meta, 'r') as f:
+            meta_obj = json.load(f)
+        meta_obj['itemsize']['token_ids'] += 4
+        with open(path_meta, 'w') as f:
+            f.write(json.dumps(meta_obj))
+        with self.assertRaises(ValueError):
+            TokenCorpus.load(self.path_corpus_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
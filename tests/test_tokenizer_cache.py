@@ -0,0 +1,94 @@
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+from sample_scripts.benchmarks.fake_tokenizer import FakeTokenizer
+from sample_scripts.tokenizer_cache import TokenizationCache, get_config_hash
+
+POS_CONDITION = [('名詞',)]
+
+
+class CountingTokenizer(FakeTokenizer):
+    def __init__(self, dictType='fake'):
+        super().__init__(dictType=dictType)
+        self.n_calls = collections.Counter()
+
+    def tokenize(self, sentence, is_surface=False, **kwargs):
+        self.n_calls[sentence] += 1
+        return super().tokenize(sentence, is_surface=is_surface, **kwargs)
+
+
+class TestTokenizationCache(unittest.TestCase):
+    def setUp(self):
+        self.path_cache_dir = tempfile.mkdtemp()
+        self.path_cache_db = os.path.join(self.path_cache_dir, 'tokenization_cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_cache_dir)
+
+    def test_hit_and_miss(self):
+        tokenizer_obj = CountingTokenizer()
+        with TokenizationCache(self.path_cache_db) as cache:
+            self.assertEqual(cache.get_or_tokenize('スター 映画', tokenizer_obj, POS_CONDITION), ['スター', '映画'])
+            self.assertEqual(cache.get_or_tokenize('スター 映画', tokenizer_obj, POS_CONDITION), ['スター', '映画'])
+            self.assertEqual((cache.n_hit, cache.n_miss), (1, 1))
+            ### 品詞条件・表層形フラグ・辞書が違えば、別のキャッシュ ###
+            self.assertEqual(cache.get_or_tokenize('スター 映画', tokenizer_obj, [('名詞', '固有名詞')]), ['スター'])
+            cache.get_or_tokenize('スター 映画', tokenizer_obj, POS_CONDITION, is_surface=True)
+            cache.get_or_tokenize('スター 映画', CountingTokenizer(dictType='other'), POS_CONDITION)
+            self.assertEqual((cache.n_hit, cache.n_miss), (1, 4))
+            ### 空のトークン列もキャッシュする ###
+            self.assertEqual(cache.get_or_tokenize('、', tokenizer_obj, POS_CONDITION), [])
+            self.assertEqual(cache.get_or_tokenize('、', tokenizer_obj, POS_CONDITION), [])
+            self.assertEqual(tokenizer_obj.n_calls, {'スター 映画': 3, '、': 1})
+
+        ### 閉じて開き直しても残っている ###
+        with TokenizationCache(self.path_cache_db) as cache:
+            self.assertEqual(len(cache), 5)
+            self.assertEqual(cache.get_or_tokenize('スター 映画', tokenizer_obj, POS_CONDITION), ['スター', '映画'])
+            self.assertEqual((cache.n_hit, cache.n_miss), (1, 0))
+        self.assertEqual(tokenizer_obj.n_calls['スター 映画'], 3)
+
+    def test_config_hash_follows_tokenizer_settings(self):
+        ### 同じオブジェクト(同じid)でも、設定が変われば別の設定として扱う ###
+        tokenizer_obj = FakeTokenizer(dictType='ipadic')
+        with TokenizationCache(self.path_cache_db) as cache:
+            ipadic_hash = cache.get_tokenizer_config_hash(tokenizer_obj, POS_CONDITION, False)
+            self.assertEqual(ipadic_hash, get_config_hash(tokenizer_obj, POS_CONDITION, False))
+            tokenizer_obj._dictType = 'neologd'
+            neologd_hash = cache.get_tokenizer_config_hash(tokenizer_obj, POS_CONDITION, False)
+            self.assertNotEqual(neologd_hash, ipadic_hash)
+            self.assertEqual(neologd_hash, get_config_hash(tokenizer_obj, POS_CONDITION, False))
+            ### 別のオブジェクトでも設定が同じなら、同じハッシュ ###
+            self.assertEqual(cache.get_tokenizer_config_hash(FakeTokenizer(dictType='ipadic'), POS_CONDITION, False), ipadic_hash)
+
+    def test_lru_eviction(self):
+        tokenizer_obj = CountingTokenizer()
+        seq_text = ['スター{}'.format('ア' * i) for i in range(1, 11)]
+        with TokenizationCache(self.path_cache_db, max_bytes=10 ** 9) as cache:
+            for input_text in seq_text[:5]:
+                cache.get_or_tokenize(input_text, tokenizer_obj, POS_CONDITION)
+            n_bytes_five = cache._total_bytes
+        ### 5件が入る大きさにして、先に入れた2件を読み出してから新しい文書を入れる ###
+        with TokenizationCache(self.path_cache_db, max_bytes=n_bytes_five + 1, commit_interval=1) as cache:
+            self.assertEqual(cache._total_bytes, n_bytes_five)
+            for input_text in seq_text[:2]:
+                cache.get_or_tokenize(input_text, tokenizer_obj, POS_CONDITION)
+            for input_text in seq_text[5:7]:
+                cache.get_or_tokenize(input_text, tokenizer_obj, POS_CONDITION)
+            self.assertLessEqual(cache._total_bytes, cache.max_bytes)
+            self.assertEqual(cache._total_bytes,
+                             cache._connection.execute('SELECT SUM(n_bytes) FROM tokens').fetchone()[0])
+
+            ### 最後に使われたのが古いもの(3件目以降)から追い出され、読み出したものと新しいものは残る ###
+            tokenizer_obj.n_calls.clear()
+            for input_text in seq_text[:2] + seq_text[6:7]:
+                cache.get_or_tokenize(input_text, tokenizer_obj, POS_CONDITION)
+            self.assertEqual(sum(tokenizer_obj.n_calls.values()), 0)
+            cache.get_or_tokenize(seq_text[2], tokenizer_obj, POS_CONDITION)
+            self.assertEqual(tokenizer_obj.n_calls, {seq_text[2]: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from sample_scripts.binary_model import BinaryScoreModel, write_binary_model
+from sample_scripts.sample_category_classification import score_tokens
+from sample_scripts.vectorized_scorer import ScoreMatrixScorer
+
+
+def _build_word_score_dictionary(random_obj:random.Random, n_labels:int, n_words:int=200):
+    labels = ['label{:03d}'.format(label_index) for label_index in range(n_labels)]
+    word_score_dictionary = {}
+    for word_index in range(n_words):
+        for label_name in random_obj.sample(labels, random_obj.randint(1, min(4, n_labels))):
+            ### 同点が起きるように、同じスコアも混ぜる ###
+            score = random_obj.choice([0.0, 1.0, 0.5, random_obj.random(), random_obj.gauss(0, 100)])
+            word_score_dictionary.setdefault('word{}'.format(word_index), []).append((label_name, score))
+    return word_score_dictionary
+
+
+class TestScoreMatrixScorer(unittest.TestCase):
+    def test_same_as_dictionary_scoring(self):
+        ### ラベル1つ(pairwise summationになる形), Pythonで並べる場合, argpartitionを使う場合 ###
+        random_obj = random.Random(0)
+        for n_labels in (1, 3, 70):
+            word_score_dictionary = _build_word_score_dictionary(random_obj, n_labels)
+            vocabulary = list(word_score_dictionary.keys()) + ['unknown']
+            seq_document_tokens = [[random_obj.choice(vocabulary) for _ in range(random_obj.randint(0, 300))] for _ in range(50)]
+            seq_expected = [score_tokens(list_tokens, word_score_dictionary) for list_tokens in seq_document_tokens]
+            for is_dense in (False, True):
+                scorer = ScoreMatrixScorer.from_word_score_dictionary(word_score_dictionary, is_dense=is_dense)
+                self._check_scorer(scorer, seq_document_tokens, seq_expected)
+
+    def test_same_as_binary_model_scoring(self):
+        random_obj = random.Random(1)
+        word_score_dictionary = _build_word_score_dictionary(random_obj, 5)
+        seq_score_record = [{'word': word, 'label': label_name, 'score': score}
+                            for word, seq_label_score in word_score_dictionary.items() for label_name, score in seq_label_score]
+        path_model_dir = tempfile.mkdtemp()
+        try:
+            path_model_file = os.path.join(path_model_dir, 'word_score.bin')
+            write_binary_model(seq_score_record, path_model_file)
+            with BinaryScoreModel(path_model_file) as binary_score_model:
+                vocabulary = list(word_score_dictionary.keys()) + ['unknown']
+                seq_document_tokens = [[random_obj.choice(vocabulary) for _ in range(random_obj.randint(0, 100))] for _ in range(30)]
+                seq_expected = [score_tokens(list_tokens, binary_score_model) for list_tokens in seq_document_tokens]
+                for is_dense in (False, True):
+                    scorer = ScoreMatrixScorer.from_binary_model(binary_score_model, is_dense=is_dense)
+                    self._check_scorer(scorer, seq_document_tokens, seq_expected)
+                    del scorer
+        finally:
+            shutil.rmtree(path_model_dir)
+
+    def _check_scorer(self, scorer, seq_document_tokens, seq_expected):
+        for k in (None, 1, 3):
+            seq_expected_top = [expected if k is None else expected[:k] for expected in seq_expected]
+            self.assertEqual([scorer.score_tokens(list_tokens, k=k) for list_tokens in seq_document_tokens], seq_expected_top)
+            self.assertEqual(scorer.score_documents(seq_document_tokens, k=k), seq_expected_top)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import random
+import unittest
+from sample_scripts.incremental_soa import IncrementalSOAScorer
+from sample_scripts.vocabulary_pruning import VocabularyPruner
+
+
+class TestVocabularyPruner(unittest.TestCase):
+    def setUp(self):
+        random_obj = random.Random(0)
+        seq_word = ['w{}'.format(i) for i in range(50)]
+        self.seq_label_tokens = [(random_obj.choice(['a', 'b', 'c']), random_obj.sample(seq_word, random_obj.randint(1, 10)))
+                                 for _ in range(200)]
+
+    def test_fit_document_frequency(self):
+        ### 差分更新の集計から決めた語彙が、文書をなめて決めた語彙と一致する ###
+        scorer = IncrementalSOAScorer()
+        for label_name, seq_tokens in self.seq_label_tokens:
+            scorer.add_document(label_name, seq_tokens)
+        for pruner_kwargs in ({'min_df': 2, 'max_df': 0.1},
+                              {'min_df': 1, 'max_df': 30, 'top_n_per_label': 5},
+                              {'min_df': 3, 'max_vocabulary_size': 7}):
+            expected = VocabularyPruner(**pruner_kwargs).fit(self.seq_label_tokens)
+            actual = VocabularyPruner(**pruner_kwargs).fit_document_frequency(scorer.document_frequency, scorer.n_documents)
+            self.assertEqual(actual.vocabulary, expected.vocabulary)
+            self.assertEqual(actual.n_documents, expected.n_documents)
+            self.assertEqual(actual.n_original_vocabulary, expected.n_original_vocabulary)
+
+
+if __name__ == '__main__':
+    unittest.main()
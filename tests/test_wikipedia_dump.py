@@ -0,0 +1,57 @@
+import bz2
+import os
+import shutil
+import tempfile
+import unittest
+from sample_scripts.wikipedia_dump import iter_dump_documents, read_multistream_index
+
+DUMP_HEADER = b'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" xml:lang="ja">\n<siteinfo><sitename>test</sitename></siteinfo>\n'
+PAGE_TEMPLATE = '<page><title>{0}</title><ns>0</ns><id>{1}</id>{2}<revision><text>[[リンク|本文]]{1}</text></revision></page>\n'
+
+
+class TestMultistreamDump(unittest.TestCase):
+    def setUp(self):
+        ### 1ストリーム10ページのmultistreamダンプと、同じ内容の通常のダンプを作る ###
+        self.path_dir = tempfile.mkdtemp()
+        self.path_dump = os.path.join(self.path_dir, 'dump.xml')
+        self.path_multistream_dump = os.path.join(self.path_dir, 'dump-multistream.xml.bz2')
+        self.path_index = os.path.join(self.path_dir, 'dump-multistream-index.txt')
+        seq_index_line = []
+        with open(self.path_dump, 'wb') as dump_file, open(self.path_multistream_dump, 'wb') as multistream_file:
+            dump_file.write(DUMP_HEADER)
+            multistream_file.write(bz2.compress(DUMP_HEADER))
+            for stream_index in range(5):
+                offset = multistream_file.tell()
+                seq_page = []
+                for page_id in range(stream_index * 10, stream_index * 10 + 10):
+                    page_title = 'ページ:{}'.format(page_id)
+                    seq_page.append(PAGE_TEMPLATE.format(page_title, page_id, '<redirect title="x" />' if page_id == 13 else ''))
+                    seq_index_line.append('{}:{}:{}\n'.format(offset, page_id, page_title))
+                stream_data = ''.join(seq_page).encode('utf-8')
+                dump_file.write(stream_data)
+                multistream_file.write(bz2.compress(stream_data))
+            dump_file.write(b'</mediawiki>\n')
+            multistream_file.write(bz2.compress(b'</mediawiki>\n'))
+        with open(self.path_index, 'w', encoding='utf-8') as f:
+            f.write(''.join(seq_index_line))
+
+    def tearDown(self):
+        shutil.rmtree(self.path_dir)
+
+    def test_read_multistream_index(self):
+        seq_stream_range = read_multistream_index(self.path_index, ['ページ:3', 'ページ:5', 'ページ:41'])
+        self.assertEqual(len(seq_stream_range), 2)
+        self.assertIsNone(seq_stream_range[-1][1])
+
+    def test_multistream_matches_sequential(self):
+        title2attribute = {'ページ:{}'.format(page_id): page_id for page_id in (0, 9, 13, 25, 49)}
+        seq_document = list(iter_dump_documents(self.path_dump, title2attribute, n_process=2))
+        seq_multistream_document = list(iter_dump_documents(self.path_multistream_dump, title2attribute, n_process=2,
+                                                            path_index=self.path_index, n_streams_per_chunk=1))
+        self.assertEqual(seq_multistream_document, seq_document)
+        self.assertEqual([page_title for page_title, _, _ in seq_document], ['ページ:0', 'ページ:9', 'ページ:25', 'ページ:49'])
+        self.assertEqual(seq_document[0][1], '本文0')
+
+
+if __name__ == '__main__':
+    unittest.main()